@@ -0,0 +1,206 @@
+import sys
+import math
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+from data_preprocessing import load_config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MB = 1 << 20
+
+
+class AdmissionRejected(Exception):
+    """
+    Batch work turned away for lack of capacity
+
+    status is 429 when too many requests are already waiting and 503 when
+    one waited wait_timeout seconds without capacity freeing up;
+    retry_after is the suggested Retry-After in seconds.
+    """
+
+    def __init__(self, status: int, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """Capacity held by one admitted request; release() is idempotent"""
+
+    def __init__(self, admission: 'BatchAdmission', kind: str, cost: int):
+        self.admission = admission
+        self.kind = kind
+        self.cost = cost
+        self.started = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self.admission._release(self)
+
+
+class BatchAdmission:
+    """
+    Memory budget and concurrency limit for batch scoring in one worker process
+
+    Every batch request reserves its estimated peak memory (see the *_row_bytes
+    estimates) before it starts. Requests that would take reservations past
+    memory_budget bytes, or past max_concurrent running requests, wait up to
+    wait_timeout seconds, with at most max_waiting of them waiting at a time.
+    Work estimated above the whole budget can never run in-process; callers
+    check fits() first and route it to the streaming or background path.
+
+    Limits are per process, like the prediction cache's memory backend: with
+    several gunicorn workers the machine needs workers x memory_budget.
+    """
+
+    def __init__(self, memory_budget: int = 1024 * MB, max_concurrent: int = 4, max_waiting: int = 8,
+                 wait_timeout: float = 2.0, json_row_bytes: int = 6144, stream_row_bytes: int = 2048,
+                 max_queued_jobs: int = 100):
+        if memory_budget < 1 or max_concurrent < 1:
+            raise ValueError("memory_budget and max_concurrent must be at least 1")
+        self.memory_budget = memory_budget
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self.json_row_bytes = json_row_bytes
+        self.stream_row_bytes = stream_row_bytes
+        self.max_queued_jobs = max_queued_jobs
+        self.reserved = 0
+        self.active = 0
+        self.waiting = 0
+        self._hold_seconds = None
+        self._cond = threading.Condition()
+        self._stats = {'admitted': 0, 'rejected_queue_full': 0, 'rejected_timeout': 0, 'routed': 0,
+                       'peak_reserved': 0}
+
+    def fits(self, cost: int) -> bool:
+        """Whether work of this estimated size can ever run within the budget"""
+        return cost <= self.memory_budget
+
+    def _has_room(self, cost: int) -> bool:
+        if self.active == 0:
+            return True
+        return self.active < self.max_concurrent and self.reserved + cost <= self.memory_budget
+
+    def retry_after(self) -> int:
+        """Seconds a rejected client should wait: the typical time a batch request holds capacity"""
+        typical = self._hold_seconds if self._hold_seconds is not None else 1.0
+        return int(min(max(math.ceil(typical), 1), 60))
+
+    def acquire(self, cost: int, kind: str = 'batch', timeout: Optional[float] = None) -> Ticket:
+        """
+        Reserve cost bytes and a concurrency slot, waiting for them if needed
+
+        Args:
+            cost (int): Estimated peak memory of the request in bytes
+            kind (str): Label for logs, e.g. 'json', 'stream', 'bulk', 'job'
+            timeout (float, optional): Seconds to wait; defaults to wait_timeout, float('inf') waits indefinitely
+
+        Returns:
+            Ticket: Release it (or use admit()) when the work is done
+
+        Raises:
+            AdmissionRejected: 429 if max_waiting requests are already waiting, 503 on timeout
+        """
+        # Oversized work that got here anyway runs alone rather than never
+        cost = min(cost, self.memory_budget)
+        timeout = self.wait_timeout if timeout is None else timeout
+        with self._cond:
+            if not self._has_room(cost):
+                if self.waiting >= self.max_waiting:
+                    self._stats['rejected_queue_full'] += 1
+                    raise AdmissionRejected(429, "Too many batch requests are waiting", self.retry_after())
+                self.waiting += 1
+                try:
+                    admitted = self._cond.wait_for(lambda: self._has_room(cost),
+                                                   None if math.isinf(timeout) else timeout)
+                finally:
+                    self.waiting -= 1
+                if not admitted:
+                    self._stats['rejected_timeout'] += 1
+                    raise AdmissionRejected(503, "Batch scoring capacity is exhausted", self.retry_after())
+            self.reserved += cost
+            self.active += 1
+            self._stats['admitted'] += 1
+            self._stats['peak_reserved'] = max(self._stats['peak_reserved'], self.reserved)
+        return Ticket(self, kind, cost)
+
+    def _release(self, ticket: Ticket) -> None:
+        held = time.monotonic() - ticket.started
+        with self._cond:
+            self.reserved -= ticket.cost
+            self.active -= 1
+            # Exponentially weighted, so Retry-After follows recent request lengths
+            self._hold_seconds = held if self._hold_seconds is None else 0.8 * self._hold_seconds + 0.2 * held
+            self._cond.notify_all()
+
+    @contextmanager
+    def admit(self, cost: int, kind: str = 'batch', timeout: Optional[float] = None):
+        ticket = self.acquire(cost, kind, timeout)
+        try:
+            yield ticket
+        finally:
+            ticket.release()
+
+    def count_routed(self) -> None:
+        with self._cond:
+            self._stats['routed'] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update(reserved_bytes=self.reserved, active=self.active, waiting=self.waiting,
+                         typical_hold_seconds=round(self._hold_seconds, 3) if self._hold_seconds else None)
+        stats.update(memory_budget=self.memory_budget, max_concurrent=self.max_concurrent,
+                     max_waiting=self.max_waiting, max_queued_jobs=self.max_queued_jobs)
+        return stats
+
+
+def process_memory() -> Dict[str, Optional[int]]:
+    """Resident and peak resident memory of this process in bytes, from /proc where available"""
+    try:
+        with open('/proc/self/status') as f:
+            fields = dict(line.split(':', 1) for line in f if ':' in line)
+        return {'rss_bytes': int(fields['VmRSS'].split()[0]) * 1024,
+                'peak_rss_bytes': int(fields['VmHWM'].split()[0]) * 1024}
+    except (OSError, KeyError, ValueError):
+        try:
+            import resource
+            # ru_maxrss is in bytes on macOS and kilobytes elsewhere; only the peak is known
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return {'rss_bytes': None, 'peak_rss_bytes': peak if sys.platform == 'darwin' else peak * 1024}
+        except ImportError:
+            return {'rss_bytes': None, 'peak_rss_bytes': None}
+
+
+_admission = None
+_admission_lock = threading.Lock()
+
+
+def get_admission() -> BatchAdmission:
+    """Return the process-wide admission controller configured by serving.batch.admission"""
+    global _admission
+    if _admission is None:
+        with _admission_lock:
+            if _admission is None:
+                batch_config = (load_config().get('serving', {}) or {}).get('batch', {}) or {}
+                settings = batch_config.get('admission', {}) or {}
+                _admission = BatchAdmission(
+                    memory_budget=int(float(settings.get('memory_budget_mb', 1024)) * MB),
+                    max_concurrent=int(settings.get('max_concurrent', 4)),
+                    max_waiting=int(settings.get('max_waiting', 8)),
+                    wait_timeout=float(settings.get('wait_timeout_s', 2.0)),
+                    json_row_bytes=int(settings.get('json_row_bytes', 6144)),
+                    stream_row_bytes=int(settings.get('stream_row_bytes', 2048)),
+                    max_queued_jobs=int(settings.get('max_queued_jobs', 100))
+                )
+    return _admission
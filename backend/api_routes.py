@@ -1,4 +1,4 @@
-from flask import Blueprint, request, jsonify, send_from_directory
+from flask import Blueprint, request, jsonify, send_from_directory, send_file, Response, stream_with_context
 import os
 import json
 import pandas as pd
@@ -6,9 +6,27 @@ import random
 from datetime import datetime, timedelta
 import pathlib
 from pathlib import Path
-from simple_inference import predict  
+from simple_inference import predict, predict_many, predict_ensemble, get_prediction_cache
+from ensemble import ENSEMBLE_MEMBERS, get_ensemble
+from batch_scoring import (
+    OUTPUT_FORMATS, MEDIA_TYPES, MODEL_COLUMNS, ChunkScorer, chunk_rows_from_config, count_rows,
+    default_columns, input_format_for, read_frame, scoring_version, split_compression, stream_scored,
+    upload_suffix
+)
+from batch_jobs import QUEUED, RUNNING, get_job_queue
+from admission import AdmissionRejected, get_admission, process_memory
+from click_rate import get_click_rate_detector
+from click_store import get_click_store, get_csv_click_cache, read_csv_since
+from click_stream import StreamFull, get_click_stream
+from csv_repair import repair_chunk, repair_enabled, summarize_counts
+from parallel_scoring import get_parallel_scorer
+from result_store import get_result_store, result_key, spool_upload
+from data_preprocessing import load_config
+from model_registry import get_registry
+from feature_pipeline import get_compiled_pipeline
 import logging
 import io
+import tempfile
 from functools import wraps
 from flask import request, jsonify, current_app
 import jwt
@@ -65,8 +83,13 @@ def predict_fraud():
         return jsonify({"error": "No input data provided"}), 400
     
     try:
-        # Get prediction from simple_inference
-        result = predict(data)
+        # ?ensemble=mean|weighted|max|stacking scores with every model instead of the served one
+        strategy = request.args.get('ensemble')
+        if strategy is not None:
+            result = predict_ensemble(data, None if strategy in ('', 'true', '1') else strategy)
+        else:
+            # Get prediction from simple_inference
+            result = predict(data)
         
         # Handle inference errors
         if 'error' in result:
@@ -83,6 +106,108 @@ def predict_fraud():
             "details": str(e)
         }), 500
 
+UNSUPPORTED_UPLOAD = "Only CSV, Parquet and Arrow files are supported, and CSV compressed as .gz, .zst or .zip"
+
+def _rejected(error: AdmissionRejected):
+    """429/503 response for work turned away by admission control"""
+    response = jsonify({"error": error.reason, "retry_after": error.retry_after})
+    response.status_code = error.status
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+def _check_job_queue(queue, admission) -> None:
+    """Raise AdmissionRejected (429) when max_queued_jobs batch jobs are already queued or running"""
+    counts = queue.store.counts()
+    if counts.get(QUEUED, 0) + counts.get(RUNNING, 0) >= admission.max_queued_jobs:
+        raise AdmissionRejected(429, "Too many batch jobs are queued", admission.retry_after())
+
+NDJSON_CONTENT_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl', 'application/x-jsonlines')
+
+def _parse_bulk_body():
+    """
+    Parse a /predict/bulk body as a JSON array or as NDJSON
+
+    Returns:
+        tuple: (records, parse_errors) where parse_errors maps the position of
+            each unparseable NDJSON line to a message; raises ValueError if the
+            body as a whole is unusable
+    """
+    if request.mimetype in NDJSON_CONTENT_TYPES:
+        records, parse_errors = [], {}
+        for line_number, line in enumerate(request.get_data(as_text=True).splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                parse_errors[len(records)] = f"Invalid JSON on line {line_number}: {e.msg}"
+                records.append(None)
+        return records, parse_errors
+
+    data = request.get_json(silent=True)
+    if data is None:
+        raise ValueError("Body must be a JSON array or NDJSON")
+    if not isinstance(data, list):
+        raise ValueError("Expected a JSON array of records")
+    return data, {}
+
+@blueprint.route('/predict/bulk', methods=['POST'])
+def predict_bulk():
+    """Score a JSON array or NDJSON stream of clicks in one pass, with per-record errors"""
+    try:
+        records, parse_errors = _parse_bulk_body()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if not records:
+        return jsonify({"error": "No input data provided"}), 400
+
+    max_records = int((load_config().get('serving', {}) or {}).get('bulk_max_records', 10000))
+    if len(records) > max_records:
+        return jsonify({
+            "error": f"Too many records: {len(records)} (limit {max_records})",
+            "max_records": max_records
+        }), 413
+
+    admission = get_admission()
+    try:
+        ticket = admission.acquire(len(records) * admission.json_row_bytes, 'bulk')
+    except AdmissionRejected as e:
+        return _rejected(e)
+
+    try:
+        results = predict_many(records)
+        for i, message in parse_errors.items():
+            results[i] = {'error': message}
+
+        failed = sum(1 for r in results if 'error' in r)
+        return jsonify({
+            'count': len(results),
+            'scored': len(results) - failed,
+            'failed': failed,
+            'results': results
+        })
+
+    except Exception as e:
+        logger.error(f"Bulk prediction failed: {str(e)}", exc_info=True)
+        return jsonify({
+            "error": "Server error during prediction",
+            "details": str(e)
+        }), 500
+    finally:
+        ticket.release()
+
+@blueprint.route('/cache/stats', methods=['GET'])
+def prediction_cache_stats():
+    """Report prediction cache hit/miss/eviction counters"""
+    try:
+        cache = get_prediction_cache()
+        if cache is None:
+            return jsonify({"enabled": False})
+        return jsonify(dict(cache.stats(), enabled=True, model_version=get_registry().version))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @blueprint.route('/model-scores', methods=['GET'])
 def get_model_scores():
     """Fetch model training metrics from stored results"""
@@ -241,6 +366,15 @@ def demo_predict():
         logger.error(f"Prediction failed: {str(e)}", exc_info=True)
         return jsonify({"error": str(e)}), 500
 
+def _projection_param(input_format):
+    """Columns to decode from ?columns=model|all, defaulting per input format"""
+    columns = request.args.get('columns') or request.form.get('columns')
+    if columns is None:
+        return default_columns(input_format)
+    if columns not in ('model', 'all'):
+        raise ValueError(f"Unsupported columns option: {columns}")
+    return MODEL_COLUMNS if columns == 'model' else None
+
 @blueprint.route('/batch-predict', methods=['POST'])
 def batch_predict_fraud():
     try:
@@ -255,111 +389,235 @@ def batch_predict_fraud():
             return jsonify({"error": "No file selected"}), 400
             
         # Check file extension
-        if not file.filename.endswith('.csv'):
-            return jsonify({"error": "Only CSV files are supported"}), 400
-        
-        # Save the file temporarily
-        temp_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'temp_uploads', file.filename)
-        os.makedirs(os.path.dirname(temp_path), exist_ok=True)
-        file.save(temp_path)
-        
+        input_format = input_format_for(file.filename)
+        if input_format is None:
+            return jsonify({"error": UNSUPPORTED_UPLOAD}), 400
+        try:
+            columns = _projection_param(input_format)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        stream_format = request.args.get('stream') or request.form.get('stream')
+        if stream_format:
+            stream_format = 'csv' if stream_format in ('1', 'true') else stream_format
+            if stream_format not in OUTPUT_FORMATS:
+                return jsonify({"error": f"Unsupported stream format: {stream_format}"}), 400
+
+        # Spool to a unique temp file, hashing on the way, so concurrent uploads
+        # never share a path and re-uploads can be answered from the result store
+        spool_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'temp_uploads')
+        temp_path, upload_sha256 = spool_upload(file, spool_dir, suffix=upload_suffix(file.filename, input_format))
+        store = get_result_store()
+        version = scoring_version() if store is not None else None
+        key = None
+        if version is not None:
+            key = result_key(upload_sha256, version, input_format, stream_format or 'json',
+                             ','.join(columns) if columns is not None else '*', repair_enabled())
+        cached = store.get(key) if key is not None else None
+        if cached is not None:
+            os.remove(temp_path)
+            logger.info(f"Serving cached result for {file.filename} ({upload_sha256[:12]})")
+            if stream_format:
+                response = send_file(str(cached), mimetype=MEDIA_TYPES[stream_format], as_attachment=True,
+                                     download_name=f'fraud_predictions.{stream_format}')
+            else:
+                response = send_file(str(cached), mimetype='application/json')
+            response.headers['X-Result-Cache'] = 'hit'
+            return response
+
+        # ?stream=csv|ndjson|parquet|arrow scores chunk by chunk and streams the
+        # annotated rows back, so memory stays bounded however large the upload is
+        admission = get_admission()
+        if stream_format:
+            try:
+                ticket = admission.acquire(chunk_rows_from_config() * admission.stream_row_bytes, 'stream')
+            except AdmissionRejected as e:
+                os.remove(temp_path)
+                return _rejected(e)
+            scorer = ChunkScorer()
+
+            def discard_upload():
+                try:
+                    os.remove(temp_path)
+                except FileNotFoundError:
+                    pass
+
+            def generate():
+                # Werkzeug closes uploads when the view returns, before the body
+                # is streamed, so the generator owns the spooled copy. The output
+                # is teed to a file that enters the result store if it completes
+                tee = tempfile.NamedTemporaryFile(dir=spool_dir, suffix=f'.{stream_format}', delete=False) \
+                    if key is not None else None
+                completed = []
+                try:
+                    for data in stream_scored(temp_path, stream_format, scorer=scorer, input_format=input_format,
+                                              columns=columns, on_complete=completed.append):
+                        if tee is not None:
+                            tee.write(data.encode() if isinstance(data, str) else data)
+                        yield data
+                    if tee is not None:
+                        tee.close()
+                        if completed and scorer.version == scoring_version():
+                            store.put(key, tee.name, suffix=f'.{stream_format}', move=True)
+                finally:
+                    ticket.release()
+                    discard_upload()
+                    if tee is not None:
+                        tee.close()
+                        if os.path.exists(tee.name):
+                            os.remove(tee.name)
+
+            response = Response(
+                stream_with_context(generate()),
+                mimetype=MEDIA_TYPES[stream_format],
+                headers={'Content-Disposition': f'attachment; filename=fraud_predictions.{stream_format}'}
+            )
+            response.headers['X-Result-Cache'] = 'miss'
+            # The generator may never start if the client goes away first
+            response.call_on_close(ticket.release)
+            response.call_on_close(discard_upload)
+            return response
+
+        # The JSON response holds every row in memory at once. Uploads too large
+        # for the whole budget become background jobs with NDJSON results
+        try:
+            cost = count_rows(temp_path, input_format) * admission.json_row_bytes
+            if not admission.fits(cost):
+                queue = get_job_queue()
+                _check_job_queue(queue, admission)
+                admission.count_routed()
+                job_id = queue.submit(temp_path, file.filename, 'ndjson', input_format)
+                logger.info(f"Routed {file.filename} ({cost // (1 << 20)} MB estimated) to batch job {job_id}")
+                response = jsonify(dict(
+                    queue.status(job_id),
+                    routed=True,
+                    message="Upload exceeds the in-memory batch budget; it is being scored as a background job"
+                ))
+                response.status_code = 202
+                response.headers['Location'] = f'/batch-jobs/{job_id}'
+                os.remove(temp_path)
+                return response
+            ticket = admission.acquire(cost, 'json')
+        except AdmissionRejected as e:
+            os.remove(temp_path)
+            return _rejected(e)
+        except Exception as e:
+            os.remove(temp_path)
+            logger.error(f"Error sizing upload: {str(e)}", exc_info=True)
+            return jsonify({"error": f"Error processing CSV: {str(e)}"}), 500
+
         # Process the CSV file
         try:
             # Import necessary modules
             import pandas as pd
             import numpy as np
-            import joblib
             from data_preprocessing import feature_engineering
             
-            # Load the CSV
-            logger.info(f"Loading CSV file from: {temp_path}")
-            input_df = pd.read_csv(temp_path)
-            logger.info(f"Loaded CSV with {len(input_df)} rows and {len(input_df.columns)} columns")
+            # Load the file
+            logger.info(f"Loading {input_format} file from: {temp_path}")
+            input_df = read_frame(temp_path, input_format, columns)
+            logger.info(f"Loaded {len(input_df)} rows and {len(input_df.columns)} columns")
+
+            # Apply the fix_csv.py repairs in one vectorized pass
+            repairs = None
+            if repair_enabled():
+                input_df, repair_counts = repair_chunk(input_df)
+                repairs = summarize_counts(repair_counts)
+                logger.info(f"Repairs: {repairs}")
             
             # Store original data for later
             original_data = input_df.copy()
             
-            # Apply feature engineering to the entire dataframe at once
-            logger.info("Applying feature engineering")
-            processed_df = feature_engineering(input_df)
-            logger.info(f"Generated {len(processed_df.columns)} features")
-            
-            # Load preprocessor
             base_dir = pathlib.Path(__file__).parent
-            preprocessor_path = base_dir / 'models/preprocessor.pkl'
-            preprocessor = joblib.load(preprocessor_path)
-            if isinstance(preprocessor, dict) and 'preprocessor' in preprocessor:
-                preprocessor = preprocessor['preprocessor']
-            
-            # Transform data using preprocessor
-            logger.info("Transforming data with preprocessor")
-            X = preprocessor.transform(processed_df)
-            if hasattr(X, 'toarray'):
-                X = X.toarray()
-            
-            # Load all available models
-            models = {}
-            model_paths = {
-                'random_forest': base_dir / 'models/random_forest_model/model.pkl',
-                'xgboost': base_dir / 'models/xgboost_model/model.pkl',
-                'neural_network': base_dir / 'models/fraud_detection_model.keras'
-            }
+
+            def transform_batch():
+                # Use the shared preprocessor from the model registry
+                preprocessor = get_registry().get().preprocessor
+                compiled = get_compiled_pipeline(preprocessor)
+
+                if compiled is not None:
+                    # Feature engineering and transform in one NumPy pass; one-hot
+                    # heavy output stays CSR and the ensemble densifies per member
+                    logger.info("Transforming data with compiled feature pipeline")
+                    return compiled.transform(input_df, sparse='auto')
+
+                # Apply feature engineering to the entire dataframe at once
+                logger.info("Applying feature engineering")
+                processed_df = feature_engineering(input_df)
+                logger.info(f"Generated {len(processed_df.columns)} features")
+
+                # Transform data using preprocessor
+                logger.info("Transforming data with preprocessor")
+                return preprocessor.transform(processed_df)
             
             # Initialize results structure
             results = {
                 'timestamp': datetime.now().isoformat(),
                 'filename': file.filename,
                 'total_records': len(input_df),
+                'repairs': repairs,
                 'data': original_data.to_dict('records'),
                 'predictions': {}
             }
-            
-            # Make predictions with each available model
-            for model_name, model_path in model_paths.items():
-                if not model_path.exists():
+
+            def summarize(probs, flags):
+                fraud_count = int(np.count_nonzero(flags))
+                return {
+                    'is_fraud': flags.tolist(),
+                    'fraud_probabilities': probs.tolist(),
+                    'fraud_count': fraud_count,
+                    'fraud_percentage': round(fraud_count / len(flags) * 100, 2)
+                }
+
+            # Large batches are partitioned across the scoring process pool, if configured
+            scored = None
+            parallel = get_parallel_scorer()
+            # The pool partitions raw CSV bytes, so it only takes whole, uncompressed CSV uploads
+            if (parallel is not None and input_format == 'csv' and split_compression(file.filename)[1] is None
+                    and columns is None and len(input_df) >= parallel.min_rows):
+                try:
+                    scored, row_errors = parallel.score_csv(temp_path)
+                    if row_errors:
+                        row, message = min(row_errors.items())
+                        raise ValueError(f"Row {row + 1}: {message}")
+                    logger.info(f"Scored {len(input_df)} rows on {parallel.workers} worker processes")
+                except Exception as parallel_error:
+                    logger.warning(f"Parallel scoring failed, scoring in-process: {str(parallel_error)}")
+                    scored = None
+
+            if scored is None:
+                # Score every resident model concurrently on the shared matrix
+                X = transform_batch()
+                try:
+                    scored = get_ensemble().score(X)
+                except Exception as ensemble_error:
+                    logger.error(f"Ensemble scoring failed: {str(ensemble_error)}")
+                    scored = None
+
+            ensemble_summary = {'error': 'No model could score the data'}
+            if scored is not None:
+                ensemble_summary = dict(summarize(scored.combined, scored.is_fraud),
+                                        strategy=scored.strategy, members=scored.names)
+
+            # The frontend shows the first model without an error
+            if request.form.get('model') == 'ensemble':
+                results['predictions']['ensemble'] = ensemble_summary
+
+            for model_name, relative_path in ENSEMBLE_MEMBERS.items():
+                if scored is not None and model_name in scored.names:
+                    probs = scored.member(model_name).astype(float)
+                    results['predictions'][model_name] = summarize(probs, probs >= 0.5)
+                elif scored is not None and model_name in scored.errors:
+                    results['predictions'][model_name] = {'error': scored.errors[model_name]}
+                else:
+                    model_path = base_dir / 'models' / relative_path
                     logger.warning(f"Model {model_name} not found at {model_path}")
                     results['predictions'][model_name] = {
                         'error': f"Model not found at {model_path}"
                     }
-                    continue
-                
-                try:
-                    logger.info(f"Making predictions with {model_name}")
-                    
-                    # Load model based on type
-                    if model_name == 'neural_network' and str(model_path).endswith(('.keras', '.h5')):
-                        import tensorflow as tf
-                        model = tf.keras.models.load_model(model_path)
-                        predictions = model.predict(X, verbose=0)
-                        fraud_probs = predictions.flatten()
-                        is_fraud = fraud_probs >= 0.5
-                    else:
-                        model = joblib.load(model_path)
-                        if hasattr(model, 'predict_proba'):
-                            probs = model.predict_proba(X)
-                            fraud_probs = probs[:, 1]  # Probability of class 1 (fraud)
-                            is_fraud = model.predict(X)
-                        else:
-                            is_fraud = model.predict(X)
-                            fraud_probs = is_fraud.astype(float)
-                    
-                    # Calculate fraud statistics
-                    fraud_count = np.sum(is_fraud)
-                    fraud_percentage = round(float(fraud_count) / len(is_fraud) * 100, 2)
-                    
-                    # Store results for this model
-                    results['predictions'][model_name] = {
-                        'is_fraud': is_fraud.tolist(),
-                        'fraud_probabilities': fraud_probs.tolist(),
-                        'fraud_count': int(fraud_count),
-                        'fraud_percentage': fraud_percentage
-                    }
-                    
-                except Exception as model_error:
-                    logger.error(f"Error with model {model_name}: {str(model_error)}")
-                    results['predictions'][model_name] = {
-                        'error': str(model_error)
-                    }
+
+            if 'ensemble' not in results['predictions']:
+                results['predictions']['ensemble'] = ensemble_summary
             
             # Generate CSV data for download
             # Use the first successful model for CSV generation
@@ -380,21 +638,123 @@ def batch_predict_fraud():
                 csv_df.to_csv(csv_buffer, index=False)
                 results['csv_data'] = csv_buffer.getvalue()
             
-            # Clean up temporary file
-            try:
-                os.remove(temp_path)
-            except Exception as e:
-                logger.warning(f"Failed to remove temporary file: {str(e)}")
+            response = jsonify(results)
+            response.headers['X-Result-Cache'] = 'miss'
+
+            # Keep complete results for re-uploads, unless the models changed meanwhile
+            if key is not None and scored is not None and not scored.errors and version == scoring_version():
+                with tempfile.NamedTemporaryFile(dir=spool_dir, suffix='.json', delete=False) as result_file:
+                    result_file.write(response.get_data())
+                store.put(key, result_file.name, suffix='.json', move=True)
             
-            return jsonify(results)
+            return response
             
         except Exception as processing_error:
             logger.error(f"Error processing CSV: {str(processing_error)}", exc_info=True)
             return jsonify({"error": f"Error processing CSV: {str(processing_error)}"}), 500
+        finally:
+            ticket.release()
+            # Clean up temporary file
+            try:
+                os.remove(temp_path)
+            except Exception as e:
+                logger.warning(f"Failed to remove temporary file: {str(e)}")
             
     except Exception as e:
         logger.error(f"Batch prediction failed: {str(e)}", exc_info=True)
         return jsonify({"error": str(e)}), 500
+
+
+@blueprint.route('/batch-jobs', methods=['POST'])
+def create_batch_job():
+    """Queue a CSV, Parquet, Arrow or compressed upload for background scoring and return its job ID straight away"""
+    if 'file' not in request.files:
+        return jsonify({"error": "No file provided"}), 400
+    file = request.files['file']
+    if file.filename == '':
+        return jsonify({"error": "No file selected"}), 400
+    if input_format_for(file.filename) is None:
+        return jsonify({"error": UNSUPPORTED_UPLOAD}), 400
+
+    output_format = request.args.get('format') or request.form.get('format') or 'csv'
+    if output_format not in OUTPUT_FORMATS:
+        return jsonify({"error": f"Unsupported output format: {output_format}"}), 400
+
+    queue = get_job_queue()
+    admission = get_admission()
+    try:
+        _check_job_queue(queue, admission)
+    except AdmissionRejected as e:
+        return _rejected(e)
+
+    try:
+        job_id = queue.submit(file, file.filename, output_format)
+        response = jsonify(queue.status(job_id))
+        response.status_code = 202
+        response.headers['Location'] = f'/batch-jobs/{job_id}'
+        return response
+    except Exception as e:
+        logger.error(f"Queueing batch job failed: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+@blueprint.route('/batch/stats', methods=['GET'])
+def batch_stats():
+    """Report batch admission counters, process memory and job queue depth"""
+    try:
+        return jsonify({
+            'admission': get_admission().stats(),
+            'memory': process_memory(),
+            'jobs': get_job_queue().store.counts()
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@blueprint.route('/batch-jobs/<job_id>', methods=['GET'])
+def batch_job_status(job_id):
+    status = get_job_queue().status(job_id)
+    if status is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(status)
+
+@blueprint.route('/batch-jobs/<job_id>/cancel', methods=['POST'])
+def cancel_batch_job(job_id):
+    queue = get_job_queue()
+    if queue.cancel(job_id) is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(queue.status(job_id))
+
+@blueprint.route('/batch-jobs/<job_id>/retry', methods=['POST'])
+def retry_batch_job(job_id):
+    queue = get_job_queue()
+    status = queue.retry(job_id)
+    if status is None:
+        return jsonify({"error": "Job not found"}), 404
+    if status != 'queued':
+        return jsonify({"error": f"Job is {status}, only failed jobs can be retried"}), 409
+    return jsonify(queue.status(job_id)), 202
+
+@blueprint.route('/batch-jobs/<job_id>/quarantine', methods=['GET'])
+def batch_job_quarantine(job_id):
+    quarantined = get_job_queue().quarantine(job_id)
+    if quarantined is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify({"job_id": job_id, "chunks": quarantined})
+
+@blueprint.route('/batch-jobs/<job_id>/result', methods=['GET'])
+def batch_job_result(job_id):
+    queue = get_job_queue()
+    status = queue.status(job_id)
+    if status is None:
+        return jsonify({"error": "Job not found"}), 404
+    result_path = queue.result_path(job_id)
+    if result_path is None or not result_path.exists():
+        return jsonify({"error": f"Job is {status['status']}, no result to download"}), 409
+    return send_file(
+        str(result_path),
+        mimetype=MEDIA_TYPES[status['format']],
+        as_attachment=True,
+        download_name=f"fraud_predictions_{job_id}.{status['format']}"
+    )
     
     
 @blueprint.route('/append-csv', methods=['POST'])
@@ -406,59 +766,61 @@ def append_to_csv():
     csv_path = os.path.join(csv_dir, 'live_clicks.csv')
     
     try:
+        # Clicks go to the segmented click store unless serving.live_clicks.store is 'csv'
+        store = get_click_store()
+
         # Create directory if it doesn't exist
-        if not os.path.exists(csv_dir):
+        if store is None and not os.path.exists(csv_dir):
             os.makedirs(csv_dir)
         
         # Create file with headers if it doesn't exist
-        if not os.path.exists(csv_path):
+        if store is None and not os.path.exists(csv_path):
             with open(csv_path, 'w') as f:
                 f.write('timestamp,device_type,browser,os,ad_position,scroll_depth,mouse_movement,click_duration,ad_id,is_fraud\n')
         
-        # Check for rapid clicks by reading recent entries
-        is_fraud = False
-        
-        # Spam detection logic
-        if os.path.exists(csv_path):
-            try:
-                # Read last few lines to check for rapid clicks
-                recent_clicks = []
-                with open(csv_path, 'r') as f:
-                    recent_clicks = f.readlines()[-20:]  # Get last 20 entries
-                
-                # Count clicks in the last 2 seconds
-                current_time = datetime.fromisoformat(data['timestamp'].replace('Z', '+00:00'))
-                click_count = 0
-                
-                for click in recent_clicks:
-                    parts = click.strip().split(',')
-                    if len(parts) >= 1:
-                        try:
-                            click_time = datetime.fromisoformat(parts[0].replace('Z', '+00:00'))
-                            time_diff = (current_time - click_time).total_seconds()
-                            if time_diff < 2.0:  # Within 2 seconds
-                                click_count += 1
-                        except (ValueError, IndexError):
-                            continue
-                
-                # Mark as fraud if more than 3 clicks in 2 seconds
-                if click_count >= 3:
-                    is_fraud = True
-                    logger.info(f"Fraud detected: {click_count} clicks in 2 seconds")
-            except Exception as e:
-                logger.error(f"Error in spam detection: {str(e)}")
-        
         # Get ad_id from data or use default
         ad_id = data.get('ad_id', 'unknown')
-        
+
+        # Rapid-click detection: per-key sliding windows held in memory (or the
+        # shared SQLite store), so the cost does not grow with the CSV
+        is_fraud = False
+        rate_limits = []
+        try:
+            click = dict(data, ad_id=ad_id, ip=request.remote_addr)
+            rate_limits = get_click_rate_detector().record(click)
+            if rate_limits:
+                is_fraud = True
+                for hit in rate_limits:
+                    logger.info(f"Fraud detected: {hit['clicks']} clicks in {hit['window_s']:g} seconds "
+                                f"for the same {hit['rule']}")
+        except Exception as e:
+            logger.error(f"Error in spam detection: {str(e)}")
+        
+        if store is not None:
+            try:
+                store.append({
+                    'timestamp': data['timestamp'], 'device_type': data['device_type'],
+                    'browser': data['browser'], 'os': data['operating_system'],
+                    'ad_position': data['ad_position'], 'scroll_depth': data['scroll_depth'],
+                    'mouse_movement': data['mouse_movement'], 'click_duration': data['click_duration'],
+                    'ad_id': ad_id, 'is_fraud': is_fraud
+                })
+            except ValueError as e:
+                return jsonify({"error": f"Invalid click: {str(e)}"}), 400
+            get_click_stream().notify()
+            return jsonify({"status": "success", "file_path": str(store.directory), "is_fraud": is_fraud,
+                            "rate_limits": rate_limits}), 200
+
         # Append new row with updated fraud status and ad_id
         with open(csv_path, 'a') as f:
             f.write(f"{data['timestamp']},{data['device_type']},{data['browser']},"
                     f"{data['operating_system']},{data['ad_position']},"
                     f"{data['scroll_depth']},{data['mouse_movement']},"
                     f"{data['click_duration']},{ad_id},{1 if is_fraud else 0}\n")
+        get_click_stream().notify()
         
-        return jsonify({"status": "success", "file_path": csv_path, "is_fraud": is_fraud}), 200
+        return jsonify({"status": "success", "file_path": csv_path, "is_fraud": is_fraud,
+                        "rate_limits": rate_limits}), 200
     
     except Exception as e:
         logger.error(f"CSV append error: {str(e)}")
@@ -500,27 +862,86 @@ def user_profile(current_user):
         
 live_clicks_bp = Blueprint('live_clicks', __name__)
 
+# Clicks per /api/live-clicks?since= page: default and maximum
+LIVE_CLICKS_PAGE = 1000
+LIVE_CLICKS_MAX_PAGE = 10000
+
 @live_clicks_bp.route('/api/live-clicks', methods=['GET'])
 def get_live_clicks():
     try:
+        store = get_click_store()
         csv_path = os.path.join(os.path.dirname(__file__), 'data', 'live_clicks.csv')
+
+        # ?since=<cursor>&limit=<n> returns only clicks appended after the cursor
+        # from the previous response, so a poll costs what arrived since then
+        if 'since' in request.args:
+            try:
+                cursor = int(request.args['since'])
+                limit = min(int(request.args.get('limit', LIVE_CLICKS_PAGE)), LIVE_CLICKS_MAX_PAGE)
+                if cursor < 0 or limit < 1:
+                    raise ValueError("since must be at least 0 and limit at least 1")
+            except ValueError as e:
+                return jsonify({"error": f"Invalid cursor: {str(e)}"}), 400
+            if store is not None:
+                page = store.read_since(cursor, limit)
+            elif os.path.exists(csv_path):
+                page = read_csv_since(csv_path, cursor, limit)
+            else:
+                return jsonify({"error": "Data file not found"}), 404
+            df = page['clicks'].astype(object)
+            return jsonify({"clicks": df.where(pd.notnull(df), None).to_dict(orient='records'),
+                            "cursor": page['cursor'], "has_more": page['has_more']})
+
+        if store is not None:
+            # Optional ?start=&end= (ISO timestamps) only read the matching segments and blocks
+            try:
+                df = store.scan(request.args.get('start'), request.args.get('end'))
+            except ValueError as e:
+                return jsonify({"error": f"Invalid time range: {str(e)}"}), 400
+            df = df.astype(object)
+            return jsonify(df.where(pd.notnull(df), None).to_dict(orient='records'))
         
-        if not os.path.exists(csv_path):
+        # The CSV is followed by a per-process cache that parses only appended lines
+        try:
+            body = get_csv_click_cache().json_chunks()
+        except FileNotFoundError:
             logger.error(f"CSV file not found at {csv_path}")
             return jsonify({"error": "Data file not found"}), 404
-
-        # Read CSV with error handling
-        df = pd.read_csv(csv_path, skip_blank_lines=True, on_bad_lines='skip')
-        
-        if df.empty:
-            logger.warning("CSV file is empty or all lines were filtered out")
-            return jsonify([]), 200
-            
-        # Convert NaN values to null
-        clicks_data = df.where(pd.notnull(df), None).to_dict(orient='records')
-        
-        return jsonify(clicks_data)
+        return Response(body, mimetype='application/json')
 
     except Exception as e:
         logger.error(f"Error loading live clicks: {str(e)}")
-        return jsonify({"error": "Failed to process data file"}), 500
\ No newline at end of file
+        return jsonify({"error": "Failed to process data file"}), 500
+
+@live_clicks_bp.route('/api/live-clicks/stream', methods=['GET'])
+def stream_live_clicks():
+    """
+    Server-Sent Events stream of clicks as /append-csv accepts them
+
+    Each click event carries the row as /api/live-clicks returns it and an
+    id that is a ?since= cursor. Reconnecting with Last-Event-ID (or
+    ?last_event_id=, e.g. the cursor of a /api/live-clicks page) replays
+    the clicks missed in between.
+    """
+    last_event_id = request.headers.get('Last-Event-ID', request.args.get('last_event_id'))
+    try:
+        last_event_id = int(last_event_id) if last_event_id not in (None, '') else None
+    except ValueError:
+        return jsonify({"error": "Last-Event-ID must be a cursor"}), 400
+    try:
+        frames = get_click_stream().subscribe(last_event_id)
+    except StreamFull as e:
+        response = jsonify({"error": str(e)})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+
+    response = Response(frames, mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.call_on_close(frames.close)
+    return response
+
+
+@live_clicks_bp.route('/api/live-clicks/stream/stats', methods=['GET'])
+def live_click_stream_stats():
+    return jsonify(get_click_stream().stats())
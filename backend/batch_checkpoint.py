@@ -0,0 +1,235 @@
+import os
+import json
+import shutil
+import logging
+import pathlib
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+
+from batch_scoring import (
+    BINARY_FORMATS, ChunkScorer, ResultEncoder, require_pyarrow, chunk_rows_from_config, read_chunks
+)
+from csv_repair import add_counts, empty_counts, repair_chunk
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = 'manifest.json'
+MANIFEST_VERSION = 1
+
+
+class CheckpointedRun:
+    """
+    Score a file into per-chunk result segments recorded in a manifest
+
+    Each chunk is scored and written to its own segment file, then recorded
+    in manifest.json (written atomically), so a run that fails or is killed
+    resumes after the last recorded chunk. A manifest from a different
+    input file, chunk size, format or model version is discarded.
+
+    A chunk whose scoring or encoding raises is retried once after
+    csv_repair.repair_chunk() (a no-op for scorers that already repair); if
+    it still fails, its raw rows are written to
+    quarantine/ with the error and the run continues without them.
+
+    Layout of directory:
+        manifest.json
+        segments/000000.<format> ...
+        quarantine/000042.csv ...
+    """
+
+    def __init__(self, directory, source, input_format: str = 'csv', output_format: str = 'csv',
+                 chunk_rows: Optional[int] = None, columns: Optional[List[str]] = None,
+                 scorer: Optional[ChunkScorer] = None):
+        self.directory = pathlib.Path(directory)
+        self.source = pathlib.Path(source)
+        self.input_format = input_format
+        self.output_format = output_format
+        self.chunk_rows = chunk_rows or chunk_rows_from_config()
+        self.columns = columns
+        self.scorer = scorer or ChunkScorer()
+        self.manifest = self._load_manifest()
+
+    @property
+    def segments_dir(self) -> pathlib.Path:
+        return self.directory / 'segments'
+
+    @property
+    def quarantine_dir(self) -> pathlib.Path:
+        return self.directory / 'quarantine'
+
+    def _settings(self) -> Dict[str, Any]:
+        stat = self.source.stat()
+        return {
+            'source_size': stat.st_size,
+            'source_mtime_ns': stat.st_mtime_ns,
+            'input_format': self.input_format,
+            'output_format': self.output_format,
+            'chunk_rows': self.chunk_rows,
+            'columns': self.columns,
+            'scoring_version': getattr(self.scorer, 'version', None)
+        }
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        settings = self._settings()
+        path = self.directory / MANIFEST_FILE
+        if path.exists():
+            try:
+                with open(path) as f:
+                    manifest = json.load(f)
+                if manifest.get('version') == MANIFEST_VERSION and manifest.get('settings') == settings:
+                    if manifest['chunks'] or manifest['quarantined']:
+                        logger.info(f"Resuming {self.source.name} after {len(manifest['chunks'])} scored and "
+                                    f"{len(manifest['quarantined'])} quarantined chunks")
+                    return manifest
+                logger.warning(f"Discarding checkpoint in {self.directory}: input, settings or models changed")
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Discarding unreadable checkpoint in {self.directory}: {e}")
+            shutil.rmtree(self.segments_dir, ignore_errors=True)
+            shutil.rmtree(self.quarantine_dir, ignore_errors=True)
+        return {'version': MANIFEST_VERSION, 'settings': settings, 'chunks': {}, 'quarantined': {}, 'complete': False}
+
+    def _save_manifest(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / MANIFEST_FILE
+        staging = path.with_name(path.name + '.tmp')
+        with open(staging, 'w') as f:
+            json.dump(self.manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(staging, path)
+
+    def totals(self) -> Dict[str, Any]:
+        chunks = self.manifest['chunks'].values()
+        quarantined = self.manifest['quarantined'].values()
+        repairs = empty_counts()
+        for chunk in chunks:
+            add_counts(repairs, chunk.get('repairs', {}))
+        return {
+            'rows': sum(c['rows'] for c in chunks) + sum(q['rows'] for q in quarantined),
+            'fraud_count': sum(c['fraud_count'] for c in chunks),
+            'error_rows': sum(c['error_rows'] for c in chunks),
+            'quarantined_rows': sum(q['rows'] for q in quarantined),
+            'quarantined_chunks': len(self.manifest['quarantined']),
+            'repairs': repairs
+        }
+
+    @property
+    def quarantined(self) -> Dict[str, Dict[str, Any]]:
+        return self.manifest['quarantined']
+
+    def _write_segment(self, index: int, annotated: pd.DataFrame) -> str:
+        encoder = ResultEncoder(self.output_format)
+        data = encoder.encode(annotated)
+        data = data + encoder.finish()
+        self.segments_dir.mkdir(parents=True, exist_ok=True)
+        name = f'{index:06d}.{self.output_format}'
+        staging = self.segments_dir / f'.{name}.tmp'
+        with open(staging, 'wb') as f:
+            f.write(data.encode() if isinstance(data, str) else data)
+        os.replace(staging, self.segments_dir / name)
+        return name
+
+    def _score_chunk(self, index: int, chunk: pd.DataFrame) -> None:
+        before = dict(getattr(self.scorer, 'repairs', {}))
+        annotated = self.scorer.score(chunk, raise_errors=True)
+        repairs = {rule: n - before.get(rule, 0) for rule, n in getattr(self.scorer, 'repairs', {}).items()}
+        self.manifest['chunks'][str(index)] = {
+            'repairs': {rule: n for rule, n in repairs.items() if n},
+            'rows': len(annotated),
+            'fraud_count': int(annotated['ensemble_is_fraud'].fillna(False).sum())
+            if 'ensemble_is_fraud' in annotated else 0,
+            'error_rows': int((annotated['error'].fillna('') != '').sum()) if 'error' in annotated else 0,
+            'segment': self._write_segment(index, annotated)
+        }
+
+    def _quarantine(self, index: int, chunk: pd.DataFrame, error: Exception) -> None:
+        self.quarantine_dir.mkdir(parents=True, exist_ok=True)
+        name = f'{index:06d}.csv'
+        chunk.to_csv(self.quarantine_dir / name, index=False)
+        self.manifest['quarantined'][str(index)] = {'rows': len(chunk), 'error': str(error), 'file': name}
+        logger.warning(f"Quarantined chunk {index} ({len(chunk)} rows) of {self.source.name}: {error}")
+
+    def run(self, before_chunk: Optional[Callable[[], None]] = None,
+            on_progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Score every chunk not yet in the manifest
+
+        Args:
+            before_chunk (callable, optional): Called before scoring each chunk; raise to stop the run
+            on_progress (callable, optional): Called with totals() at the start and after every chunk
+
+        Returns:
+            dict: totals() once every chunk is scored or quarantined
+        """
+        if on_progress is not None:
+            on_progress(self.totals())
+        if self.manifest['complete']:
+            return self.totals()
+
+        for index, chunk in enumerate(read_chunks(str(self.source), self.chunk_rows, self.input_format, self.columns)):
+            key = str(index)
+            if key in self.manifest['chunks'] or key in self.manifest['quarantined']:
+                continue
+            if before_chunk is not None:
+                before_chunk()
+            try:
+                self._score_chunk(index, chunk)
+            except MemoryError:
+                # Not the chunk's fault; fail the run so it can resume from here
+                raise
+            except Exception as e:
+                logger.warning(f"Chunk {index} of {self.source.name} failed ({e}), retrying after repair")
+                try:
+                    self._score_chunk(index, repair_chunk(chunk)[0])
+                except MemoryError:
+                    raise
+                except Exception as e:
+                    self._quarantine(index, chunk, e)
+            self._save_manifest()
+            if on_progress is not None:
+                on_progress(self.totals())
+
+        self.manifest['complete'] = True
+        self._save_manifest()
+        return self.totals()
+
+    def _segment_paths(self) -> List[pathlib.Path]:
+        indexes = sorted(int(key) for key in self.manifest['chunks'])
+        return [self.segments_dir / self.manifest['chunks'][str(i)]['segment'] for i in indexes]
+
+    def assemble(self, output_path) -> None:
+        """Concatenate the segments, in chunk order, into one output file"""
+        output_path = pathlib.Path(output_path)
+        partial = output_path.with_name(output_path.name + '.partial')
+        segments = self._segment_paths()
+
+        if self.output_format in BINARY_FORMATS and segments:
+            pa = require_pyarrow()
+            read = (pa.parquet.read_table if self.output_format == 'parquet'
+                    else lambda path: pa.ipc.open_file(pa.memory_map(str(path))).read_all())
+            schema = read(segments[0]).schema
+            new_writer = pa.parquet.ParquetWriter if self.output_format == 'parquet' else pa.ipc.new_file
+            with new_writer(str(partial), schema) as writer:
+                for path in segments:
+                    writer.write_table(read(path).cast(schema))
+        else:
+            with open(partial, 'wb') as out:
+                if not segments:
+                    finished = ResultEncoder(self.output_format).finish()
+                    out.write(finished.encode() if isinstance(finished, str) else finished)
+                for i, path in enumerate(segments):
+                    with open(path, 'rb') as f:
+                        if self.output_format == 'csv' and i > 0:
+                            # Every segment carries the header; keep only the first
+                            f.readline()
+                        shutil.copyfileobj(f, out, 1 << 20)
+        os.replace(partial, output_path)
+
+    def cleanup(self) -> None:
+        """Remove the segments; the manifest and quarantined chunks stay if there are any"""
+        shutil.rmtree(self.segments_dir, ignore_errors=True)
+        if not self.manifest['quarantined']:
+            shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,510 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import socket
+import sqlite3
+import logging
+import pathlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from data_preprocessing import load_config
+from batch_scoring import (
+    INPUT_FORMATS, OUTPUT_FORMATS, ChunkScorer, count_rows, default_columns, input_format_for, scoring_version,
+    upload_suffix
+)
+from batch_checkpoint import MANIFEST_FILE, CheckpointedRun
+from csv_repair import repair_enabled, summarize_counts
+from result_store import ResultStore, get_result_store, result_key, spool_upload
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOBS_DIR = pathlib.Path(__file__).parent / 'jobs'
+
+QUEUED, RUNNING, COMPLETED, FAILED, CANCELLED = 'queued', 'running', 'completed', 'failed', 'cancelled'
+FINISHED_STATES = (COMPLETED, FAILED, CANCELLED)
+
+JOB_COLUMNS = (
+    'id', 'status', 'filename', 'output_format', 'input_path', 'result_path', 'rows_total', 'rows_done',
+    'fraud_count', 'error_rows', 'error', 'cancel_requested', 'owner', 'heartbeat',
+    'created_at', 'started_at', 'finished_at', 'upload_sha256', 'result_key', 'repairs'
+)
+
+
+class JobCancelled(Exception):
+    """Raised inside a worker when its job was cancelled between chunks"""
+
+
+class JobLost(Exception):
+    """Raised inside a worker whose job was requeued and may now belong to another worker"""
+
+
+class JobStore:
+    """
+    Batch job state in a SQLite file shared by every worker process
+
+    Like the prediction cache, the database runs in WAL mode with one
+    connection per thread of each process, so gunicorn workers see each
+    other's jobs and state survives restarts.
+    """
+
+    def __init__(self, path):
+        self.path = pathlib.Path(path)
+        self._local = threading.local()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(str(self.path), timeout=5.0, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                'id TEXT PRIMARY KEY, status TEXT NOT NULL, filename TEXT, output_format TEXT NOT NULL, '
+                'input_path TEXT NOT NULL, result_path TEXT NOT NULL, rows_total INTEGER, '
+                'rows_done INTEGER NOT NULL DEFAULT 0, fraud_count INTEGER NOT NULL DEFAULT 0, '
+                'error_rows INTEGER NOT NULL DEFAULT 0, error TEXT, cancel_requested INTEGER NOT NULL DEFAULT 0, '
+                'owner TEXT, heartbeat REAL, created_at REAL NOT NULL, started_at REAL, finished_at REAL, '
+                'upload_sha256 TEXT, result_key TEXT, repairs TEXT)'
+            )
+            # Job databases created before result caching and repair lack these columns
+            existing = {row['name'] for row in conn.execute('PRAGMA table_info(jobs)')}
+            for column in ('upload_sha256', 'result_key', 'repairs'):
+                if column not in existing:
+                    conn.execute(f'ALTER TABLE jobs ADD COLUMN {column} TEXT')
+            conn.execute('CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)')
+            conn.execute('CREATE INDEX IF NOT EXISTS jobs_result_key ON jobs (result_key)')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def create(self, job_id: str, filename: str, output_format: str, input_path, result_path,
+               upload_sha256: Optional[str] = None) -> None:
+        self._connection().execute(
+            'INSERT INTO jobs (id, status, filename, output_format, input_path, result_path, created_at, upload_sha256) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (job_id, QUEUED, filename, output_format, str(input_path), str(result_path), time.time(), upload_sha256)
+        )
+
+    def completed_with(self, key: str) -> Optional[Dict[str, Any]]:
+        """Most recent completed job whose result was stored under key"""
+        row = self._connection().execute(
+            'SELECT * FROM jobs WHERE result_key = ? AND status = ? ORDER BY finished_at DESC LIMIT 1',
+            (key, COMPLETED)
+        ).fetchone()
+        return dict(row) if row is not None else None
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def update(self, job_id: str, if_owner: Optional[str] = None, **fields) -> bool:
+        """
+        Set fields of a job
+
+        Args:
+            job_id (str): Job ID
+            if_owner (str, optional): Only update while the job is still claimed by this owner
+            **fields: Columns to set
+
+        Returns:
+            bool: False if no job matched (unknown ID, or no longer owned by if_owner)
+        """
+        unknown = set(fields) - set(JOB_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown job fields: {', '.join(sorted(unknown))}")
+        assignments = ', '.join(f'{name} = ?' for name in fields)
+        if if_owner is None:
+            cursor = self._connection().execute(f'UPDATE jobs SET {assignments} WHERE id = ?',
+                                                (*fields.values(), job_id))
+        else:
+            cursor = self._connection().execute(f'UPDATE jobs SET {assignments} WHERE id = ? AND owner = ?',
+                                                (*fields.values(), job_id, if_owner))
+        return cursor.rowcount == 1
+
+    def heartbeat(self, job_id: str, owner: str) -> bool:
+        """Refresh a running job's heartbeat; False if owner no longer holds it"""
+        cursor = self._connection().execute(
+            'UPDATE jobs SET heartbeat = ? WHERE id = ? AND owner = ? AND status = ?',
+            (time.time(), job_id, owner, RUNNING)
+        )
+        return cursor.rowcount == 1
+
+    def claim(self, job_id: str, owner: str) -> bool:
+        """Atomically move a queued job to running; False if another worker got it first"""
+        now = time.time()
+        cursor = self._connection().execute(
+            'UPDATE jobs SET status = ?, owner = ?, heartbeat = ?, started_at = ?, rows_done = 0, '
+            'fraud_count = 0, error_rows = 0, error = NULL, repairs = NULL WHERE id = ? AND status = ?',
+            (RUNNING, owner, now, now, job_id, QUEUED)
+        )
+        return cursor.rowcount == 1
+
+    def request_cancel(self, job_id: str) -> Optional[str]:
+        """Flag a job for cancellation; queued jobs are cancelled at once. Returns the new status"""
+        conn = self._connection()
+        conn.execute(
+            'UPDATE jobs SET status = ?, cancel_requested = 1, finished_at = ? WHERE id = ? AND status = ?',
+            (CANCELLED, time.time(), job_id, QUEUED)
+        )
+        conn.execute('UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = ?', (job_id, RUNNING))
+        job = self.get(job_id)
+        return job['status'] if job else None
+
+    def cancel_requested(self, job_id: str) -> bool:
+        row = self._connection().execute('SELECT cancel_requested FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return row is None or bool(row['cancel_requested'])
+
+    def requeue_stale(self, stale_after: float) -> int:
+        """Return running jobs whose worker stopped sending heartbeats to the queue"""
+        cursor = self._connection().execute(
+            'UPDATE jobs SET status = ?, owner = NULL WHERE status = ? AND heartbeat < ? AND cancel_requested = 0',
+            (QUEUED, RUNNING, time.time() - stale_after)
+        )
+        self._connection().execute(
+            'UPDATE jobs SET status = ?, finished_at = ? WHERE status = ? AND heartbeat < ? AND cancel_requested = 1',
+            (CANCELLED, time.time(), RUNNING, time.time() - stale_after)
+        )
+        return cursor.rowcount
+
+    def retry(self, job_id: str) -> Optional[str]:
+        """Move a failed job back to the queue. Returns the job's status afterwards"""
+        self._connection().execute(
+            'UPDATE jobs SET status = ?, error = NULL, finished_at = NULL, owner = NULL WHERE id = ? AND status = ?',
+            (QUEUED, job_id, FAILED)
+        )
+        job = self.get(job_id)
+        return job['status'] if job else None
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs in each status"""
+        rows = self._connection().execute('SELECT status, COUNT(*) AS n FROM jobs GROUP BY status').fetchall()
+        return {row['status']: row['n'] for row in rows}
+
+    def queued(self) -> List[str]:
+        rows = self._connection().execute(
+            'SELECT id FROM jobs WHERE status = ? ORDER BY created_at', (QUEUED,)
+        ).fetchall()
+        return [row['id'] for row in rows]
+
+
+class BatchJobQueue:
+    """
+    Run batch scoring jobs on a local worker pool
+
+    Uploads are spooled under jobs_dir and scored chunk by chunk with the
+    same ChunkScorer as streaming /batch-predict. Progress is written to
+    the JobStore after every chunk and a timer thread refreshes the job's
+    heartbeat every heartbeat_s seconds, even through a long row count or
+    chunk; cancellation is checked between chunks. Each run claims its job
+    under its own owner token and only writes while it still holds it, so
+    a run whose job was requeued stops instead of racing the new owner. Every chunk is checkpointed
+    by CheckpointedRun, so jobs whose worker died (resume_pending()) and
+    failed jobs (retry()) pick up after their last completed chunk, and
+    chunks that cannot be scored are quarantined instead of failing the job.
+
+    With a result_store, finished results are kept by upload hash and model
+    version, and a re-upload completes at once from the stored result.
+    """
+
+    def __init__(self, jobs_dir=None, max_workers: int = 2, chunk_rows: Optional[int] = None,
+                 stale_after: float = 120.0, scorer_factory: Callable[[], Any] = ChunkScorer,
+                 result_store: Optional[ResultStore] = None, heartbeat_s: Optional[float] = None):
+        self.jobs_dir = pathlib.Path(jobs_dir) if jobs_dir else DEFAULT_JOBS_DIR
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        self.store = JobStore(self.jobs_dir / 'jobs.sqlite')
+        self.max_workers = max_workers
+        self.chunk_rows = chunk_rows
+        self.stale_after = stale_after
+        self.heartbeat_s = heartbeat_s if heartbeat_s is not None else max(stale_after / 4, 0.05)
+        self.scorer_factory = scorer_factory
+        self.result_store = result_store
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def owner(self) -> str:
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def _pool(self) -> ThreadPoolExecutor:
+        # Pools do not survive fork, so each worker process creates its own
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='batch-job')
+                    self._pid = os.getpid()
+        return self._executor
+
+    def submit(self, upload, filename: str, output_format: str = 'csv', input_format: Optional[str] = None) -> str:
+        """
+        Spool an upload and queue it for scoring
+
+        Args:
+            upload: Object with a save(file) method (a werkzeug FileStorage) or a path to copy
+            filename (str): Original file name, for display; a .gz, .zst or .zip extension
+                marks the upload as compressed
+            output_format (str): 'csv', 'ndjson', 'parquet' or 'arrow'
+            input_format (str, optional): 'csv', 'parquet' or 'arrow'; defaults to filename's extension
+
+        Returns:
+            str: Job ID
+        """
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported output format {output_format!r}; expected one of {', '.join(OUTPUT_FORMATS)}")
+        input_format = input_format or input_format_for(filename) or 'csv'
+        if input_format not in INPUT_FORMATS:
+            raise ValueError(f"Unsupported input format {input_format!r}; expected one of {', '.join(INPUT_FORMATS)}")
+        job_id = uuid.uuid4().hex
+        # The spooled file's extensions record the input format and compression
+        input_path = self.jobs_dir / f'{job_id}.input{upload_suffix(filename, input_format)}'
+        result_path = self.jobs_dir / f'{job_id}.result.{output_format}'
+        if isinstance(upload, (str, pathlib.Path)):
+            with open(upload, 'rb') as source:
+                spooled, upload_sha256 = spool_upload(source, self.jobs_dir)
+        else:
+            spooled, upload_sha256 = spool_upload(upload, self.jobs_dir)
+        os.replace(spooled, input_path)
+        self.store.create(job_id, filename, output_format, input_path, result_path, upload_sha256)
+
+        if self._complete_from_store(job_id, upload_sha256, input_format, output_format, input_path, result_path):
+            logger.info(f"Batch job {job_id} for {filename} served from the result store")
+            return job_id
+        self._pool().submit(self._run, job_id)
+        logger.info(f"Queued batch job {job_id} for {filename}")
+        return job_id
+
+    def _result_key(self, upload_sha256: str, version: Optional[str], input_format: str,
+                    output_format: str) -> Optional[str]:
+        if self.result_store is None or version is None or upload_sha256 is None:
+            return None
+        columns = default_columns(input_format)
+        return result_key(upload_sha256, version, input_format, output_format,
+                          ','.join(columns) if columns is not None else '*', repair_enabled())
+
+    def _complete_from_store(self, job_id: str, upload_sha256: str, input_format: str, output_format: str,
+                             input_path, result_path) -> bool:
+        """Finish a new job from an identical earlier one, if its result is still stored"""
+        key = self._result_key(upload_sha256, scoring_version(), input_format, output_format)
+        previous = self.store.completed_with(key) if key is not None else None
+        cached = self.result_store.get(key) if previous is not None else None
+        if cached is None:
+            return False
+        try:
+            os.link(cached, result_path)
+        except OSError:
+            shutil.copyfile(cached, result_path)
+        now = time.time()
+        self.store.update(job_id, status=COMPLETED, result_key=key, rows_total=previous['rows_total'],
+                          rows_done=previous['rows_done'], fraud_count=previous['fraud_count'],
+                          error_rows=previous['error_rows'], repairs=previous['repairs'], started_at=now,
+                          finished_at=now)
+        os.remove(input_path)
+        return True
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Job state with progress and ETA, or None for unknown IDs"""
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        if job['status'] == RUNNING and job['heartbeat'] < time.time() - self.stale_after:
+            # The worker running it is gone; hand it to this process
+            self.resume_pending()
+            job = self.store.get(job_id)
+
+        rows_total, rows_done = job['rows_total'], job['rows_done']
+        progress = eta = None
+        if job['status'] == COMPLETED:
+            progress = 1.0
+        elif rows_total:
+            progress = min(rows_done / rows_total, 1.0)
+            if job['status'] == RUNNING and rows_done:
+                elapsed = time.time() - job['started_at']
+                eta = round(elapsed / rows_done * max(rows_total - rows_done, 0), 1)
+        end = job['finished_at'] or time.time()
+        return {
+            'job_id': job['id'],
+            'status': job['status'],
+            'filename': job['filename'],
+            'format': job['output_format'],
+            'rows_total': rows_total,
+            'rows_done': rows_done,
+            'progress': progress,
+            'eta_seconds': eta,
+            'fraud_count': job['fraud_count'],
+            'error_rows': job['error_rows'],
+            'error': job['error'],
+            'repairs': summarize_counts(json.loads(job['repairs'])) if job['repairs'] else None,
+            'created_at': job['created_at'],
+            'started_at': job['started_at'],
+            'finished_at': job['finished_at'],
+            'processing_time': round(end - job['started_at'], 3) if job['started_at'] else None
+        }
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        return self.store.request_cancel(job_id)
+
+    def result_path(self, job_id: str) -> Optional[pathlib.Path]:
+        """Path of a completed job's output, or None if it is not ready"""
+        job = self.store.get(job_id)
+        if job is None or job['status'] != COMPLETED:
+            return None
+        return pathlib.Path(job['result_path'])
+
+    def resume_pending(self) -> int:
+        """Requeue jobs orphaned by dead workers and run every queued job; returns how many were submitted"""
+        requeued = self.store.requeue_stale(self.stale_after)
+        if requeued:
+            logger.warning(f"Requeued {requeued} batch job(s) whose worker stopped responding")
+        pending = self.store.queued()
+        for job_id in pending:
+            # Claiming is atomic, so a job submitted by several processes still runs once
+            self._pool().submit(self._run, job_id)
+        return len(pending)
+
+    def checkpoint_dir(self, job_id: str) -> pathlib.Path:
+        return self.jobs_dir / f'{job_id}.checkpoint'
+
+    def quarantine(self, job_id: str) -> Optional[Dict[str, Dict[str, Any]]]:
+        """Quarantined chunks of a job (chunk index -> rows, error, file), or None for unknown IDs"""
+        if self.store.get(job_id) is None:
+            return None
+        path = self.checkpoint_dir(job_id) / MANIFEST_FILE
+        if not path.exists():
+            return {}
+        with open(path) as f:
+            return json.load(f).get('quarantined', {})
+
+    def retry(self, job_id: str) -> Optional[str]:
+        """Queue a failed job again; it resumes after its last checkpointed chunk. Returns the job's status"""
+        status = self.store.retry(job_id)
+        if status == QUEUED:
+            self._pool().submit(self._run, job_id)
+            logger.info(f"Retrying batch job {job_id}")
+        return status
+
+    def _keep_alive(self, job_id: str, owner: str, stop: threading.Event, lost: threading.Event) -> None:
+        """Refresh the job's heartbeat until stop is set; sets lost if the job was taken away"""
+        while not stop.wait(self.heartbeat_s):
+            try:
+                if not self.store.heartbeat(job_id, owner):
+                    lost.set()
+                    return
+            except Exception as e:
+                logger.error(f"Heartbeat for batch job {job_id} failed: {e}")
+
+    def _run(self, job_id: str) -> None:
+        # A token per run: two runs of one job in the same process must not share an owner
+        owner = f"{self.owner}:{uuid.uuid4().hex[:8]}"
+        if not self.store.claim(job_id, owner):
+            return
+        job = self.store.get(job_id)
+        result_path = pathlib.Path(job['result_path'])
+        input_format = input_format_for(job['input_path']) or 'csv'
+        totals = {'rows': 0}
+        stop, lost = threading.Event(), threading.Event()
+        keep_alive = threading.Thread(target=self._keep_alive, args=(job_id, owner, stop, lost),
+                                      name=f'batch-job-heartbeat-{job_id[:8]}', daemon=True)
+        keep_alive.start()
+
+        def update(**fields):
+            if lost.is_set() or not self.store.update(job_id, if_owner=owner, **fields):
+                raise JobLost()
+
+        def before_chunk():
+            if lost.is_set():
+                raise JobLost()
+            if self.store.cancel_requested(job_id):
+                raise JobCancelled()
+
+        def on_progress(progress):
+            totals.update(progress)
+            update(rows_done=progress['rows'], fraud_count=progress['fraud_count'],
+                   error_rows=progress['error_rows'] + progress['quarantined_rows'],
+                   repairs=json.dumps(progress['repairs']), heartbeat=time.time())
+
+        finished = False
+        try:
+            update(rows_total=count_rows(job['input_path'], input_format), heartbeat=time.time())
+            scorer = self.scorer_factory()
+            run = CheckpointedRun(self.checkpoint_dir(job_id), job['input_path'], input_format,
+                                  job['output_format'], self.chunk_rows, default_columns(input_format), scorer)
+            run.run(before_chunk, on_progress)
+            if lost.is_set():
+                raise JobLost()
+            run.assemble(result_path)
+
+            key = error = None
+            if totals['quarantined_chunks']:
+                # Kept out of the result store: the quarantined rows are missing from this result
+                error = (f"{totals['quarantined_chunks']} chunk(s) with {totals['quarantined_rows']} rows "
+                         f"quarantined")
+            else:
+                key = self._result_key(job['upload_sha256'], getattr(scorer, 'version', None), input_format,
+                                       job['output_format'])
+            if lost.is_set():
+                raise JobLost()
+            # Stored and cleaned up before the status flips, so a client seeing COMPLETED finds it all done
+            if key is not None:
+                self.result_store.put(key, result_path, suffix=result_path.suffix)
+            run.cleanup()
+            update(status=COMPLETED, result_key=key, error=error, finished_at=time.time())
+            finished = True
+            logger.info(f"Batch job {job_id} scored {totals['rows']} rows")
+        except JobLost:
+            # The new owner carries on from the checkpoint; leave its files alone
+            logger.warning(f"Batch job {job_id} was requeued while running; stopping this run")
+        except JobCancelled:
+            finished = self.store.update(job_id, if_owner=owner, status=CANCELLED, finished_at=time.time())
+            logger.info(f"Batch job {job_id} cancelled after {totals['rows']} rows")
+        except Exception as e:
+            # The input and checkpoint are kept so retry() resumes where this run stopped
+            logger.error(f"Batch job {job_id} failed after {totals['rows']} rows: {e}", exc_info=True)
+            self.store.update(job_id, if_owner=owner, status=FAILED, error=str(e), finished_at=time.time())
+        finally:
+            stop.set()
+            keep_alive.join()
+            job = self.store.get(job_id)
+            if finished and job['status'] == CANCELLED:
+                shutil.rmtree(self.checkpoint_dir(job_id), ignore_errors=True)
+            if finished and job['status'] in (COMPLETED, CANCELLED) and os.path.exists(job['input_path']):
+                os.remove(job['input_path'])
+
+
+_queue: Optional[BatchJobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> BatchJobQueue:
+    """
+    Return the process-wide job queue configured by serving.batch.jobs in config.yaml
+
+    The first call in each process also resumes jobs left queued or orphaned
+    by a previous run.
+    """
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                batch_config = (load_config().get('serving', {}) or {}).get('batch', {}) or {}
+                jobs_config = batch_config.get('jobs', {}) or {}
+                jobs_dir = jobs_config.get('path')
+                if jobs_dir and not os.path.isabs(jobs_dir):
+                    jobs_dir = pathlib.Path(__file__).parent / jobs_dir
+                queue = BatchJobQueue(
+                    jobs_dir=jobs_dir,
+                    max_workers=int(jobs_config.get('max_workers', 2)),
+                    stale_after=float(jobs_config.get('stale_after_s', 120)),
+                    result_store=get_result_store()
+                )
+                queue.resume_pending()
+                _queue = queue
+    return _queue
@@ -0,0 +1,641 @@
+import io
+import sys
+import gzip
+import json
+import queue
+import logging
+import pathlib
+import zipfile
+import argparse
+import threading
+from typing import Callable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from data_preprocessing import feature_engineering, load_config
+from feature_pipeline import get_compiled_pipeline
+from model_registry import get_registry
+from ensemble import get_ensemble
+from simple_inference import REQUIRED_FIELDS, validate_frame
+from csv_repair import add_counts, empty_counts, repair_chunk, repair_enabled, summarize_counts
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+INPUT_FORMATS = ('csv', 'parquet', 'arrow')
+OUTPUT_FORMATS = ('csv', 'ndjson', 'parquet', 'arrow')
+BINARY_FORMATS = ('parquet', 'arrow')
+DEFAULT_CHUNK_ROWS = 10000
+
+# File extensions per input format; .feather is Arrow IPC file format v2
+FORMAT_EXTENSIONS = {
+    'csv': ('.csv',),
+    'parquet': ('.parquet', '.pq'),
+    'arrow': ('.arrow', '.feather', '.ipc')
+}
+# Compression implied by a file's last extension. gzip and zstd wrap a single
+# CSV; a zip archive holds any number of CSV, Parquet or Arrow files
+COMPRESSIONS = ('gzip', 'zstd', 'zip')
+COMPRESSION_EXTENSIONS = {'.gz': 'gzip', '.gzip': 'gzip', '.zst': 'zstd', '.zstd': 'zstd', '.zip': 'zip'}
+COMPRESSION_SUFFIXES = {'gzip': '.gz', 'zstd': '.zst', 'zip': '.zip'}
+# Chunks of compressed input decoded ahead of scoring on a background thread
+READ_AHEAD_CHUNKS = 2
+MEDIA_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.file'
+}
+
+# Column projection: the model's inputs plus click_id to join results back
+MODEL_COLUMNS = ['click_id'] + REQUIRED_FIELDS
+
+
+def require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+        return pyarrow
+    except ImportError:
+        raise ImportError("Parquet and Arrow support needs pyarrow: pip install pyarrow")
+
+
+def split_compression(filename) -> Tuple[str, Optional[str]]:
+    """Split a compression extension off a file name: ('clicks.csv', 'gzip') for 'clicks.csv.gz'"""
+    path = pathlib.Path(str(filename))
+    compression = COMPRESSION_EXTENSIONS.get(path.suffix.lower())
+    return (path.stem if compression else path.name), compression
+
+
+def input_format_for(filename: str) -> Optional[str]:
+    """
+    Input format implied by a file name's extensions, or None if unsupported
+
+    gzip and zstd are only accepted around CSV: Parquet and Arrow are
+    compressed internally and need random access. Zip members are read by
+    their own extensions, so an archive's format defaults to CSV.
+    """
+    name, compression = split_compression(filename)
+    suffix = pathlib.Path(name).suffix.lower()
+    input_format = next((fmt for fmt, extensions in FORMAT_EXTENSIONS.items() if suffix in extensions), None)
+    if compression == 'zip':
+        return input_format or 'csv'
+    if compression is not None and input_format != 'csv':
+        return None
+    return input_format
+
+
+def upload_suffix(filename: str, input_format: str) -> str:
+    """Suffix for a spooled upload that records its format and compression, e.g. '.csv.gz'"""
+    compression = split_compression(filename)[1]
+    return f'.{input_format}' + (COMPRESSION_SUFFIXES[compression] if compression else '')
+
+
+def open_decompressed(source, compression: str):
+    """Open a gzip or zstd path or binary file object as a stream of decompressed bytes"""
+    if compression == 'gzip':
+        return gzip.open(source, 'rb')
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("zstd input needs zstandard: pip install zstandard")
+        raw = open(source, 'rb') if isinstance(source, (str, pathlib.Path)) else source
+        # read_across_frames so files written by parallel compressors are read to the end
+        return zstandard.ZstdDecompressor().stream_reader(
+            raw, read_across_frames=True, closefd=raw is not source)
+    raise ValueError(f"Unsupported compression {compression!r}; expected one of {', '.join(COMPRESSIONS)}")
+
+
+def _zip_members(archive: zipfile.ZipFile) -> List[zipfile.ZipInfo]:
+    """Data files of an archive in stored order, skipping directories and macOS/hidden entries"""
+    members = [
+        info for info in archive.infolist()
+        if not info.is_dir() and not any(part.startswith(('.', '__MACOSX')) for part in info.filename.split('/'))
+    ]
+    if not members:
+        raise ValueError("The zip archive holds no files")
+    return members
+
+
+def default_columns(input_format: str) -> Optional[List[str]]:
+    """
+    Columns decoded by default: every column for CSV, so uploads pass through
+    unchanged as before, and only MODEL_COLUMNS for columnar formats, whose
+    readers skip the other columns without decoding them
+    """
+    return None if input_format == 'csv' else MODEL_COLUMNS
+
+
+def chunk_rows_from_config() -> int:
+    """Rows per chunk from serving.batch.chunk_rows in config.yaml"""
+    batch_config = (load_config().get('serving', {}) or {}).get('batch', {}) or {}
+    return int(batch_config.get('chunk_rows', DEFAULT_CHUNK_ROWS))
+
+
+def scoring_version() -> Optional[str]:
+    """Version of the served preprocessor and ensemble together, or None if the ensemble has none"""
+    ensemble_version = get_ensemble().version
+    if ensemble_version is None:
+        return None
+    return f"{get_registry().get().version}:{ensemble_version}"
+
+
+class ChunkScorer:
+    """
+    Annotate chunks of raw clicks with per-model and ensemble predictions
+
+    The preprocessor and ensemble are captured once, so every chunk of one
+    file is scored by the same models even if they are swapped mid-stream.
+    Rows failing validation keep their input columns, get empty prediction
+    columns and a message in the error column; they never fail the chunk.
+    version identifies the served models (see scoring_version()) and is None
+    when a preprocessor or ensemble is passed in.
+
+    With repair (serving.batch.repair.enabled by default), every chunk goes
+    through csv_repair.repair_chunk() first; the annotated output carries
+    the repaired values and repairs holds the per-rule counts so far.
+    """
+
+    def __init__(self, preprocessor=None, ensemble=None, repair: Optional[bool] = None):
+        self.version = scoring_version() if preprocessor is None and ensemble is None else None
+        self.repair = repair_enabled() if repair is None else repair
+        self.repairs = empty_counts()
+        self.preprocessor = preprocessor if preprocessor is not None else get_registry().get().preprocessor
+        self.ensemble = ensemble if ensemble is not None else get_ensemble()
+        self.compiled = get_compiled_pipeline(self.preprocessor)
+        self.output_columns = []
+        for name in self.ensemble.names + ['ensemble']:
+            self.output_columns += [f'{name}_is_fraud', f'{name}_fraud_probability']
+        self.output_columns.append('error')
+
+    def transform(self, df: pd.DataFrame):
+        # One-hot heavy matrices stay CSR; the ensemble densifies per member as needed
+        if self.compiled is not None:
+            return self.compiled.transform(df, sparse='auto')
+        return self.preprocessor.transform(feature_engineering(df.copy()))
+
+    def score(self, chunk: pd.DataFrame, raise_errors: bool = False) -> pd.DataFrame:
+        """
+        Return chunk with prediction columns and an error column appended
+
+        If transforming or scoring the chunk fails, its valid rows are marked
+        "Scoring failed" in the error column, or the error is raised when
+        raise_errors is set (so a checkpointed run can quarantine the chunk).
+        """
+        if self.repair:
+            chunk, counts = repair_chunk(chunk)
+            add_counts(self.repairs, counts)
+        validated, errors = validate_frame(chunk)
+        valid = (errors == '').to_numpy()
+        annotated = chunk.copy()
+        columns = {name: np.full(len(chunk), np.nan) for name in self.output_columns[:-1]}
+
+        if valid.any():
+            try:
+                result = self.ensemble.score(self.transform(validated[valid]))
+                for name in result.names:
+                    probs = result.member(name).astype(float)
+                    columns[f'{name}_fraud_probability'][valid] = probs
+                    columns[f'{name}_is_fraud'][valid] = probs >= 0.5
+                columns['ensemble_fraud_probability'][valid] = result.combined
+                columns['ensemble_is_fraud'][valid] = result.is_fraud
+                for name, message in result.errors.items():
+                    logger.warning(f"Model {name} failed on a chunk of {int(valid.sum())} rows: {message}")
+            except Exception as e:
+                if raise_errors:
+                    raise
+                logger.error(f"Scoring a chunk of {len(chunk)} rows failed: {e}")
+                errors = errors.mask(errors == '', f"Scoring failed: {e}")
+
+        for name, values in columns.items():
+            if name.endswith('_is_fraud'):
+                # Nullable booleans so rows without a prediction stay empty
+                values = pd.array(np.where(np.isnan(values), None, values == 1), dtype='boolean')
+            annotated[name] = values
+        annotated['error'] = errors.to_numpy()
+        return annotated
+
+
+def read_chunks(source, chunk_rows: int, input_format: str = 'csv', columns: Optional[List[str]] = None,
+                compression: Optional[str] = None) -> Iterator[pd.DataFrame]:
+    """
+    Read a CSV, Parquet or Arrow IPC path or binary file object chunk by chunk
+
+    CSV columns are read as text so input values pass through verbatim
+    instead of being re-typed per chunk (75 vs 75.0 depending on whether a
+    chunk has blanks); validate_frame() coerces the fields the models need.
+    Parquet and Arrow keep their own types. Their numeric columns convert to
+    NumPy without copying when they have no nulls, and under pandas 3 string
+    columns stay Arrow-backed rather than becoming Python object columns.
+
+    Args:
+        source: Path or binary file object
+        chunk_rows (int): Rows per chunk
+        input_format (str): 'csv', 'parquet' or 'arrow' (IPC file or stream format)
+        columns (list, optional): Only decode these columns (missing ones are skipped)
+        compression (str, optional): 'gzip', 'zstd' or 'zip'; inferred from a path's extension.
+            Input is decompressed while it is parsed, never as a whole, and
+            READ_AHEAD_CHUNKS chunks are decoded ahead on a background thread
+    """
+    if compression is None and isinstance(source, (str, pathlib.Path)):
+        compression = split_compression(source)[1]
+    if compression is not None:
+        yield from _read_ahead(_compressed_chunks(source, chunk_rows, input_format, columns, compression))
+        return
+    if input_format == 'csv':
+        usecols = (lambda name: name in columns) if columns is not None else None
+        yield from pd.read_csv(source, chunksize=chunk_rows, dtype=str, usecols=usecols)
+        return
+    if input_format not in INPUT_FORMATS:
+        raise ValueError(f"Unsupported input format {input_format!r}; expected one of {', '.join(INPUT_FORMATS)}")
+
+    pa = require_pyarrow()
+    if input_format == 'parquet':
+        parquet_file = pa.parquet.ParquetFile(source)
+        names = parquet_file.schema_arrow.names
+        projection = [name for name in columns if name in names] if columns is not None else None
+        for batch in parquet_file.iter_batches(batch_size=chunk_rows, columns=projection):
+            yield batch.to_pandas()
+        return
+
+    schema, batches = _arrow_batches(source)
+    names = schema.names
+    projection = [name for name in columns if name in names] if columns is not None else None
+    for batch in batches:
+        if projection is not None:
+            batch = batch.select(projection)
+        # Slicing a record batch is zero-copy
+        for offset in range(0, batch.num_rows, chunk_rows):
+            yield batch.slice(offset, chunk_rows).to_pandas()
+
+
+def _compressed_chunks(source, chunk_rows: int, input_format: str, columns: Optional[List[str]],
+                       compression: str) -> Iterator[pd.DataFrame]:
+    if compression != 'zip':
+        if input_format != 'csv':
+            raise ValueError(f"{compression} input must be CSV; Parquet and Arrow files can be zipped instead")
+        with open_decompressed(source, compression) as stream:
+            yield from read_chunks(stream, chunk_rows, 'csv', columns)
+        return
+
+    # Members are read one after another; later members are aligned to the
+    # first one's columns, since the output schema is fixed by its first chunk
+    header = None
+    with zipfile.ZipFile(source) as archive:
+        for info in _zip_members(archive):
+            name, member_compression = split_compression(info.filename)
+            member_format = input_format_for(name) or input_format
+            with archive.open(info) as member:
+                member_chunks = (
+                    _compressed_chunks(member, chunk_rows, member_format, columns, member_compression)
+                    if member_compression else read_chunks(member, chunk_rows, member_format, columns)
+                )
+                try:
+                    for chunk in member_chunks:
+                        if header is None:
+                            header = list(chunk.columns)
+                        elif list(chunk.columns) != header:
+                            extra = [column for column in chunk.columns if column not in header]
+                            if extra:
+                                logger.warning(f"Dropping columns {', '.join(extra)} of {info.filename} "
+                                               f"that the first file in the archive lacks")
+                            chunk = chunk.reindex(columns=header)
+                        yield chunk
+                finally:
+                    # Release the member's reader before the member itself is closed
+                    member_chunks.close()
+            logger.info(f"Read {info.filename} from the archive")
+
+
+def _read_ahead(chunks: Iterator[pd.DataFrame], depth: int = READ_AHEAD_CHUNKS) -> Iterator[pd.DataFrame]:
+    """
+    Decode chunks on a background thread, up to depth chunks ahead of the consumer
+
+    zlib and pandas' CSV tokenizer release the GIL, so decompressing and
+    parsing the next chunk overlaps scoring the current one. Errors are
+    re-raised in the consumer; closing the generator stops the thread.
+    """
+    if depth < 1:
+        yield from chunks
+        return
+    ready = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    done = object()
+
+    def produce():
+        try:
+            for chunk in chunks:
+                while not stop.is_set():
+                    try:
+                        ready.put((chunk, None), timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    break
+            item = (done, None)
+        except BaseException as e:
+            item = (None, e)
+        finally:
+            chunks.close()
+        while not stop.is_set():
+            try:
+                ready.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    thread = threading.Thread(target=produce, name='batch-read-ahead', daemon=True)
+    thread.start()
+    try:
+        while True:
+            chunk, error = ready.get()
+            if error is not None:
+                raise error
+            if chunk is done:
+                return
+            yield chunk
+    finally:
+        stop.set()
+        thread.join()
+
+
+def _arrow_batches(source):
+    """Open an Arrow IPC file (or, failing that, stream) and return its schema and record batches"""
+    pa = require_pyarrow()
+    if isinstance(source, (str, pathlib.Path)):
+        # Memory-mapped, so record batches are views of the file rather than copies
+        source = pa.memory_map(str(source))
+    try:
+        reader = pa.ipc.open_file(source)
+        return reader.schema, (reader.get_batch(i) for i in range(reader.num_record_batches))
+    except pa.ArrowInvalid:
+        source.seek(0)
+        reader = pa.ipc.open_stream(source)
+        return reader.schema, iter(reader)
+
+
+def read_frame(path, input_format: str = 'csv', columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Read a whole file into one DataFrame (CSV with pandas' usual type inference)"""
+    compression = split_compression(path)[1] if isinstance(path, (str, pathlib.Path)) else None
+    if compression == 'zip':
+        frames = []
+        with zipfile.ZipFile(path) as archive:
+            for info in _zip_members(archive):
+                name, member_compression = split_compression(info.filename)
+                with archive.open(info) as member:
+                    if member_compression is not None:
+                        member = open_decompressed(member, member_compression)
+                    frames.append(read_frame(member, input_format_for(name) or input_format, columns))
+        return pd.concat(frames, ignore_index=True)
+    if compression is not None:
+        with open_decompressed(path, compression) as stream:
+            return read_frame(stream, input_format, columns)
+    if input_format == 'csv':
+        usecols = (lambda name: name in columns) if columns is not None else None
+        return pd.read_csv(path, usecols=usecols)
+    if input_format == 'parquet':
+        require_pyarrow()
+        if columns is not None:
+            names = require_pyarrow().parquet.ParquetFile(path).schema_arrow.names
+            columns = [name for name in columns if name in names]
+        return pd.read_parquet(path, columns=columns)
+    chunks = list(read_chunks(path, 1 << 30, input_format, columns))
+    return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+
+
+def count_rows(path, input_format: str = 'csv') -> int:
+    """
+    Count data rows without parsing them
+
+    CSV rows are counted by newlines, so quoted newlines make this an upper
+    bound; Parquet and Arrow files store their row counts. Compressed input
+    is decompressed block by block, and archives count every member.
+    """
+    compression = split_compression(path)[1] if isinstance(path, (str, pathlib.Path)) else None
+    if compression == 'zip':
+        with zipfile.ZipFile(path) as archive:
+            total = 0
+            for info in _zip_members(archive):
+                name, member_compression = split_compression(info.filename)
+                with archive.open(info) as member:
+                    if member_compression is not None:
+                        member = open_decompressed(member, member_compression)
+                    total += count_rows(member, input_format_for(name) or input_format)
+            return total
+    if compression is not None:
+        with open_decompressed(path, compression) as stream:
+            return count_rows(stream, input_format)
+    if input_format == 'parquet':
+        return require_pyarrow().parquet.ParquetFile(path).metadata.num_rows
+    if input_format == 'arrow':
+        return sum(batch.num_rows for batch in _arrow_batches(path)[1])
+
+    lines, last = 0, b'\n'
+    f = open(path, 'rb') if isinstance(path, (str, pathlib.Path)) else path
+    try:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            lines += block.count(b'\n')
+            last = block[-1:]
+    finally:
+        if f is not path:
+            f.close()
+    if last != b'\n':
+        lines += 1
+    return max(lines - 1, 0)
+
+
+def format_chunk(annotated: pd.DataFrame, output_format: str, header: bool) -> str:
+    if output_format == 'ndjson':
+        return annotated.to_json(orient='records', lines=True, date_format='iso')
+    buffer = io.StringIO()
+    annotated.to_csv(buffer, index=False, header=header)
+    return buffer.getvalue()
+
+
+class _DrainableSink(io.RawIOBase):
+    """Write-only file object whose contents are taken out as they are produced"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data, self._chunks = b''.join(self._chunks), []
+        return data
+
+
+class ResultEncoder:
+    """
+    Encode annotated chunks as one CSV, NDJSON, Parquet or Arrow IPC output
+
+    encode() returns the output produced by one chunk and finish() whatever
+    must follow the last chunk: text for CSV and NDJSON, bytes for Parquet
+    (a row group per chunk, then the footer) and Arrow (a record batch per
+    chunk, then the footer). The columnar schema is fixed by the first chunk.
+    """
+
+    def __init__(self, output_format: str):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported output format {output_format!r}; expected one of {', '.join(OUTPUT_FORMATS)}")
+        self.output_format = output_format
+        self.binary = output_format in BINARY_FORMATS
+        self.rows = 0
+        self._pa = require_pyarrow() if self.binary else None
+        self._sink = _DrainableSink() if self.binary else None
+        self._schema = None
+        self._writer = None
+
+    def encode(self, annotated: pd.DataFrame) -> Union[str, bytes]:
+        header = self.rows == 0
+        self.rows += len(annotated)
+        if not self.binary:
+            return format_chunk(annotated, self.output_format, header)
+
+        pa = self._pa
+        if self._schema is None:
+            schema = pa.Schema.from_pandas(annotated, preserve_index=False)
+            # A column that is all-null in the first chunk is stored as text
+            for i, field in enumerate(schema):
+                if pa.types.is_null(field.type):
+                    schema = schema.set(i, field.with_type(pa.string()))
+            self._schema = schema.remove_metadata()
+            if self.output_format == 'parquet':
+                self._writer = pa.parquet.ParquetWriter(self._sink, self._schema)
+            else:
+                self._writer = pa.ipc.new_file(self._sink, self._schema)
+        table = pa.Table.from_pandas(annotated, schema=self._schema, preserve_index=False)
+        self._writer.write_table(table)
+        return self._sink.drain()
+
+    def finish(self) -> Union[str, bytes]:
+        if not self.binary:
+            return ''
+        if self._writer is None:
+            # No rows: still produce a valid, empty file
+            schema = self._pa.schema([])
+            self._writer = (self._pa.parquet.ParquetWriter(self._sink, schema) if self.output_format == 'parquet'
+                            else self._pa.ipc.new_file(self._sink, schema))
+        self._writer.close()
+        return self._sink.drain()
+
+
+def stream_scored(source, output_format: str = 'csv', chunk_rows: Optional[int] = None,
+                  scorer: Optional[ChunkScorer] = None, input_format: str = 'csv',
+                  columns: Optional[List[str]] = None,
+                  on_complete: Optional[Callable[[int], None]] = None) -> Iterator[Union[str, bytes]]:
+    """
+    Score a file chunk by chunk, yielding the annotated output as it is produced
+
+    Memory use is bounded by chunk_rows regardless of the input size: only
+    one chunk and its annotated copy are alive at a time.
+
+    Args:
+        source: Path or binary file object
+        output_format (str): 'csv' (header once, then rows), 'ndjson' (one
+            object per row), 'parquet' or 'arrow'
+        chunk_rows (int, optional): Rows per chunk; defaults to serving.batch.chunk_rows
+        scorer (ChunkScorer, optional): Scorer to use; built from the served models by default
+        input_format (str): 'csv', 'parquet' or 'arrow'
+        columns (list, optional): Input columns to decode; see read_chunks()
+        on_complete (callable, optional): Called with the row count once every
+            chunk was scored and written, i.e. not when the output ended early
+
+    Yields:
+        str or bytes: Output for one chunk (bytes for Parquet and Arrow). If
+            reading or scoring fails part way, NDJSON output ends with an
+            {"error": ...} line; other formats end early
+    """
+    encoder = ResultEncoder(output_format)
+    chunk_rows = chunk_rows or chunk_rows_from_config()
+    scorer = scorer or ChunkScorer()
+
+    try:
+        for chunk in read_chunks(source, chunk_rows, input_format, columns):
+            yield encoder.encode(scorer.score(chunk))
+        yield encoder.finish()
+    except Exception as e:
+        logger.error(f"Streaming batch scoring stopped after {encoder.rows} rows: {e}", exc_info=True)
+        if output_format == 'ndjson':
+            yield json.dumps({'error': str(e), 'rows_scored': encoder.rows}) + '\n'
+        return
+    logger.info(f"Streamed predictions for {encoder.rows} rows")
+    if getattr(scorer, 'repair', False):
+        logger.info(f"Repairs: {summarize_counts(scorer.repairs)}")
+    if on_complete is not None:
+        on_complete(encoder.rows)
+
+
+def main():
+    """Score a file offline without loading it into memory"""
+    parser = argparse.ArgumentParser(description="Score a click file chunk by chunk")
+    parser.add_argument('input', help="Input CSV, Parquet or Arrow IPC file; CSV may be .gz or .zst, any of them zipped")
+    parser.add_argument('output', help="Output file ('-' for stdout, text formats only)")
+    parser.add_argument('--input-format', choices=INPUT_FORMATS, default=None,
+                        help="Defaults to the input file's extension")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='csv')
+    parser.add_argument('--columns', choices=('model', 'all'), default=None,
+                        help="Decode only the model's input columns, or all of them "
+                             "(default: all for CSV, model for Parquet and Arrow)")
+    parser.add_argument('--chunk-rows', type=int, default=None)
+    parser.add_argument('--no-repair', action='store_true', help="Score rows exactly as read")
+    parser.add_argument('--checkpoint-dir', default=None,
+                        help="Checkpoint every chunk here; rerunning with the same directory resumes "
+                             "after the last completed chunk")
+    args = parser.parse_args()
+
+    try:
+        input_format = args.input_format or input_format_for(args.input) or 'csv'
+        columns = default_columns(input_format) if args.columns is None else (
+            MODEL_COLUMNS if args.columns == 'model' else None)
+        binary = args.format in BINARY_FORMATS
+        scorer = ChunkScorer(repair=not args.no_repair)
+        if args.checkpoint_dir:
+            if args.output == '-':
+                parser.error("--checkpoint-dir needs an output file")
+            from batch_checkpoint import CheckpointedRun
+            run = CheckpointedRun(args.checkpoint_dir, args.input, input_format, args.format,
+                                  args.chunk_rows, columns, scorer)
+            totals = run.run()
+            run.assemble(args.output)
+            run.cleanup()
+            logger.info(f"Repairs: {summarize_counts(totals['repairs'])}")
+            if totals['quarantined_chunks']:
+                logger.warning(f"{totals['quarantined_rows']} rows in {totals['quarantined_chunks']} chunk(s) "
+                               f"were quarantined under {run.quarantine_dir}")
+            return 0
+        if args.output == '-':
+            out = sys.stdout.buffer if binary else sys.stdout
+        else:
+            out = open(args.output, 'wb') if binary else open(args.output, 'w', newline='')
+        try:
+            for data in stream_scored(args.input, args.format, args.chunk_rows, scorer,
+                                      input_format=input_format, columns=columns):
+                out.write(data)
+        finally:
+            if args.output != '-':
+                out.close()
+        return 0
+    except Exception as e:
+        logger.error(f"Batch scoring failed: {e}")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""
+Measure how batch scoring scales with the number of worker processes.
+
+The input is data/augmented_fraud_dataset.csv repeated --repeat times. Each
+worker count gets a fresh pool that is warmed up (models loaded) before
+timing, so the numbers show steady-state scoring throughput rather than
+process start-up. 1 worker is the in-process baseline (ChunkScorer on the
+whole file); results from every pool are checked against it.
+
+    python benchmarks/parallel_benchmark.py --workers 1 2 4 8 --repeat 4
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import pathlib
+import tempfile
+import statistics
+
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from batch_scoring import ChunkScorer
+from parallel_scoring import ParallelScorer
+
+DATASET = BACKEND_DIR / 'data' / 'augmented_fraud_dataset.csv'
+
+
+def time_runs(fn, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        value = fn()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--repeat', type=int, default=4, help="Copies of the dataset in the input")
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--partitions-per-worker', type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.NamedTemporaryFile(suffix='.csv', delete=False) as f:
+        path = f.name
+    try:
+        source = pd.read_csv(DATASET)
+        pd.concat([source] * args.repeat, ignore_index=True).to_csv(path, index=False)
+        rows = len(source) * args.repeat
+        print(f"{rows} rows, {os.path.getsize(path) / 1e6:.1f} MB, {os.cpu_count()} CPUs")
+
+        scorer = ChunkScorer()
+        baseline_seconds, baseline = time_runs(
+            lambda: scorer.score(pd.read_csv(path, dtype=str))['ensemble_fraud_probability'].to_numpy(float),
+            args.runs
+        )
+
+        report = []
+        for workers in args.workers:
+            if workers == 1:
+                seconds = baseline_seconds
+            else:
+                pool = ParallelScorer(workers, partitions_per_worker=args.partitions_per_worker)
+                try:
+                    pool.score_csv(path)  # start the workers and load models
+                    seconds, (result, _) = time_runs(lambda: pool.score_csv(path), args.runs)
+                finally:
+                    pool.shutdown()
+                np.testing.assert_allclose(result.combined, baseline, rtol=1e-5, equal_nan=True)
+            report.append({
+                'workers': workers,
+                'seconds': round(seconds, 3),
+                'rows_per_second': round(rows / seconds),
+                'speedup': round(baseline_seconds / seconds, 2)
+            })
+            print(f"{workers:>2} workers: {seconds:7.3f}s  {rows / seconds:>10,.0f} rows/s  "
+                  f"x{baseline_seconds / seconds:.2f}")
+
+        print('BENCHMARK ' + json.dumps(report))
+        return 0
+    finally:
+        os.remove(path)
+
+if __name__ == "__main__":
+    sys.exit(main())
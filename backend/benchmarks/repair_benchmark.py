@@ -0,0 +1,105 @@
+"""
+Measure the throughput of the streaming repair stage in rows per second.
+
+The input is data/augmented_fraud_dataset.csv repeated --repeat times, with
+--dirty of the rows given one fault each (padded text, blank or unparseable
+numbers, true/false flags, future or invalid timestamps, missing device
+types). For each chunk size the file is read chunk by chunk once without
+and once with csv_repair.repair_chunk(), so the difference is the cost of
+repairing; the per-rule counts are printed alongside.
+
+    python benchmarks/repair_benchmark.py --repeat 20 --dirty 0.05 --chunk-rows 10000 50000
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import pathlib
+import tempfile
+import statistics
+
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from batch_scoring import read_chunks
+from csv_repair import add_counts, empty_counts, repair_chunk
+
+DATASET = BACKEND_DIR / 'data' / 'augmented_fraud_dataset.csv'
+
+
+def inject_faults(df, fraction, seed=0):
+    """Give fraction of the rows one fault each, spread evenly over the fault kinds"""
+    rng = np.random.default_rng(seed)
+    df = df.astype(str)
+    rows = rng.choice(len(df), int(len(df) * fraction), replace=False)
+    faults = np.array_split(rows, 7)
+    df.loc[faults[0], 'browser'] = ' ' + df.loc[faults[0], 'browser'] + ' '
+    df.loc[faults[1], 'scroll_depth'] = ''
+    df.loc[faults[2], 'mouse_movement'] = 'lots'
+    df.loc[faults[3], 'VPN_usage'] = 'yes'
+    df.loc[faults[4], 'timestamp'] = '2099-01-01T00:00:00'
+    df.loc[faults[5], 'timestamp'] = 'yesterday'
+    df.loc[faults[6], 'device_type'] = ''
+    return df
+
+
+def run(path, chunk_rows, repair):
+    counts = empty_counts()
+    for chunk in read_chunks(path, chunk_rows):
+        if repair:
+            chunk, chunk_counts = repair_chunk(chunk)
+            add_counts(counts, chunk_counts)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20, help="Copies of the dataset in the input")
+    parser.add_argument('--dirty', type=float, default=0.05, help="Fraction of rows given a fault")
+    parser.add_argument('--chunk-rows', type=int, nargs='+', default=[10000, 50000])
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.NamedTemporaryFile(suffix='.csv', delete=False) as f:
+        path = f.name
+    try:
+        source = pd.read_csv(DATASET)
+        data = inject_faults(pd.concat([source] * args.repeat, ignore_index=True), args.dirty)
+        data.to_csv(path, index=False)
+        rows = len(data)
+        print(f"{rows} rows, {os.path.getsize(path) / 1e6:.1f} MB, {args.dirty:.0%} dirty")
+
+        report = []
+        for chunk_rows in args.chunk_rows:
+            timings = {}
+            for repair in (False, True):
+                runs = []
+                for _ in range(args.runs):
+                    started = time.perf_counter()
+                    counts = run(path, chunk_rows, repair)
+                    runs.append(time.perf_counter() - started)
+                timings[repair] = statistics.median(runs)
+            repair_seconds = max(timings[True] - timings[False], 1e-9)
+            report.append({
+                'chunk_rows': chunk_rows,
+                'read_rows_per_second': round(rows / timings[False]),
+                'read_and_repair_rows_per_second': round(rows / timings[True]),
+                'repair_rows_per_second': round(rows / repair_seconds),
+                'counts': {rule: n for rule, n in counts.items() if n}
+            })
+            print(f"{chunk_rows:>7} rows/chunk: read {rows / timings[False]:>10,.0f} rows/s  "
+                  f"read+repair {rows / timings[True]:>10,.0f} rows/s  "
+                  f"repair alone {rows / repair_seconds:>10,.0f} rows/s")
+
+        print(f"Counts: {report[-1]['counts']}")
+        print('BENCHMARK ' + json.dumps(report))
+        return 0
+    finally:
+        os.remove(path)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+Compare peak memory of dense and sparse (CSR) feature matrices in batch scoring.
+
+A preprocessor is fitted on synthetic clicks whose device_type, browser and
+operating_system take --categories distinct values each, as a stand-in for
+high-cardinality categoricals. The ensemble is a random forest exported to
+a TreeEnsemble (takes CSR) and a random two-layer NumpyModel (densified in
+float32 blocks). For every batch size the compiled pipeline transforms and
+the ensemble scores the batch once dense and once sparse; peak traced
+allocations (tracemalloc sees NumPy and SciPy buffers) and times are
+reported, and the two paths are checked to give identical probabilities.
+
+    python benchmarks/sparse_benchmark.py --rows 20000 50000 --categories 1000
+"""
+import sys
+import json
+import time
+import argparse
+import pathlib
+import tracemalloc
+
+import numpy as np
+
+BACKEND_DIR = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from data_preprocessing import create_preprocessing_pipeline, feature_engineering
+from ensemble import EnsembleScorer
+from feature_pipeline import compile_pipeline
+from numpy_model import NumpyModel
+from tree_model import export_tree_model
+from tests.test_feature_pipeline import make_clicks
+
+MB = 1 << 20
+
+
+def make_wide_clicks(n, categories, seed=0):
+    """make_clicks() with categories distinct values in each one-hot encoded column"""
+    rng = np.random.default_rng(seed)
+    clicks = make_clicks(n, seed=seed)
+    for column in ('device_type', 'browser', 'operating_system'):
+        clicks[column] = np.char.add(f'{column}-', rng.integers(0, categories, n).astype(str))
+    return clicks
+
+
+def build_scorer(plan, train, seed=0):
+    from sklearn.ensemble import RandomForestClassifier
+
+    X = plan.transform(train)
+    y = (X[:, :plan.n_numeric].sum(axis=1) > 0).astype(int)
+    forest = RandomForestClassifier(n_estimators=50, max_depth=10, random_state=seed).fit(X, y)
+    rng = np.random.default_rng(seed)
+    network = NumpyModel([
+        (rng.standard_normal((plan.n_features, 32)) * 0.1, np.zeros(32), 'relu'),
+        (rng.standard_normal((32, 1)) * 0.1, np.zeros(1), 'sigmoid')
+    ])
+    return EnsembleScorer({'random_forest': (export_tree_model(forest), 'sklearn'),
+                           'neural_network': (network, 'numpy')})
+
+
+def measure(fn):
+    """Run fn once under tracemalloc; return (result, seconds, peak traced bytes)"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+def matrix_bytes(X):
+    if hasattr(X, 'tocsr'):
+        return X.data.nbytes + X.indices.nbytes + X.indptr.nbytes
+    return X.nbytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[20000, 50000])
+    parser.add_argument('--categories', type=int, default=1000, help="Distinct values per categorical column")
+    args = parser.parse_args()
+
+    train = make_wide_clicks(max(20 * args.categories, 5000), args.categories, seed=1)
+    preprocessor = create_preprocessing_pipeline().fit(feature_engineering(train.copy()))
+    plan = compile_pipeline(preprocessor)
+    scorer = build_scorer(plan, train.head(5000))
+    print(f"{plan.n_features} features, density {plan.density:.4f}")
+
+    report = []
+    for rows in args.rows:
+        clicks = make_wide_clicks(rows, args.categories, seed=2)
+        results = {}
+        for mode in ('dense', 'sparse'):
+            def run():
+                X = plan.transform(clicks, sparse=mode == 'sparse')
+                return matrix_bytes(X), scorer.score(X).combined
+            (size, combined), seconds, peak = measure(run)
+            results[mode] = {'matrix_mb': round(size / MB, 1), 'peak_mb': round(peak / MB, 1),
+                             'seconds': round(seconds, 3), 'combined': combined}
+            print(f"{rows:>8} rows {mode:>6}: matrix {size / MB:8.1f} MB  peak {peak / MB:8.1f} MB  "
+                  f"{seconds:6.2f} s")
+
+        max_diff = float(np.max(np.abs(results['dense'].pop('combined') - results['sparse'].pop('combined'))))
+        if max_diff != 0.0:
+            print(f"WARNING: dense and sparse probabilities differ by up to {max_diff:.2e}")
+        report.append({'rows': rows, 'features': plan.n_features, 'max_abs_diff': max_diff, **results})
+
+    print('BENCHMARK ' + json.dumps(report))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
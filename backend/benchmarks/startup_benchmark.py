@@ -0,0 +1,109 @@
+"""
+Measure API startup cost: time to import app.py, peak RSS, and which heavy
+ML libraries got imported along the way.
+
+Each run happens in a fresh interpreter so nothing is cached between runs.
+Pass --max-import-seconds / --max-rss-mb to turn the benchmark into a
+regression check that exits non-zero when a budget is exceeded, and
+--first-prediction to also time the first /predict-equivalent call (which
+loads the serving artifacts).
+
+    python benchmarks/startup_benchmark.py --runs 5 --max-import-seconds 3 --max-rss-mb 400
+"""
+import os
+import sys
+import json
+import argparse
+import pathlib
+import statistics
+import subprocess
+
+BACKEND_DIR = pathlib.Path(__file__).resolve().parent.parent
+
+# Libraries that must only be imported by code paths that really need them
+HEAVY_MODULES = ['tensorflow', 'keras', 'xgboost', 'imblearn', 'matplotlib', 'torch']
+
+SAMPLE_CLICK = {
+    'timestamp': '2024-01-01T12:00:00',
+    'device_type': 'Mobile',
+    'browser': 'Chrome',
+    'operating_system': 'Android',
+    'ad_position': 'top',
+    'device_ip_reputation': 'Suspicious',
+    'scroll_depth': 75,
+    'mouse_movement': 120,
+    'keystrokes_detected': 0,
+    'click_duration': 0.8,
+    'bot_likelihood_score': 0.65,
+    'VPN_usage': 1,
+    'proxy_usage': 0
+}
+
+CHILD_SCRIPT = """
+import sys, json, time, resource
+sys.path.insert(0, {backend!r})
+started = time.perf_counter()
+import app
+result = {{'import_seconds': time.perf_counter() - started}}
+if {first_prediction!r}:
+    from simple_inference import predict
+    started = time.perf_counter()
+    prediction = predict({sample!r})
+    result['first_prediction_seconds'] = time.perf_counter() - started
+    result['prediction_error'] = prediction.get('error')
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+result['peak_rss_mb'] = rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+result['heavy_modules'] = [m for m in {heavy!r} if m in sys.modules]
+print('BENCHMARK ' + json.dumps(result))
+"""
+
+
+def run_once(first_prediction: bool = False) -> dict:
+    """Import app.py in a fresh interpreter and return its measurements"""
+    script = CHILD_SCRIPT.format(backend=str(BACKEND_DIR), first_prediction=first_prediction,
+                                 sample=SAMPLE_CLICK, heavy=HEAVY_MODULES)
+    env = dict(os.environ, TF_CPP_MIN_LOG_LEVEL='3')
+    proc = subprocess.run([sys.executable, '-c', script], cwd=BACKEND_DIR, env=env,
+                          capture_output=True, text=True, check=True)
+    line = next(l for l in proc.stdout.splitlines() if l.startswith('BENCHMARK '))
+    return json.loads(line[len('BENCHMARK '):])
+
+
+def summarize(runs: list) -> dict:
+    summary = {'runs': len(runs), 'heavy_modules': sorted({m for r in runs for m in r['heavy_modules']})}
+    for key in ['import_seconds', 'first_prediction_seconds', 'peak_rss_mb']:
+        values = [r[key] for r in runs if key in r]
+        if values:
+            summary[key] = {'median': round(statistics.median(values), 4),
+                            'min': round(min(values), 4), 'max': round(max(values), 4)}
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark FraudGuard API startup")
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--first-prediction', action='store_true', help="Also time the first prediction")
+    parser.add_argument('--max-import-seconds', type=float, help="Fail if the median import time exceeds this")
+    parser.add_argument('--max-rss-mb', type=float, help="Fail if the median peak RSS exceeds this")
+    parser.add_argument('--output', help="Write the summary as JSON to this file")
+    args = parser.parse_args()
+
+    summary = summarize([run_once(args.first_prediction) for _ in range(args.runs)])
+    print(json.dumps(summary, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+    failures = []
+    if summary['heavy_modules']:
+        failures.append(f"heavy modules imported at startup: {', '.join(summary['heavy_modules'])}")
+    if args.max_import_seconds and summary['import_seconds']['median'] > args.max_import_seconds:
+        failures.append(f"import took {summary['import_seconds']['median']}s (budget {args.max_import_seconds}s)")
+    if args.max_rss_mb and summary['peak_rss_mb']['median'] > args.max_rss_mb:
+        failures.append(f"peak RSS {summary['peak_rss_mb']['median']} MB (budget {args.max_rss_mb} MB)")
+    for failure in failures:
+        print(f"REGRESSION: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,254 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import pathlib
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional, Sequence
+
+from data_preprocessing import load_config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_SQLITE_PATH = pathlib.Path(__file__).parent / 'cache' / 'click_rate.sqlite'
+
+# Used when serving.click_rate.rules is not set: the old /append-csv check
+# (more than 3 clicks in 2 seconds), per device and IP instead of global,
+# plus a looser limit per ad
+DEFAULT_RULES = [
+    {'name': 'device', 'key': ['ip', 'device_type', 'browser', 'operating_system'], 'window_s': 2, 'max_clicks': 3},
+    {'name': 'ad', 'key': ['ad_id'], 'window_s': 10, 'max_clicks': 30}
+]
+
+
+class RateRule:
+    """
+    At most max_clicks clicks per window_s seconds for each distinct value of the key fields
+
+    Only the newest max_clicks + 1 click times of a key are kept, which is
+    all that is needed to tell whether the limit is exceeded.
+    """
+
+    def __init__(self, name: str, key: Sequence[str], window_s: float, max_clicks: int):
+        if window_s <= 0 or max_clicks < 1:
+            raise ValueError(f"Rule {name!r} needs a positive window_s and max_clicks of at least 1")
+        self.name = name
+        self.key_fields = list(key)
+        self.window_s = float(window_s)
+        self.max_clicks = int(max_clicks)
+
+    @property
+    def capacity(self) -> int:
+        return self.max_clicks + 1
+
+    def key_for(self, click: Dict[str, Any]) -> str:
+        values = [str(click.get(field, 'unknown')) for field in self.key_fields]
+        return self.name + '\0' + '\0'.join(values)
+
+
+class MemoryRateBackend:
+    """
+    Per-process ring buffers of recent click times, one per rule and key
+
+    Keys idle for idle_ttl seconds, or the least recently clicked ones
+    beyond max_keys, are evicted from the front of an LRU ordering, so
+    eviction is amortized O(1) per click.
+    """
+
+    def __init__(self, max_keys: int = 100000, idle_ttl: float = 600.0):
+        if max_keys < 1:
+            raise ValueError("max_keys must be at least 1")
+        self.max_keys = max_keys
+        self.idle_ttl = idle_ttl
+        self._rings: 'OrderedDict[str, deque]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'clicks': 0, 'evictions': 0}
+
+    def hit(self, key: str, now: float, window_s: float, capacity: int) -> int:
+        """Record a click at now and return the key's clicks within window_s, this one included"""
+        with self._lock:
+            ring = self._rings.get(key)
+            if ring is None or ring.maxlen != capacity:
+                ring = self._rings[key] = deque(maxlen=capacity)
+            else:
+                self._rings.move_to_end(key)
+            ring.append(now)
+            while ring[0] <= now - window_s:
+                ring.popleft()
+            self._stats['clicks'] += 1
+            self._evict(now)
+            return len(ring)
+
+    def _evict(self, now: float):
+        while self._rings:
+            oldest_key, oldest = next(iter(self._rings.items()))
+            if len(self._rings) <= self.max_keys and oldest[-1] > now - self.idle_ttl:
+                break
+            del self._rings[oldest_key]
+            self._stats['evictions'] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._rings.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats, keys=len(self._rings))
+        stats.update(backend='memory', max_keys=self.max_keys, idle_ttl=self.idle_ttl)
+        return stats
+
+
+class SqliteRateBackend:
+    """
+    Ring buffers in a SQLite file shared by every worker process
+
+    Like the prediction cache, the database runs in WAL mode with one
+    connection per thread of each process. A click reads and rewrites one
+    row in an immediate transaction, so concurrent workers never lose each
+    other's clicks. Idle keys are deleted every prune_every clicks.
+    """
+
+    def __init__(self, path=None, idle_ttl: float = 600.0, prune_every: int = 256):
+        self.path = pathlib.Path(path) if path else DEFAULT_SQLITE_PATH
+        self.idle_ttl = idle_ttl
+        self.prune_every = prune_every
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {'clicks': 0, 'evictions': 0}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(str(self.path), timeout=5.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS click_rates ('
+                'key TEXT PRIMARY KEY, stamps TEXT NOT NULL, last_seen REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS click_rates_last_seen ON click_rates (last_seen)')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def hit(self, key: str, now: float, window_s: float, capacity: int) -> int:
+        """Record a click at now and return the key's clicks within window_s, this one included"""
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT stamps FROM click_rates WHERE key = ?', (key,)).fetchone()
+            stamps = json.loads(row[0]) if row else []
+            stamps = [t for t in stamps[1 - capacity:] if t > now - window_s] + [now]
+            conn.execute('INSERT OR REPLACE INTO click_rates VALUES (?, ?, ?)', (key, json.dumps(stamps), now))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+        with self._lock:
+            self._stats['clicks'] += 1
+            prune = self._stats['clicks'] % self.prune_every == 0
+        if prune:
+            evicted = conn.execute('DELETE FROM click_rates WHERE last_seen <= ?', (now - self.idle_ttl,)).rowcount
+            with self._lock:
+                self._stats['evictions'] += max(evicted, 0)
+        return len(stamps)
+
+    def clear(self) -> None:
+        self._connection().execute('DELETE FROM click_rates')
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats['keys'] = self._connection().execute('SELECT COUNT(*) FROM click_rates').fetchone()[0]
+        stats.update(backend='sqlite', idle_ttl=self.idle_ttl, path=str(self.path))
+        return stats
+
+
+class ClickRateDetector:
+    """
+    Flag live clicks that arrive faster than any rule allows for their key
+
+    Each click costs one ring-buffer update per rule, however long the live
+    click log has grown. Click times are taken on the server when the click
+    arrives rather than from the client-supplied timestamp.
+    """
+
+    def __init__(self, rules: List[RateRule], backend):
+        self.rules = list(rules)
+        self.backend = backend
+
+    def record(self, click: Dict[str, Any], now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Count a click against every rule
+
+        Args:
+            click (dict): Click fields, including those the rules key on
+            now (float, optional): Arrival time in seconds since the epoch; defaults to time.time()
+
+        Returns:
+            list: One {'rule', 'clicks', 'window_s', 'max_clicks'} entry per rule
+                the click exceeded; empty if it is within every limit
+        """
+        now = time.time() if now is None else now
+        exceeded = []
+        for rule in self.rules:
+            clicks = self.backend.hit(rule.key_for(click), now, rule.window_s, rule.capacity)
+            if clicks > rule.max_clicks:
+                exceeded.append({'rule': rule.name, 'clicks': clicks, 'window_s': rule.window_s,
+                                 'max_clicks': rule.max_clicks})
+        return exceeded
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self.backend.stats(), rules=[rule.name for rule in self.rules])
+
+
+def create_click_rate_detector(settings: Dict[str, Any]) -> ClickRateDetector:
+    """
+    Build a detector from the serving.click_rate section of config.yaml
+
+    Args:
+        settings (dict): rules (name, key, window_s, max_clicks), backend
+            ('memory' or 'sqlite'), idle_ttl_s, max_keys and, for sqlite,
+            path relative to the backend directory
+
+    Returns:
+        ClickRateDetector: Detector over the selected backend
+    """
+    rules = [RateRule(r['name'], r.get('key', []), r['window_s'], r['max_clicks'])
+             for r in settings.get('rules') or DEFAULT_RULES]
+    backend_name = settings.get('backend', 'memory')
+    idle_ttl = float(settings.get('idle_ttl_s', 600))
+    if backend_name == 'memory':
+        backend = MemoryRateBackend(max_keys=int(settings.get('max_keys', 100000)), idle_ttl=idle_ttl)
+    elif backend_name == 'sqlite':
+        path = settings.get('path')
+        if path and not os.path.isabs(path):
+            path = pathlib.Path(__file__).parent / path
+        backend = SqliteRateBackend(path, idle_ttl=idle_ttl)
+    else:
+        raise ValueError(f"Unsupported click rate backend: {backend_name}")
+    return ClickRateDetector(rules, backend)
+
+
+_detector = None
+_detector_lock = threading.Lock()
+
+
+def get_click_rate_detector() -> ClickRateDetector:
+    """Return the process-wide detector configured by serving.click_rate"""
+    global _detector
+    if _detector is None:
+        with _detector_lock:
+            if _detector is None:
+                settings = (load_config().get('serving', {}) or {}).get('click_rate', {}) or {}
+                _detector = create_click_rate_detector(settings)
+                logger.info(f"Click rate detector using {settings.get('backend', 'memory')} backend "
+                            f"with rules {', '.join(rule.name for rule in _detector.rules)}")
+    return _detector
@@ -0,0 +1,934 @@
+import os
+import csv
+import sys
+import json
+import uuid
+import struct
+import logging
+import pathlib
+import argparse
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from data_preprocessing import load_config
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialized within one process
+    fcntl = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_DIR = pathlib.Path(__file__).parent / 'data' / 'click_store'
+LEGACY_CSV = pathlib.Path(__file__).parent / 'data' / 'live_clicks.csv'
+
+# Column order of the legacy live_clicks.csv, which scan() reproduces
+FIELDS = ['timestamp', 'device_type', 'browser', 'os', 'ad_position', 'scroll_depth', 'mouse_movement',
+          'click_duration', 'ad_id', 'is_fraud']
+TEXT_FIELDS = ['device_type', 'browser', 'os', 'ad_position', 'ad_id']
+NUMBER_FIELDS = ['scroll_depth', 'mouse_movement', 'click_duration']
+
+# Active segment record: u32 length of the rest, then timestamp (ms since the
+# epoch, UTC), the numbers as float64 (NaN if missing), is_fraud as int8 (-1
+# if unknown) and each text field as u16 length + UTF-8 bytes
+_LENGTH = struct.Struct('<I')
+_FIXED = struct.Struct('<qdddb')
+_TEXT_LENGTH = struct.Struct('<H')
+# Sparse index entry per block of block_records records: byte range and time range
+_INDEX_ENTRY = struct.Struct('<QQqq')
+
+MANIFEST_FILE = 'manifest.json'
+
+
+def to_millis(value) -> int:
+    """Milliseconds since the epoch (UTC) for an ISO string, datetime, pandas Timestamp or number of ms"""
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return int(round(value))
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    if isinstance(value, pd.Timestamp):
+        value = value.to_pydatetime()
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(round(value.timestamp() * 1000))
+    raise ValueError(f"Not a timestamp: {value!r}")
+
+
+def format_millis(millis: np.ndarray) -> np.ndarray:
+    """ISO strings with millisecond precision and a Z suffix, like JavaScript's toISOString()"""
+    iso = np.datetime_as_string(np.asarray(millis, dtype=np.int64).astype('datetime64[ms]'), unit='ms')
+    return np.char.add(iso, 'Z').astype(object)
+
+
+def _number(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('nan')
+
+
+def _flag(value) -> int:
+    if value in (None, ''):
+        return -1
+    if isinstance(value, str):
+        return {'1': 1, 'true': 1, '0': 0, 'false': 0}.get(value.strip().lower(), -1)
+    return 1 if value else 0
+
+
+def encode_record(click: Dict[str, Any]) -> Tuple[int, bytes]:
+    """Return (timestamp ms, encoded record) for a click dict with FIELDS keys"""
+    timestamp = to_millis(click['timestamp'])
+    parts = [_FIXED.pack(timestamp, *(_number(click.get(f)) for f in NUMBER_FIELDS), _flag(click.get('is_fraud')))]
+    for field in TEXT_FIELDS:
+        value = click.get(field)
+        text = b'' if value is None else str(value).encode('utf-8')[:0xFFFF]
+        parts += [_TEXT_LENGTH.pack(len(text)), text]
+    body = b''.join(parts)
+    return timestamp, _LENGTH.pack(len(body)) + body
+
+
+def _record_timestamps(buffer: bytes, offset: int = 0) -> Iterable[Tuple[int, int, int]]:
+    """Yield (start offset, end offset, timestamp) of each complete record in buffer"""
+    while offset + _LENGTH.size + _FIXED.size <= len(buffer):
+        (length,) = _LENGTH.unpack_from(buffer, offset)
+        end = offset + _LENGTH.size + length
+        if end > len(buffer):
+            break  # A record still being written
+        yield offset, end, struct.unpack_from('<q', buffer, offset + _LENGTH.size)[0]
+        offset = end
+
+
+def decode_records(buffer: bytes, first_seq: int = 0) -> Dict[str, np.ndarray]:
+    """Decode every complete record in buffer into column arrays, numbering them from first_seq"""
+    columns = {field: [] for field in FIELDS}
+    offset, size = 0, len(buffer)
+    while offset + _LENGTH.size + _FIXED.size <= size:
+        (length,) = _LENGTH.unpack_from(buffer, offset)
+        end = offset + _LENGTH.size + length
+        if end > size:
+            break
+        position = offset + _LENGTH.size
+        timestamp, scroll_depth, mouse_movement, click_duration, is_fraud = _FIXED.unpack_from(buffer, position)
+        position += _FIXED.size
+        for field in TEXT_FIELDS:
+            (text_length,) = _TEXT_LENGTH.unpack_from(buffer, position)
+            position += _TEXT_LENGTH.size
+            columns[field].append(buffer[position:position + text_length].decode('utf-8'))
+            position += text_length
+        columns['timestamp'].append(timestamp)
+        columns['scroll_depth'].append(scroll_depth)
+        columns['mouse_movement'].append(mouse_movement)
+        columns['click_duration'].append(click_duration)
+        columns['is_fraud'].append(is_fraud)
+        offset = end
+    arrays = {field: np.asarray(columns[field], dtype=object) for field in TEXT_FIELDS}
+    arrays['timestamp'] = np.asarray(columns['timestamp'], dtype=np.int64)
+    for field in NUMBER_FIELDS:
+        arrays[field] = np.asarray(columns[field], dtype=np.float64)
+    arrays['is_fraud'] = np.asarray(columns['is_fraud'], dtype=np.int8)
+    arrays['seq'] = first_seq + np.arange(len(arrays['timestamp']), dtype=np.int64)
+    return arrays
+
+
+def parse_csv_row(row: List[str]) -> Optional[Dict[str, Any]]:
+    """Click dict for a live_clicks.csv row with or without ad_id; None for a malformed row"""
+    if len(row) == len(FIELDS):
+        click = dict(zip(FIELDS, row))
+    elif len(row) == len(FIELDS) - 1:
+        click = dict(zip([field for field in FIELDS if field != 'ad_id'], row), ad_id='unknown')
+    else:
+        return None
+    try:
+        to_millis(click['timestamp'])
+    except ValueError:
+        return None
+    return click
+
+
+def typed_click(click: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert the numbers and is_fraud of a parsed CSV row; missing values become None"""
+    for field in NUMBER_FIELDS:
+        value = _number(click[field])
+        click[field] = None if value != value else value
+    flag = _flag(click['is_fraud'])
+    click['is_fraud'] = None if flag < 0 else flag
+    return click
+
+
+def read_csv_since(path, offset: int = 0, limit: int = 1000) -> Dict[str, Any]:
+    """
+    Up to limit rows of a legacy live_clicks.csv starting at byte offset
+
+    Only the requested rows are read and parsed; the cursor returned is the
+    byte offset just past the last complete line read.
+
+    Returns:
+        dict: clicks (DataFrame in the FIELDS layout), cursor, has_more and
+            cursors (the cursor just past each click)
+    """
+    records, cursors = [], []
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        while len(records) < limit:
+            line = f.readline()
+            if not line.endswith(b'\n'):
+                break  # End of file, or a line still being written
+            offset += len(line)
+            row = next(csv.reader([line.decode('utf-8', errors='replace')]), [])
+            click = parse_csv_row(row) if row and row[0] != 'timestamp' else None
+            if click is not None:
+                records.append(typed_click(click))
+                cursors.append(offset)
+        has_more = f.readline().endswith(b'\n')
+    return {'clicks': pd.DataFrame(records, columns=FIELDS), 'cursor': offset, 'has_more': has_more,
+            'cursors': cursors}
+
+
+def csv_end_cursor(path) -> int:
+    """Byte offset just past the last complete line of a live_clicks.csv, or 0 if it does not exist"""
+    try:
+        with open(path, 'rb') as f:
+            size = f.seek(0, os.SEEK_END)
+            position = size
+            while position > 0:
+                start = max(position - 65536, 0)
+                f.seek(start)
+                newline = f.read(position - start).rfind(b'\n')
+                if newline >= 0:
+                    return start + newline + 1
+                position = start
+    except FileNotFoundError:
+        pass
+    return 0
+
+
+def _concat(parts: List[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    if not parts:
+        return decode_records(b'')
+    return {field: np.concatenate([part[field] for part in parts]) for field in parts[0]}
+
+
+def _select(columns: Dict[str, np.ndarray], keep) -> Dict[str, np.ndarray]:
+    return {field: values[keep] for field, values in columns.items()}
+
+
+class ClickStore:
+    """
+    Append-only store of live clicks in time-partitioned segments
+
+    New clicks are appended to one active segment (active/*.log) as compact
+    length-prefixed binary records, with a sparse index (*.idx) holding the
+    byte and time range of every block_records records. The active segment
+    is sealed when it reaches segment_records records or a click from a
+    later partition (partition_s seconds of event time) arrives: its records
+    are sorted by time and written as a read-only columnar .npz (text
+    columns dictionary-encoded), listed in manifest.json with its time
+    range. Sealed segments of closed partitions are compacted into one.
+
+    Range scans skip segments and index blocks outside the requested range
+    and binary-search the sorted sealed segments, so they read close to only
+    the clicks they return. An flock on store.lock serializes writers across
+    gunicorn workers; scans take it shared just long enough to open files.
+
+    Every click also gets a sequence number in append order (seq), which
+    read_since() uses as a cursor: the active segment's first seq is in its
+    file name, so the index finds a cursor's block without decoding older
+    clicks, manifest seq ranges limit a page to the sealed segments it can
+    come from, and each sealed segment stores its rows' seq order so only
+    the clicks returned are decoded.
+    """
+
+    def __init__(self, directory=None, partition_s: int = 86400, segment_records: int = 65536,
+                 block_records: int = 256):
+        if partition_s < 1 or segment_records < 1 or block_records < 1:
+            raise ValueError("partition_s, segment_records and block_records must be at least 1")
+        self.directory = pathlib.Path(directory) if directory else DEFAULT_STORE_DIR
+        self.active_dir = self.directory / 'active'
+        self.active_dir.mkdir(parents=True, exist_ok=True)
+        self.partition_ms = int(partition_s) * 1000
+        self.segment_records = segment_records
+        self.block_records = block_records
+        self._process_lock = threading.RLock()
+        # This process's view of the active segment, caught up under the lock
+        self._active = None
+
+    # -- locking and manifest -------------------------------------------------
+
+    @contextmanager
+    def _locked(self, shared: bool = False):
+        if fcntl is None:
+            with self._process_lock:
+                yield
+            return
+        # A fresh open file description per acquisition, so threads of one
+        # process exclude each other as well as other processes
+        with open(self.directory / 'store.lock', 'a+b') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                if shared:
+                    yield
+                else:
+                    with self._process_lock:
+                        yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        try:
+            with open(self.directory / MANIFEST_FILE) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'segments': [], 'imported': []}
+
+    def _write_manifest(self, manifest: Dict[str, Any]) -> None:
+        staging = self.directory / f'{MANIFEST_FILE}.{uuid.uuid4().hex}.tmp'
+        with open(staging, 'w') as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(staging, self.directory / MANIFEST_FILE)
+
+    # -- active segment ---------------------------------------------------------
+
+    def _active_log(self) -> Optional[pathlib.Path]:
+        if self._active is not None and self._active['path'].exists():
+            return self._active['path']
+        logs = sorted(self.active_dir.glob('*.log'))
+        return logs[-1] if logs else None
+
+    def _sync_active(self) -> Optional[Dict[str, Any]]:
+        """Catch this process's view of the active segment up with other writers' appends"""
+        path = self._active_log()
+        if path is None:
+            self._active = None
+            return None
+        index = path.with_suffix('.idx')
+        blocks = index.stat().st_size // _INDEX_ENTRY.size if index.exists() else 0
+        if self._active is None or self._active['path'] != path or self._active['blocks'] != blocks:
+            # Resume from the end of the last indexed block; the index entries
+            # of blocks other writers completed are already on disk
+            block_start = 0
+            if blocks:
+                with open(index, 'rb') as f:
+                    f.seek((blocks - 1) * _INDEX_ENTRY.size)
+                    block_start = _INDEX_ENTRY.unpack(f.read(_INDEX_ENTRY.size))[1]
+            self._active = {
+                'path': path, 'index': index, 'first_seq': int(path.stem.split('-')[0]),
+                'partition': int(path.stem.split('-')[1]),
+                'blocks': blocks, 'block_start': block_start, 'offset': block_start,
+                'block_count': 0, 'block_min': None, 'block_max': None
+            }
+        active = self._active
+        with open(active['path'], 'rb') as f:
+            f.seek(active['offset'])
+            pending = f.read()
+        base = active['offset']
+        for _, end, timestamp in _record_timestamps(pending):
+            self._track(timestamp, base + end)
+        return active
+
+    def _track(self, timestamp: int, end: int) -> None:
+        """Account one appended record ending at byte end; writes an index entry when a block fills up"""
+        active = self._active
+        active['offset'] = end
+        active['block_count'] += 1
+        active['block_min'] = timestamp if active['block_min'] is None else min(active['block_min'], timestamp)
+        active['block_max'] = timestamp if active['block_max'] is None else max(active['block_max'], timestamp)
+        if active['block_count'] == self.block_records:
+            with open(active['index'], 'ab') as f:
+                f.write(_INDEX_ENTRY.pack(active['block_start'], end, active['block_min'], active['block_max']))
+            active.update(blocks=active['blocks'] + 1, block_start=end, block_count=0, block_min=None,
+                          block_max=None)
+
+    def _active_records(self) -> int:
+        if self._active is None:
+            return 0
+        return self._active['blocks'] * self.block_records + self._active['block_count']
+
+    def _next_seq(self) -> int:
+        if self._active is not None:
+            return self._active['first_seq'] + self._active_records()
+        return self._next_seq_from_manifest()
+
+    def _next_seq_from_manifest(self) -> int:
+        return max((s['max_seq'] + 1 for s in self._read_manifest()['segments']), default=0)
+
+    def _open_active(self, partition: int, first_seq: Optional[int] = None) -> Dict[str, Any]:
+        first_seq = self._next_seq() if first_seq is None else first_seq
+        path = self.active_dir / f'{first_seq:012d}-{partition:010d}-{uuid.uuid4().hex}.log'
+        path.touch()
+        self._active = None
+        return self._sync_active()
+
+    # -- writing ---------------------------------------------------------------
+
+    def append(self, click: Dict[str, Any]) -> int:
+        """Append one click; returns its timestamp in ms"""
+        return self.append_many([click])[0]
+
+    def append_many(self, clicks: Iterable[Dict[str, Any]]) -> List[int]:
+        """
+        Append clicks in order, sealing the active segment whenever it fills up
+        or a click from a later partition arrives
+
+        Returns:
+            list: Timestamp in ms of each click
+
+        Raises:
+            ValueError: If a click has no parseable timestamp (nothing is written)
+        """
+        encoded = [encode_record(click) for click in clicks]
+        with self._locked():
+            self._append_encoded(encoded)
+        return [timestamp for timestamp, _ in encoded]
+
+    def _append_encoded(self, encoded: List[Tuple[int, bytes]]) -> None:
+        """Write encoded records; call with the exclusive lock held"""
+        active = self._sync_active()
+        start = 0
+        while start < len(encoded):
+            partition = encoded[start][0] // self.partition_ms
+            if active is not None and (self._active_records() >= self.segment_records
+                                       or partition > active['partition']):
+                next_seq = self._next_seq()
+                self._seal_active()
+                active = self._open_active(partition, next_seq)
+                # The partition sealed just now may have been closed by this click
+                self.compact(_locked=True)
+            if active is None:
+                active = self._open_active(partition)
+
+            # Write the run of clicks that fits in this segment and partition in one call
+            room = self.segment_records - self._active_records()
+            stop = start
+            while stop < len(encoded) and stop - start < room and \
+                    encoded[stop][0] // self.partition_ms <= active['partition']:
+                stop += 1
+            with open(active['path'], 'ab') as f:
+                f.write(b''.join(record for _, record in encoded[start:stop]))
+            end = active['offset']
+            for timestamp, record in encoded[start:stop]:
+                end += len(record)
+                self._track(timestamp, end)
+            start = stop
+
+    def seal(self) -> Optional[str]:
+        """Seal the active segment now (normally done on rollover); returns the sealed file name or None"""
+        with self._locked():
+            if self._sync_active() is None:
+                return None
+            return self._seal_active()
+
+    def _seal_active(self) -> Optional[str]:
+        active = self._active
+        columns = decode_records(active['path'].read_bytes(), active['first_seq'])
+        name = None
+        if len(columns['timestamp']):
+            name = self._write_segment(columns, active['partition'])
+        active['path'].unlink()
+        if active['index'].exists():
+            active['index'].unlink()
+        self._active = None
+        return name
+
+    def _write_segment(self, columns: Dict[str, np.ndarray], partition: int, manifest=None,
+                       replaces: Iterable[str] = ()) -> str:
+        """Write columns sorted by time as a sealed segment and record it in the manifest"""
+        order = np.argsort(columns['timestamp'], kind='stable')
+        arrays = {}
+        for field in FIELDS:
+            values = columns[field][order]
+            if field in TEXT_FIELDS:
+                dictionary, codes = np.unique(values.astype(str), return_inverse=True)
+                arrays[f'{field}_values'] = dictionary
+                arrays[f'{field}_codes'] = codes.astype(np.uint32)
+            else:
+                arrays[field] = values
+        arrays['seq'] = columns['seq'][order]
+        # Rows in append order, so read_since() finds a cursor with a binary search
+        arrays['seq_order'] = np.argsort(arrays['seq'], kind='stable').astype(np.uint32)
+        name = f'{partition:010d}-{uuid.uuid4().hex}.npz'
+        staging = self.directory / f'{name}.tmp'
+        with open(staging, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(staging, self.directory / name)
+
+        manifest = manifest or self._read_manifest()
+        replaces = set(replaces)
+        manifest['segments'] = [s for s in manifest['segments'] if s['file'] not in replaces] + [{
+            'file': name, 'partition': partition, 'rows': int(len(order)),
+            'min_ts': int(arrays['timestamp'][0]), 'max_ts': int(arrays['timestamp'][-1]),
+            'min_seq': int(arrays['seq'].min()), 'max_seq': int(arrays['seq'].max())
+        }]
+        manifest['segments'].sort(key=lambda s: (s['min_ts'], s['file']))
+        self._write_manifest(manifest)
+        return name
+
+    def compact(self, _locked: bool = False) -> int:
+        """Merge the sealed segments of every closed partition into one; returns segments removed"""
+        if not _locked:
+            with self._locked():
+                self._sync_active()
+                return self.compact(_locked=True)
+
+        manifest = self._read_manifest()
+        current = self._active['partition'] if self._active is not None else None
+        if current is None and manifest['segments']:
+            current = max(s['partition'] for s in manifest['segments'])
+        by_partition = {}
+        for segment in manifest['segments']:
+            by_partition.setdefault(segment['partition'], []).append(segment['file'])
+
+        removed = 0
+        for partition, files in sorted(by_partition.items()):
+            if partition >= current or len(files) < 2:
+                continue
+            merged = _concat([self._load_segment(self.directory / name) for name in files])
+            self._write_segment(merged, partition, manifest, replaces=files)
+            for name in files:
+                os.remove(self.directory / name)
+            removed += len(files)
+            logger.info(f"Compacted {len(files)} click segments of partition {partition}")
+        return removed
+
+    # -- reading ---------------------------------------------------------------
+
+    @staticmethod
+    def _load_segment(path, lo: Optional[int] = None, hi: Optional[int] = None) -> Dict[str, np.ndarray]:
+        with np.load(path, allow_pickle=False) as data:
+            timestamps = data['timestamp']
+            i = 0 if lo is None else int(np.searchsorted(timestamps, lo, side='left'))
+            j = len(timestamps) if hi is None else int(np.searchsorted(timestamps, hi, side='left'))
+            return ClickStore._segment_rows(data, slice(i, j), timestamps)
+
+    @staticmethod
+    def _load_segment_since(path, cursor: int, limit: int) -> Tuple[Dict[str, np.ndarray], bool]:
+        """The first limit clicks of a sealed segment with seq >= cursor, in seq order, and whether there are more"""
+        with np.load(path, allow_pickle=False) as data:
+            seq = data['seq']
+            # Segments sealed before seq_order was stored are sorted here
+            order = data['seq_order'] if 'seq_order' in data.files else np.argsort(seq, kind='stable')
+            i = int(np.searchsorted(seq[order], cursor, side='left'))
+            return ClickStore._segment_rows(data, order[i:i + limit]), len(order) - i > limit
+
+    @staticmethod
+    def _segment_rows(data, rows, timestamps=None) -> Dict[str, np.ndarray]:
+        """Decode only the given rows (a slice or index array) of an open sealed segment"""
+        timestamps = data['timestamp'] if timestamps is None else timestamps
+        columns = {'timestamp': timestamps[rows], 'seq': data['seq'][rows]}
+        for field in FIELDS[1:]:
+            if field in TEXT_FIELDS:
+                columns[field] = data[f'{field}_values'].astype(object)[data[f'{field}_codes'][rows]]
+            else:
+                columns[field] = data[field][rows]
+        return columns
+
+    def _open_log(self):
+        """Open the active segment; returns (file or None, size, index bytes, first seq). Call under the lock."""
+        logs = sorted(self.active_dir.glob('*.log'))
+        if not logs:
+            return None, 0, b'', 0
+        log = open(logs[-1], 'rb')
+        index_path = logs[-1].with_suffix('.idx')
+        index = index_path.read_bytes() if index_path.exists() else b''
+        return log, os.fstat(log.fileno()).st_size, index, int(logs[-1].stem.split('-')[0])
+
+    def scan_columns(self, start=None, end=None) -> Dict[str, np.ndarray]:
+        """Column arrays of the clicks with start <= timestamp < end, sorted by time"""
+        lo = to_millis(start) if start is not None else None
+        hi = to_millis(end) if end is not None else None
+
+        def overlaps(min_ts, max_ts):
+            return (lo is None or max_ts >= lo) and (hi is None or min_ts < hi)
+
+        # Open everything under the shared lock; open files stay readable even if
+        # a writer seals or compacts them away afterwards
+        with self._locked(shared=True):
+            segments = [open(self.directory / s['file'], 'rb') for s in self._read_manifest()['segments']
+                        if overlaps(s['min_ts'], s['max_ts'])]
+            log, log_size, index, first_seq = self._open_log()
+
+        parts = []
+        for f in segments:
+            with f:
+                parts.append(self._load_segment(f, lo, hi))
+        if log is not None:
+            with log:
+                # Indexed blocks outside the range are skipped; the unindexed tail is always read
+                blocks = len(index) // _INDEX_ENTRY.size
+                ranges, tail = [], 0
+                for i in range(blocks):
+                    block_start, block_end, min_ts, max_ts = _INDEX_ENTRY.unpack_from(index, i * _INDEX_ENTRY.size)
+                    if overlaps(min_ts, max_ts):
+                        ranges.append((i, block_start, block_end))
+                    tail = block_end
+                ranges.append((blocks, tail, log_size))
+                for i, block_start, block_end in ranges:
+                    log.seek(block_start)
+                    columns = decode_records(log.read(block_end - block_start), first_seq + i * self.block_records)
+                    keep = np.ones(len(columns['timestamp']), dtype=bool)
+                    if lo is not None:
+                        keep &= columns['timestamp'] >= lo
+                    if hi is not None:
+                        keep &= columns['timestamp'] < hi
+                    parts.append(_select(columns, keep))
+
+        columns = _concat(parts)
+        return _select(columns, np.argsort(columns['timestamp'], kind='stable'))
+
+    def scan(self, start=None, end=None) -> pd.DataFrame:
+        """
+        Clicks with start <= timestamp < end as a DataFrame in the live_clicks.csv layout
+
+        Args:
+            start, end: ISO strings, datetimes or ms since the epoch; None leaves that side open
+
+        Returns:
+            pd.DataFrame: FIELDS columns sorted by time; timestamps as ISO strings,
+                missing numbers as NaN and unknown is_fraud as NaN
+        """
+        return self._frame(self.scan_columns(start, end))
+
+    @staticmethod
+    def _frame(columns: Dict[str, np.ndarray]) -> pd.DataFrame:
+        frame = pd.DataFrame({field: columns[field] for field in FIELDS})
+        frame['timestamp'] = format_millis(columns['timestamp'])
+        frame['is_fraud'] = pd.array(np.where(columns['is_fraud'] < 0, None, columns['is_fraud']), dtype='Int64')
+        return frame
+
+    def read_since(self, cursor: int = 0, limit: int = 1000) -> Dict[str, Any]:
+        """
+        Up to limit clicks appended at or after cursor, in append order
+
+        Args:
+            cursor (int): Sequence number of the first click wanted; 0 reads from the start
+            limit (int): Maximum number of clicks to return
+
+        Returns:
+            dict: clicks (DataFrame as from scan()), cursor to pass next time,
+                has_more (more clicks are already waiting) and cursors (the
+                cursor just past each click)
+        """
+        with self._locked(shared=True):
+            # Segments in seq order until limit clicks are certain to lie in those opened: seqs are
+            # unique, so at most cursor - min_seq rows of a segment come before cursor, and a segment
+            # starting after the largest seq of those opened cannot hold any of the first limit
+            segments, certain, bound, truncated = [], 0, -1, False
+            candidates = sorted((s for s in self._read_manifest()['segments'] if s['max_seq'] >= cursor),
+                                key=lambda s: s['min_seq'])
+            for segment in candidates:
+                if certain >= limit and segment['min_seq'] > bound:
+                    truncated = True
+                    break
+                segments.append(open(self.directory / segment['file'], 'rb'))
+                certain += max(segment['rows'] - max(cursor - segment['min_seq'], 0), 1)
+                bound = max(bound, segment['max_seq'])
+            log, log_size, index, first_seq = self._open_log()
+
+        parts = []
+        for f in segments:
+            with f:
+                columns, more = self._load_segment_since(f, cursor, limit)
+            parts.append(columns)
+            truncated |= more
+        # The active segment's clicks all come after the sealed ones
+        need = limit - sum(len(part['seq']) for part in parts)
+        if log is not None and need <= 0:
+            log.close()
+            truncated |= log_size > 0
+        elif log is not None:
+            with log:
+                # Decode from the block holding the cursor to the block holding cursor + need
+                blocks = len(index) // _INDEX_ENTRY.size
+                first_block = min(max(cursor - first_seq, 0) // self.block_records, blocks)
+                last_block = (max(cursor - first_seq, 0) + need) // self.block_records
+                start = _INDEX_ENTRY.unpack_from(index, (first_block - 1) * _INDEX_ENTRY.size)[1] if first_block else 0
+                end = log_size
+                if last_block < blocks:
+                    end = _INDEX_ENTRY.unpack_from(index, last_block * _INDEX_ENTRY.size)[1]
+                    truncated = True
+                log.seek(start)
+                columns = decode_records(log.read(end - start), first_seq + first_block * self.block_records)
+                parts.append(_select(columns, columns['seq'] >= cursor))
+
+        columns = _concat(parts)
+        order = np.argsort(columns['seq'], kind='stable')
+        has_more = truncated or len(order) > limit
+        columns = _select(columns, order[:limit])
+        if len(columns['seq']):
+            cursor = int(columns['seq'][-1]) + 1
+        return {'clicks': self._frame(columns), 'cursor': cursor, 'has_more': has_more,
+                'cursors': (columns['seq'] + 1).tolist()}
+
+    def end_cursor(self) -> int:
+        """Cursor just past the newest click, from which read_since() returns only new clicks"""
+        with self._locked(shared=True):
+            log, log_size, index, first_seq = self._open_log()
+            if log is None:
+                return self._next_seq_from_manifest()
+        with log:
+            blocks = len(index) // _INDEX_ENTRY.size
+            start = _INDEX_ENTRY.unpack_from(index, (blocks - 1) * _INDEX_ENTRY.size)[1] if blocks else 0
+            log.seek(start)
+            tail = sum(1 for _ in _record_timestamps(log.read(log_size - start)))
+        return first_seq + blocks * self.block_records + tail
+
+    # -- import and stats --------------------------------------------------------
+
+    def import_csv(self, path, batch_rows: int = 10000) -> Dict[str, int]:
+        """
+        Import a legacy live_clicks.csv, which mixes rows with and without ad_id
+
+        The file is imported in batches of batch_rows lines. Each batch is
+        appended and its end offset recorded in the manifest under one
+        exclusive lock, so concurrent importers share the work instead of
+        duplicating it and an interrupted import resumes after the last
+        recorded batch. Rows with the wrong number of fields or an
+        unparseable timestamp are skipped and counted.
+
+        Returns:
+            dict: imported and skipped row counts of this call
+        """
+        path = pathlib.Path(path).resolve()
+        imported = skipped = 0
+        with open(path, 'rb') as f:
+            while True:
+                with self._locked():
+                    progress = self._import_progress(str(path))
+                    if progress['done']:
+                        break
+                    offset, clicks, lines = progress['offset'], [], 0
+                    f.seek(offset)
+                    while lines < batch_rows:
+                        line = f.readline()
+                        if not line:
+                            break
+                        offset += len(line)
+                        lines += 1
+                        row = next(csv.reader([line.decode('utf-8', errors='replace')]), [])
+                        if row and row[0] != 'timestamp':
+                            clicks.append(parse_csv_row(row))
+                    valid = [click for click in clicks if click is not None]
+                    skipped += len(clicks) - len(valid)
+
+                    encoded = [encode_record(click) for click in valid]
+                    # Recorded before the batch is appended, so a resume can tell whether it was
+                    self._record_import(str(path), offset=progress['offset'], done=False,
+                                        pending={'offset': offset, 'seq': self._next_seq() + len(encoded)})
+                    # Appending may seal and compact segments, which rewrites the manifest
+                    self._append_encoded(encoded)
+                    self._record_import(str(path), offset=offset, done=lines < batch_rows, pending=None)
+                    imported += len(encoded)
+
+        if imported or skipped:
+            logger.info(f"Imported {imported} clicks from {path} ({skipped} rows skipped)")
+        return {'imported': imported, 'skipped': skipped}
+
+    def _import_progress(self, path: str) -> Dict[str, Any]:
+        """Import progress of path; a batch left pending by a crash counts if it was fully appended"""
+        progress = self._read_manifest().get('imports', {}).get(path) or {'offset': 0, 'done': False}
+        pending = progress.get('pending')
+        if pending:
+            self._sync_active()
+            if self._next_seq() >= pending['seq']:
+                progress['offset'] = pending['offset']
+        return progress
+
+    def _record_import(self, path: str, **progress) -> None:
+        manifest = self._read_manifest()
+        manifest.setdefault('imports', {})[path] = progress
+        self._write_manifest(manifest)
+
+    def imported(self, path) -> bool:
+        """Whether path has been imported completely"""
+        progress = self._read_manifest().get('imports', {}).get(str(pathlib.Path(path).resolve()))
+        return bool(progress and progress['done'])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._locked(shared=True):
+            manifest = self._read_manifest()
+            logs = sorted(self.active_dir.glob('*.log'))
+            active_bytes = logs[-1].stat().st_size if logs else 0
+        sealed = manifest['segments']
+        return {
+            'sealed_segments': len(sealed),
+            'sealed_rows': sum(s['rows'] for s in sealed),
+            'active_bytes': active_bytes,
+            'min_ts': min((s['min_ts'] for s in sealed), default=None),
+            'max_ts': max((s['max_ts'] for s in sealed), default=None),
+            'path': str(self.directory)
+        }
+
+
+class CsvClickCache:
+    """
+    Parsed rows of a live_clicks.csv that follows the file as it grows
+
+    Each refresh parses only the complete lines appended since the last
+    one and extends a ready-to-serve JSON array, kept as frozen chunks of
+    about CHUNK_BYTES plus a growing tail, so serving every click costs a
+    stat, a small read and copying the tail however long the file is. The
+    file is parsed from the start again when it was replaced (new inode),
+    truncated, or rewritten (the bytes just before the remembered offset changed).
+    """
+
+    # Bytes before the offset compared on each refresh to notice rewrites
+    CHECK_BYTES = 64
+    # Size at which the tail of the JSON array is frozen into a chunk
+    CHUNK_BYTES = 1 << 20
+
+    def __init__(self, path=None):
+        self.path = pathlib.Path(path) if path else LEGACY_CSV
+        self._lock = threading.Lock()
+        self._reset(None)
+
+    def _reset(self, identity) -> None:
+        self._identity = identity
+        self._offset = 0
+        self._check = b''
+        self._rows = 0
+        self._chunks: List[bytes] = []
+        self._tail = bytearray()
+
+    def _unchanged(self, f, stat) -> bool:
+        if (stat.st_dev, stat.st_ino) != self._identity or stat.st_size < self._offset:
+            return False
+        f.seek(self._offset - len(self._check))
+        return f.read(len(self._check)) == self._check
+
+    def refresh(self) -> int:
+        """
+        Parse lines appended since the last refresh
+
+        Returns:
+            int: Rows added
+
+        Raises:
+            FileNotFoundError: If the CSV does not exist
+        """
+        with self._lock:
+            with open(self.path, 'rb') as f:
+                stat = os.fstat(f.fileno())
+                if not self._unchanged(f, stat):
+                    if self._identity is not None:
+                        logger.info(f"{self.path} was replaced or truncated; parsing it again")
+                    self._reset((stat.st_dev, stat.st_ino))
+                f.seek(self._offset)
+                data = f.read(stat.st_size - self._offset)
+            end = data.rfind(b'\n') + 1
+            if end == 0:
+                return 0  # No complete new line yet
+
+            added = 0
+            for row in csv.reader(data[:end].decode('utf-8', errors='replace').splitlines()):
+                click = parse_csv_row(row) if row and row[0] != 'timestamp' else None
+                if click is None:
+                    continue
+                if self._rows:
+                    self._tail += b','
+                self._tail += json.dumps(typed_click(click)).encode('utf-8')
+                self._rows += 1
+                added += 1
+                if len(self._tail) >= self.CHUNK_BYTES:
+                    self._chunks.append(bytes(self._tail))
+                    self._tail = bytearray()
+            self._offset += end
+            self._check = data[max(end - self.CHECK_BYTES, 0):end]
+            return added
+
+    def json_chunks(self) -> List[bytes]:
+        """Every click as the pieces of a JSON array, after catching up with the file"""
+        self.refresh()
+        with self._lock:
+            return [b'['] + self._chunks + [bytes(self._tail), b']']
+
+    def json(self) -> bytes:
+        """Every click as a JSON array"""
+        return b''.join(self.json_chunks())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            json_bytes = sum(len(chunk) for chunk in self._chunks) + len(self._tail) + 2
+            return {'rows': self._rows, 'offset': self._offset, 'json_bytes': json_bytes,
+                    'path': str(self.path)}
+
+
+_csv_cache = None
+_csv_cache_lock = threading.Lock()
+
+
+def get_csv_click_cache() -> CsvClickCache:
+    """Return the process-wide cache of data/live_clicks.csv"""
+    global _csv_cache
+    if _csv_cache is None:
+        with _csv_cache_lock:
+            if _csv_cache is None:
+                _csv_cache = CsvClickCache()
+    return _csv_cache
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_click_store() -> Optional[ClickStore]:
+    """
+    Return the shared click store, or None when serving.live_clicks.store is 'csv'
+
+    An existing data/live_clicks.csv is not imported here, in the middle of
+    a request; run `python click_store.py import` once to bring it over.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                settings = (load_config().get('serving', {}) or {}).get('live_clicks', {}) or {}
+                if settings.get('store', 'segments') != 'segments':
+                    _store = False
+                else:
+                    path = settings.get('path')
+                    if path and not os.path.isabs(path):
+                        path = pathlib.Path(__file__).parent / path
+                    store = ClickStore(
+                        path,
+                        partition_s=int(settings.get('partition_s', 86400)),
+                        segment_records=int(settings.get('segment_records', 65536)),
+                        block_records=int(settings.get('block_records', 256))
+                    )
+                    if LEGACY_CSV.exists() and not store.imported(LEGACY_CSV):
+                        logger.warning(f"{LEGACY_CSV} has not been imported into the click store; "
+                                       f"run `python click_store.py import` to include its clicks")
+                    _store = store
+    return _store or None
+
+
+def main():
+    """Import CSV files into the click store, seal, compact or print stats"""
+    parser = argparse.ArgumentParser(description="Manage the live click store")
+    parser.add_argument('command', choices=['import', 'seal', 'compact', 'stats'])
+    parser.add_argument('paths', nargs='*', help="CSV files to import")
+    parser.add_argument('--store', help="Store directory (default: serving.live_clicks.path)")
+    args = parser.parse_args()
+
+    store = ClickStore(args.store) if args.store else get_click_store() or ClickStore()
+    if args.command == 'import':
+        # Without paths, the legacy CSV if there is one
+        for path in args.paths or [path for path in [LEGACY_CSV] if path.exists()]:
+            print(json.dumps(dict(store.import_csv(path), path=str(path))))
+    elif args.command == 'seal':
+        print(store.seal())
+    elif args.command == 'compact':
+        print(store.compact())
+    print(json.dumps(store.stats()))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
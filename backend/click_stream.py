@@ -0,0 +1,300 @@
+import os
+import json
+import queue
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import pandas as pd
+
+from data_preprocessing import load_config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Page size when the tailer or a resuming subscriber reads new clicks
+READ_LIMIT = 1000
+
+
+class StreamFull(Exception):
+    """Raised when max_subscribers streams are already open in this process"""
+
+
+def encode_event(event: str, data: Any, event_id: Optional[int] = None) -> bytes:
+    """One Server-Sent Events frame"""
+    lines = [] if event_id is None else [f'id: {event_id}']
+    lines += [f'event: {event}', f'data: {json.dumps(data)}']
+    return ('\n'.join(lines) + '\n\n').encode('utf-8')
+
+
+def encode_clicks(page: Dict[str, Any]) -> List[Any]:
+    """(cursor, frame) per click of a read_since() page; the cursor is the event id"""
+    clicks = page['clicks'].astype(object)
+    records = clicks.where(pd.notnull(clicks), None).to_dict(orient='records')
+    return [(cursor, encode_event('click', record, cursor)) for cursor, record in zip(page['cursors'], records)]
+
+
+class Subscriber:
+    """One open stream: a bounded queue of encoded frames filled by the tailer"""
+
+    def __init__(self, max_buffer: int):
+        self.frames = queue.Queue(maxsize=max_buffer)
+        self.dropped = False
+
+    def offer(self, frame: bytes) -> bool:
+        """Queue a frame; a subscriber whose queue is full is marked dropped"""
+        if self.dropped:
+            return False
+        try:
+            self.frames.put_nowait(frame)
+            return True
+        except queue.Full:
+            self.dropped = True
+            return False
+
+
+class Frames:
+    """
+    The frames of one subscriber; close() unsubscribes even if they were never iterated
+
+    A generator closed before it started never runs its finally, which
+    would leave the subscriber holding its slot when a client disconnects
+    before the first frame.
+    """
+
+    def __init__(self, frames: Iterator[bytes], unsubscribe: Callable[[], None]):
+        self._frames = frames
+        self._unsubscribe = unsubscribe
+
+    def __iter__(self) -> Iterator[bytes]:
+        return self
+
+    def __next__(self) -> bytes:
+        return next(self._frames)
+
+    def close(self) -> None:
+        try:
+            self._frames.close()
+        finally:
+            self._unsubscribe()
+
+
+class ClickStream:
+    """
+    Push live clicks to Server-Sent Events subscribers
+
+    One tailer thread per process reads clicks appended after its cursor,
+    woken by notify() when this process accepted a click and otherwise every
+    poll_s seconds (clicks accepted by other gunicorn workers). Each click
+    is encoded once and the same bytes are queued to every subscriber, so a
+    viewer costs a queue put per click.
+
+    Event ids are read_since() cursors. A subscriber that reconnects with
+    Last-Event-ID is first replayed what it missed, up to max_replay clicks
+    (past that it gets a reset event and should refetch), then joins the
+    live feed exactly where the replay ended. A subscriber whose queue of
+    max_buffer frames fills up is dropped, so a slow consumer never holds
+    back the others; the client reconnects and resumes from its last id.
+    """
+
+    def __init__(self, read_page: Callable[[int, int], Dict[str, Any]], end_cursor: Callable[[], int],
+                 poll_s: float = 0.5, heartbeat_s: float = 15.0, max_buffer: int = 1000,
+                 max_replay: int = 10000, max_subscribers: int = 100):
+        if max_buffer < 1 or poll_s <= 0 or heartbeat_s <= 0:
+            raise ValueError("max_buffer must be at least 1 and poll_s and heartbeat_s positive")
+        self.read_page = read_page
+        self.end_cursor = end_cursor
+        self.poll_s = poll_s
+        self.heartbeat_s = heartbeat_s
+        self.max_buffer = max_buffer
+        self.max_replay = max_replay
+        self.max_subscribers = max_subscribers
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._subscribers: List[Subscriber] = []
+        self._cursor = None
+        self._worker = None
+        self._pid = None
+        self._stats = {'published': 0, 'dropped': 0, 'replayed': 0, 'resets': 0}
+
+    # -- tailer ----------------------------------------------------------------
+
+    def notify(self) -> None:
+        """Wake the tailer now; call after appending a click"""
+        self._wake.set()
+
+    def _ensure_worker(self) -> None:
+        # Threads do not survive fork, so each process starts its own tailer;
+        # it stops when the last subscriber leaves. Call with _lock held.
+        if self._worker is None or not self._worker.is_alive() or self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._cursor = self.end_cursor()
+            self._worker = threading.Thread(target=self._run, name='click-stream', daemon=True)
+            self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.poll_s)
+            self._wake.clear()
+            with self._lock:
+                if self._worker is not threading.current_thread():
+                    return
+                if not self._subscribers:
+                    self._worker = None
+                    return
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error(f"Error reading live clicks for the stream: {str(e)}")
+
+    def poll(self) -> int:
+        """Read clicks after the cursor and queue them to every subscriber; returns clicks published"""
+        published = 0
+        has_more = True
+        while has_more:
+            page = self.read_page(self._cursor, READ_LIMIT)
+            has_more = page['has_more']
+            frames = encode_clicks(page)
+            with self._lock:
+                for subscriber in list(self._subscribers):
+                    for _, frame in frames:
+                        if not subscriber.offer(frame):
+                            self._subscribers.remove(subscriber)
+                            self._stats['dropped'] += 1
+                            logger.info("Dropped a live click subscriber that fell behind")
+                            break
+                self._cursor = page['cursor']
+                self._stats['published'] += len(frames)
+            published += len(frames)
+        return published
+
+    # -- subscribers -----------------------------------------------------------
+
+    def subscribe(self, last_event_id: Optional[int] = None) -> Iterator[bytes]:
+        """
+        Open a stream of SSE frames
+
+        Args:
+            last_event_id (int, optional): Last event id the client received;
+                clicks after it are replayed first. None starts with new clicks.
+
+        Returns:
+            iterator: Encoded frames; close() it to unsubscribe
+
+        Raises:
+            StreamFull: If max_subscribers streams are open
+        """
+        subscriber = Subscriber(self.max_buffer)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                raise StreamFull(f"{self.max_subscribers} live click streams are already open")
+            self._ensure_worker()
+            self._subscribers.append(subscriber)
+            joined_at = self._cursor
+        return Frames(self._frames(subscriber, last_event_id, joined_at), lambda: self.unsubscribe(subscriber))
+
+    def _replay(self, cursor: int, joined_at: int) -> Iterator[bytes]:
+        """Frames for clicks between the client's last id and where it joined the live feed"""
+        replayed = 0
+        while cursor < joined_at:
+            page = self.read_page(cursor, READ_LIMIT)
+            frames = [(c, frame) for c, frame in encode_clicks(page) if c <= joined_at]
+            if not frames:
+                break
+            replayed += len(frames)
+            if replayed > self.max_replay:
+                with self._lock:
+                    self._stats['resets'] += 1
+                yield encode_event('reset', {'cursor': joined_at}, joined_at)
+                return
+            for _, frame in frames:
+                yield frame
+            cursor = frames[-1][0]
+        with self._lock:
+            self._stats['replayed'] += replayed
+
+    def _frames(self, subscriber: Subscriber, last_event_id: Optional[int], joined_at: int) -> Iterator[bytes]:
+        try:
+            yield f'retry: {int(self.poll_s * 1000) + 1000}\n\n'.encode('utf-8')
+            if last_event_id is not None:
+                yield from self._replay(last_event_id, joined_at)
+            while True:
+                if subscriber.dropped:
+                    # Reconnecting with Last-Event-ID resumes where this left off
+                    yield encode_event('dropped', {'reason': 'slow consumer'})
+                    return
+                try:
+                    yield subscriber.frames.get(timeout=self.heartbeat_s)
+                except queue.Empty:
+                    yield b': heartbeat\n\n'
+        finally:
+            self.unsubscribe(subscriber)
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._stats, subscribers=len(self._subscribers), cursor=self._cursor)
+
+
+def subscriber_limit(configured: Optional[int] = None, threads: Optional[int] = None) -> int:
+    """
+    How many streams one worker process may hold open
+
+    Every open stream holds one of the worker's request threads for as long
+    as the client stays connected, so under gunicorn's threaded workers
+    streams get at most a quarter of the threads (GUNICORN_THREADS) and the
+    rest stay free for ordinary requests. Without GUNICORN_THREADS, as under
+    the development server's thread per request, configured applies as is.
+    """
+    if threads is None:
+        threads = int(os.environ.get('GUNICORN_THREADS', 0))
+    if not threads:
+        return configured if configured is not None else 100
+    limit = max(threads // 4, 1)
+    if configured is not None and configured > limit:
+        logger.warning(f"max_subscribers {configured} would hold too many of {threads} worker threads; "
+                       f"using {limit}")
+    return limit if configured is None else min(configured, limit)
+
+
+_stream = None
+_stream_lock = threading.Lock()
+
+
+def get_click_stream() -> ClickStream:
+    """Return the process-wide live click stream configured by serving.live_clicks.stream"""
+    global _stream
+    if _stream is None:
+        with _stream_lock:
+            if _stream is None:
+                from click_store import LEGACY_CSV, csv_end_cursor, get_click_store, read_csv_since
+
+                live_clicks = (load_config().get('serving', {}) or {}).get('live_clicks', {}) or {}
+                settings = live_clicks.get('stream', {}) or {}
+                store = get_click_store()
+                if store is not None:
+                    read_page, end_cursor = store.read_since, store.end_cursor
+                else:
+                    def read_page(cursor, limit):
+                        if not LEGACY_CSV.exists():
+                            return {'clicks': pd.DataFrame(), 'cursor': cursor, 'has_more': False, 'cursors': []}
+                        return read_csv_since(LEGACY_CSV, cursor, limit)
+
+                    def end_cursor():
+                        return csv_end_cursor(LEGACY_CSV)
+                _stream = ClickStream(
+                    read_page, end_cursor,
+                    poll_s=float(settings.get('poll_s', 0.5)),
+                    heartbeat_s=float(settings.get('heartbeat_s', 15)),
+                    max_buffer=int(settings.get('max_buffer', 1000)),
+                    max_replay=int(settings.get('max_replay', 10000)),
+                    max_subscribers=subscriber_limit(
+                        int(settings['max_subscribers']) if settings.get('max_subscribers') is not None else None
+                    )
+                )
+    return _stream
@@ -0,0 +1,155 @@
+import logging
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+from data_preprocessing import load_config
+from simple_inference import NUMERIC_FIELDS, REQUIRED_FIELDS
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CATEGORICAL_FIELDS = ['device_type', 'browser', 'operating_system', 'ad_position', 'device_ip_reputation']
+FLAG_FIELDS = ['VPN_usage', 'proxy_usage']
+# Rows without these cannot be scored meaningfully; fix_csv.py dropped them
+CRITICAL_FIELDS = ['device_type', 'browser', 'operating_system']
+# What pd.to_numeric() accepts once whitespace is stripped ('nan' counts as missing there too)
+NUMBER_PATTERN = r'[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?|[+-]?(?i:inf|infinity)'
+FLAG_VALUES = {'true': '1', 'yes': '1', 'y': '1', 't': '1', 'false': '0', 'no': '0', 'n': '0', 'f': '0'}
+
+# Rule name -> what happens to the values it matches. Fixed values are
+# rewritten in place; rejected ones are left for validate_frame() to report
+# in the row's error column, so output rows stay aligned with the input.
+REPAIR_RULES = {
+    'missing_column': 'fixed',      # absent column added with the fix_csv.py default
+    'padded_text': 'fixed',         # leading/trailing whitespace stripped
+    'blank_numeric': 'fixed',       # empty numeric field set to 0
+    'flag_text': 'fixed',           # true/false, yes/no in VPN_usage/proxy_usage mapped to 1/0
+    'future_timestamp': 'fixed',    # timestamp after now moved back two years
+    'invalid_numeric': 'rejected',  # numeric field that does not parse
+    'invalid_timestamp': 'rejected',
+    'missing_category': 'rejected'  # no device_type, browser or operating_system
+}
+
+
+def repair_enabled() -> bool:
+    """serving.batch.repair.enabled from config.yaml"""
+    batch_config = (load_config().get('serving', {}) or {}).get('batch', {}) or {}
+    return bool((batch_config.get('repair', {}) or {}).get('enabled', True))
+
+
+def empty_counts() -> Dict[str, int]:
+    return {rule: 0 for rule in REPAIR_RULES}
+
+
+def add_counts(total: Dict[str, int], counts: Dict[str, int]) -> Dict[str, int]:
+    """Add per-rule counts into total in place and return it"""
+    for rule, count in counts.items():
+        total[rule] = total.get(rule, 0) + count
+    return total
+
+
+def _is_text(series: pd.Series) -> bool:
+    return pd.api.types.is_string_dtype(series) or series.dtype == object
+
+
+def _numeric_mask(values: pd.Series) -> pd.Series:
+    """True where a text value parses as a number"""
+    if getattr(values.dtype, 'storage', None) == 'pyarrow':
+        # Arrow's regex kernel is several times faster than to_numeric on Arrow strings
+        return values.str.fullmatch(NUMBER_PATTERN).fillna(False).astype(bool)
+    return pd.to_numeric(values, errors='coerce').notna()
+
+
+def repair_chunk(chunk: pd.DataFrame, now: Optional[pd.Timestamp] = None) -> Tuple[pd.DataFrame, Dict[str, int]]:
+    """
+    Apply the batchtest/fix_csv.py repairs to a chunk of raw clicks, column by column
+
+    Every rule is a vectorized operation on a whole column, so the cost per
+    chunk does not depend on how many rows need fixing. Text columns (CSV
+    chunks are read as text) stay text: repaired values are written back as
+    strings so they pass through to the output verbatim.
+
+    Unlike fix_csv.py, numeric values that do not parse are not zero-filled
+    and rows missing a critical category are not dropped: both are counted
+    as rejected and left for validate_frame() to flag.
+
+    Args:
+        chunk (pd.DataFrame): Raw clicks
+        now (pd.Timestamp, optional): Cut-off for future timestamps (UTC); defaults to the current time
+
+    Returns:
+        tuple: (repaired chunk, {rule: number of values it matched})
+    """
+    counts = empty_counts()
+    chunk = chunk.copy()
+    rows = len(chunk)
+
+    for field in REQUIRED_FIELDS:
+        if field not in chunk.columns:
+            chunk[field] = 'unknown' if field in CATEGORICAL_FIELDS else 0
+            counts['missing_column'] += rows
+
+    for field in CATEGORICAL_FIELDS + NUMERIC_FIELDS + ['timestamp']:
+        values = chunk[field]
+        if not _is_text(values):
+            continue
+        stripped = values.str.strip()
+        changed = ((stripped != values) & values.notna()).to_numpy(bool)
+        if changed.any():
+            counts['padded_text'] += int(changed.sum())
+            # Whitespace-only values become missing rather than ''
+            chunk[field] = stripped.mask(stripped == '')
+
+    for field in CRITICAL_FIELDS:
+        counts['missing_category'] += int(chunk[field].isna().sum())
+
+    for field in NUMERIC_FIELDS:
+        values = chunk[field]
+        blank = values.isna().to_numpy(bool)
+        if blank.any():
+            counts['blank_numeric'] += int(blank.sum())
+            chunk[field] = values.mask(blank, '0' if _is_text(values) else 0)
+            values = chunk[field]
+        if not _is_text(values):
+            continue
+        if field in FLAG_FIELDS:
+            mapped = values.str.lower().map(FLAG_VALUES)
+            flags = mapped.notna().to_numpy(bool)
+            if flags.any():
+                counts['flag_text'] += int(flags.sum())
+                chunk[field] = values.mask(flags, mapped)
+                values = chunk[field]
+        counts['invalid_numeric'] += int((~_numeric_mask(values)).sum())
+
+    timestamps = chunk['timestamp']
+    if timestamps.dtype.kind == 'M':
+        parsed = timestamps if timestamps.dt.tz is not None else timestamps.dt.tz_localize('UTC')
+    else:
+        parsed = pd.to_datetime(timestamps, errors='coerce', utc=True, format='mixed')
+    counts['invalid_timestamp'] += int((parsed.isna() & timestamps.notna()).sum())
+    now = pd.Timestamp.now(tz='UTC') if now is None else pd.Timestamp(now)
+    now = now.tz_localize('UTC') if now.tzinfo is None else now
+    future = (parsed > now).to_numpy(bool)
+    if future.any():
+        counts['future_timestamp'] += int(future.sum())
+        shifted = (parsed[future] - pd.DateOffset(years=2)).dt.strftime('%Y-%m-%dT%H:%M:%S')
+        if _is_text(timestamps):
+            chunk.loc[future, 'timestamp'] = shifted.to_numpy()
+        else:
+            chunk['timestamp'] = timestamps.mask(future, timestamps - pd.DateOffset(years=2))
+
+    return chunk, counts
+
+
+def summarize_counts(counts: Dict[str, int]) -> Dict[str, object]:
+    """Per-rule counts split into fixed and rejected, for API responses and logs"""
+    fixed = {rule: n for rule, n in counts.items() if n and REPAIR_RULES.get(rule) == 'fixed'}
+    rejected = {rule: n for rule, n in counts.items() if n and REPAIR_RULES.get(rule) == 'rejected'}
+    return {
+        'fixed': fixed,
+        'rejected': rejected,
+        'fixed_values': sum(fixed.values()),
+        'rejected_values': sum(rejected.values())
+    }
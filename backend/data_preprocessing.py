@@ -5,9 +5,6 @@ import yaml
 import pandas as pd
 import numpy as np
 import joblib
-from sklearn.compose import ColumnTransformer
-from sklearn.preprocessing import OneHotEncoder, StandardScaler
-from sklearn.model_selection import train_test_split
 import pathlib
 from typing import Tuple, Dict, List, Any, Optional
 
@@ -99,6 +96,9 @@ def load_raw_data() -> pd.DataFrame:
         logger.error(f"Error loading raw data: {e}")
         raise
 
+# Reputation levels used by the fraud risk score; unknown levels score 0.5
+REPUTATION_MAPPING = {'Good': 0, 'Suspicious': 0.5, 'Bad': 1}
+
 def feature_engineering(df):
     """
     Create advanced temporal and behavioral features
@@ -120,10 +120,9 @@ def feature_engineering(df):
     df['dwell_speed'] = df['click_duration'] / (df['mouse_movement'] + 1e-5)
     
     # Fraud risk scoring
-    reputation_mapping = {'Good': 0, 'Suspicious': 0.5, 'Bad': 1}
     df['fraud_risk_score'] = (
         0.4 * df['bot_likelihood_score'] +
-        0.3 * df['device_ip_reputation'].map(reputation_mapping).fillna(0.5) +
+        0.3 * df['device_ip_reputation'].map(REPUTATION_MAPPING).fillna(0.5) +
         0.2 * df['VPN_usage'] +
         0.1 * df['proxy_usage']
     )
@@ -166,6 +165,7 @@ def preprocess_data(data=None, test_size=0.2, random_state=42):
     # For training, split the data
     y = X.pop('is_fraudulent') if 'is_fraudulent' in X.columns else X.pop('click_validity') if 'click_validity' in X.columns else None
     if y is not None:
+        from sklearn.model_selection import train_test_split
         return train_test_split(X, y, test_size=test_size, stratify=y, random_state=random_state)
     return X
 
@@ -195,6 +195,11 @@ def save_preprocessor(preprocessor, path=None):
 
 def create_preprocessing_pipeline():
     """Create the complete preprocessing pipeline"""
+    # Imported here so serving code that only needs feature_engineering/load_config
+    # does not pay for sklearn (and scipy) at startup
+    from sklearn.compose import ColumnTransformer
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
     try:
         # Define categorical and numeric features
         categorical_features = ['device_type', 'browser', 'operating_system']
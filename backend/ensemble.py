@@ -0,0 +1,371 @@
+import os
+import sys
+import json
+import hashlib
+import logging
+import pathlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from feature_pipeline import dense_blocks, is_sparse
+from model_registry import MODELS_DIR, file_sha256, final_estimator, load_model_file
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Ensemble members and their model files, relative to the models directory
+ENSEMBLE_MEMBERS = {
+    'random_forest': 'random_forest_model/model.pkl',
+    'xgboost': 'xgboost_model/model.pkl',
+    'neural_network': 'fraud_detection_model.keras'
+}
+STRATEGIES = ('mean', 'weighted', 'max', 'stacking')
+STACKER_FILE = 'ensemble_stacker.json'
+# sklearn estimators that read CSR input as-is. XGBoost is left out on purpose:
+# it treats entries missing from a sparse matrix as missing values, not zeros
+SPARSE_ESTIMATORS = ('RandomForestClassifier', 'ExtraTreesClassifier', 'DecisionTreeClassifier')
+
+
+def accepts_sparse(model) -> bool:
+    """Whether a model scores a CSR feature matrix exactly as it scores the dense one"""
+    if getattr(model, 'accepts_sparse', False):
+        return True
+    return final_estimator(model).__class__.__name__ in SPARSE_ESTIMATORS
+
+
+def fraud_probabilities(model, X) -> np.ndarray:
+    """Return the class-1 probability per row for sklearn-style and Keras-style models"""
+    if is_sparse(X) and not accepts_sparse(model):
+        # Bounded float32 blocks instead of one dense copy of the whole matrix
+        blocks = [fraud_probabilities(model, block) for block in dense_blocks(X)]
+        return np.concatenate(blocks) if blocks else np.empty(0)
+    if hasattr(model, 'predict_proba'):
+        return np.asarray(model.predict_proba(X))[:, 1]
+    return np.asarray(model.predict(X, verbose=0)).reshape(X.shape[0], -1)[:, 0]
+
+
+class EnsembleResult:
+    """
+    Scores of every ensemble member for one feature matrix
+
+    probabilities holds one float32 column per member (in names order) and
+    combined the ensemble probability per row, so a batch is a couple of
+    arrays rather than a Python list per model.
+    """
+    __slots__ = ('names', 'probabilities', 'combined', 'is_fraud', 'strategy', 'threshold', 'errors')
+
+    def __init__(self, names: List[str], probabilities: np.ndarray, combined: np.ndarray,
+                 strategy: str, threshold: float, errors: Dict[str, str]):
+        self.names = names
+        self.probabilities = probabilities
+        self.combined = combined
+        self.is_fraud = combined >= threshold
+        self.strategy = strategy
+        self.threshold = threshold
+        self.errors = errors
+
+    def member(self, name: str) -> np.ndarray:
+        """Return one member's probability column"""
+        return self.probabilities[:, self.names.index(name)]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-ready form: per-member probabilities as one row per record"""
+        return {
+            'strategy': self.strategy,
+            'threshold': self.threshold,
+            'members': self.names,
+            'member_probabilities': self.probabilities.tolist(),
+            'fraud_probability': self.combined.tolist(),
+            'is_fraud': self.is_fraud.tolist(),
+            'errors': self.errors
+        }
+
+
+class EnsembleScorer:
+    """
+    Score several resident models concurrently on one preprocessed matrix
+
+    Members run on a shared thread pool (NumPy, XGBoost and TensorFlow all
+    release the GIL while computing) and their probabilities are combined by
+    strategy:
+
+    - mean: average of the member probabilities
+    - weighted: weighted average; members without a weight count as 1
+    - max: the most suspicious member wins
+    - stacking: logistic regression over member probabilities, fitted by
+      fit_stacker()
+
+    A member that fails is reported in EnsembleResult.errors and left out of
+    mean, weighted and max; stacking needs every member it was fitted on.
+
+    version identifies the member models and combination settings when the
+    scorer was built from files (see get_ensemble()); it is None otherwise.
+    """
+
+    def __init__(self, members: Dict[str, Tuple[Any, str]], strategy: str = 'mean',
+                 weights: Optional[Dict[str, float]] = None, stacker: Optional[Dict[str, Any]] = None,
+                 threshold: float = 0.5, max_workers: Optional[int] = None, version: Optional[str] = None):
+        if not members:
+            raise ValueError("An ensemble needs at least one member")
+        self.members = dict(members)
+        self.strategy = self._check_strategy(strategy, stacker)
+        self.weights = dict(weights or {})
+        self.stacker = stacker
+        self.threshold = threshold
+        self.max_workers = max_workers or len(self.members)
+        self.version = version
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.members)
+
+    @staticmethod
+    def _check_strategy(strategy: str, stacker) -> str:
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown ensemble strategy {strategy!r}; expected one of {', '.join(STRATEGIES)}")
+        if strategy == 'stacking' and stacker is None:
+            raise ValueError(f"Stacking needs a fitted stacker; run `python ensemble.py` to create {STACKER_FILE}")
+        return strategy
+
+    def _pool(self) -> ThreadPoolExecutor:
+        # Pools do not survive fork, so each worker process creates its own
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='ensemble')
+                    self._pid = os.getpid()
+        return self._executor
+
+    def score(self, X, strategy: Optional[str] = None) -> EnsembleResult:
+        """
+        Score X with every member and combine the results
+
+        Args:
+            X: Preprocessed feature matrix, one row per record; CSR matrices go as-is to members
+                that accept them and are densified in blocks for the rest
+            strategy (str, optional): Overrides the configured combination strategy
+
+        Returns:
+            EnsembleResult: Member and combined probabilities
+
+        Raises:
+            RuntimeError: If every member failed
+        """
+        strategy = self._check_strategy(strategy or self.strategy, self.stacker)
+        if not is_sparse(X):
+            X = np.asarray(X)
+            if X.ndim == 1:
+                X = X.reshape(1, -1)
+
+        if len(self.members) == 1:
+            futures = None
+        else:
+            pool = self._pool()
+            futures = {name: pool.submit(fraud_probabilities, model, X) for name, (model, _) in self.members.items()}
+
+        names, columns, errors = [], [], {}
+        for name, (model, _) in self.members.items():
+            try:
+                probs = futures[name].result() if futures else fraud_probabilities(model, X)
+                columns.append(np.asarray(probs, dtype=np.float32))
+                names.append(name)
+            except Exception as e:
+                logger.error(f"Ensemble member {name} failed: {e}")
+                errors[name] = str(e)
+        if not names:
+            raise RuntimeError(f"Every ensemble member failed: {errors}")
+
+        probabilities = np.column_stack(columns)
+        combined = self.combine(probabilities, names, strategy)
+        return EnsembleResult(names, probabilities, combined, strategy, self.threshold, errors)
+
+    def combine(self, probabilities: np.ndarray, names: List[str], strategy: str) -> np.ndarray:
+        """Combine an (n_rows, n_members) probability matrix into one probability per row"""
+        P = probabilities.astype(np.float64)
+        if strategy == 'mean':
+            return P.mean(axis=1)
+        if strategy == 'max':
+            return P.max(axis=1)
+        if strategy == 'weighted':
+            w = np.array([float(self.weights.get(name, 1.0)) for name in names])
+            if w.sum() <= 0:
+                raise ValueError("Ensemble weights must sum to a positive number")
+            return P @ (w / w.sum())
+
+        missing = [name for name in self.stacker['members'] if name not in names]
+        if missing:
+            raise ValueError(f"Stacking needs members that did not score: {', '.join(missing)}")
+        columns = [names.index(name) for name in self.stacker['members']]
+        margin = P[:, columns] @ np.asarray(self.stacker['coef']) + float(self.stacker['intercept'])
+        return 1.0 / (1.0 + np.exp(-margin))
+
+
+def fit_stacker(probabilities: np.ndarray, y, names: List[str]) -> Dict[str, Any]:
+    """
+    Fit the stacking combiner: logistic regression on member probabilities
+
+    Args:
+        probabilities (np.ndarray): (n_rows, n_members) member probabilities on held-out data
+        y: True labels
+        names (list): Member name per column
+
+    Returns:
+        dict: members, coef and intercept, as stored in ensemble_stacker.json
+    """
+    from sklearn.linear_model import LogisticRegression
+
+    meta = LogisticRegression().fit(probabilities, np.asarray(y).astype(int))
+    return {
+        'members': list(names),
+        'coef': meta.coef_[0].tolist(),
+        'intercept': float(meta.intercept_[0])
+    }
+
+
+def load_stacker(path, models_dir=None) -> Optional[Dict[str, Any]]:
+    """Load a stacker saved by main(), or None if missing or fitted on different member models"""
+    path = pathlib.Path(path)
+    models_dir = pathlib.Path(models_dir) if models_dir else MODELS_DIR
+    if not path.exists():
+        return None
+    with open(path) as f:
+        stacker = json.load(f)
+
+    for name, sha256 in (stacker.get('source_sha256') or {}).items():
+        model_path = models_dir / ENSEMBLE_MEMBERS[name]
+        if not model_path.exists() or file_sha256(model_path) != sha256:
+            logger.warning(f"Ignoring stale {path.name}: member {name} changed since it was fitted")
+            return None
+    return stacker
+
+
+def load_members(models_dir=None) -> Dict[str, Tuple[Any, str]]:
+    """Load every ensemble member whose model file exists, in ENSEMBLE_MEMBERS order"""
+    models_dir = pathlib.Path(models_dir) if models_dir else MODELS_DIR
+    members = {}
+    for name, relative_path in ENSEMBLE_MEMBERS.items():
+        model_path = models_dir / relative_path
+        if not model_path.exists():
+            logger.warning(f"Ensemble member {name} not found at {model_path}")
+            continue
+        members[name] = load_model_file(model_path)
+    return members
+
+
+def ensemble_version(models_dir, names: List[str], strategy: str, weights, threshold: float,
+                     stacker: Optional[Dict[str, Any]]) -> str:
+    """Digest of the member model files and everything that affects how they are combined"""
+    models_dir = pathlib.Path(models_dir)
+    description = {
+        'members': {name: file_sha256(models_dir / ENSEMBLE_MEMBERS[name]) for name in names},
+        'strategy': strategy,
+        'weights': weights or {},
+        'threshold': threshold,
+        'stacker': stacker
+    }
+    return hashlib.sha256(json.dumps(description, sort_keys=True).encode()).hexdigest()[:16]
+
+
+_ensemble: Optional[EnsembleScorer] = None
+_ensemble_key = None
+_ensemble_lock = threading.Lock()
+
+
+def _stat_key(models_dir: pathlib.Path):
+    key = []
+    for relative_path in list(ENSEMBLE_MEMBERS.values()) + [STACKER_FILE]:
+        try:
+            st = os.stat(models_dir / relative_path)
+            key.append((relative_path, st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            key.append((relative_path, None, None))
+    return tuple(key)
+
+
+def get_ensemble() -> EnsembleScorer:
+    """
+    Return the process-wide ensemble configured by serving.ensemble in config.yaml
+
+    Members stay resident between calls and are reloaded when one of their
+    model files (or the stacker) changes on disk.
+    """
+    global _ensemble, _ensemble_key
+    key = _stat_key(MODELS_DIR)
+    if _ensemble is not None and key == _ensemble_key:
+        return _ensemble
+
+    with _ensemble_lock:
+        if _ensemble is None or key != _ensemble_key:
+            settings = {}
+            try:
+                from data_preprocessing import load_config
+                settings = (load_config().get('serving', {}) or {}).get('ensemble', {}) or {}
+            except Exception as e:
+                logger.warning(f"Using default ensemble settings: {e}")
+
+            stacker = load_stacker(MODELS_DIR / STACKER_FILE, MODELS_DIR)
+            strategy = settings.get('strategy', 'mean')
+            if strategy == 'stacking' and stacker is None:
+                logger.warning(f"No {STACKER_FILE} found, ensemble falls back to the mean strategy")
+                strategy = 'mean'
+            members = load_members(MODELS_DIR)
+            threshold = float(settings.get('threshold', 0.5))
+            _ensemble = EnsembleScorer(
+                members,
+                strategy=strategy,
+                weights=settings.get('weights'),
+                stacker=stacker,
+                threshold=threshold,
+                max_workers=settings.get('max_workers'),
+                version=ensemble_version(MODELS_DIR, list(members), strategy, settings.get('weights'),
+                                         threshold, stacker)
+            )
+            _ensemble_key = key
+            logger.info(f"Ensemble loaded with members {', '.join(_ensemble.names)} ({strategy})")
+    return _ensemble
+
+
+def main():
+    """Fit the stacking combiner on the held-out split of the training data"""
+    try:
+        from sklearn.model_selection import train_test_split
+        from data_preprocessing import load_config, load_raw_data, feature_engineering
+        from model_registry import get_registry
+
+        config = load_config()
+        df = feature_engineering(load_raw_data())
+        y = df.pop('is_fraudulent').values
+
+        # Same split as model_training, so the stacker only sees rows the members did not train on
+        _, X_test, _, y_test = train_test_split(
+            df, y, test_size=config.get('test_size', 0.2), stratify=y,
+            random_state=config.get('random_state', 42)
+        )
+        X = get_registry().get().preprocessor.transform(X_test)
+        if hasattr(X, 'toarray'):
+            X = X.toarray()
+
+        scorer = EnsembleScorer(load_members(MODELS_DIR))
+        result = scorer.score(X)
+        stacker = fit_stacker(result.probabilities, y_test, result.names)
+        stacker['source_sha256'] = {
+            name: file_sha256(MODELS_DIR / ENSEMBLE_MEMBERS[name]) for name in result.names
+        }
+
+        with open(MODELS_DIR / STACKER_FILE, 'w') as f:
+            json.dump(stacker, f, indent=2)
+        logger.info(f"Saved stacker over {', '.join(result.names)} to {MODELS_DIR / STACKER_FILE}")
+        return 0
+    except Exception as e:
+        logger.error(f"Fitting the stacker failed: {e}")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,368 @@
+import logging
+import pathlib
+import threading
+import weakref
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from data_preprocessing import REPUTATION_MAPPING
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# transform(sparse='auto') returns CSR below this share of non-zero columns,
+# the same cut-off as ColumnTransformer's default sparse_threshold
+SPARSE_THRESHOLD = 0.3
+# Rows densified at a time for models that cannot take CSR input
+DENSE_CHUNK_ROWS = 4096
+
+
+def is_sparse(X) -> bool:
+    # Duck-typed, so asking does not import scipy at startup
+    return hasattr(X, 'tocsr')
+
+
+def dense_blocks(X, chunk_rows: int = DENSE_CHUNK_ROWS) -> Iterator[np.ndarray]:
+    """
+    Yield a feature matrix as dense float32 blocks of at most chunk_rows rows
+
+    Every model here computes in float32 (sklearn and XGBoost trees, the
+    exported evaluators and Keras), so the cast loses nothing and halves the
+    block compared with toarray()'s float64.
+    """
+    for start in range(0, X.shape[0], chunk_rows):
+        block = X[start:start + chunk_rows]
+        if is_sparse(block):
+            yield block.astype(np.float32).toarray()
+        else:
+            yield np.asarray(block, dtype=np.float32)
+
+
+def _to_array(values) -> np.ndarray:
+    """Convert a column of values to a numpy array, mapping None to NaN like pandas does"""
+    if isinstance(values, np.ndarray):
+        return values
+    if hasattr(values, 'to_numpy'):
+        return values.to_numpy()
+    values = list(values)
+    if any(v is None for v in values):
+        values = [np.nan if v is None else v for v in values]
+    return np.asarray(values)
+
+
+class _ColumnSource:
+    """Uniform column access over a record, a list of records, a dict of columns or a DataFrame"""
+
+    def __init__(self, data):
+        if isinstance(data, pd.DataFrame):
+            self._get = lambda name: data[name].to_numpy()
+            self._records = None
+            self.n_rows = len(data)
+        elif isinstance(data, dict) and data and all(
+                isinstance(v, (list, tuple, np.ndarray, pd.Series)) for v in data.values()):
+            self._get = lambda name: _to_array(data[name])
+            self._records = None
+            self.n_rows = len(next(iter(data.values())))
+        else:
+            records = [data] if isinstance(data, dict) else list(data)
+            self._get = lambda name: _to_array([r[name] if name in r else None for r in records])
+            self._records = records
+            self.n_rows = len(records)
+        self._cache: Dict[str, np.ndarray] = {}
+
+    def __call__(self, name: str) -> np.ndarray:
+        if name not in self._cache:
+            if self._records is not None and not any(name in r for r in self._records):
+                raise KeyError(name)
+            self._cache[name] = self._get(name)
+        return self._cache[name]
+
+
+def _lookup_indexer(categories) -> Callable[[np.ndarray], np.ndarray]:
+    """Build a category -> position lookup, dict based for small inputs and hash-index based for large ones"""
+    positions = {category: i for i, category in enumerate(categories)}
+    index = pd.Index(categories, dtype=object)
+
+    def indexer(values: np.ndarray) -> np.ndarray:
+        if len(values) <= 32:
+            return np.fromiter((positions.get(v, -1) for v in values), dtype=np.intp, count=len(values))
+        return index.get_indexer(values.astype(object, copy=False))
+
+    return indexer
+
+
+_REPUTATION_LEVELS = list(REPUTATION_MAPPING)
+_REPUTATION_SCORES = np.asarray([REPUTATION_MAPPING[k] for k in _REPUTATION_LEVELS], dtype=float)
+_reputation_indexer = _lookup_indexer(_REPUTATION_LEVELS)
+
+
+class _Timestamps:
+    """Parses the timestamp column once and exposes the calendar fields feature_engineering derives"""
+
+    def __init__(self, values):
+        self.fields = None
+        if len(values) <= 32 and all(isinstance(v, str) for v in values):
+            # ISO strings parse identically with the stdlib, at a fraction of
+            # pd.to_datetime's fixed cost; anything else goes through pandas.
+            try:
+                parsed = [datetime.fromisoformat(v) for v in values]
+                self.fields = {
+                    'hour': np.fromiter((d.hour for d in parsed), dtype=np.int64, count=len(parsed)),
+                    'dayofweek': np.fromiter((d.weekday() for d in parsed), dtype=np.int64, count=len(parsed)),
+                    'month': np.fromiter((d.month for d in parsed), dtype=np.int64, count=len(parsed)),
+                }
+            except ValueError:
+                self.fields = None
+        if self.fields is None:
+            index = pd.DatetimeIndex(pd.to_datetime(values))
+            if index.hasnans:
+                # Same failure the pandas path raises on .astype(int)
+                raise ValueError("Cannot convert non-finite values (NA or inf) to integer")
+            self.fields = {
+                name: np.asarray(getattr(index, name), dtype=np.int64)
+                for name in ('hour', 'dayofweek', 'month')
+            }
+
+    def field(self, name: str) -> np.ndarray:
+        return self.fields[name]
+
+
+# Engineered features, computed with the same operations and operand order as
+# data_preprocessing.feature_engineering so the results are bit-identical.
+def _hour(col, ts):
+    return ts().field('hour')
+
+def _day_of_week(col, ts):
+    return ts().field('dayofweek')
+
+def _is_weekend(col, ts):
+    return (ts().field('dayofweek') >= 5).astype(np.int64)
+
+def _month(col, ts):
+    return ts().field('month')
+
+def _interaction_intensity(col, ts):
+    return col('scroll_depth') * col('mouse_movement') * col('keystrokes_detected')
+
+def _dwell_speed(col, ts):
+    return col('click_duration') / (col('mouse_movement') + 1e-5)
+
+def _fraud_risk_score(col, ts):
+    positions = _reputation_indexer(col('device_ip_reputation'))
+    reputation = np.where(positions >= 0, _REPUTATION_SCORES[positions], 0.5)
+    return (
+        0.4 * col('bot_likelihood_score') +
+        0.3 * reputation +
+        0.2 * col('VPN_usage') +
+        0.1 * col('proxy_usage')
+    )
+
+ENGINEERED_FEATURES: Dict[str, Callable] = {
+    'hour': _hour,
+    'day_of_week': _day_of_week,
+    'is_weekend': _is_weekend,
+    'month': _month,
+    'interaction_intensity': _interaction_intensity,
+    'dwell_speed': _dwell_speed,
+    'fraud_risk_score': _fraud_risk_score,
+}
+
+# Raw input columns each engineered feature is computed from
+FEATURE_DEPENDENCIES: Dict[str, List[str]] = {
+    'hour': ['timestamp'],
+    'day_of_week': ['timestamp'],
+    'is_weekend': ['timestamp'],
+    'month': ['timestamp'],
+    'interaction_intensity': ['scroll_depth', 'mouse_movement', 'keystrokes_detected'],
+    'dwell_speed': ['click_duration', 'mouse_movement'],
+    'fraud_risk_score': ['bot_likelihood_score', 'device_ip_reputation', 'VPN_usage', 'proxy_usage'],
+}
+
+
+class CompiledPipeline:
+    """
+    Flat NumPy transform plan equivalent to feature_engineering + the fitted ColumnTransformer
+
+    Holds the scaler mean/scale arrays and, per categorical column, a
+    category -> output column table. transform() accepts a single record, a
+    list of records, a dict of column arrays or a DataFrame, parses the
+    timestamp column once and never builds an intermediate DataFrame.
+    """
+
+    def __init__(self, numeric_features: List[str], mean: Optional[np.ndarray], scale: Optional[np.ndarray],
+                 categorical_features: List[str], categories: List[np.ndarray], feature_names: List[str]):
+        self.numeric_features = list(numeric_features)
+        self.mean = mean
+        self.scale = scale
+        self.categorical_features = list(categorical_features)
+        self.categories = [np.asarray(c, dtype=object) for c in categories]
+        self.feature_names = list(feature_names)
+        self.n_numeric = len(self.numeric_features)
+        self.n_features = self.n_numeric + sum(len(c) for c in self.categories)
+
+        # Output column offset of the first category of each categorical feature
+        self._offsets = np.cumsum([self.n_numeric] + [len(c) for c in self.categories[:-1]]).astype(np.intp)
+        self._indexers = [_lookup_indexer(c) for c in self.categories]
+
+    @property
+    def density(self) -> float:
+        """Largest share of non-zero columns in a row: every numeric feature plus one category each"""
+        return (self.n_numeric + len(self.categorical_features)) / self.n_features if self.n_features else 1.0
+
+    @property
+    def input_columns(self) -> List[str]:
+        """Raw input columns the plan reads"""
+        columns = []
+        for name in self.numeric_features + self.categorical_features:
+            for column in FEATURE_DEPENDENCIES.get(name, [name]):
+                if column not in columns:
+                    columns.append(column)
+        return columns
+
+    def transform(self, data, sparse: Union[bool, str] = False):
+        """
+        Transform raw input into the model feature matrix
+
+        Args:
+            data: A record dict, a list of record dicts, a dict of column arrays or a DataFrame
+            sparse (bool or 'auto'): Return a CSR matrix; 'auto' does so when density is
+                below SPARSE_THRESHOLD, i.e. when one-hot columns dominate
+
+        Returns:
+            Dense float64 np.ndarray, or float32 scipy.sparse.csr_matrix, of shape (n_rows, n_features)
+        """
+        if sparse == 'auto':
+            sparse = self.density < SPARSE_THRESHOLD
+        col = _ColumnSource(data)
+        X = np.zeros((col.n_rows, self.n_numeric if sparse else self.n_features), dtype=np.float64)
+
+        timestamps = []
+        def ts():
+            if not timestamps:
+                timestamps.append(_Timestamps(col('timestamp')))
+            return timestamps[0]
+
+        # Numeric block: engineered features, then (X - mean) / scale in place
+        for j, name in enumerate(self.numeric_features):
+            feature = ENGINEERED_FEATURES.get(name)
+            X[:, j] = feature(col, ts) if feature is not None else col(name)
+        if self.n_numeric:
+            numeric = X[:, :self.n_numeric]
+            if self.mean is not None:
+                numeric -= self.mean
+            if self.scale is not None:
+                numeric /= self.scale
+
+        if sparse:
+            return self._to_csr(X, col)
+
+        # One-hot block: unknown categories leave the row all zeros
+        rows = np.arange(col.n_rows)
+        for offset, name, indexer in zip(self._offsets, self.categorical_features, self._indexers):
+            positions = indexer(col(name))
+            known = positions >= 0
+            X[rows[known], offset + positions[known]] = 1.0
+
+        return X
+
+    def _to_csr(self, numeric: np.ndarray, col: _ColumnSource):
+        """Assemble the numeric block and one-hot positions straight into CSR, never densifying"""
+        from scipy import sparse as sp
+
+        n_rows = numeric.shape[0]
+        # One slot per numeric feature and categorical feature per row; column
+        # order within a row is ascending because the offsets are
+        indices = np.empty((n_rows, self.n_numeric + len(self.categorical_features)), dtype=np.int32)
+        indices[:, :self.n_numeric] = np.arange(self.n_numeric, dtype=np.int32)
+        for k, (offset, name, indexer) in enumerate(zip(self._offsets, self.categorical_features, self._indexers)):
+            positions = indexer(col(name))
+            indices[:, self.n_numeric + k] = np.where(positions >= 0, offset + positions, -1)
+        values = np.ones(indices.shape, dtype=np.float32)
+        values[:, :self.n_numeric] = numeric
+
+        # Unknown categories have no entry, like the all-zero dense one-hot row
+        stored = indices >= 0
+        indptr = np.zeros(n_rows + 1, dtype=np.int32)
+        np.cumsum(stored.sum(axis=1), out=indptr[1:])
+        return sp.csr_matrix((values[stored], indices[stored], indptr), shape=(n_rows, self.n_features))
+
+
+def compile_pipeline(preprocessor) -> CompiledPipeline:
+    """
+    Compile a fitted ColumnTransformer into a CompiledPipeline
+
+    Args:
+        preprocessor: Fitted ColumnTransformer with one StandardScaler and one
+            OneHotEncoder(handle_unknown='ignore') block, remainder dropped
+
+    Returns:
+        CompiledPipeline: Equivalent NumPy transform plan
+
+    Raises:
+        ValueError: If the preprocessor uses steps the plan cannot reproduce
+    """
+    from sklearn.compose import ColumnTransformer
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+    if not isinstance(preprocessor, ColumnTransformer) or not hasattr(preprocessor, 'transformers_'):
+        raise ValueError("Expected a fitted ColumnTransformer")
+
+    numeric_features, categorical_features, categories = [], [], []
+    mean = scale = None
+    for name, transformer, columns in preprocessor.transformers_:
+        if isinstance(transformer, str) and transformer == 'drop':
+            continue
+        if isinstance(transformer, StandardScaler) and not numeric_features and not categorical_features:
+            # Numeric block must come first to match the ColumnTransformer output order
+            numeric_features = list(columns)
+            mean = np.asarray(transformer.mean_, dtype=np.float64) if transformer.with_mean else None
+            scale = np.asarray(transformer.scale_, dtype=np.float64) if transformer.with_std else None
+        elif isinstance(transformer, OneHotEncoder) and not categorical_features:
+            if transformer.handle_unknown != 'ignore' or transformer.drop is not None:
+                raise ValueError("Only OneHotEncoder(handle_unknown='ignore') without drop is supported")
+            if any(c is not None for c in getattr(transformer, 'infrequent_categories_', None) or []):
+                raise ValueError("Infrequent category grouping is not supported")
+            categorical_features = list(columns)
+            categories = list(transformer.categories_)
+        else:
+            raise ValueError(f"Unsupported transformer {name!r}: {transformer!r}")
+
+    return CompiledPipeline(
+        numeric_features, mean, scale, categorical_features, categories,
+        list(preprocessor.get_feature_names_out())
+    )
+
+
+def compile_from_file(preprocessor_path=None) -> CompiledPipeline:
+    """Compile the fitted preprocessor stored in models/preprocessor.pkl (or the given path)"""
+    from model_registry import load_preprocessor
+    if preprocessor_path is None:
+        preprocessor_path = pathlib.Path(__file__).parent / 'models' / 'preprocessor.pkl'
+    return compile_pipeline(load_preprocessor(preprocessor_path))
+
+
+_compiled = weakref.WeakKeyDictionary()
+_compiled_lock = threading.Lock()
+
+
+def get_compiled_pipeline(preprocessor) -> Optional[CompiledPipeline]:
+    """Return the cached compiled plan for a preprocessor, or None if it cannot be compiled"""
+    try:
+        return _compiled[preprocessor]
+    except (KeyError, TypeError):
+        pass
+    with _compiled_lock:
+        try:
+            plan = compile_pipeline(preprocessor)
+        except Exception as e:
+            logger.info(f"Using sklearn preprocessing path: {e}")
+            plan = None
+        try:
+            _compiled[preprocessor] = plan
+        except TypeError:
+            pass  # Not weak-referenceable; compile again next time
+    return plan
@@ -0,0 +1,122 @@
+import os
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class _Pending:
+    """A single queued request waiting for its row of a batch result"""
+    __slots__ = ('item', 'enqueued_at', 'done', 'result', 'error', 'batch_size', 'queue_delay_ms')
+
+    def __init__(self, item):
+        self.item = item
+        self.enqueued_at = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.batch_size = 0
+        self.queue_delay_ms = 0.0
+
+
+class MicroBatcher:
+    """
+    Coalesce concurrent single-item requests into batched calls
+
+    Callers block in submit() while a background thread collects queued items
+    until either max_batch_size items are waiting or the oldest item has
+    waited max_wait_ms, then scores them with one call to score_fn and hands
+    each caller its own result. If a batch fails, its items are retried one
+    by one so a single bad record cannot fail its neighbours.
+    """
+
+    def __init__(self, score_fn: Callable[[List[Any]], List[Any]],
+                 max_batch_size: int = 64, max_wait_ms: float = 5.0):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.score_fn = score_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._lock = threading.Lock()
+        self._queue = None
+        self._worker = None
+        self._pid = None
+
+    def _ensure_worker(self) -> queue.Queue:
+        # Threads do not survive fork (e.g. gunicorn --preload), so each
+        # process starts its own worker on first use.
+        if self._worker is None or self._pid != os.getpid():
+            with self._lock:
+                if self._worker is None or self._pid != os.getpid():
+                    self._queue = queue.Queue()
+                    self._pid = os.getpid()
+                    self._worker = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+                    self._worker.start()
+        return self._queue
+
+    def submit(self, item, timeout: Optional[float] = None) -> Tuple[Any, Dict[str, Any]]:
+        """
+        Queue an item and wait for its result
+
+        Args:
+            item: A single input accepted by score_fn
+            timeout (float, optional): Seconds to wait before giving up
+
+        Returns:
+            tuple: (result, metadata) where metadata holds batch_size and queue_delay_ms
+        """
+        pending = _Pending(item)
+        self._ensure_worker().put(pending)
+        if not pending.done.wait(timeout):
+            raise TimeoutError("Timed out waiting for batched prediction")
+        if pending.error is not None:
+            raise pending.error
+        return pending.result, {
+            'batch_size': pending.batch_size,
+            'queue_delay_ms': round(pending.queue_delay_ms, 3)
+        }
+
+    def _collect(self, q: queue.Queue) -> List[_Pending]:
+        batch = [q.get()]
+        deadline = batch[0].enqueued_at + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(q.get(timeout=remaining) if remaining > 0 else q.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        q = self._queue
+        while True:
+            batch = self._collect(q)
+            started = time.perf_counter()
+            for pending in batch:
+                pending.batch_size = len(batch)
+                pending.queue_delay_ms = (started - pending.enqueued_at) * 1000.0
+
+            try:
+                results = self.score_fn([p.item for p in batch])
+                if len(results) != len(batch):
+                    raise ValueError(f"score_fn returned {len(results)} results for {len(batch)} items")
+                for pending, result in zip(batch, results):
+                    pending.result = result
+            except Exception as e:
+                if len(batch) == 1:
+                    batch[0].error = e
+                else:
+                    logger.warning(f"Batch of {len(batch)} failed ({e}); scoring items individually")
+                    for pending in batch:
+                        try:
+                            pending.result = self.score_fn([pending.item])[0]
+                        except Exception as item_error:
+                            pending.error = item_error
+            finally:
+                for pending in batch:
+                    pending.done.set()
@@ -0,0 +1,310 @@
+import os
+import logging
+import hashlib
+import pathlib
+import threading
+import time
+from typing import Any, Callable, List, NamedTuple, Optional, Tuple
+
+import joblib
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MODELS_DIR = pathlib.Path(__file__).parent / 'models'
+PREPROCESSOR_FILE = 'preprocessor.pkl'
+
+# Serving model candidates in priority order
+MODEL_FILES = [
+    'fraud_detection_model.keras',
+    'fraud_detection_model.h5',
+    'fraud_detection_model.pkl'
+]
+
+
+class ModelArtifacts(NamedTuple):
+    """Immutable snapshot of the artifacts currently being served"""
+    preprocessor: Any
+    model: Any
+    model_type: str
+    model_path: pathlib.Path
+    version: str
+    loaded_at: float
+
+
+def file_sha256(path, chunk_size: int = 1 << 20) -> str:
+    """Compute the SHA-256 hex digest of a file without reading it into memory at once"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def resolve_model_path(models_dir=None) -> pathlib.Path:
+    """Return the first existing serving model file in priority order"""
+    models_dir = pathlib.Path(models_dir) if models_dir else MODELS_DIR
+    for name in MODEL_FILES:
+        model_path = models_dir / name
+        if model_path.exists():
+            return model_path
+    raise FileNotFoundError("No fraud_detection_model found with .keras, .h5 or .pkl extension")
+
+
+def load_preprocessor(preprocessor_path):
+    """Load the fitted preprocessor, unwrapping the artifacts dict written by save_preprocessor"""
+    preprocessor = joblib.load(preprocessor_path)
+    if isinstance(preprocessor, dict) and 'preprocessor' in preprocessor:
+        preprocessor = preprocessor['preprocessor']
+    return preprocessor
+
+
+def final_estimator(model):
+    """Return the last step of an (imblearn or sklearn) Pipeline, or the model itself
+
+    Training pickles whole preprocessor/SMOTE/classifier pipelines, but serving
+    feeds already-transformed features, so only the classifier is applied.
+    """
+    if hasattr(model, 'steps'):
+        return model.steps[-1][1]
+    return model
+
+
+def export_path_for(model_path) -> pathlib.Path:
+    """Location of the dependency-free export that may accompany a serving model file"""
+    model_path = pathlib.Path(model_path)
+    if model_path.suffix == '.pkl':
+        return model_path.with_name(model_path.stem + '.trees.npz')
+    return model_path.with_suffix('.npz')
+
+
+def load_model_file(model_path, model_sha256: Optional[str] = None) -> Tuple[Any, str]:
+    """
+    Load one model file, preferring its up-to-date dependency-free export
+
+    Args:
+        model_path: .keras, .h5 or .pkl model file
+        model_sha256 (str, optional): Precomputed hash of model_path
+
+    Returns:
+        tuple: (model, model_type) with model_type "numpy", "keras" or "sklearn"
+    """
+    model_path = pathlib.Path(model_path)
+
+    # Load model based on extension
+    if model_path.suffix in ['.keras', '.h5']:
+        # Prefer an up-to-date NumPy export of a Keras model: no TensorFlow needed
+        from numpy_model import load_exported_model
+        model = load_exported_model(model_path, model_sha256)
+        if model is not None:
+            logger.info(f"Loaded numpy export of {model_path}")
+            return model, "numpy"
+        from tensorflow.keras.models import load_model
+        model = load_model(model_path)
+        model_type = "keras"
+    elif model_path.suffix == '.pkl':
+        # Prefer an up-to-date tree export: no sklearn/xgboost unpickling needed
+        from tree_model import load_exported_trees
+        model = load_exported_trees(model_path, model_sha256)
+        if model is None:
+            model = final_estimator(joblib.load(model_path))
+        model_type = "sklearn"
+    else:
+        raise ValueError(f"Unsupported model format: {model_path.suffix}")
+
+    logger.info(f"Loaded {model_type} model from {model_path}")
+    return model, model_type
+
+
+def load_artifacts(preprocessor_path, model_path, model_sha256: Optional[str] = None) -> Tuple[Any, Any, str]:
+    """Load preprocessor and model from disk (supports NumPy exports, Keras and sklearn formats)"""
+    preprocessor = load_preprocessor(preprocessor_path)
+    model, model_type = load_model_file(model_path, model_sha256)
+    return preprocessor, model, model_type
+
+
+def publish_model(staged_path, models_dir=None) -> pathlib.Path:
+    """
+    Atomically install a staged model file as the serving model
+
+    The staged file is renamed over its final name so a running registry never
+    observes a half-written artifact, and serving models of other formats are
+    removed so the new one is not shadowed by a stale higher-priority file.
+
+    Args:
+        staged_path: Fully written model file in the models directory whose
+            suffix selects the final name (.keras, .h5 or .pkl)
+        models_dir: Directory holding the serving artifacts
+
+    Returns:
+        pathlib.Path: Final path of the published model
+    """
+    staged_path = pathlib.Path(staged_path)
+    models_dir = pathlib.Path(models_dir) if models_dir else MODELS_DIR
+    target = models_dir / f"fraud_detection_model{staged_path.suffix}"
+    if target.name not in MODEL_FILES:
+        raise ValueError(f"Unsupported model format: {staged_path.suffix}")
+
+    os.replace(staged_path, target)
+    for name in MODEL_FILES:
+        stale = models_dir / name
+        if stale != target and stale.exists():
+            stale.unlink()
+            logger.info(f"Removed superseded model {stale}")
+
+    logger.info(f"Published serving model {target}")
+    return target
+
+
+class ModelRegistry:
+    """
+    Thread-safe, process-wide holder of the serving preprocessor and model
+
+    Artifacts are loaded once and shared by every request. At most once per
+    check interval the artifact files are stat'ed; when their mtime or size
+    changes the content hash is recomputed and, if it differs, the new
+    artifacts are loaded and swapped in. Requests keep using the previous
+    snapshot while a reload is in progress, and a failed reload keeps the
+    last good artifacts in service.
+    """
+
+    def __init__(self, models_dir=None, check_interval: float = 2.0):
+        self.models_dir = pathlib.Path(models_dir) if models_dir else MODELS_DIR
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._artifacts: Optional[ModelArtifacts] = None
+        self._stat_key = None
+        self._hashes = None
+        self._last_check = 0.0
+        self._listeners: List[Callable[[ModelArtifacts], None]] = []
+
+    @property
+    def version(self) -> Optional[str]:
+        """Version string of the artifacts currently served, or None before the first load"""
+        artifacts = self._artifacts
+        return artifacts.version if artifacts else None
+
+    def add_listener(self, callback: Callable[[ModelArtifacts], None]) -> None:
+        """Register a callback invoked with the new artifacts after every swap"""
+        with self._lock:
+            self._listeners.append(callback)
+
+    def get(self) -> ModelArtifacts:
+        """Return the current artifacts, reloading them first if the files changed"""
+        artifacts = self._artifacts
+        if artifacts is not None and time.monotonic() - self._last_check < self.check_interval:
+            return artifacts
+
+        # Only the first caller blocks; later callers keep serving the current
+        # snapshot while another thread checks for (and loads) new artifacts.
+        if not self._lock.acquire(blocking=artifacts is None):
+            return artifacts
+        try:
+            self._refresh(force=False)
+        finally:
+            self._lock.release()
+        return self._artifacts
+
+    def reload(self, force: bool = False) -> bool:
+        """
+        Check the artifact files now instead of waiting for the check interval
+
+        Args:
+            force (bool): Reload even if the content hashes are unchanged
+
+        Returns:
+            bool: True if new artifacts were swapped in
+        """
+        with self._lock:
+            return self._refresh(force=force)
+
+    def _stat(self):
+        preprocessor_path = self.models_dir / PREPROCESSOR_FILE
+        model_path = resolve_model_path(self.models_dir)
+        watched = [preprocessor_path, model_path]
+
+        # An export appearing or changing next to the model is a change too
+        export_path = export_path_for(model_path)
+        if export_path.exists():
+            watched.append(export_path)
+
+        key = tuple(
+            (str(path), st.st_mtime_ns, st.st_size)
+            for path, st in ((p, os.stat(p)) for p in watched)
+        )
+        return watched, key
+
+    def _refresh(self, force: bool) -> bool:
+        """Reload artifacts if their files changed; caller must hold the lock"""
+        try:
+            watched, stat_key = self._stat()
+        except (FileNotFoundError, OSError) as e:
+            if self._artifacts is None:
+                raise
+            logger.error(f"Model artifacts unavailable, keeping current version: {e}")
+            self._last_check = time.monotonic()
+            return False
+
+        if not force and stat_key == self._stat_key:
+            self._last_check = time.monotonic()
+            return False
+
+        preprocessor_path, model_path = watched[0], watched[1]
+        hashes = tuple(file_sha256(path) for path in watched)
+        if not force and hashes == self._hashes:
+            # Touched or copied over with identical content
+            self._stat_key = stat_key
+            self._last_check = time.monotonic()
+            return False
+
+        try:
+            preprocessor, model, model_type = load_artifacts(preprocessor_path, model_path, hashes[1])
+        except Exception as e:
+            if self._artifacts is None:
+                raise
+            logger.error(f"Failed to reload model artifacts, keeping version {self._artifacts.version}: {e}")
+            self._last_check = time.monotonic()
+            return False
+
+        version = hashlib.sha256(''.join(hashes).encode()).hexdigest()[:12]
+        self._artifacts = ModelArtifacts(
+            preprocessor=preprocessor,
+            model=model,
+            model_type=model_type,
+            model_path=model_path,
+            version=version,
+            loaded_at=time.time()
+        )
+        self._stat_key = stat_key
+        self._hashes = hashes
+        self._last_check = time.monotonic()
+        logger.info(f"Model registry serving version {version} ({model_type})")
+
+        for callback in list(self._listeners):
+            try:
+                callback(self._artifacts)
+            except Exception as e:
+                logger.error(f"Model registry listener failed: {e}")
+        return True
+
+
+_registry: Optional[ModelRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> ModelRegistry:
+    """Return the process-wide model registry, creating it on first use"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                check_interval = 2.0
+                try:
+                    from data_preprocessing import load_config
+                    serving_config = load_config().get('serving', {}) or {}
+                    check_interval = float(serving_config.get('model_reload_interval', check_interval))
+                except Exception as e:
+                    logger.warning(f"Using default model registry settings: {e}")
+                _registry = ModelRegistry(check_interval=check_interval)
+    return _registry
@@ -7,12 +7,10 @@ import yaml
 import numpy as np
 import pandas as pd
 import joblib
-import tensorflow as tf
 import warnings
 import pathlib
 from typing import Dict, List, Tuple, Any, Optional, Union
 import shutil
-from tensorflow.keras.models import load_model
 
 # Suppress warnings
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
@@ -32,6 +30,9 @@ logger = logging.getLogger(__name__)
 # Import preprocessing functions
 try:
     from data_preprocessing import load_raw_data, feature_engineering
+    from model_registry import publish_model, file_sha256
+    from numpy_model import export_keras_model
+    from tree_model import export_model_file
 except ImportError as e:
     logger.error(f"Could not import preprocessing functions: {e}")
     sys.exit(1)
@@ -50,18 +51,8 @@ from sklearn.metrics import (
 )
 from sklearn.inspection import permutation_importance
 
-# XGBoost imports
-from xgboost import XGBClassifier
-
-# Keras imports
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import Dense, Dropout, BatchNormalization
-from tensorflow.keras.optimizers import Adam
-from tensorflow.keras.callbacks import EarlyStopping
-
-# Imbalanced learning imports
-from imblearn.pipeline import Pipeline
-from imblearn.over_sampling import SMOTE
+# XGBoost, Keras and imbalanced-learn are imported where they are used, so
+# importing this module (e.g. from the test suite) does not load TensorFlow
 
 def load_config(config_path: str = 'config.yaml') -> dict:
     # Replace with a centralized config loader
@@ -151,7 +142,7 @@ def load_preprocessed_data() -> typing.Tuple[pd.DataFrame, np.ndarray]:
         logger.error(f"Error in data loading and preprocessing: {e}")
         raise
 
-def create_model_pipeline(model_type: str) -> Pipeline:
+def create_model_pipeline(model_type: str) -> 'Pipeline':
     """
     Create a unified training pipeline with preprocessing and model.
     
@@ -161,6 +152,9 @@ def create_model_pipeline(model_type: str) -> Pipeline:
     Returns:
     - Pipeline: Preprocessing and model training pipeline
     """
+    from imblearn.pipeline import Pipeline
+    from imblearn.over_sampling import SMOTE
+
     try:
         base_dir = pathlib.Path(__file__).parent
         artifacts_path = base_dir / 'models' / 'preprocessor.pkl'
@@ -214,6 +208,8 @@ def create_model(model_type: str):
             )
         
         if model_type == 'xgboost':
+            from xgboost import XGBClassifier
+
             xgb_config = CONFIG.get('xgboost', {})
             return XGBClassifier(
                 max_depth=xgb_config.get('max_depth', 7),
@@ -226,6 +222,11 @@ def create_model(model_type: str):
             )
         
         if model_type == 'neural_network':
+            import tensorflow as tf
+            from tensorflow.keras.models import Sequential
+            from tensorflow.keras.layers import Dense, Dropout, BatchNormalization
+            from tensorflow.keras.optimizers import Adam
+
             nn_config = CONFIG.get('neural_network', {})
             model = Sequential()
             
@@ -360,6 +361,8 @@ def train_and_evaluate() -> Dict[str, Any]:
                 # Training logic with model-specific handling
                 if model_type == 'neural_network':
                     # Fix neural network training
+                    from tensorflow.keras.callbacks import EarlyStopping
+
                     nn_config = CONFIG.get('neural_network', {})
                     early_stop = EarlyStopping(
                         monitor='val_auc',
@@ -438,6 +441,10 @@ def train_and_evaluate() -> Dict[str, Any]:
 
                 else:
                     joblib.dump(pipeline, model_dir / 'model.pkl')
+                    try:
+                        export_model_file(model_dir / 'model.pkl', pipeline)
+                    except Exception as export_error:
+                        logger.warning(f"Tree export skipped for {model_type}: {export_error}")
 
                 # Perform model interpretation
                 perform_model_interpretation(
@@ -492,18 +499,39 @@ def main():
         
         # Save best model separately
         # In the best model saving section:
+        # Models are staged under a temporary name and then published atomically,
+        # so a running API server hot-swaps to them without a restart.
         if best_model_info:
-            best_model_path = models_dir / 'fraud_detection_model.keras'  # Changed extension
-            
             if best_model_info['type'] == 'neural_network':
                 # Use native Keras format
+                from tensorflow.keras.models import load_model
+
+                staged_path = models_dir / 'fraud_detection_model.staging.keras'
                 best_model = load_model(best_model_info['path'])
-                best_model.save(best_model_path)  # Save as .keras format
+                best_model.save(staged_path)  # Save as .keras format
+                
+                # Export the TensorFlow-free NumPy engine before publishing so the
+                # server sees the model and its export together
+                try:
+                    export_keras_model(
+                        best_model,
+                        models_dir / 'fraud_detection_model.npz',
+                        source_sha256=file_sha256(staged_path)
+                    )
+                except Exception as export_error:
+                    logger.warning(f"NumPy export skipped, serving will use Keras: {export_error}")
             else:
                 # For sklearn models, keep .pkl but use correct path
-                best_model_path = models_dir / 'fraud_detection_model.pkl'
-                shutil.copy(best_model_info['path'], best_model_path)
+                staged_path = models_dir / 'fraud_detection_model.staging.pkl'
+                shutil.copy(best_model_info['path'], staged_path)
+
+                # The copy is byte-identical, so the tree export made during
+                # training stays valid for the published model
+                trees_path = best_model_info['path'].with_name('model.trees.npz')
+                if trees_path.exists():
+                    shutil.copy(trees_path, models_dir / 'fraud_detection_model.trees.npz')
             
+            best_model_path = publish_model(staged_path, models_dir)
             logger.info(f"Best model ({best_model_info['type']}) saved to {best_model_path}")
         
         # Print results
@@ -0,0 +1,213 @@
+import os
+import sys
+import logging
+import pathlib
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from model_registry import MODELS_DIR, export_path_for, file_sha256
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+ACTIVATIONS = {
+    'linear': lambda z: z,
+    'relu': lambda z: np.maximum(z, 0, out=z),
+    'sigmoid': lambda z: np.reciprocal(1 + np.exp(-z, out=z), out=z),
+    'tanh': lambda z: np.tanh(z, out=z),
+}
+
+
+def fold_keras_model(model) -> List[Tuple[np.ndarray, np.ndarray, str]]:
+    """
+    Reduce a Sequential Dense/BatchNormalization/Dropout model to plain affine layers
+
+    Dropout is the identity at inference time and is dropped. Each
+    BatchNormalization is an affine map x * a + c with a = gamma / sqrt(var + eps)
+    and c = beta - mean * a; it is folded into the preceding Dense when that
+    layer is linear, otherwise into the weights of the following Dense.
+
+    Args:
+        model: Trained Keras model
+
+    Returns:
+        list: (weights, bias, activation) per Dense layer, in float64
+    """
+    layers = []
+    pending = None  # (a, c) affine map waiting to be folded into the next Dense
+
+    for layer in model.layers:
+        kind = layer.__class__.__name__
+        if kind in ('InputLayer', 'Dropout'):
+            continue
+
+        if kind == 'Dense':
+            weights = layer.get_weights()
+            kernel = np.asarray(weights[0], dtype=np.float64)
+            bias = np.asarray(weights[1], dtype=np.float64) if layer.use_bias else np.zeros(kernel.shape[1])
+            activation = layer.get_config()['activation']
+            if not isinstance(activation, str) or activation not in ACTIVATIONS:
+                raise ValueError(f"Unsupported activation in layer {layer.name}: {activation}")
+            if pending is not None:
+                a, c = pending
+                bias = bias + c @ kernel
+                kernel = a[:, None] * kernel
+                pending = None
+            layers.append((kernel, bias, activation))
+
+        elif kind == 'BatchNormalization':
+            mean = np.asarray(layer.moving_mean, dtype=np.float64)
+            variance = np.asarray(layer.moving_variance, dtype=np.float64)
+            gamma = np.asarray(layer.gamma, dtype=np.float64) if layer.scale else np.ones_like(mean)
+            beta = np.asarray(layer.beta, dtype=np.float64) if layer.center else np.zeros_like(mean)
+            a = gamma / np.sqrt(variance + layer.epsilon)
+            c = beta - mean * a
+            if pending is not None:
+                pending = (pending[0] * a, pending[1] * a + c)
+            elif layers and layers[-1][2] == 'linear':
+                kernel, bias, activation = layers[-1]
+                layers[-1] = (kernel * a[None, :], bias * a + c, activation)
+            else:
+                pending = (a, c)
+
+        else:
+            raise ValueError(f"Unsupported layer type for NumPy export: {kind}")
+
+    if pending is not None:
+        raise ValueError("Trailing BatchNormalization without a following Dense layer is not supported")
+    if not layers:
+        raise ValueError("Model has no Dense layers")
+    return layers
+
+
+class NumpyModel:
+    """TensorFlow-free float32 forward pass over exported Dense layers"""
+
+    def __init__(self, layers: List[Tuple[np.ndarray, np.ndarray, str]], source_sha256: Optional[str] = None):
+        self.layers = [
+            (np.ascontiguousarray(w, dtype=np.float32), np.ascontiguousarray(b, dtype=np.float32), act)
+            for w, b, act in layers
+        ]
+        self.source_sha256 = source_sha256
+        self.n_features = self.layers[0][0].shape[0]
+
+    def predict(self, X, verbose=0) -> np.ndarray:
+        """Return fraud probabilities with shape (n_rows, 1), mirroring keras Model.predict"""
+        h = np.asarray(X, dtype=np.float32)
+        if h.ndim == 1:
+            h = h.reshape(1, -1)
+        with np.errstate(over='ignore'):
+            for weights, bias, activation in self.layers:
+                h = h @ weights
+                h += bias
+                h = ACTIVATIONS[activation](h)
+        return h
+
+    def save(self, path) -> pathlib.Path:
+        """Write the layers to a compressed .npz, atomically replacing any previous export"""
+        path = pathlib.Path(path)
+        arrays = {'format_version': np.asarray(FORMAT_VERSION),
+                  'activations': np.asarray([act for _, _, act in self.layers]),
+                  'source_sha256': np.asarray(self.source_sha256 or '')}
+        for i, (weights, bias, _) in enumerate(self.layers):
+            arrays[f'W{i}'] = weights
+            arrays[f'b{i}'] = bias
+
+        staged = path.with_name(path.stem + '.staging.npz')
+        np.savez_compressed(staged, **arrays)
+        os.replace(staged, path)
+        return path
+
+    @classmethod
+    def load(cls, path) -> 'NumpyModel':
+        """Load an export written by save()"""
+        with np.load(path, allow_pickle=False) as data:
+            if int(data['format_version']) != FORMAT_VERSION:
+                raise ValueError(f"Unsupported export format version {int(data['format_version'])}")
+            activations = [str(a) for a in data['activations']]
+            layers = [(data[f'W{i}'], data[f'b{i}'], act) for i, act in enumerate(activations)]
+            source_sha256 = str(data['source_sha256']) or None
+        return cls(layers, source_sha256=source_sha256)
+
+
+def export_keras_model(model, path, source_sha256: Optional[str] = None,
+                       probe: Optional[np.ndarray] = None, tolerance: float = 1e-5) -> NumpyModel:
+    """
+    Export a Keras model to .npz after checking the NumPy engine reproduces it
+
+    Args:
+        model: Trained Keras model
+        path: Destination .npz file
+        source_sha256 (str, optional): Hash of the Keras file the export was made from,
+            used by the registry to ignore stale exports
+        probe (np.ndarray, optional): Inputs for the parity check; random
+            standardized rows are used when omitted
+        tolerance (float): Maximum absolute probability difference allowed
+
+    Returns:
+        NumpyModel: The exported engine
+
+    Raises:
+        ValueError: If the model cannot be folded or the parity check fails
+    """
+    engine = NumpyModel(fold_keras_model(model), source_sha256=source_sha256)
+    if probe is None:
+        probe = np.random.default_rng(0).standard_normal((256, engine.n_features))
+
+    expected = np.asarray(model.predict(probe, verbose=0), dtype=np.float64)
+    actual = engine.predict(probe).astype(np.float64)
+    max_diff = float(np.max(np.abs(expected - actual)))
+    if max_diff > tolerance:
+        raise ValueError(f"NumPy export differs from Keras output by {max_diff:.2e} (tolerance {tolerance:.0e})")
+
+    engine.save(path)
+    logger.info(f"Exported NumPy model to {path} (max abs diff {max_diff:.2e})")
+    return engine
+
+
+def load_exported_model(model_path, model_sha256: Optional[str] = None) -> Optional[NumpyModel]:
+    """
+    Load the NumPy export of a Keras model file if one exists and is up to date
+
+    Args:
+        model_path: Path to the .keras or .h5 model
+        model_sha256 (str, optional): Precomputed hash of model_path
+
+    Returns:
+        NumpyModel or None: The export, or None if missing, stale or unreadable
+    """
+    export_path = export_path_for(model_path)
+    if not export_path.exists():
+        return None
+    try:
+        engine = NumpyModel.load(export_path)
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable NumPy export {export_path}: {e}")
+        return None
+
+    if model_sha256 is None:
+        model_sha256 = file_sha256(model_path)
+    if engine.source_sha256 != model_sha256:
+        logger.warning(f"Ignoring stale NumPy export {export_path}; it was made from a different model file")
+        return None
+    return engine
+
+
+def main():
+    """Export models/fraud_detection_model.keras (or the given file) to NumPy"""
+    try:
+        from tensorflow.keras.models import load_model
+
+        model_path = pathlib.Path(sys.argv[1]) if len(sys.argv) > 1 else MODELS_DIR / 'fraud_detection_model.keras'
+        model = load_model(model_path)
+        export_keras_model(model, export_path_for(model_path), source_sha256=file_sha256(model_path))
+        return 0
+    except Exception as e:
+        logger.error(f"Export failed: {e}")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
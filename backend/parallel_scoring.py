@@ -0,0 +1,257 @@
+import io
+import os
+import atexit
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from data_preprocessing import load_config
+from ensemble import ENSEMBLE_MEMBERS, EnsembleResult
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Output columns: one probability per ensemble member, then the combined probability
+OUTPUT_COLUMNS = list(ENSEMBLE_MEMBERS) + ['ensemble']
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    # Workers share the parent's resource tracker (spawn, fork and forkserver
+    # all pass it on), so attaching registers nothing new and only the
+    # parent's unlink() releases the segment
+    return shared_memory.SharedMemory(name=name)
+
+
+def _init_worker():
+    """Load the preprocessor and ensemble once per worker process"""
+    try:
+        # One BLAS/OpenMP thread per process: the pool is the parallelism
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(1)
+    except ImportError:
+        pass
+    from model_registry import get_registry
+    from ensemble import get_ensemble
+    from feature_pipeline import get_compiled_pipeline
+
+    get_compiled_pipeline(get_registry().get().preprocessor)
+    get_ensemble()
+    logger.info(f"Scoring worker {os.getpid()} ready")
+
+
+def _score_partition(task: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Score rows [row_start, row_start + n_rows) of the shared CSV into the shared output matrix
+
+    Runs in a worker process. Only the task description (names and offsets)
+    and a small summary are pickled; rows and probabilities stay in shared memory.
+    """
+    from batch_scoring import ChunkScorer
+    from csv_repair import repair_chunk
+    from simple_inference import validate_frame
+
+    source = _attach(task['input'])
+    target = _attach(task['output'])
+    try:
+        header = bytes(source.buf[:task['header_end']])
+        body = bytes(source.buf[task['byte_start']:task['byte_end']])
+        chunk = pd.read_csv(io.BytesIO(header + body), dtype=str)
+        if len(chunk) != task['n_rows']:
+            raise ValueError(f"Expected {task['n_rows']} rows but parsed {len(chunk)}; "
+                             "quoted newlines are not supported by parallel scoring")
+
+        scorer = ChunkScorer()
+        if scorer.repair:
+            chunk, _ = repair_chunk(chunk)
+        validated, errors = validate_frame(chunk)
+        valid = (errors == '').to_numpy()
+        summary = {
+            'row_errors': {task['row_start'] + int(i): errors.iloc[i] for i in np.flatnonzero(~valid)},
+            'names': None, 'strategy': None, 'threshold': None, 'errors': {}
+        }
+        block = np.full((task['n_rows'], len(OUTPUT_COLUMNS)), np.nan, dtype=np.float32)
+        if valid.any():
+            result = scorer.ensemble.score(scorer.transform(validated[valid]))
+            for name in result.names:
+                block[valid, OUTPUT_COLUMNS.index(name)] = result.member(name)
+            block[valid, -1] = result.combined
+            summary.update(names=result.names, strategy=result.strategy,
+                           threshold=result.threshold, errors=result.errors)
+
+        out = np.ndarray((task['total_rows'], len(OUTPUT_COLUMNS)), dtype=np.float32, buffer=target.buf)
+        out[task['row_start']:task['row_start'] + task['n_rows']] = block
+        # The view must be released before the segment can be closed
+        del out
+        return summary
+    finally:
+        source.close()
+        target.close()
+
+
+def partition_rows(buf: memoryview, partitions: int) -> Tuple[int, List[Tuple[int, int, int, int]]]:
+    """
+    Split CSV bytes into about `partitions` slices of whole lines
+
+    Returns:
+        tuple: (header_end, [(row_start, n_rows, byte_start, byte_end), ...])
+    """
+    data = np.frombuffer(buf, dtype=np.uint8)
+    size = len(data)
+    while size and data[size - 1] in (10, 13):
+        size -= 1
+    newlines = np.flatnonzero(data[:size] == 10)
+    if len(newlines) == 0:
+        return size, []
+    header_end = int(newlines[0]) + 1
+    # End offset (exclusive) of every data row
+    row_ends = np.append(newlines[1:] + 1, size)
+    total = len(row_ends)
+
+    bounds = np.linspace(0, total, min(partitions, total) + 1).astype(int)
+    slices = []
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        byte_start = header_end if start == 0 else int(row_ends[start - 1])
+        slices.append((int(start), int(stop - start), byte_start, int(row_ends[stop - 1])))
+    return header_end, slices
+
+
+class ParallelScorer:
+    """
+    Score a batch CSV across a pool of worker processes
+
+    Workers load the preprocessor and ensemble once when they start. The CSV
+    bytes are copied into one shared memory block and every worker parses,
+    validates, transforms and scores its own slice of lines, writing member
+    and combined probabilities into a shared float32 output matrix at its
+    row offset, so results come back in input order without pickling rows.
+
+    Batches smaller than min_rows are not worth the partitioning overhead;
+    callers should score them in-process.
+    """
+
+    def __init__(self, workers: int, partitions_per_worker: int = 2, start_method: str = 'spawn',
+                 min_rows: int = 0):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.workers = workers
+        self.min_rows = min_rows
+        self.partitions_per_worker = partitions_per_worker
+        self.start_method = start_method
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        # Pools do not survive fork, so each worker process creates its own
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context(self.start_method),
+                        initializer=_init_worker
+                    )
+                    self._pid = os.getpid()
+        return self._executor
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def score_csv(self, path) -> Tuple[EnsembleResult, Dict[int, str]]:
+        """
+        Score every row of a CSV file
+
+        Args:
+            path: CSV file with a header row
+
+        Returns:
+            tuple: (EnsembleResult over all rows, {row index: validation error}).
+                Rows with an error have NaN probabilities
+
+        Raises:
+            RuntimeError: If partitions were scored by different member sets
+                (a model failed or was swapped mid-batch)
+        """
+        size = os.path.getsize(path)
+        source = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        target = None
+        try:
+            with open(path, 'rb') as f:
+                f.readinto(source.buf[:size])
+            header_end, slices = partition_rows(source.buf[:size], self.workers * self.partitions_per_worker)
+            total = sum(n_rows for _, n_rows, _, _ in slices)
+            target = shared_memory.SharedMemory(create=True, size=max(total * len(OUTPUT_COLUMNS) * 4, 1))
+
+            tasks = [{
+                'input': source.name, 'output': target.name, 'header_end': header_end,
+                'row_start': row_start, 'n_rows': n_rows, 'byte_start': byte_start, 'byte_end': byte_end,
+                'total_rows': total
+            } for row_start, n_rows, byte_start, byte_end in slices]
+            summaries = list(self._pool().map(_score_partition, tasks))
+
+            out = np.ndarray((total, len(OUTPUT_COLUMNS)), dtype=np.float32, buffer=target.buf).copy()
+            return self._assemble(out, summaries)
+        finally:
+            for shm in (source, target):
+                if shm is not None:
+                    shm.close()
+                    shm.unlink()
+
+    @staticmethod
+    def _assemble(out: np.ndarray, summaries: List[Dict[str, Any]]) -> Tuple[EnsembleResult, Dict[int, str]]:
+        row_errors, member_errors = {}, {}
+        scored = [s for s in summaries if s['names'] is not None]
+        for summary in summaries:
+            row_errors.update(summary['row_errors'])
+            member_errors.update(summary['errors'])
+        if not scored:
+            raise RuntimeError("No row of the batch could be scored")
+        names = scored[0]['names']
+        if any(s['names'] != names for s in scored):
+            raise RuntimeError("Partitions were scored by different ensemble members")
+
+        columns = [OUTPUT_COLUMNS.index(name) for name in names]
+        result = EnsembleResult(names, out[:, columns], out[:, -1].astype(np.float64),
+                                scored[0]['strategy'], scored[0]['threshold'], member_errors)
+        return result, row_errors
+
+
+_scorer: Optional[ParallelScorer] = None
+_scorer_lock = threading.Lock()
+
+
+def parallel_settings() -> Dict[str, Any]:
+    batch_config = (load_config().get('serving', {}) or {}).get('batch', {}) or {}
+    return batch_config.get('parallel', {}) or {}
+
+
+def get_parallel_scorer() -> Optional[ParallelScorer]:
+    """Return the shared process pool, or None when serving.batch.parallel.workers is below 2"""
+    global _scorer
+    if _scorer is None:
+        with _scorer_lock:
+            if _scorer is None:
+                settings = parallel_settings()
+                workers = int(settings.get('workers', 0) or 0)
+                if workers < 2:
+                    _scorer = False
+                else:
+                    _scorer = ParallelScorer(
+                        workers,
+                        partitions_per_worker=int(settings.get('partitions_per_worker', 2)),
+                        start_method=settings.get('start_method', 'spawn'),
+                        min_rows=int(settings.get('min_rows', 5000))
+                    )
+                    atexit.register(_scorer.shutdown)
+                    logger.info(f"Parallel batch scoring enabled with {workers} worker processes")
+    return _scorer or None
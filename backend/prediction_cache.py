@@ -0,0 +1,272 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import pathlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_SQLITE_PATH = pathlib.Path(__file__).parent / 'cache' / 'prediction_cache.sqlite'
+
+# Keeps "WHERE key IN (...)" below SQLite's default host parameter limit
+SQLITE_CHUNK = 500
+
+
+def row_keys(X: np.ndarray, version: str) -> List[str]:
+    """
+    Content-address each preprocessed feature row for one model version
+
+    Rows are hashed as canonical float64 bytes (with -0.0 folded into 0.0),
+    so replayed clicks that engineer to the same features share a key even
+    if their raw JSON differed in irrelevant ways.
+
+    Args:
+        X (np.ndarray): Preprocessed feature matrix, one row per record
+        version (str): Version of the serving artifacts that will score the rows
+
+    Returns:
+        list: Hex digest per row
+    """
+    X = np.ascontiguousarray(X, dtype=np.float64) + 0.0
+    prefix = version.encode() + b'\0'
+    return [hashlib.blake2b(prefix + row.tobytes(), digest_size=16).hexdigest() for row in X]
+
+
+class MemoryCacheBackend:
+    """Per-process LRU cache with a time-to-live on every entry"""
+
+    def __init__(self, max_entries: int = 100000, ttl: float = 300.0):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: 'OrderedDict[str, Tuple[float, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[Any]]:
+        """Return the cached value per key, or None for misses and expired entries"""
+        now = time.monotonic()
+        values = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] <= now:
+                    del self._entries[key]
+                    self._stats['expirations'] += 1
+                    entry = None
+                if entry is None:
+                    self._stats['misses'] += 1
+                    values.append(None)
+                else:
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    values.append(entry[1])
+        return values
+
+    def put_many(self, items: Iterable[Tuple[str, Any]]) -> None:
+        """Store values, evicting least recently used entries beyond max_entries"""
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            for key, value in items:
+                self._entries[key] = (expires_at, value)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats, size=len(self._entries))
+        stats.update(backend='memory', max_entries=self.max_entries, ttl=self.ttl)
+        return stats
+
+
+class SqliteCacheBackend:
+    """
+    LRU/TTL cache in a SQLite file shared by every worker process
+
+    The database runs in WAL mode so readers do not block the writer. Each
+    thread of each process gets its own connection. Entries past max_entries
+    are evicted by last use every prune_every writes rather than on every
+    write, so the table may briefly exceed the limit. Hit/miss counters are
+    per process; size is shared.
+    """
+
+    def __init__(self, path=None, max_entries: int = 100000, ttl: float = 300.0, prune_every: int = 64):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.path = pathlib.Path(path) if path else DEFAULT_SQLITE_PATH
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.prune_every = prune_every
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(str(self.path), timeout=5.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS predictions ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, last_used REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS predictions_last_used ON predictions (last_used)')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _count(self, key: str, n: int = 1):
+        with self._lock:
+            self._stats[key] += n
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[Any]]:
+        """Return the cached value per key, or None for misses and expired entries"""
+        conn = self._connection()
+        now = time.time()
+        found, expired = {}, []
+        for start in range(0, len(keys), SQLITE_CHUNK):
+            chunk = list(keys[start:start + SQLITE_CHUNK])
+            placeholders = ','.join('?' * len(chunk))
+            for key, value, expires_at in conn.execute(
+                    f'SELECT key, value, expires_at FROM predictions WHERE key IN ({placeholders})', chunk):
+                if expires_at <= now:
+                    expired.append(key)
+                else:
+                    found[key] = json.loads(value)
+
+        hit_keys = list(found)
+        for start in range(0, len(hit_keys), SQLITE_CHUNK):
+            chunk = hit_keys[start:start + SQLITE_CHUNK]
+            conn.execute(f"UPDATE predictions SET last_used = ? WHERE key IN ({','.join('?' * len(chunk))})",
+                         [now] + chunk)
+        for start in range(0, len(expired), SQLITE_CHUNK):
+            chunk = expired[start:start + SQLITE_CHUNK]
+            conn.execute(f"DELETE FROM predictions WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+
+        values = [found.get(key) for key in keys]
+        hits = sum(value is not None for value in values)
+        self._count('hits', hits)
+        self._count('misses', len(values) - hits)
+        if expired:
+            self._count('expirations', len(expired))
+        return values
+
+    def put_many(self, items: Iterable[Tuple[str, Any]]) -> None:
+        """Store values; every prune_every writes, evict expired and least recently used entries"""
+        now = time.time()
+        rows = [(key, json.dumps(value), now + self.ttl, now) for key, value in items]
+        if not rows:
+            return
+        conn = self._connection()
+        conn.executemany('INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?)', rows)
+
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % self.prune_every == 0 or len(rows) >= self.prune_every
+        if prune:
+            self._prune(conn, now)
+
+    def _prune(self, conn: sqlite3.Connection, now: float):
+        expired = conn.execute('DELETE FROM predictions WHERE expires_at <= ?', (now,)).rowcount
+        excess = conn.execute('SELECT COUNT(*) FROM predictions').fetchone()[0] - self.max_entries
+        evicted = 0
+        if excess > 0:
+            evicted = conn.execute(
+                'DELETE FROM predictions WHERE key IN '
+                '(SELECT key FROM predictions ORDER BY last_used LIMIT ?)', (excess,)
+            ).rowcount
+        self._count('expirations', max(expired, 0))
+        self._count('evictions', max(evicted, 0))
+
+    def clear(self) -> None:
+        self._connection().execute('DELETE FROM predictions')
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats['size'] = self._connection().execute('SELECT COUNT(*) FROM predictions').fetchone()[0]
+        stats.update(backend='sqlite', max_entries=self.max_entries, ttl=self.ttl, path=str(self.path))
+        return stats
+
+
+class PredictionCache:
+    """
+    Cache of (fraud_probability, is_fraud) per preprocessed feature row and model version
+
+    Keys embed the model version, so a model swap can never serve a stale
+    prediction; attach_to_registry() additionally clears the cache on every
+    swap so entries of the old model do not linger until they expire.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def lookup(self, X: np.ndarray, version: str) -> Tuple[List[str], List[Optional[Tuple[float, bool]]]]:
+        """Return (keys, cached) for the rows of X, where cached[i] is None on a miss"""
+        keys = row_keys(X, version)
+        return keys, self.backend.get_many(keys)
+
+    def store(self, keys: Sequence[str], fraud_probs: Sequence[float], is_fraud: Sequence[bool]) -> None:
+        self.backend.put_many((key, (float(p), bool(f))) for key, p, f in zip(keys, fraud_probs, is_fraud))
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.backend.stats()
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
+
+    def attach_to_registry(self, registry) -> None:
+        """Clear the cache whenever the registry swaps in new artifacts"""
+        def on_swap(artifacts):
+            self.clear()
+            logger.info(f"Prediction cache cleared for model version {artifacts.version}")
+        registry.add_listener(on_swap)
+
+
+def create_prediction_cache(settings: Dict[str, Any]) -> PredictionCache:
+    """
+    Build a cache from the serving.prediction_cache section of config.yaml
+
+    Args:
+        settings (dict): backend ('memory' or 'sqlite'), max_entries, ttl_s and,
+            for sqlite, path relative to the backend directory
+
+    Returns:
+        PredictionCache: Cache over the selected backend
+    """
+    backend_name = settings.get('backend', 'memory')
+    max_entries = int(settings.get('max_entries', 100000))
+    ttl = float(settings.get('ttl_s', 300))
+    if backend_name == 'memory':
+        backend = MemoryCacheBackend(max_entries=max_entries, ttl=ttl)
+    elif backend_name == 'sqlite':
+        path = settings.get('path')
+        if path and not os.path.isabs(path):
+            path = pathlib.Path(__file__).parent / path
+        backend = SqliteCacheBackend(path, max_entries=max_entries, ttl=ttl)
+    else:
+        raise ValueError(f"Unsupported prediction cache backend: {backend_name}")
+    return PredictionCache(backend)
@@ -0,0 +1,331 @@
+import os
+import json
+import gzip
+import shutil
+import logging
+import pathlib
+import queue
+import threading
+import time
+import atexit
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: rely on O_APPEND atomicity alone
+    fcntl = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LOG_DIR = pathlib.Path(__file__).parent / 'logs'
+DEFAULT_LOG_FILE = LOG_DIR / 'predictions.log.json'
+QUEUE_FULL_POLICIES = ('drop', 'block')
+
+
+class _Flush:
+    """Queue marker acknowledged once every line queued before it is on disk"""
+    __slots__ = ('done',)
+
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class PredictionLogWriter:
+    """
+    Background JSON-lines sink for prediction log entries
+
+    write() only serializes the entry and puts the line on a bounded queue; a
+    daemon thread drains the queue and appends whatever has accumulated (up to
+    batch_size lines) with a single write on an O_APPEND descriptor, so request
+    threads never wait on the disk and lines from several processes never
+    interleave mid-line.
+
+    The active file is rotated when the next batch would push it past
+    max_bytes or when its last write falls in an earlier rotate_interval
+    window. Rotation happens under an exclusive lock on a sibling .lock file
+    (when fcntl is available), and every process reopens the log once it
+    notices the file was renamed, so gunicorn workers can share one log.
+    Rotated segments are optionally gzip-compressed and pruned to
+    backup_count.
+
+    When the queue is full, the 'drop' policy discards the entry and counts
+    it; the 'block' policy waits up to block_timeout seconds before dropping.
+    """
+
+    def __init__(self, path=None, max_queue_size: int = 10000, batch_size: int = 256,
+                 flush_interval: float = 0.2, max_bytes: Optional[int] = 50 * 1024 * 1024,
+                 rotate_interval: Optional[float] = 86400, compress: bool = True,
+                 backup_count: int = 0, use_lock: bool = True,
+                 queue_full_policy: str = 'drop', block_timeout: float = 1.0):
+        if queue_full_policy not in QUEUE_FULL_POLICIES:
+            raise ValueError(f"queue_full_policy must be one of {QUEUE_FULL_POLICIES}, got {queue_full_policy!r}")
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.path = pathlib.Path(path) if path else DEFAULT_LOG_FILE
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes or None
+        self.rotate_interval = rotate_interval or None
+        self.compress = compress
+        self.backup_count = backup_count
+        self.use_lock = use_lock and fcntl is not None
+        self.queue_full_policy = queue_full_policy
+        self.block_timeout = block_timeout
+
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._queue = None
+        self._worker = None
+        self._pid = None
+        self._closed = False
+        self._fd = None
+        self._lock_fd = None
+        self._stats = {'written': 0, 'dropped': 0, 'batches': 0, 'rotations': 0, 'errors': 0}
+
+    def _ensure_worker(self) -> queue.Queue:
+        # Threads and descriptors are not shared across fork, so each
+        # process starts its own worker and opens its own files on first use.
+        if self._worker is None or self._pid != os.getpid():
+            with self._lock:
+                if self._worker is None or self._pid != os.getpid():
+                    self._queue = queue.Queue(maxsize=self.max_queue_size)
+                    self._pid = os.getpid()
+                    self._fd = None
+                    self._lock_fd = None
+                    self._worker = threading.Thread(target=self._run, name='prediction-log', daemon=True)
+                    self._worker.start()
+        return self._queue
+
+    def _count(self, key: str, n: int = 1):
+        with self._stats_lock:
+            self._stats[key] += n
+
+    def write(self, entry: Dict[str, Any]) -> bool:
+        """
+        Queue a log entry without touching the disk
+
+        Args:
+            entry (dict): JSON-serializable log entry; values json cannot encode are stringified
+
+        Returns:
+            bool: False if the entry was dropped because the queue was full or the writer is closed
+        """
+        if self._closed:
+            self._count('dropped')
+            return False
+        line = json.dumps(entry, default=str) + '\n'
+        q = self._ensure_worker()
+        try:
+            if self.queue_full_policy == 'block':
+                q.put(line, timeout=self.block_timeout)
+            else:
+                q.put_nowait(line)
+            return True
+        except queue.Full:
+            self._count('dropped')
+            dropped = self._stats['dropped']
+            if dropped == 1 or dropped % 1000 == 0:
+                logger.warning(f"Prediction log queue full, {dropped} entries dropped so far")
+            return False
+
+    def flush(self, timeout: Optional[float] = 5.0) -> bool:
+        """Wait until every entry queued so far has been written; returns False on timeout"""
+        if self._worker is None or self._pid != os.getpid() or not self._worker.is_alive():
+            return True
+        marker = _Flush()
+        try:
+            self._queue.put(marker, timeout=timeout)
+        except queue.Full:
+            return False
+        return marker.done.wait(timeout)
+
+    def close(self, timeout: Optional[float] = 5.0):
+        """Flush pending entries and stop accepting new ones"""
+        self.flush(timeout)
+        self._closed = True
+
+    def stats(self) -> Dict[str, int]:
+        """Return counters for written, dropped and failed entries plus the current queue depth"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['queued'] = self._queue.qsize() if self._queue is not None else 0
+        return stats
+
+    def _collect(self, q: queue.Queue) -> List[Any]:
+        # Block for the first item, then take whatever else is already queued:
+        # under load batches grow on their own, when idle lines go out at once.
+        items = [q.get()]
+        while len(items) < self.batch_size:
+            try:
+                items.append(q.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def _run(self):
+        q = self._queue
+        while True:
+            items = self._collect(q)
+            lines = [item for item in items if not isinstance(item, _Flush)]
+            if lines:
+                data = ''.join(lines).encode('utf-8')
+                try:
+                    self._append(data)
+                    self._count('written', len(lines))
+                    self._count('batches')
+                except Exception as e:
+                    self._count('errors', len(lines))
+                    logger.error(f"Failed to write {len(lines)} prediction log entries: {e}")
+                    self._close_fd()
+            for item in items:
+                if isinstance(item, _Flush):
+                    item.done.set()
+            if lines and self.flush_interval and len(lines) < self.batch_size:
+                # Let more entries accumulate so the next append is one larger write
+                time.sleep(self.flush_interval)
+
+    def _open(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def _close_fd(self):
+        if self._fd is not None:
+            try:
+                os.close(self._fd)
+            except OSError:
+                pass
+            self._fd = None
+
+    def _acquire(self):
+        if not self.use_lock:
+            return
+        if self._lock_fd is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._lock_fd = os.open(str(self.path) + '.lock', os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+
+    def _release(self):
+        if self.use_lock and self._lock_fd is not None:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _append(self, data: bytes):
+        rotated = None
+        self._acquire()
+        try:
+            # Reopen if another process rotated (renamed) the file under us
+            try:
+                current = os.stat(self.path)
+            except FileNotFoundError:
+                current = None
+            if self._fd is not None and (current is None or os.fstat(self._fd).st_ino != current.st_ino):
+                self._close_fd()
+            if self._fd is None:
+                self._open()
+                current = os.fstat(self._fd)
+
+            if self._should_rotate(current, len(data)):
+                rotated = self._rotate()
+                self._open()
+
+            view = memoryview(data)
+            while view:
+                written = os.write(self._fd, view)
+                view = view[written:]
+        finally:
+            self._release()
+
+        # Compression is slow, so it runs after the lock is released
+        if rotated is not None and self.compress:
+            self._compress(rotated)
+
+    def _should_rotate(self, st, incoming: int) -> bool:
+        if st is None or st.st_size == 0:
+            return False
+        if self.max_bytes and st.st_size + incoming > self.max_bytes:
+            return True
+        if self.rotate_interval:
+            # Fixed wall-clock windows, so every process agrees on the boundary
+            return int(st.st_mtime // self.rotate_interval) != int(time.time() // self.rotate_interval)
+        return False
+
+    def _rotate(self) -> pathlib.Path:
+        """Rename the active file to a timestamped segment; caller must hold the lock"""
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%fZ')
+        target = self.path.with_name(f"{self.path.name}.{stamp}")
+        os.replace(self.path, target)
+        self._close_fd()
+        self._count('rotations')
+        logger.info(f"Rotated prediction log to {target}")
+        if self.backup_count:
+            self._prune()
+        return target
+
+    def _segments(self) -> List[pathlib.Path]:
+        prefix = self.path.name + '.'
+        return sorted(
+            p for p in self.path.parent.iterdir()
+            if p.name.startswith(prefix) and not p.name.endswith(('.lock', '.tmp'))
+        )
+
+    def _prune(self):
+        segments = self._segments()
+        for stale in segments[:max(len(segments) - self.backup_count, 0)]:
+            try:
+                stale.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _compress(self, segment: pathlib.Path):
+        target = segment.with_name(segment.name + '.gz')
+        staged = segment.with_name(segment.name + '.gz.tmp')
+        try:
+            with open(segment, 'rb') as src, gzip.open(staged, 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            os.replace(staged, target)
+            segment.unlink()
+        except FileNotFoundError:
+            pass  # Pruned by another process in the meantime
+        except Exception as e:
+            logger.error(f"Failed to compress {segment}: {e}")
+
+
+_writer: Optional[PredictionLogWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_prediction_log() -> PredictionLogWriter:
+    """Return the process-wide prediction log writer configured by serving.prediction_log in config.yaml"""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                settings = {}
+                try:
+                    from data_preprocessing import load_config
+                    settings = (load_config().get('serving', {}) or {}).get('prediction_log', {}) or {}
+                except Exception as e:
+                    logger.warning(f"Using default prediction log settings: {e}")
+
+                path = settings.get('path')
+                if path and not os.path.isabs(path):
+                    path = pathlib.Path(__file__).parent / path
+                _writer = PredictionLogWriter(
+                    path=path,
+                    max_queue_size=int(settings.get('max_queue_size', 10000)),
+                    batch_size=int(settings.get('batch_size', 256)),
+                    flush_interval=float(settings.get('flush_interval_ms', 200)) / 1000.0,
+                    max_bytes=settings.get('max_bytes', 50 * 1024 * 1024),
+                    rotate_interval=settings.get('rotate_interval_s', 86400),
+                    compress=bool(settings.get('compress', True)),
+                    backup_count=int(settings.get('backup_count', 0)),
+                    use_lock=bool(settings.get('lock', True)),
+                    queue_full_policy=settings.get('queue_full_policy', 'drop'),
+                    block_timeout=float(settings.get('block_timeout_ms', 1000)) / 1000.0
+                )
+                # Entries still queued at interpreter exit would otherwise be lost
+                atexit.register(_writer.close)
+    return _writer
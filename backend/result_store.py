@@ -0,0 +1,210 @@
+import os
+import time
+import shutil
+import sqlite3
+import hashlib
+import logging
+import pathlib
+import tempfile
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from data_preprocessing import load_config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_RESULTS_DIR = pathlib.Path(__file__).parent / 'results'
+
+
+def spool_upload(upload, directory, suffix: str = '') -> Tuple[str, str]:
+    """
+    Copy an upload to a uniquely named temp file, hashing it on the way
+
+    Concurrent uploads of files with the same name each get their own file,
+    and the content hash costs no extra pass over the data.
+
+    Args:
+        upload: werkzeug FileStorage or binary file object
+        directory: Directory for the temp file (created if missing)
+        suffix (str): Temp file suffix, e.g. '.csv'
+
+    Returns:
+        tuple: (path, sha256 hex digest of the contents)
+    """
+    os.makedirs(directory, exist_ok=True)
+    source = getattr(upload, 'stream', upload)
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(dir=directory, suffix=suffix, delete=False) as spooled:
+        try:
+            for block in iter(lambda: source.read(1 << 20), b''):
+                digest.update(block)
+                spooled.write(block)
+        except Exception:
+            spooled.close()
+            os.remove(spooled.name)
+            raise
+    return spooled.name, digest.hexdigest()
+
+
+def result_key(upload_sha256: str, *variant: Any) -> str:
+    """Key of one result: the upload's content hash plus model versions and output options"""
+    return hashlib.sha256('\0'.join([upload_sha256] + [str(part) for part in variant]).encode()).hexdigest()[:32]
+
+
+class ResultStore:
+    """
+    Bounded on-disk store of finished batch results, keyed by result_key()
+
+    Result files live in one directory, indexed by a SQLite table shared by
+    every worker process (WAL mode, one connection per thread, as in the
+    prediction cache). Entries expire after ttl seconds, and the least
+    recently used ones are evicted once the store holds more than
+    max_entries files or max_bytes bytes.
+    """
+
+    def __init__(self, directory=None, max_bytes: int = 1 << 30, max_entries: int = 500, ttl: float = 604800.0):
+        if max_entries < 1 or max_bytes < 1:
+            raise ValueError("max_entries and max_bytes must be at least 1")
+        self.directory = pathlib.Path(directory) if directory else DEFAULT_RESULTS_DIR
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._connection()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(str(self.directory / 'index.sqlite'), timeout=5.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS results ('
+                'key TEXT PRIMARY KEY, filename TEXT NOT NULL, size INTEGER NOT NULL, '
+                'created_at REAL NOT NULL, last_used REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _count(self, key: str, n: int = 1):
+        with self._lock:
+            self._stats[key] += n
+
+    def get(self, key: str) -> Optional[pathlib.Path]:
+        """Path of the stored result for key, or None"""
+        conn = self._connection()
+        row = conn.execute('SELECT filename, created_at FROM results WHERE key = ?', (key,)).fetchone()
+        now = time.time()
+        if row is not None:
+            path = self.directory / row[0]
+            if row[1] + self.ttl > now and path.exists():
+                conn.execute('UPDATE results SET last_used = ? WHERE key = ?', (now, key))
+                self._count('hits')
+                return path
+            self._delete(conn, key, row[0])
+        self._count('misses')
+        return None
+
+    def put(self, key: str, source, suffix: str = '', move: bool = False) -> pathlib.Path:
+        """
+        Store a finished result file under key
+
+        Args:
+            key (str): result_key() of the result
+            source: Path of the result file
+            suffix (str): Suffix for the stored file, e.g. '.csv'
+            move (bool): Move source into the store instead of linking or copying it
+
+        Returns:
+            pathlib.Path: Path of the stored file
+        """
+        filename = key + suffix
+        path = self.directory / filename
+        staging = self.directory / f'.{filename}.{os.getpid()}.{threading.get_ident()}'
+        if move:
+            shutil.move(str(source), str(staging))
+        else:
+            try:
+                os.link(source, staging)
+            except OSError:
+                shutil.copyfile(source, staging)
+        os.replace(staging, path)
+
+        now = time.time()
+        conn = self._connection()
+        conn.execute(
+            'INSERT OR REPLACE INTO results (key, filename, size, created_at, last_used) VALUES (?, ?, ?, ?, ?)',
+            (key, filename, path.stat().st_size, now, now)
+        )
+        self._evict(conn, now)
+        return path
+
+    def _delete(self, conn: sqlite3.Connection, key: str, filename: str) -> None:
+        conn.execute('DELETE FROM results WHERE key = ?', (key,))
+        try:
+            os.remove(self.directory / filename)
+        except FileNotFoundError:
+            pass
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        for key, filename in conn.execute(
+                'SELECT key, filename FROM results WHERE created_at <= ?', (now - self.ttl,)).fetchall():
+            self._delete(conn, key, filename)
+        count, total = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results').fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        for key, filename, size in conn.execute(
+                'SELECT key, filename, size FROM results ORDER BY last_used').fetchall():
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            self._delete(conn, key, filename)
+            count, total = count - 1, total - size
+            self._count('evictions')
+
+    def clear(self) -> None:
+        conn = self._connection()
+        for key, filename in conn.execute('SELECT key, filename FROM results').fetchall():
+            self._delete(conn, key, filename)
+
+    def stats(self) -> Dict[str, Any]:
+        count, total = self._connection().execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results').fetchone()
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update(entries=count, bytes=total, max_entries=self.max_entries, max_bytes=self.max_bytes,
+                     ttl=self.ttl)
+        return stats
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_result_store() -> Optional[ResultStore]:
+    """Return the shared result store, or None when serving.batch.result_store is disabled"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                batch_config = (load_config().get('serving', {}) or {}).get('batch', {}) or {}
+                settings = batch_config.get('result_store', {}) or {}
+                if not settings.get('enabled', True):
+                    _store = False
+                else:
+                    directory = settings.get('path')
+                    if directory and not os.path.isabs(directory):
+                        directory = pathlib.Path(__file__).parent / directory
+                    _store = ResultStore(
+                        directory,
+                        max_bytes=int(settings.get('max_bytes', 1 << 30)),
+                        max_entries=int(settings.get('max_entries', 500)),
+                        ttl=float(settings.get('ttl_s', 604800))
+                    )
+    return _store or None
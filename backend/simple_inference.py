@@ -2,12 +2,11 @@ import os
 import sys
 import logging
 import json
-import joblib
 import pandas as pd
 import numpy as np
 import pathlib
-from typing import Dict, Any, Union
-import tensorflow as tf
+from typing import Dict, Any, List, Optional, Tuple, Union
+import threading
 from datetime import datetime
 
 # Configure logging
@@ -20,58 +19,49 @@ sys.path.insert(0, str(project_root))
 
 # Import preprocessing functions
 try:
-    from data_preprocessing import feature_engineering
+    from data_preprocessing import feature_engineering, load_config
+    from model_registry import get_registry
+    from micro_batching import MicroBatcher
+    from feature_pipeline import dense_blocks, get_compiled_pipeline, is_sparse
+    from prediction_log import get_prediction_log
+    from prediction_cache import PredictionCache, create_prediction_cache
+    from ensemble import accepts_sparse, get_ensemble
 except ImportError as e:
     logger.error(f"Could not import preprocessing functions: {e}")
     sys.exit(1)
 
+# Fields /demo-predict requires, plus the timestamp feature_engineering derives time features from
+REQUIRED_FIELDS = [
+    'timestamp', 'device_type', 'browser', 'operating_system',
+    'ad_position', 'device_ip_reputation', 'scroll_depth',
+    'mouse_movement', 'keystrokes_detected', 'click_duration',
+    'bot_likelihood_score', 'VPN_usage', 'proxy_usage'
+]
+NUMERIC_FIELDS = [
+    'scroll_depth', 'mouse_movement', 'keystrokes_detected', 'click_duration',
+    'bot_likelihood_score', 'VPN_usage', 'proxy_usage'
+]
+
 def load_model():
-    """Load the best model (supports Keras and sklearn formats)"""
-    try:
-        base_dir = pathlib.Path(__file__).parent
-        preprocessor_path = base_dir / 'models/preprocessor.pkl'
-        
-        # Check for different model formats in priority order
-        model_paths = [
-            base_dir / 'models/fraud_detection_model.keras',
-            base_dir / 'models/fraud_detection_model.h5',
-            base_dir / 'models/fraud_detection_model.pkl'
-        ]
-        
-        # Find first existing model file
-        for model_path in model_paths:
-            if model_path.exists():
-                actual_model_path = model_path
-                break
-        else:
-            raise FileNotFoundError("No fraud_detection_model found with .keras, .h5 or .pkl extension")
-        
-        # Load preprocessor
-        preprocessor = joblib.load(preprocessor_path)
-        if isinstance(preprocessor, dict) and 'preprocessor' in preprocessor:
-            preprocessor = preprocessor['preprocessor']
-        
-        # Load model based on extension
-        if actual_model_path.suffix in ['.keras', '.h5']:
-            from tensorflow.keras.models import load_model
-            model = load_model(actual_model_path)
-            model_type = "keras"
-        elif actual_model_path.suffix == '.pkl':
-            model = joblib.load(actual_model_path)
-            model_type = "sklearn"
-        else:
-            raise ValueError(f"Unsupported model format: {actual_model_path.suffix}")
-            
-        logger.info(f"Loaded {model_type} model from {actual_model_path}")
-        return preprocessor, model, model_type
-    
-    except Exception as e:
-        logger.error(f"Failed to load model: {str(e)}")
-        raise
+    """Return the shared (preprocessor, model, model_type) from the process-wide model registry"""
+    artifacts = get_registry().get()
+    return artifacts.preprocessor, artifacts.model, artifacts.model_type
+
+def preprocess_input(data: Union[Dict[str, Any], List[Dict[str, Any]]], preprocessor,
+                     sparse: Union[bool, str] = False):
+    """
+    Process raw input data for prediction
 
-def preprocess_input(data: Dict[str, Any], preprocessor) -> np.ndarray:
-    """Process raw input data for prediction"""
+    With sparse=False the result is a dense array. With sparse='auto' (or
+    True) the one-hot output may stay a CSR matrix, as CompiledPipeline or
+    the ColumnTransformer produce it; score_matrix() takes either.
+    """
     try:
+        # Fast path: compiled NumPy plan, bit-identical to the pandas/sklearn path below
+        compiled = get_compiled_pipeline(preprocessor)
+        if compiled is not None:
+            return compiled.transform(data, sparse=sparse)
+        
         # Convert to DataFrame
         if isinstance(data, dict):
             df = pd.DataFrame([data])
@@ -85,8 +75,8 @@ def preprocess_input(data: Dict[str, Any], preprocessor) -> np.ndarray:
         # Transform using preprocessor
         X = preprocessor.transform(df)
         
-        # Convert to dense array if sparse
-        if hasattr(X, 'toarray'):
+        # Convert to dense array if sparse and the caller needs it dense
+        if not sparse and hasattr(X, 'toarray'):
             X = X.toarray()
             
         return X
@@ -95,62 +85,290 @@ def preprocess_input(data: Dict[str, Any], preprocessor) -> np.ndarray:
         logger.error(f"Error preprocessing input: {e}")
         raise
 
-def predict(input_data: Dict[str, Any]) -> Dict[str, Any]:
-    """Make fraud prediction using the best model"""
+def score_matrix(X, model, model_type: str):
+    """
+    Score a preprocessed feature matrix
+
+    Args:
+        X: Preprocessed feature matrix, one row per record; CSR is densified
+            in bounded float32 blocks for models that cannot take it
+        model: Loaded Keras, NumPy-exported or sklearn model
+        model_type (str): "keras", "numpy" or "sklearn"
+
+    Returns:
+        tuple: (fraud_probabilities, is_fraud) as 1-D numpy arrays
+    """
+    if is_sparse(X) and not accepts_sparse(model):
+        scored = [score_matrix(block, model, model_type) for block in dense_blocks(X)]
+        if not scored:
+            return np.empty(0, dtype=float), np.empty(0, dtype=bool)
+        return np.concatenate([p for p, _ in scored]), np.concatenate([f for _, f in scored])
+    if model_type in ("keras", "numpy"):
+        # For Keras models and their NumPy exports
+        fraud_probs = np.asarray(model.predict(X, verbose=0)).reshape(X.shape[0], -1)[:, 0].astype(float)
+        is_fraud = fraud_probs >= 0.5
+    elif hasattr(model, 'predict_proba'):
+        # For sklearn models
+        fraud_probs = np.asarray(model.predict_proba(X))[:, 1].astype(float)  # Class 1 probability
+        is_fraud = np.asarray(model.predict(X)).astype(bool)
+    else:
+        # Direct prediction
+        pred = np.asarray(model.predict(X))
+        is_fraud = pred.astype(bool)
+        fraud_probs = pred.astype(float)
+    return fraud_probs, is_fraud
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_prediction_cache() -> Optional[PredictionCache]:
+    """Return the shared prediction cache, or None when caching is disabled in config.yaml"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                cache_config = (load_config().get('serving', {}) or {}).get('prediction_cache', {}) or {}
+                if not cache_config.get('enabled', False):
+                    _cache = False
+                else:
+                    cache = create_prediction_cache(cache_config)
+                    cache.attach_to_registry(get_registry())
+                    _cache = cache
+                    logger.info(f"Prediction cache enabled ({cache_config.get('backend', 'memory')} backend)")
+    return _cache or None
+
+def score_matrix_cached(X, model, model_type: str):
+    """score_matrix() that only scores rows missing from the prediction cache, if one is enabled"""
+    cache = get_prediction_cache()
+    if cache is None:
+        return score_matrix(X, model, model_type)
+
+    # Only cache when the model is still the one being served, so a row scored
+    # by a model swapped out mid-request is never stored under the new version
+    artifacts = get_registry().get()
+    if artifacts.model is not model:
+        return score_matrix(X, model, model_type)
+
+    keys, cached = cache.lookup(X, artifacts.version)
+    misses = [i for i, value in enumerate(cached) if value is None]
+    fraud_probs = np.empty(len(keys), dtype=float)
+    is_fraud = np.empty(len(keys), dtype=bool)
+    for i, value in enumerate(cached):
+        if value is not None:
+            fraud_probs[i], is_fraud[i] = value
+
+    if misses:
+        miss_probs, miss_flags = score_matrix(X[misses], model, model_type)
+        fraud_probs[misses] = miss_probs
+        is_fraud[misses] = miss_flags
+        cache.store([keys[i] for i in misses], miss_probs, miss_flags)
+    return fraud_probs, is_fraud
+
+def score_records(records: List[Dict[str, Any]]) -> List[Tuple[float, bool, str]]:
+    """Score a list of raw records in one pass, returning (fraud_probability, is_fraud, model_type) per record"""
+    preprocessor, model, model_type = load_model()
+    X = preprocess_input(records, preprocessor)
+    fraud_probs, is_fraud = score_matrix_cached(X, model, model_type)
+    return [(float(p), bool(f), model_type) for p, f in zip(fraud_probs, is_fraud)]
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+def get_batcher() -> Optional[MicroBatcher]:
+    """Return the shared micro-batcher, or None when micro-batching is disabled in config.yaml"""
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                batching_config = (load_config().get('serving', {}) or {}).get('micro_batching', {}) or {}
+                if not batching_config.get('enabled', False):
+                    _batcher = False
+                else:
+                    _batcher = MicroBatcher(
+                        score_records,
+                        max_batch_size=int(batching_config.get('max_batch_size', 64)),
+                        max_wait_ms=float(batching_config.get('max_wait_ms', 5))
+                    )
+                    logger.info(f"Micro-batching enabled (max {_batcher.max_batch_size} rows, "
+                                f"{batching_config.get('max_wait_ms', 5)} ms)")
+    return _batcher or None
+
+def build_result(input_data: Dict[str, Any], fraud_prob: float, is_fraud: bool, model_type: str) -> Dict[str, Any]:
+    """Queue the prediction log entry and return the response body for one scored record"""
+    # Hand off to the background writer; never waits on the disk
+    get_prediction_log().write({
+        "timestamp": datetime.now().isoformat(),
+        "input_features": input_data,
+        "prediction_result": {
+            'is_fraud': is_fraud,
+            'fraud_probability': fraud_prob,
+            'model_type': model_type
+        }
+    })
+
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'input': input_data,
+        'prediction': {
+            'is_fraud': is_fraud,
+            'fraud_probability': fraud_prob,
+            'threshold': 0.5
+        }
+    }
+
+def validate_frame(df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.Series]:
+    """
+    Validate a DataFrame of raw records column by column
+
+    Args:
+        df (pd.DataFrame): Raw records, one per row
+
+    Returns:
+        tuple: (df, errors) where df has its numeric fields coerced and errors
+            holds the first problem found per row, or '' for valid rows
+    """
+    df = df.copy()
+    errors = pd.Series('', index=df.index, dtype=object)
+    for field in REQUIRED_FIELDS:
+        if field not in df.columns:
+            errors = errors.mask(errors == '', f"Missing required field: {field}")
+            continue
+        missing = df[field].isna()
+        if field in NUMERIC_FIELDS:
+            df[field] = pd.to_numeric(df[field], errors='coerce')
+            bad = df[field].isna() & ~missing
+            message = f"Field {field} must be numeric"
+        elif field == 'timestamp':
+            # utc=True and format='mixed' so records with different offsets or
+            # layouts still parse in one call
+            bad = pd.to_datetime(df[field], errors='coerce', utc=True, format='mixed').isna() & ~missing
+            message = "Field timestamp is not a valid date/time"
+        else:
+            bad = pd.Series(False, index=df.index)
+            message = ''
+        errors = errors.mask((errors == '') & missing, f"Missing required field: {field}")
+        errors = errors.mask((errors == '') & bad, message)
+    return df, errors
+
+def validate_records(records: List[Any]) -> Tuple[pd.DataFrame, Dict[int, str]]:
+    """
+    Validate records column by column instead of record by record
+
+    Args:
+        records (list): Raw records, normally dicts
+
+    Returns:
+        tuple: (valid, errors) where valid is a DataFrame of the valid records,
+            indexed by their position in records, with numeric fields coerced,
+            and errors maps the position of each invalid record to a message
+    """
+    errors = {}
+    positions = []
+    for i, record in enumerate(records):
+        if isinstance(record, dict):
+            positions.append(i)
+        else:
+            errors[i] = "Record must be a JSON object"
+
+    df = pd.DataFrame.from_records([records[i] for i in positions], index=positions)
+    if df.empty:
+        return df, errors
+
+    df, invalid = validate_frame(df)
+    for i, message in invalid[invalid != ''].items():
+        errors[i] = message
+    return df[invalid == ''], errors
+
+def predict_many(records: List[Any]) -> List[Dict[str, Any]]:
+    """
+    Validate and score many records in one vectorized pass
+
+    Invalid records get an {'error': ...} entry and do not affect the others.
+    If the batch as a whole fails to score, records are retried one by one so
+    a single bad record cannot fail its neighbours.
+
+    Args:
+        records (list): Raw click records
+
+    Returns:
+        list: One predict()-shaped result or {'error': ...} per record, in input order
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(records)
+    valid, errors = validate_records(records)
+    for i, message in errors.items():
+        results[i] = {'error': message}
+
+    if len(valid):
+        positions = list(valid.index)
+        try:
+            preprocessor, model, model_type = load_model()
+            # The prediction cache keys dense rows; without it the matrix may stay sparse
+            sparse = 'auto' if get_prediction_cache() is None else False
+            X = preprocess_input(valid.reset_index(drop=True), preprocessor, sparse=sparse)
+            fraud_probs, flags = score_matrix_cached(X, model, model_type)
+            for i, fraud_prob, is_fraud in zip(positions, fraud_probs, flags):
+                results[i] = build_result(records[i], float(fraud_prob), bool(is_fraud), model_type)
+        except Exception as e:
+            logger.warning(f"Bulk scoring of {len(positions)} records failed ({e}); scoring individually")
+            for i in positions:
+                results[i] = predict(records[i])
+
+    return results
+
+def predict_ensemble(input_data: Dict[str, Any], strategy: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Score one record with every ensemble member and combine their probabilities
+
+    Args:
+        input_data (dict): Raw click record
+        strategy (str, optional): mean, weighted, max or stacking; defaults to serving.ensemble.strategy
+
+    Returns:
+        dict: predict()-shaped result with an extra 'ensemble' section holding per-member probabilities
+    """
     try:
-        # Load model and preprocessor
-        preprocessor, model, model_type = load_model()
-        
-        # Preprocess input
+        preprocessor, _, _ = load_model()
         X = preprocess_input(input_data, preprocessor)
-        
-        # Make prediction based on model type
-        if model_type == "keras":
-            # For Keras models
-            prediction = model.predict(X, verbose=0)
-            fraud_prob = float(prediction[0][0])
-            is_fraud = bool(fraud_prob >= 0.5)
-        else:
-            # For sklearn models
-            if hasattr(model, 'predict_proba'):
-                proba = model.predict_proba(X)
-                fraud_prob = float(proba[0][1])  # Class 1 probability
-                is_fraud = bool(model.predict(X)[0])
-            else:
-                # Direct prediction
-                pred = model.predict(X)
-                is_fraud = bool(pred[0])
-                fraud_prob = float(pred[0])
-        
-        # Create log entry
-        log_entry = {
-            "timestamp": datetime.now().isoformat(),
-            "input_features": input_data,
-            "prediction_result": {
-                'is_fraud': is_fraud,
-                'fraud_probability': fraud_prob,
-                'model_type': model_type
-            }
+        scored = get_ensemble().score(X, strategy)
+
+        result = build_result(input_data, float(scored.combined[0]), bool(scored.is_fraud[0]),
+                              f"ensemble:{scored.strategy}")
+        result['prediction']['threshold'] = scored.threshold
+        result['ensemble'] = {
+            'strategy': scored.strategy,
+            'members': {name: float(p) for name, p in zip(scored.names, scored.probabilities[0])},
+            'errors': scored.errors
         }
+        return result
+
+    except Exception as e:
+        logger.error(f"Ensemble prediction failed: {str(e)}")
+        return {'error': str(e)}
 
-        # Ensure logs directory exists
-        log_dir = pathlib.Path(__file__).parent / 'logs'
-        log_dir.mkdir(exist_ok=True)
+def predict(input_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Make fraud prediction using the best model"""
+    try:
+        batcher = get_batcher()
+        batch_info = None
+        if batcher is not None:
+            # Score together with concurrent requests
+            (fraud_prob, is_fraud, model_type), batch_info = batcher.submit(input_data)
+        else:
+            # Get shared model and preprocessor (loaded once, hot-swapped on change)
+            preprocessor, model, model_type = load_model()
+            
+            # Preprocess input
+            X = preprocess_input(input_data, preprocessor)
+            
+            # Make prediction based on model type
+            fraud_probs, flags = score_matrix_cached(X, model, model_type)
+            fraud_prob = float(fraud_probs[0])
+            is_fraud = bool(flags[0])
         
-        # Append to log file
-        log_file = log_dir / 'predictions.log.json'
-        with open(log_file, 'a') as f:
-            f.write(json.dumps(log_entry) + '\n')
-
-        return {
-            'timestamp': datetime.now().isoformat(),
-            'input': input_data,
-            'prediction': {
-                'is_fraud': is_fraud,
-                'fraud_probability': fraud_prob,
-                'threshold': 0.5
-            }
-        }
+        result = build_result(input_data, fraud_prob, is_fraud, model_type)
+        if batch_info is not None:
+            result['metadata'] = {'batch': batch_info}
+        return result
     
     except Exception as e:
         logger.error(f"Prediction failed: {str(e)}")
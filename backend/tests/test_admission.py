@@ -0,0 +1,148 @@
+import sys
+import os
+import io
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+# Add the parent directory to path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app
+from admission import AdmissionRejected, BatchAdmission, process_memory
+from batch_jobs import BatchJobQueue, COMPLETED, QUEUED, RUNNING
+from batch_scoring import ChunkScorer
+from tests.test_feature_pipeline import make_clicks
+
+class TestBatchAdmission(unittest.TestCase):
+    def test_memory_budget_limits_concurrency(self):
+        admission = BatchAdmission(memory_budget=100, max_concurrent=4, wait_timeout=0.05)
+        first = admission.acquire(60)
+        with self.assertRaises(AdmissionRejected) as ctx:
+            admission.acquire(60)
+        self.assertEqual(ctx.exception.status, 503)
+        self.assertGreaterEqual(ctx.exception.retry_after, 1)
+
+        second = admission.acquire(40)
+        self.assertEqual(admission.stats()['reserved_bytes'], 100)
+        first.release()
+        first.release()
+        second.release()
+        self.assertEqual(admission.stats()['reserved_bytes'], 0)
+        self.assertEqual(admission.stats()['active'], 0)
+
+    def test_oversized_work_runs_alone(self):
+        admission = BatchAdmission(memory_budget=100, wait_timeout=0.05)
+        self.assertFalse(admission.fits(500))
+        with admission.admit(500):
+            self.assertEqual(admission.stats()['reserved_bytes'], 100)
+            with self.assertRaises(AdmissionRejected):
+                admission.acquire(1)
+
+    def test_waiter_is_admitted_on_release(self):
+        """Test a waiting request gets in when capacity frees up, and a full waiting queue gets 429"""
+        admission = BatchAdmission(memory_budget=100, max_concurrent=1, max_waiting=1, wait_timeout=5)
+        ticket = admission.acquire(10)
+        admitted = []
+        waiter = threading.Thread(target=lambda: admitted.append(admission.acquire(10)))
+        waiter.start()
+        deadline = time.time() + 5
+        while admission.stats()['waiting'] == 0 and time.time() < deadline:
+            time.sleep(0.01)
+
+        with self.assertRaises(AdmissionRejected) as ctx:
+            admission.acquire(10)
+        self.assertEqual(ctx.exception.status, 429)
+
+        ticket.release()
+        waiter.join(5)
+        self.assertEqual(len(admitted), 1)
+        admitted[0].release()
+        stats = admission.stats()
+        self.assertEqual((stats['admitted'], stats['rejected_queue_full']), (2, 1))
+
+    def test_process_memory(self):
+        memory = process_memory()
+        self.assertGreater(memory['peak_rss_bytes'], 0)
+
+class TestAdmissionEndpoints(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.scorer = ChunkScorer()
+        cls.csv = make_clicks(120, seed=5).to_csv(index=False).encode()
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.queue = BatchJobQueue(os.path.join(self.tmp_dir, 'jobs'), max_workers=1, chunk_rows=50,
+                                   scorer_factory=lambda: self.scorer)
+        self.app = app.test_client()
+        self.app.testing = True
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def post_batch(self, query=''):
+        return self.app.post(f'/batch-predict{query}', data={'file': (io.BytesIO(self.csv), 'clicks.csv')},
+                             content_type='multipart/form-data')
+
+    def test_busy_batch_predict_gets_retry_after(self):
+        admission = BatchAdmission(memory_budget=1 << 30, max_concurrent=1, max_waiting=0, wait_timeout=0)
+        held = admission.acquire(1)
+        with patch('api_routes.get_admission', return_value=admission), \
+                patch('api_routes.get_result_store', return_value=None):
+            for query in ('', '?stream=csv'):
+                response = self.post_batch(query)
+                self.assertEqual(response.status_code, 429)
+                self.assertEqual(response.headers['Retry-After'], str(response.get_json()['retry_after']))
+
+            held.release()
+            response = self.post_batch('?stream=csv')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data.decode().splitlines()), 121)
+            response.close()
+        self.assertEqual(admission.stats()['active'], 0)
+
+    def test_oversized_upload_becomes_job(self):
+        """Test a JSON upload estimated above the budget is queued as a background job"""
+        admission = BatchAdmission(memory_budget=1000, json_row_bytes=6144)
+        with patch('api_routes.get_admission', return_value=admission), \
+                patch('api_routes.get_job_queue', return_value=self.queue), \
+                patch('api_routes.get_result_store', return_value=None):
+            response = self.post_batch()
+            self.assertEqual(response.status_code, 202)
+            body = response.get_json()
+            self.assertTrue(body['routed'])
+            self.assertEqual(body['format'], 'ndjson')
+            self.assertEqual(response.headers['Location'], f"/batch-jobs/{body['job_id']}")
+
+            deadline = time.time() + 30
+            while self.queue.status(body['job_id'])['status'] in (QUEUED, RUNNING) and time.time() < deadline:
+                time.sleep(0.05)
+            self.assertEqual(self.queue.status(body['job_id'])['status'], COMPLETED)
+
+            stats = self.app.get('/batch/stats').get_json()
+            self.assertEqual(stats['admission']['routed'], 1)
+            self.assertEqual(stats['jobs'], {COMPLETED: 1})
+
+    def test_full_job_queue_gets_429(self):
+        """Test uploads queued directly or routed from /batch-predict are turned away by a full job queue"""
+        admission = BatchAdmission(memory_budget=1000, json_row_bytes=6144, max_queued_jobs=0)
+        with patch('api_routes.get_admission', return_value=admission), \
+                patch('api_routes.get_job_queue', return_value=self.queue), \
+                patch('api_routes.get_result_store', return_value=None):
+            response = self.app.post('/batch-jobs', data={'file': (io.BytesIO(self.csv), 'clicks.csv')},
+                                     content_type='multipart/form-data')
+            self.assertEqual(response.status_code, 429)
+            self.assertIn('Retry-After', response.headers)
+
+            response = self.post_batch()
+            self.assertEqual(response.status_code, 429)
+            self.assertIn('Retry-After', response.headers)
+        self.assertEqual(self.queue.store.counts(), {})
+        self.assertEqual(admission.stats()['routed'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import sys
+import os
+import shutil
+import tempfile
+import unittest
+import pandas as pd
+
+# Add the parent directory to path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from batch_checkpoint import CheckpointedRun
+from batch_scoring import ChunkScorer, stream_scored
+from tests.test_feature_pipeline import make_clicks
+
+class Interrupted(Exception):
+    pass
+
+class TestCheckpointedRun(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.scorer = ChunkScorer()
+        cls.clicks = make_clicks(120, seed=17)
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.input_path = os.path.join(self.tmp_dir, 'clicks.csv')
+        self.clicks.to_csv(self.input_path, index=False)
+        self.checkpoint = os.path.join(self.tmp_dir, 'checkpoint')
+        self.output_path = os.path.join(self.tmp_dir, 'scored.csv')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def make_run(self, scorer=None):
+        return CheckpointedRun(self.checkpoint, self.input_path, chunk_rows=50, scorer=scorer or self.scorer)
+
+    def expected(self):
+        return ''.join(stream_scored(self.input_path, 'csv', 50, scorer=self.scorer))
+
+    def test_resumes_after_interruption(self):
+        """Test a rerun skips the chunks already checkpointed and assembles the same output as streaming"""
+        started = []
+
+        def stop_at_third_chunk():
+            started.append(True)
+            if len(started) == 3:
+                raise Interrupted()
+
+        with self.assertRaises(Interrupted):
+            self.make_run().run(before_chunk=stop_at_third_chunk)
+
+        resumed = self.make_run()
+        self.assertEqual(sorted(resumed.manifest['chunks']), ['0', '1'])
+        started.clear()
+        totals = resumed.run(before_chunk=lambda: started.append(True))
+        self.assertEqual(len(started), 1)
+        self.assertEqual(totals['rows'], 120)
+
+        resumed.assemble(self.output_path)
+        with open(self.output_path) as f:
+            self.assertEqual(f.read(), self.expected())
+        resumed.cleanup()
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_changed_input_discards_checkpoint(self):
+        """Test a checkpoint from a different input file is not reused"""
+        self.assertEqual(self.make_run().run()['rows'], 120)
+        make_clicks(80, seed=3).to_csv(self.input_path, index=False)
+
+        run = self.make_run()
+        self.assertEqual(run.manifest['chunks'], {})
+        self.assertEqual(run.run()['rows'], 80)
+
+    def test_bad_chunk_is_quarantined(self):
+        """Test a chunk that fails even after repair is quarantined and the run goes on"""
+        class PickyScorer:
+            version = None
+
+            def score(inner, chunk, raise_errors=False):
+                if 60 in chunk.index:
+                    raise ValueError("model rejected chunk")
+                return self.scorer.score(chunk, raise_errors)
+
+        run = self.make_run(PickyScorer())
+        totals = run.run()
+        self.assertEqual((totals['rows'], totals['quarantined_rows'], totals['quarantined_chunks']), (120, 50, 1))
+        self.assertEqual(run.quarantined['1']['error'], "model rejected chunk")
+        quarantined = pd.read_csv(os.path.join(run.quarantine_dir, run.quarantined['1']['file']))
+        self.assertEqual(len(quarantined), 50)
+
+        run.assemble(self.output_path)
+        self.assertEqual(len(pd.read_csv(self.output_path)), 70)
+        run.cleanup()
+        self.assertTrue(os.path.exists(os.path.join(run.quarantine_dir, run.quarantined['1']['file'])))
+
+if __name__ == '__main__':
+    unittest.main()
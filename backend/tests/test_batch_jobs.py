@@ -0,0 +1,213 @@
+import sys
+import os
+import io
+import time
+import shutil
+import zipfile
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Add the parent directory to path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app
+from batch_checkpoint import CheckpointedRun
+from batch_jobs import BatchJobQueue, COMPLETED, CANCELLED, FAILED, QUEUED, RUNNING, count_rows
+from batch_scoring import ChunkScorer, stream_scored
+from tests.test_feature_pipeline import make_clicks
+
+class TestBatchJobs(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.scorer = ChunkScorer()
+        cls.csv = make_clicks(120, seed=11).to_csv(index=False).encode()
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.input_path = os.path.join(self.tmp_dir, 'clicks.csv')
+        with open(self.input_path, 'wb') as f:
+            f.write(self.csv)
+        self.queue = self.make_queue()
+        self.app = app.test_client()
+        self.app.testing = True
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def make_queue(self, scorer_factory=None):
+        return BatchJobQueue(os.path.join(self.tmp_dir, 'jobs'), max_workers=1, chunk_rows=50,
+                             scorer_factory=scorer_factory or (lambda: self.scorer))
+
+    def wait(self, queue, job_id, timeout=30):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            status = queue.status(job_id)
+            if status['status'] not in (QUEUED, RUNNING):
+                return status
+            time.sleep(0.05)
+        self.fail(f"Job {job_id} did not finish")
+
+    def test_job_matches_streaming_output(self):
+        """Test a finished job reports progress and stores the same CSV as streaming"""
+        job_id = self.queue.submit(self.input_path, 'clicks.csv')
+        status = self.wait(self.queue, job_id)
+
+        self.assertEqual(status['status'], COMPLETED)
+        self.assertEqual((status['rows_total'], status['rows_done'], status['progress']), (120, 120, 1.0))
+        self.assertEqual(status['repairs']['fixed_values'], 0)
+        with open(self.queue.result_path(job_id)) as f:
+            expected = ''.join(stream_scored(self.input_path, 'csv', 50, scorer=self.scorer))
+            self.assertEqual(f.read(), expected)
+
+    def test_cancel_between_chunks(self):
+        """Test cancelling a running job stops it at the next chunk"""
+        queue = None
+
+        class CancellingScorer:
+            def score(inner, chunk, raise_errors=False):
+                queue.cancel(job_id)
+                return self.scorer.score(chunk, raise_errors)
+
+        queue = self.make_queue(scorer_factory=CancellingScorer)
+        job_id = queue.submit(self.input_path, 'clicks.csv')
+        status = self.wait(queue, job_id)
+
+        self.assertEqual(status['status'], CANCELLED)
+        self.assertEqual(status['rows_done'], 50)
+        self.assertIsNone(queue.result_path(job_id))
+
+    def test_completed_job_is_cleaned_up(self):
+        """Test a job is reported completed only after its checkpoint is removed"""
+        cleanup = CheckpointedRun.cleanup
+
+        def slow_cleanup(run):
+            time.sleep(0.3)
+            cleanup(run)
+
+        with patch.object(CheckpointedRun, 'cleanup', slow_cleanup):
+            job_id = self.queue.submit(self.input_path, 'clicks.csv')
+            self.assertEqual(self.wait(self.queue, job_id)['status'], COMPLETED)
+            self.assertFalse(self.queue.checkpoint_dir(job_id).exists())
+
+    def test_orphaned_job_resumes_after_restart(self):
+        """Test a job left running by a dead worker is rerun by a new queue"""
+        with patch.object(BatchJobQueue, '_pool'):
+            job_id = self.queue.submit(self.input_path, 'clicks.csv')
+        self.queue.store.update(job_id, status=RUNNING, owner='gone:1', heartbeat=time.time() - 3600)
+
+        restarted = self.make_queue()
+        self.assertEqual(restarted.resume_pending(), 1)
+        self.assertEqual(self.wait(restarted, job_id)['status'], COMPLETED)
+
+    def test_heartbeat_outlasts_slow_row_count(self):
+        """Test a job counting rows for longer than stale_after is not requeued from under its worker"""
+        queue = BatchJobQueue(os.path.join(self.tmp_dir, 'jobs'), max_workers=1, chunk_rows=50,
+                              scorer_factory=lambda: self.scorer, stale_after=0.4)
+
+        def slow_count(*args):
+            time.sleep(1.2)
+            return count_rows(*args)
+
+        with patch('batch_jobs.count_rows', side_effect=slow_count):
+            job_id = queue.submit(self.input_path, 'clicks.csv')
+            requeued = 0
+            while queue.store.get(job_id)['status'] in (QUEUED, RUNNING):
+                requeued += queue.store.requeue_stale(queue.stale_after)
+                time.sleep(0.05)
+        self.assertEqual(requeued, 0)
+        self.assertEqual(queue.store.get(job_id)['status'], COMPLETED)
+
+    def test_requeued_run_stops_writing(self):
+        """Test a run whose job was requeued and claimed elsewhere leaves the job to its new owner"""
+        queue = None
+
+        class StolenScorer:
+            def score(inner, chunk, raise_errors=False):
+                queue.store.update(job_id, status=QUEUED, owner=None)
+                queue.store.claim(job_id, 'other:1')
+                return self.scorer.score(chunk, raise_errors)
+
+        queue = self.make_queue(scorer_factory=StolenScorer)
+        job_id = queue.submit(self.input_path, 'clicks.csv')
+        deadline = time.time() + 30
+        while not queue.checkpoint_dir(job_id).exists() and time.time() < deadline:
+            time.sleep(0.05)
+        queue._pool().submit(lambda: None).result(30)
+
+        job = queue.store.get(job_id)
+        self.assertEqual((job['status'], job['owner'], job['rows_done']), (RUNNING, 'other:1', 0))
+        self.assertTrue(os.path.exists(job['input_path']))
+        self.assertFalse(os.path.exists(job['result_path']))
+
+    def test_failed_job_retries_from_checkpoint(self):
+        """Test retrying a failed job scores only the chunks its first run did not finish"""
+        scored = []
+
+        class FailingScorer:
+            version = None
+
+            def score(inner, chunk, raise_errors=False):
+                scored.append(len(chunk))
+                if len(scored) == 2:
+                    raise MemoryError("out of memory")
+                return self.scorer.score(chunk, raise_errors)
+
+        queue = self.make_queue(scorer_factory=FailingScorer)
+        job_id = queue.submit(self.input_path, 'clicks.csv')
+        self.assertEqual(self.wait(queue, job_id)['status'], FAILED)
+        self.assertTrue(os.path.exists(queue.store.get(job_id)['input_path']))
+
+        self.assertEqual(queue.retry(job_id), QUEUED)
+        status = self.wait(queue, job_id)
+        self.assertEqual(status['status'], COMPLETED)
+        self.assertEqual(status['rows_done'], 120)
+        self.assertEqual(scored, [50, 50, 50, 20])
+        self.assertFalse(queue.checkpoint_dir(job_id).exists())
+        with open(queue.result_path(job_id)) as f:
+            self.assertEqual(f.read(), ''.join(stream_scored(self.input_path, 'csv', 50, scorer=self.scorer)))
+        self.assertEqual(queue.retry(job_id), COMPLETED)
+
+    def test_zipped_upload(self):
+        """Test a zip of daily CSVs is spooled compressed and scored member by member"""
+        zip_path = os.path.join(self.tmp_dir, 'clicks.zip')
+        lines = self.csv.decode().splitlines(keepends=True)
+        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr('day1.csv', ''.join(lines[:61]))
+            archive.writestr('day2.csv', ''.join(lines[:1] + lines[61:]))
+        job_id = self.queue.submit(zip_path, 'clicks.zip')
+        status = self.wait(self.queue, job_id)
+
+        self.assertEqual(status['status'], COMPLETED)
+        self.assertEqual((status['rows_total'], status['rows_done']), (120, 120))
+        self.assertTrue(self.queue.store.get(job_id)['input_path'].endswith('.input.csv.zip'))
+
+    def test_count_rows(self):
+        self.assertEqual(count_rows(self.input_path), 120)
+
+    def test_job_endpoints(self):
+        """Test submitting, polling and downloading through the API"""
+        with patch('api_routes.get_job_queue', return_value=self.queue):
+            response = self.app.post('/batch-jobs', data={'file': (io.BytesIO(self.csv), 'clicks.csv')},
+                                     content_type='multipart/form-data')
+            self.assertEqual(response.status_code, 202)
+            job_id = response.get_json()['job_id']
+            self.assertEqual(response.headers['Location'], f'/batch-jobs/{job_id}')
+
+            self.wait(self.queue, job_id)
+            status = self.app.get(f'/batch-jobs/{job_id}').get_json()
+            self.assertEqual(status['status'], COMPLETED)
+
+            result = self.app.get(f'/batch-jobs/{job_id}/result')
+            self.assertEqual(result.status_code, 200)
+            self.assertEqual(result.mimetype, 'text/csv')
+            self.assertEqual(len(result.data.decode().splitlines()), 121)
+            result.close()
+
+            self.assertEqual(self.app.get(f'/batch-jobs/{job_id}/quarantine').get_json()['chunks'], {})
+            self.assertEqual(self.app.post(f'/batch-jobs/{job_id}/retry').status_code, 409)
+            self.assertEqual(self.app.get('/batch-jobs/missing').status_code, 404)
+            self.assertEqual(self.app.post('/batch-jobs/missing/retry').status_code, 404)
+
+if __name__ == '__main__':
+    unittest.main()
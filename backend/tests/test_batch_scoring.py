@@ -0,0 +1,270 @@
+import sys
+import os
+import io
+import gzip
+import json
+import shutil
+import zipfile
+import tempfile
+import unittest
+from unittest.mock import patch
+import numpy as np
+import pandas as pd
+
+# Add the parent directory to path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app
+from batch_scoring import MODEL_COLUMNS, ChunkScorer, count_rows, read_frame, stream_scored
+from result_store import spool_upload
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet  # noqa: F401
+except ImportError:
+    pa = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+from tests.test_feature_pipeline import make_clicks
+
+class TestBatchScoring(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.scorer = ChunkScorer()
+        clicks = make_clicks(250, seed=7)
+        clicks['scroll_depth'] = clicks['scroll_depth'].astype(object)
+        clicks.loc[[3, 120], 'scroll_depth'] = ['deep', None]
+        cls.csv = clicks.to_csv(index=False).encode()
+
+    def setUp(self):
+        """Set up test client before each test"""
+        self.app = app.test_client()
+        self.app.testing = True
+        # Score every upload rather than answering from the shared result store
+        patcher = patch('api_routes.get_result_store', return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def scored(self, chunk_rows, output_format='csv'):
+        return ''.join(stream_scored(io.BytesIO(self.csv), output_format, chunk_rows, scorer=self.scorer))
+
+    def test_chunking_does_not_change_results(self):
+        """Test small chunks produce the same annotated CSV as a single chunk"""
+        single = pd.read_csv(io.StringIO(self.scored(10000)))
+        chunked = pd.read_csv(io.StringIO(self.scored(37)))
+
+        pd.testing.assert_frame_equal(single, chunked)
+        self.assertEqual(len(chunked), 250)
+        self.assertIn('ensemble_fraud_probability', chunked.columns)
+
+    def test_invalid_rows_are_annotated(self):
+        """Test rows failing validation keep their data and carry an error"""
+        scored = pd.read_csv(io.StringIO(self.scored(100)), keep_default_na=False)
+
+        self.assertEqual(scored.loc[3, 'error'], 'Field scroll_depth must be numeric')
+        self.assertEqual(scored.loc[3, 'ensemble_fraud_probability'], '')
+        # The blank scroll_depth is repaired to 0 before validation
+        self.assertEqual(scored.loc[120, 'scroll_depth'], '0')
+        self.assertEqual((scored['error'] == '').sum(), 249)
+
+        unrepaired = ''.join(stream_scored(io.BytesIO(self.csv), 'csv', 100, scorer=ChunkScorer(repair=False)))
+        unrepaired = pd.read_csv(io.StringIO(unrepaired), keep_default_na=False)
+        self.assertEqual(unrepaired.loc[120, 'error'], 'Missing required field: scroll_depth')
+
+    def test_ndjson_output(self):
+        """Test NDJSON output has one object per input row"""
+        lines = self.scored(64, 'ndjson').splitlines()
+
+        self.assertEqual(len(lines), 250)
+        record = json.loads(lines[0])
+        self.assertIn('ensemble_is_fraud', record)
+        self.assertIsInstance(record['ensemble_fraud_probability'], float)
+
+    def test_streaming_endpoint(self):
+        """Test /batch-predict?stream=csv streams the annotated CSV"""
+        response = self.app.post('/batch-predict?stream=csv',
+                                 data={'file': (io.BytesIO(self.csv), 'clicks.csv')},
+                                 content_type='multipart/form-data')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/csv')
+        scored = pd.read_csv(io.BytesIO(response.data))
+        self.assertEqual(len(scored), 250)
+        np.testing.assert_array_equal(scored['ensemble_is_fraud'].notna(), scored['error'].isna())
+
+    def test_abandoned_stream_removes_upload(self):
+        """Test the spooled upload is removed when the client goes away before the stream starts"""
+        spooled = []
+
+        def spool(*args, **kwargs):
+            spooled.append(spool_upload(*args, **kwargs))
+            return spooled[-1]
+
+        # Dispatch without iterating the body, as when the client disconnects before the first chunk
+        with patch('api_routes.spool_upload', side_effect=spool), \
+                app.test_request_context('/batch-predict?stream=csv', method='POST',
+                                         data={'file': (io.BytesIO(self.csv), 'clicks.csv')},
+                                         content_type='multipart/form-data'):
+            response = app.full_dispatch_request()
+        temp_path = spooled[0][0]
+        self.assertTrue(os.path.exists(temp_path))
+        response.close()
+        self.assertFalse(os.path.exists(temp_path))
+
+    def test_unknown_stream_format(self):
+        response = self.app.post('/batch-predict?stream=xml',
+                                 data={'file': (io.BytesIO(self.csv), 'clicks.csv')},
+                                 content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 400)
+
+@unittest.skipIf(pa is None, "pyarrow is not installed")
+class TestColumnarBatchScoring(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.scorer = ChunkScorer()
+        cls.clicks = make_clicks(150, seed=9)
+        cls.clicks.insert(0, 'click_id', [f'c{i}' for i in range(150)])
+        cls.clicks['notes'] = 'not a model input'
+        cls.expected = pd.read_csv(io.StringIO(''.join(
+            stream_scored(io.BytesIO(cls.clicks.to_csv(index=False).encode()), 'csv', 1000, scorer=cls.scorer)
+        )))
+
+    def setUp(self):
+        self.app = app.test_client()
+        self.app.testing = True
+        patcher = patch('api_routes.get_result_store', return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def scored(self, source, output_format, input_format, columns=None):
+        data = b''.join(stream_scored(source, output_format, 40, scorer=self.scorer,
+                                      input_format=input_format, columns=columns))
+        if output_format == 'parquet':
+            return pd.read_parquet(io.BytesIO(data))
+        return pa.ipc.open_file(pa.BufferReader(data)).read_pandas()
+
+    def test_parquet_round_trip(self):
+        """Test Parquet in and out matches CSV scoring, four row groups of chunks"""
+        buffer = io.BytesIO()
+        self.clicks.to_parquet(buffer, index=False)
+        buffer.seek(0)
+        scored = self.scored(buffer, 'parquet', 'parquet')
+
+        self.assertEqual(len(scored), 150)
+        np.testing.assert_allclose(scored['ensemble_fraud_probability'], self.expected['ensemble_fraud_probability'],
+                                   rtol=1e-6)
+        self.assertIn('notes', scored.columns)
+
+    def test_arrow_projection(self):
+        """Test Arrow IPC input decodes only the projected columns"""
+        sink = pa.BufferOutputStream()
+        table = pa.Table.from_pandas(self.clicks, preserve_index=False)
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=64)
+        scored = self.scored(pa.BufferReader(sink.getvalue()), 'arrow', 'arrow', columns=MODEL_COLUMNS)
+
+        self.assertNotIn('notes', scored.columns)
+        self.assertEqual(list(scored.columns[:len(MODEL_COLUMNS)]), MODEL_COLUMNS)
+        np.testing.assert_array_equal(scored['ensemble_is_fraud'], self.expected['ensemble_is_fraud'])
+
+    def test_streaming_parquet_endpoint(self):
+        """Test a Parquet upload streams back Parquet with only model columns by default"""
+        buffer = io.BytesIO()
+        self.clicks.to_parquet(buffer, index=False)
+        buffer.seek(0)
+        response = self.app.post('/batch-predict?stream=parquet',
+                                 data={'file': (buffer, 'clicks.parquet')},
+                                 content_type='multipart/form-data')
+
+        self.assertEqual(response.status_code, 200)
+        scored = pd.read_parquet(io.BytesIO(response.data))
+        self.assertEqual(len(scored), 150)
+        self.assertNotIn('notes', scored.columns)
+
+class TestCompressedBatchScoring(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.scorer = ChunkScorer()
+        cls.clicks = make_clicks(120, seed=13)
+        cls.csv = cls.clicks.to_csv(index=False).encode()
+        cls.expected = ''.join(stream_scored(io.BytesIO(cls.csv), 'csv', 50, scorer=cls.scorer))
+
+    def setUp(self):
+        self.app = app.test_client()
+        self.app.testing = True
+        patcher = patch('api_routes.get_result_store', return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir, True)
+
+    def assertScoredLikeCsv(self, output):
+        # Chunk boundaries shift float32 results in the last digits
+        pd.testing.assert_frame_equal(pd.read_csv(io.StringIO(output)), pd.read_csv(io.StringIO(self.expected)),
+                                      rtol=1e-5)
+
+    def write(self, name, data):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_gzip_matches_plain_csv(self):
+        """Test a .csv.gz file streams the same output as the uncompressed CSV"""
+        path = self.write('clicks.csv.gz', gzip.compress(self.csv))
+
+        self.assertScoredLikeCsv(''.join(stream_scored(path, 'csv', 50, scorer=self.scorer)))
+        self.assertEqual(count_rows(path), 120)
+
+    @unittest.skipIf(zstandard is None, "zstandard is not installed")
+    def test_zstd_multi_frame(self):
+        """Test every frame of a zstd file written in pieces is read"""
+        compressor = zstandard.ZstdCompressor()
+        half = len(self.csv) // 2
+        path = self.write('clicks.csv.zst', compressor.compress(self.csv[:half]) + compressor.compress(self.csv[half:]))
+
+        self.assertScoredLikeCsv(''.join(stream_scored(path, 'csv', 50, scorer=self.scorer)))
+
+    def test_zip_members_in_order(self):
+        """Test zip members are scored one after another, aligned to the first member's columns"""
+        first, second = self.clicks.iloc[:70], self.clicks.iloc[70:]
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr('2024-01-01.csv', first.to_csv(index=False))
+            archive.writestr('__MACOSX/._2024-01-01.csv', 'resource fork')
+            archive.writestr('2024-01-02.csv.gz', gzip.compress(second[second.columns[::-1]].to_csv(index=False).encode()))
+        path = self.write('clicks.zip', buffer.getvalue())
+
+        self.assertEqual(count_rows(path), 120)
+        self.assertEqual(len(read_frame(path)), 120)
+        self.assertScoredLikeCsv(''.join(stream_scored(path, 'csv', 50, scorer=self.scorer)))
+
+    def test_corrupt_archive_ends_stream_with_error(self):
+        path = self.write('clicks.csv.gz', gzip.compress(self.csv)[:400])
+        lines = ''.join(stream_scored(path, 'ndjson', 50, scorer=self.scorer)).splitlines()
+
+        self.assertIn('error', json.loads(lines[-1]))
+
+    def test_compressed_upload_endpoint(self):
+        """Test /batch-predict accepts .csv.gz uploads and rejects compressed Parquet"""
+        response = self.app.post('/batch-predict?stream=csv',
+                                 data={'file': (io.BytesIO(gzip.compress(self.csv)), 'clicks.csv.gz')},
+                                 content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 200)
+        self.assertScoredLikeCsv(response.data.decode())
+
+        response = self.app.post('/batch-predict',
+                                 data={'file': (io.BytesIO(gzip.compress(self.csv)), 'clicks.csv.gz')},
+                                 content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['total_records'], 120)
+
+        response = self.app.post('/batch-predict',
+                                 data={'file': (io.BytesIO(b'PAR1'), 'clicks.parquet.gz')},
+                                 content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
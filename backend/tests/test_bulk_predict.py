@@ -0,0 +1,99 @@
+import sys
+import os
+import unittest
+from unittest.mock import patch
+import json
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app
+from simple_inference import validate_records, predict, predict_many
+
+VALID_CLICK = {
+    'timestamp': '2023-06-15T14:30:00',
+    'device_type': 'Mobile',
+    'browser': 'Chrome',
+    'operating_system': 'Android',
+    'ad_position': 'top',
+    'device_ip_reputation': 'Suspicious',
+    'scroll_depth': 75,
+    'mouse_movement': 120,
+    'keystrokes_detected': 0,
+    'click_duration': 0.8,
+    'bot_likelihood_score': 0.65,
+    'VPN_usage': 1,
+    'proxy_usage': 0
+}
+
+class TestBulkPredict(unittest.TestCase):
+    def setUp(self):
+        """Set up test client before each test"""
+        self.app = app.test_client()
+        self.app.testing = True
+
+    def test_validation_is_per_record(self):
+        """Test invalid records are reported individually with the first problem found"""
+        missing = dict(VALID_CLICK)
+        del missing['browser']
+        records = [VALID_CLICK, missing, dict(VALID_CLICK, scroll_depth='lots'),
+                   dict(VALID_CLICK, timestamp='not a date'), 'oops', dict(VALID_CLICK, scroll_depth='75')]
+
+        valid, errors = validate_records(records)
+
+        self.assertEqual(list(valid.index), [0, 5])
+        self.assertEqual(valid.loc[5, 'scroll_depth'], 75)
+        self.assertEqual(errors, {
+            1: "Missing required field: browser",
+            2: "Field scroll_depth must be numeric",
+            3: "Field timestamp is not a valid date/time",
+            4: "Record must be a JSON object"
+        })
+
+    def test_results_match_single_predictions(self):
+        """Test bulk scoring returns the same prediction as /predict for each record"""
+        records = [dict(VALID_CLICK, bot_likelihood_score=score, VPN_usage=vpn)
+                   for score in (0.05, 0.5, 0.95) for vpn in (0, 1)]
+
+        results = predict_many(records)
+
+        self.assertEqual(len(results), len(records))
+        for record, result in zip(records, results):
+            expected = predict(record)['prediction']
+            self.assertEqual(result['input'], record)
+            self.assertEqual(result['prediction']['is_fraud'], expected['is_fraud'])
+            self.assertAlmostEqual(result['prediction']['fraud_probability'], expected['fraud_probability'], places=6)
+
+    def test_batch_failure_falls_back_to_single_records(self):
+        """Test a failing vectorized pass is retried one record at a time"""
+        with patch('simple_inference.score_matrix', side_effect=[RuntimeError('boom'), ([0.9], [True]), ([0.1], [False])]):
+            results = predict_many([VALID_CLICK, VALID_CLICK])
+        self.assertEqual([r['prediction']['is_fraud'] for r in results], [True, False])
+
+    def test_json_array_endpoint(self):
+        """Test /predict/bulk accepts a JSON array and reports per-record errors"""
+        response = self.app.post('/predict/bulk', json=[VALID_CLICK, {'device_type': 'Mobile'}, VALID_CLICK])
+
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual((data['count'], data['scored'], data['failed']), (3, 2, 1))
+        self.assertIn('prediction', data['results'][0])
+        self.assertEqual(data['results'][1], {'error': 'Missing required field: timestamp'})
+
+    def test_ndjson_endpoint(self):
+        """Test /predict/bulk accepts NDJSON and isolates malformed lines"""
+        body = json.dumps(VALID_CLICK) + '\n{not json\n\n' + json.dumps(VALID_CLICK) + '\n'
+        response = self.app.post('/predict/bulk', data=body, content_type='application/x-ndjson')
+
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual((data['count'], data['failed']), (3, 1))
+        self.assertTrue(data['results'][1]['error'].startswith('Invalid JSON on line 2'))
+        self.assertIn('prediction', data['results'][2])
+
+    def test_rejects_non_array_body(self):
+        """Test a single JSON object or an empty array is rejected"""
+        self.assertEqual(self.app.post('/predict/bulk', json=VALID_CLICK).status_code, 400)
+        self.assertEqual(self.app.post('/predict/bulk', json=[]).status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import sys
+import os
+import shutil
+import tempfile
+import unittest
+
+# Add the parent directory to path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from click_rate import (
+    ClickRateDetector, MemoryRateBackend, RateRule, SqliteRateBackend, create_click_rate_detector
+)
+
+CLICK = {'ip': '10.0.0.1', 'device_type': 'Desktop', 'browser': 'Chrome', 'operating_system': 'Win32',
+         'ad_id': 'ad-1'}
+
+class TestClickRate(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def detector(self, backend=None):
+        rules = [RateRule('device', ['ip', 'device_type'], window_s=2, max_clicks=3),
+                 RateRule('ad', ['ad_id'], window_s=10, max_clicks=4)]
+        return ClickRateDetector(rules, backend or MemoryRateBackend())
+
+    def check_windows(self, detector):
+        # Three clicks in two seconds are allowed, the fourth is flagged
+        self.assertEqual([detector.record(CLICK, now=t) for t in (0.0, 0.5, 1.0)], [[], [], []])
+        self.assertEqual(detector.record(CLICK, now=1.5),
+                         [{'rule': 'device', 'clicks': 4, 'window_s': 2.0, 'max_clicks': 3}])
+        # The device window slides (only 1.0 and 1.5 are recent) while the ad's fifth click is flagged
+        self.assertEqual(detector.record(CLICK, now=2.6)[0]['rule'], 'ad')
+        # Another device is counted separately, but shares the ad's window
+        other = dict(CLICK, ip='10.0.0.2')
+        self.assertEqual([hit['rule'] for hit in detector.record(other, now=2.7)], ['ad'])
+
+    def test_sliding_windows_per_key(self):
+        self.check_windows(self.detector())
+
+    def test_sqlite_backend_is_shared(self):
+        """Test two backends on one file, as in two gunicorn workers, see each other's clicks"""
+        path = os.path.join(self.tmp_dir, 'click_rate.sqlite')
+        first, second = SqliteRateBackend(path), SqliteRateBackend(path)
+        self.check_windows(self.detector(first))
+
+        detector = self.detector(second)
+        self.assertEqual(detector.record(dict(CLICK, ip='10.0.0.9'), now=3.0)[0]['clicks'], 5)
+        self.assertEqual(first.stats()['keys'], 4)
+
+    def test_idle_and_excess_keys_are_evicted(self):
+        backend = MemoryRateBackend(max_keys=3, idle_ttl=60)
+        detector = ClickRateDetector([RateRule('ip', ['ip'], window_s=1, max_clicks=1)], backend)
+        for i in range(5):
+            detector.record({'ip': f'10.0.0.{i}'}, now=float(i))
+        self.assertEqual(backend.stats()['keys'], 3)
+
+        detector.record({'ip': '10.0.0.4'}, now=100.0)
+        self.assertEqual(backend.stats()['keys'], 1)
+        self.assertEqual(backend.stats()['evictions'], 4)
+
+    def test_config(self):
+        detector = create_click_rate_detector({})
+        self.assertEqual([rule.name for rule in detector.rules], ['device', 'ad'])
+
+        with self.assertRaises(ValueError):
+            create_click_rate_detector({'rules': [{'name': 'bad', 'window_s': 0, 'max_clicks': 1}]})
+        with self.assertRaises(ValueError):
+            create_click_rate_detector({'backend': 'redis'})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,279 @@
+import sys
+import os
+import json
+import shutil
+import threading
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+# Add the parent directory to path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app
+from click_store import ClickStore, CsvClickCache, format_millis, read_csv_since, to_millis
+
+BASE = to_millis('2025-04-03T00:00:00.000Z')
+
+
+def make_click(i, offset_ms=0, **fields):
+    click = {'timestamp': BASE + offset_ms, 'device_type': 'Mobile', 'browser': 'Chrome', 'os': 'iOS',
+             'ad_position': 'top', 'scroll_depth': i, 'mouse_movement': 2 * i, 'click_duration': 0.5,
+             'ad_id': f'ad-{i % 3}', 'is_fraud': i % 2}
+    click.update(fields)
+    return click
+
+class TestClickStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def store(self, **kwargs):
+        settings = dict(partition_s=60, segment_records=8, block_records=3)
+        settings.update(kwargs)
+        return ClickStore(os.path.join(self.tmp_dir, 'clicks'), **settings)
+
+    def test_timestamps_round_trip(self):
+        self.assertEqual(format_millis([to_millis('2025-04-03T05:16:30.704Z')])[0], '2025-04-03T05:16:30.704Z')
+        with self.assertRaises(ValueError):
+            to_millis('yesterday')
+
+    def test_append_and_range_scan(self):
+        """Test scans over sealed segments and the active segment return the same clicks in time order"""
+        store = self.store()
+        # 150 clicks, one per second, over three one-minute partitions and out of order within each block
+        offsets = [(i // 5) * 5000 + (4 - i % 5) * 1000 for i in range(150)]
+        for i, offset in enumerate(offsets):
+            store.append(make_click(i, offset))
+        self.assertGreater(store.stats()['sealed_segments'], 0)
+
+        clicks = store.scan()
+        self.assertEqual(len(clicks), 150)
+        self.assertTrue(clicks['timestamp'].is_monotonic_increasing)
+        self.assertEqual(clicks.columns.tolist()[:2], ['timestamp', 'device_type'])
+        self.assertEqual(sorted(clicks['scroll_depth']), list(range(150)))
+
+        window = store.scan('2025-04-03T00:00:55Z', BASE + 125000)
+        self.assertEqual(len(window), 70)
+        self.assertEqual(window['timestamp'].iloc[0], '2025-04-03T00:00:55.000Z')
+        self.assertEqual(window['timestamp'].iloc[-1], '2025-04-03T00:02:04.000Z')
+
+    def test_closed_partitions_are_compacted(self):
+        store = self.store()
+        store.append_many([make_click(i, i * 1000) for i in range(30)])
+        store.append(make_click(30, 90000))
+        segments = store._read_manifest()['segments']
+        self.assertEqual([(s['partition'], s['rows']) for s in segments], [(segments[0]['partition'], 30)])
+        self.assertEqual(len(os.listdir(store.active_dir)), 1)
+
+        self.assertIsNotNone(store.seal())
+        self.assertEqual(len(store.scan()), 31)
+        self.assertEqual(store.stats()['active_bytes'], 0)
+
+    def test_writers_share_a_directory(self):
+        """Test two stores on one directory, as in two gunicorn workers, see each other's clicks"""
+        first, second = self.store(), self.store()
+        for i in range(20):
+            (first if i % 2 else second).append(make_click(i, i * 100))
+        self.assertEqual(first.scan()['scroll_depth'].tolist(), list(range(20)))
+        self.assertEqual(second.scan(BASE + 1000)['scroll_depth'].tolist(), list(range(10, 20)))
+
+    def test_read_since_pages_in_append_order(self):
+        """Test cursor pages cover every click once, across sealed segments and the active one"""
+        store = self.store()
+        # Clicks from two partitions interleaved, so sealed segments are time-sorted but not in append order
+        store.append_many([make_click(i, (i % 2) * 60000 + i * 10) for i in range(25)])
+
+        seen, cursor = [], 0
+        for _ in range(10):
+            page = store.read_since(cursor, limit=4)
+            seen += page['clicks']['scroll_depth'].tolist()
+            cursor = page['cursor']
+            if not page['has_more']:
+                break
+        self.assertEqual(seen, list(range(25)))
+        self.assertEqual(cursor, 25)
+
+        store.append(make_click(25, 120000))
+        page = store.read_since(cursor)
+        self.assertEqual((page['clicks']['scroll_depth'].tolist(), page['cursor']), ([25], 26))
+        self.assertEqual(len(store.read_since(26)['clicks']), 0)
+        self.assertEqual(store.read_since(26)['cursor'], 26)
+
+    def test_read_since_opens_only_the_segments_it_needs(self):
+        """Test paging through a long history reads only the sealed segments each page comes from"""
+        store = self.store(segment_records=5)
+        store.append_many([make_click(i, i * 10) for i in range(62)])
+        self.assertEqual(store.stats()['sealed_segments'], 12)
+
+        loads = []
+        load = ClickStore._load_segment_since
+        with patch.object(ClickStore, '_load_segment_since',
+                          side_effect=lambda *args: loads.append(args) or load(*args)):
+            seen, cursor, pages, has_more = [], 0, 0, True
+            while has_more:
+                page = store.read_since(cursor, limit=4)
+                seen += page['clicks']['scroll_depth'].tolist()
+                cursor, has_more, pages = page['cursor'], page['has_more'], pages + 1
+        self.assertEqual(seen, list(range(62)))
+        # Each page reads the segments it returns clicks from, not the ones after them
+        self.assertLessEqual(len(loads), pages + 12)
+        self.assertEqual(store.read_since(13, limit=3)['clicks']['scroll_depth'].tolist(), [13, 14, 15])
+
+    def test_read_csv_since(self):
+        path = os.path.join(self.tmp_dir, 'live_clicks.csv')
+        with open(path, 'w') as f:
+            f.write('timestamp,device_type,browser,os,ad_position,scroll_depth,mouse_movement,click_duration,ad_id,is_fraud\n')
+            for i in range(5):
+                f.write(f'2025-04-03T05:16:3{i}.000Z,Desktop,Chrome,Win32,top,{i},3,0.2,ad-1,0\n')
+            f.write('2025-04-03T05:16:40.000Z,Desktop')  # still being written
+
+        page = read_csv_since(path, 0, limit=3)
+        self.assertEqual((page['clicks']['scroll_depth'].tolist(), page['has_more']), ([0.0, 1.0, 2.0], True))
+        page = read_csv_since(path, page['cursor'], limit=3)
+        self.assertEqual((page['clicks']['scroll_depth'].tolist(), page['has_more']), ([3.0, 4.0], False))
+        self.assertEqual(read_csv_since(path, page['cursor'])['cursor'], page['cursor'])
+
+    def test_csv_cache_follows_the_file(self):
+        """Test the CSV cache parses appended lines only and starts over when the file is truncated or replaced"""
+        path = os.path.join(self.tmp_dir, 'live_clicks.csv')
+        header = 'timestamp,device_type,browser,os,ad_position,scroll_depth,mouse_movement,click_duration,ad_id,is_fraud\n'
+        line = '2025-04-03T05:16:3{0}.000Z,Desktop,Chrome,Win32,top,{0},3,0.2,ad-1,0\n'
+        with open(path, 'w') as f:
+            f.write(header + line.format(0) + line.format(1))
+        cache = CsvClickCache(path)
+        clicks = json.loads(cache.json())
+        self.assertEqual([c['scroll_depth'] for c in clicks], [0.0, 1.0])
+        self.assertEqual(clicks[0]['is_fraud'], 0)
+
+        with open(path, 'a') as f:
+            f.write(line.format(2) + '2025-04-03T05:16:39.000Z,Desk')
+        self.assertEqual(cache.refresh(), 1)
+        self.assertEqual(len(json.loads(cache.json())), 3)
+        with open(path, 'a') as f:
+            f.write('top,Chrome,Win32,top,9,3,0.2,ad-1,1\n')
+        self.assertEqual(cache.refresh(), 1)
+        self.assertEqual(cache.stats()['offset'], os.path.getsize(path))
+
+        # Truncated and rewritten past the old offset before the next refresh, then replaced by a new file
+        with open(path, 'w') as f:
+            f.write(header + ''.join(line.format(5) for _ in range(6)))
+        self.assertEqual([c['scroll_depth'] for c in json.loads(cache.json())], [5.0] * 6)
+        staging = path + '.new'
+        with open(staging, 'w') as f:
+            f.write(header + line.format(7))
+        os.replace(staging, path)
+        self.assertEqual([c['scroll_depth'] for c in json.loads(cache.json())], [7.0])
+
+    def test_import_csv(self):
+        """Test the legacy CSV, with and without ad_id, blank and bad lines, is imported once"""
+        path = os.path.join(self.tmp_dir, 'live_clicks.csv')
+        with open(path, 'w') as f:
+            f.write('timestamp,device_type,browser,os,ad_position,scroll_depth,mouse_movement,click_duration,is_fraud\n'
+                    '2025-04-03T05:16:30.704Z,Desktop,Chrome,Win32,top,50,3,0.2,0\n'
+                    '\n'
+                    'not a time,Desktop,Chrome,Win32,top,50,3,0.2,0\n'
+                    '2025-04-03T05:16:31.000Z,Mobile,Safari,iOS,side,10,1,0.1,ad-7,1\n')
+        store = self.store()
+        self.assertEqual(store.import_csv(path), {'imported': 2, 'skipped': 1})
+        self.assertEqual(store.import_csv(path), {'imported': 0, 'skipped': 0})
+
+        clicks = store.scan()
+        self.assertEqual(clicks['ad_id'].tolist(), ['unknown', 'ad-7'])
+        self.assertEqual(clicks['is_fraud'].tolist(), [0, 1])
+        self.assertTrue(store.imported(path))
+
+    def test_interrupted_import_resumes(self):
+        """Test imports interrupted before or after a batch was appended resume without duplicates"""
+        path = os.path.join(self.tmp_dir, 'live_clicks.csv')
+        with open(path, 'w') as f:
+            f.write('timestamp,device_type,browser,os,ad_position,scroll_depth,mouse_movement,click_duration,ad_id,is_fraud\n')
+            for i in range(25):
+                f.write(f'2025-04-03T05:{i:02d}:00.000Z,Desktop,Chrome,Win32,top,{i},3,0.2,ad-1,0\n')
+        store = self.store()
+        append, record = store._append_encoded, store._record_import
+
+        calls = []
+        def crash_on_second_batch(encoded):
+            calls.append(len(encoded))
+            if len(calls) == 2:
+                raise OSError("disk full")
+            append(encoded)
+
+        with patch.object(store, '_append_encoded', side_effect=crash_on_second_batch):
+            with self.assertRaises(OSError):
+                store.import_csv(path, batch_rows=10)
+        self.assertFalse(store.imported(path))
+
+        # Crash after the third batch was appended, before its progress was recorded
+        def crash_after_append(path, **progress):
+            if progress['pending'] is None and progress['offset'] > 0 and len(calls) == 3:
+                raise OSError("killed")
+            record(path, **progress)
+
+        with patch.object(store, '_record_import', side_effect=crash_after_append), \
+                patch.object(store, '_append_encoded', side_effect=crash_on_second_batch):
+            with self.assertRaises(OSError):
+                store.import_csv(path, batch_rows=10)
+
+        # A second worker finishes the import
+        self.assertEqual(self.store().import_csv(path, batch_rows=10)['imported'], 6)
+        self.assertEqual(store.scan()['scroll_depth'].tolist(), list(range(25)))
+        self.assertTrue(store.imported(path))
+
+    def test_concurrent_imports_share_the_file(self):
+        path = os.path.join(self.tmp_dir, 'live_clicks.csv')
+        with open(path, 'w') as f:
+            for i in range(200):
+                f.write(f'2025-04-03T05:{i // 60:02d}:{i % 60:02d}.000Z,Desktop,Chrome,Win32,top,{i},3,0.2,ad-1,0\n')
+        stores = [self.store(), self.store()]
+        results = []
+        threads = [threading.Thread(target=lambda s=s: results.append(s.import_csv(path, batch_rows=7)))
+                   for s in stores]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sum(result['imported'] for result in results), 200)
+        self.assertEqual(sorted(stores[0].scan()['scroll_depth']), list(range(200)))
+
+    def test_live_clicks_endpoints(self):
+        store = self.store()
+        client = app.test_client()
+        stream = MagicMock()
+        with patch('api_routes.get_click_store', return_value=store), \
+                patch('api_routes.get_click_stream', return_value=stream):
+            body = {'timestamp': '2025-04-03T05:16:30.704Z', 'device_type': 'Desktop', 'browser': 'Chrome',
+                    'operating_system': 'Win32', 'ad_position': 'top', 'scroll_depth': 40,
+                    'mouse_movement': 7, 'click_duration': 0.3, 'ad_id': 'ad-1'}
+            self.assertEqual(client.post('/append-csv', json=body).status_code, 200)
+            self.assertEqual(client.post('/append-csv', json=dict(body, timestamp='soon')).status_code, 400)
+            self.assertEqual(stream.notify.call_count, 1)
+
+            clicks = client.get('/api/live-clicks').get_json()
+            self.assertEqual(clicks, [{'timestamp': '2025-04-03T05:16:30.704Z', 'device_type': 'Desktop',
+                                       'browser': 'Chrome', 'os': 'Win32', 'ad_position': 'top',
+                                       'scroll_depth': 40.0, 'mouse_movement': 7.0, 'click_duration': 0.3,
+                                       'ad_id': 'ad-1', 'is_fraud': 0}])
+            self.assertEqual(client.get('/api/live-clicks?start=2025-04-04').get_json(), [])
+            self.assertEqual(client.get('/api/live-clicks?start=whenever').status_code, 400)
+
+            page = client.get('/api/live-clicks?since=0&limit=5').get_json()
+            self.assertEqual((len(page['clicks']), page['cursor'], page['has_more']), (1, 1, False))
+            self.assertEqual(client.get('/api/live-clicks?since=1').get_json()['clicks'], [])
+            self.assertEqual(client.get('/api/live-clicks?since=-1').status_code, 400)
+
+        path = os.path.join(self.tmp_dir, 'live_clicks.csv')
+        with patch('api_routes.get_click_store', return_value=None), \
+                patch('api_routes.get_csv_click_cache', return_value=CsvClickCache(path)):
+            self.assertEqual(client.get('/api/live-clicks').status_code, 404)
+            with open(path, 'w') as f:
+                f.write('timestamp,device_type,browser,os,ad_position,scroll_depth,mouse_movement,click_duration,is_fraud\n'
+                        '2025-04-03T05:16:30.704Z,Desktop,Chrome,Win32,top,50,3,0.2,1\n')
+            clicks = client.get('/api/live-clicks').get_json()
+            self.assertEqual((clicks[0]['ad_id'], clicks[0]['is_fraud']), ('unknown', 1))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+import sys
+import os
+import json
+import time
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Add the parent directory to path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app
+from click_store import ClickStore
+from click_stream import ClickStream, StreamFull, subscriber_limit
+from tests.test_click_store import make_click
+
+
+def parse_frame(frame):
+    """(event, id, data) of an SSE frame; event is None for comments and retry frames"""
+    fields = dict(line.split(': ', 1) for line in frame.decode().strip().split('\n') if not line.startswith(':'))
+    data = json.loads(fields['data']) if 'data' in fields else None
+    return fields.get('event'), int(fields['id']) if 'id' in fields else None, data
+
+
+def read_events(frames, count, timeout=10):
+    """Read frames until count click/reset/dropped events arrived"""
+    events = []
+    deadline = time.time() + timeout
+    while len(events) < count and time.time() < deadline:
+        event, event_id, data = parse_frame(next(frames))
+        if event is not None:
+            events.append((event, event_id, data))
+    return events
+
+class TestClickStream(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.store = ClickStore(os.path.join(self.tmp_dir, 'clicks'), partition_s=60, segment_records=8,
+                                block_records=3)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def stream(self, **kwargs):
+        settings = dict(poll_s=0.05, heartbeat_s=0.1)
+        settings.update(kwargs)
+        return ClickStream(self.store.read_since, self.store.end_cursor, **settings)
+
+    def append(self, stream, first, count):
+        self.store.append_many([make_click(i, i * 10) for i in range(first, first + count)])
+        stream.notify()
+
+    def test_clicks_fan_out_to_subscribers(self):
+        stream = self.stream()
+        self.append(stream, 0, 2)  # Before anyone subscribed: not pushed
+        first, second = stream.subscribe(), stream.subscribe()
+        self.append(stream, 2, 3)
+        for frames in (first, second):
+            events = read_events(frames, 3)
+            self.assertEqual([(event, event_id) for event, event_id, _ in events],
+                             [('click', 3), ('click', 4), ('click', 5)])
+            self.assertEqual(events[0][2]['scroll_depth'], 2.0)
+            self.assertIn('is_fraud', events[0][2])
+        first.close()
+        second.close()
+        self.assertEqual(stream.stats()['subscribers'], 0)
+        self.assertEqual(stream.stats()['published'], 3)
+
+    def test_resume_from_last_event_id(self):
+        stream = self.stream()
+        self.append(stream, 0, 12)
+        frames = stream.subscribe(last_event_id=4)
+        self.append(stream, 12, 2)
+        self.assertEqual([event_id for _, event_id, _ in read_events(frames, 10)], list(range(5, 15)))
+        frames.close()
+
+        # Too far behind: told to refetch from the cursor where the live feed starts
+        frames = self.stream(max_replay=3).subscribe(last_event_id=0)
+        self.assertEqual(read_events(frames, 1), [('reset', 14, {'cursor': 14})])
+        frames.close()
+
+    def test_slow_subscriber_is_dropped(self):
+        stream = self.stream(max_buffer=3)
+        slow, fast = stream.subscribe(), stream.subscribe()
+        next(slow)  # retry frame
+        self.append(stream, 0, 1)
+        self.assertEqual(read_events(fast, 1)[0][1], 1)
+        # The slow subscriber still holds the first click, so three more overflow its queue
+        self.append(stream, 1, 3)
+        self.assertEqual([event_id for _, event_id, _ in read_events(fast, 3)], [2, 3, 4])
+        self.assertEqual(read_events(slow, 1)[0][0], 'dropped')
+        self.assertEqual(stream.stats()['dropped'], 1)
+        fast.close()
+
+    def test_subscriber_limit_and_endpoint(self):
+        stream = self.stream(max_subscribers=1)
+        self.append(stream, 0, 3)
+        client = app.test_client()
+        with patch('api_routes.get_click_stream', return_value=stream):
+            response = client.get('/api/live-clicks/stream', headers={'Last-Event-ID': '1'})
+            self.assertEqual(response.mimetype, 'text/event-stream')
+            self.assertEqual([event_id for _, event_id, _ in read_events(response.response, 2)], [2, 3])
+
+            with self.assertRaises(StreamFull):
+                stream.subscribe()
+            self.assertEqual(client.get('/api/live-clicks/stream').status_code, 503)
+            response.close()
+            self.assertEqual(client.get('/api/live-clicks/stream?last_event_id=x').status_code, 400)
+
+    def test_stream_closed_before_it_starts_frees_its_slot(self):
+        """Test a client that disconnects before the first frame does not keep its subscriber slot"""
+        stream = self.stream(max_subscribers=2)
+        for _ in range(3):
+            stream.subscribe().close()
+        self.assertEqual(stream.stats()['subscribers'], 0)
+
+        # Dispatch without iterating the body, then close it as the server does on disconnect
+        with patch('api_routes.get_click_stream', return_value=stream), \
+                app.test_request_context('/api/live-clicks/stream'):
+            response = app.full_dispatch_request()
+        self.assertEqual(stream.stats()['subscribers'], 1)
+        response.close()
+        self.assertEqual(stream.stats()['subscribers'], 0)
+
+    def test_subscriber_limit_leaves_threads_for_requests(self):
+        """Test streams get at most a quarter of gunicorn's threads, whatever is configured"""
+        self.assertEqual(subscriber_limit(None, threads=32), 8)
+        self.assertEqual(subscriber_limit(100, threads=32), 8)
+        self.assertEqual(subscriber_limit(3, threads=32), 3)
+        self.assertEqual(subscriber_limit(None, threads=2), 1)
+        with patch.dict(os.environ, {'GUNICORN_THREADS': '16'}):
+            self.assertEqual(subscriber_limit(50), 4)
+        with patch.dict(os.environ, clear=True):
+            self.assertEqual((subscriber_limit(50), subscriber_limit()), (50, 100))
+
+if __name__ == '__main__':
+    unittest.main()
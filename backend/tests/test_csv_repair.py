@@ -0,0 +1,73 @@
+import sys
+import os
+import io
+import unittest
+import pandas as pd
+
+# Add the parent directory to path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from batch_scoring import ChunkScorer
+from csv_repair import REPAIR_RULES, repair_chunk, summarize_counts
+from tests.test_feature_pipeline import make_clicks
+
+NOW = pd.Timestamp('2025-06-01T00:00:00Z')
+
+DIRTY_CSV = """timestamp,device_type,browser,operating_system,ad_position,device_ip_reputation,scroll_depth,mouse_movement,keystrokes_detected,click_duration,bot_likelihood_score,VPN_usage,proxy_usage
+2024-01-01 00:00:00, Mobile ,Chrome,Android,top,Good,40,100,3,1.2,0.1,yes,0
+2027-03-01T10:00:00,Desktop,Chrome,Windows,top,Good,,100,3,1.2,0.1,1,False
+notadate,,Chrome,Windows,top,Good,deep,100,3,1.2,0.1,0,0
+"""
+
+class TestCsvRepair(unittest.TestCase):
+    def setUp(self):
+        self.dirty = pd.read_csv(io.StringIO(DIRTY_CSV), dtype=str)
+
+    def test_rules_fix_and_count(self):
+        """Test each rule rewrites or rejects the values it matches and counts them"""
+        repaired, counts = repair_chunk(self.dirty, now=NOW)
+
+        self.assertEqual(set(counts), set(REPAIR_RULES))
+        self.assertEqual(repaired['device_type'].iloc[0], 'Mobile')
+        self.assertEqual(list(repaired['VPN_usage']), ['1', '1', '0'])
+        self.assertEqual(repaired['proxy_usage'].iloc[1], '0')
+        self.assertEqual(repaired['scroll_depth'].iloc[1], '0')
+        self.assertEqual(repaired['timestamp'].iloc[1], '2025-03-01T10:00:00')
+        # Rejected values are left as they were for validation to report
+        self.assertEqual(repaired['scroll_depth'].iloc[2], 'deep')
+        self.assertEqual(repaired['timestamp'].iloc[2], 'notadate')
+        self.assertEqual(counts, {
+            'missing_column': 0, 'padded_text': 1, 'blank_numeric': 1, 'flag_text': 2, 'future_timestamp': 1,
+            'invalid_numeric': 1, 'invalid_timestamp': 1, 'missing_category': 1
+        })
+        self.assertEqual(summarize_counts(counts)['fixed_values'], 5)
+        self.assertEqual(summarize_counts(counts)['rejected_values'], 3)
+
+    def test_missing_column_gets_default(self):
+        clicks = make_clicks(10, seed=2).drop(columns=['ad_position', 'keystrokes_detected'])
+        repaired, counts = repair_chunk(clicks, now=NOW)
+
+        self.assertEqual(counts['missing_column'], 20)
+        self.assertEqual(set(repaired['ad_position']), {'unknown'})
+        self.assertEqual(set(repaired['keystrokes_detected']), {0})
+
+    def test_clean_chunk_is_unchanged(self):
+        clicks = make_clicks(50, seed=4).astype(str)
+        repaired, counts = repair_chunk(clicks, now=NOW)
+
+        pd.testing.assert_frame_equal(repaired, clicks)
+        self.assertEqual(sum(counts.values()), 0)
+
+    def test_scorer_scores_repaired_rows(self):
+        """Test a repairing scorer scores rows that would otherwise fail validation"""
+        raw = ChunkScorer(repair=False).score(self.dirty)
+        repaired = ChunkScorer(repair=True)
+        scored = repaired.score(self.dirty)
+
+        self.assertTrue(raw['error'].iloc[1].startswith('Missing required field'))
+        self.assertEqual(list(scored['error'].iloc[:2]), ['', ''])
+        self.assertNotEqual(scored['error'].iloc[2], '')
+        self.assertEqual(repaired.repairs['flag_text'], 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import sys
+import os
+import unittest
+from unittest.mock import MagicMock, patch
+import numpy as np
+from scipy import sparse as sp
+
+# Add the parent directory to path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ensemble import EnsembleScorer, accepts_sparse, fit_stacker
+from feature_pipeline import dense_blocks
+
+class ColumnModel:
+    """sklearn-style model whose fraud probability is one input column"""
+    def __init__(self, column):
+        self.column = column
+
+    def predict_proba(self, X):
+        p = X[:, self.column]
+        return np.column_stack([1 - p, p])
+
+class KerasStyleModel:
+    """Keras-style model returning (n, 1) probabilities"""
+    def predict(self, X, verbose=0):
+        return X[:, 2:3]
+
+class TestEnsemble(unittest.TestCase):
+    def setUp(self):
+        self.members = {
+            'random_forest': (ColumnModel(0), 'sklearn'),
+            'xgboost': (ColumnModel(1), 'sklearn'),
+            'neural_network': (KerasStyleModel(), 'numpy')
+        }
+        self.X = np.array([[0.2, 0.4, 0.9], [0.1, 0.1, 0.1]])
+
+    def test_strategies(self):
+        """Test mean, weighted and max combinations"""
+        scorer = EnsembleScorer(self.members, weights={'neural_network': 2.0})
+
+        np.testing.assert_allclose(scorer.score(self.X).combined, [0.5, 0.1], rtol=1e-6)
+        np.testing.assert_allclose(scorer.score(self.X, 'weighted').combined, [0.6, 0.1], rtol=1e-6)
+        np.testing.assert_allclose(scorer.score(self.X, 'max').combined, [0.9, 0.1], rtol=1e-6)
+
+    def test_result_is_one_matrix(self):
+        """Test member probabilities come back as one float32 column per member"""
+        result = EnsembleScorer(self.members, strategy='max').score(self.X)
+
+        self.assertEqual(result.names, ['random_forest', 'xgboost', 'neural_network'])
+        self.assertEqual(result.probabilities.shape, (2, 3))
+        self.assertEqual(result.probabilities.dtype, np.float32)
+        np.testing.assert_allclose(result.member('neural_network'), [0.9, 0.1], rtol=1e-6)
+        np.testing.assert_array_equal(result.is_fraud, [True, False])
+
+    def test_sparse_input(self):
+        """Test CSR goes as-is to members that accept it and in dense float32 blocks to the rest"""
+        from sklearn.ensemble import RandomForestClassifier
+
+        rng = np.random.default_rng(0)
+        X = np.where(rng.random((300, 6)) < 0.7, 0.0, rng.random((300, 6)))
+        forest = RandomForestClassifier(n_estimators=5, random_state=0).fit(X, (X[:, 0] > 0.1).astype(int))
+        seen = []
+
+        class DenseOnlyModel(KerasStyleModel):
+            def predict(self, X, verbose=0):
+                seen.append((type(X), X.dtype, X.shape[0]))
+                return X[:, 2:3]
+
+        scorer = EnsembleScorer({'random_forest': (forest, 'sklearn'), 'neural_network': (DenseOnlyModel(), 'numpy')})
+        with patch('ensemble.dense_blocks', lambda X: dense_blocks(X, chunk_rows=128)):
+            sparse_result = scorer.score(sp.csr_matrix(X))
+        dense_result = scorer.score(X)
+
+        np.testing.assert_array_equal(sparse_result.probabilities, dense_result.probabilities)
+        self.assertEqual(seen[:3], [(np.ndarray, np.float32, 128), (np.ndarray, np.float32, 128),
+                                    (np.ndarray, np.float32, 44)])
+        self.assertTrue(accepts_sparse(forest))
+        self.assertFalse(accepts_sparse(DenseOnlyModel()))
+
+    def test_failed_member_is_excluded(self):
+        """Test a failing member is reported and left out of the combination"""
+        broken = MagicMock()
+        broken.predict_proba.side_effect = RuntimeError('corrupt model')
+        members = dict(self.members, xgboost=(broken, 'sklearn'))
+
+        result = EnsembleScorer(members).score(self.X)
+
+        self.assertEqual(result.names, ['random_forest', 'neural_network'])
+        self.assertIn('corrupt model', result.errors['xgboost'])
+        np.testing.assert_allclose(result.combined, [0.55, 0.1], rtol=1e-6)
+
+    def test_stacking(self):
+        """Test the fitted stacker ranks rows like the member it learned to trust"""
+        rng = np.random.default_rng(0)
+        y = rng.integers(0, 2, 400)
+        noise = rng.random(400)
+        probabilities = np.column_stack([noise, 0.2 + 0.6 * y, noise])
+        stacker = fit_stacker(probabilities, y, ['random_forest', 'xgboost', 'neural_network'])
+        scorer = EnsembleScorer(self.members, strategy='stacking', stacker=stacker)
+
+        combined = scorer.score(np.array([[0.5, 0.8, 0.5], [0.5, 0.2, 0.5]])).combined
+        self.assertGreater(combined[0], 0.5)
+        self.assertLess(combined[1], 0.5)
+
+    def test_invalid_strategies(self):
+        """Test unknown strategies and stacking without a stacker are rejected"""
+        with self.assertRaises(ValueError):
+            EnsembleScorer(self.members, strategy='vote')
+        with self.assertRaises(ValueError):
+            EnsembleScorer(self.members).score(self.X, 'stacking')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import sys
+import os
+import unittest
+from unittest.mock import MagicMock, patch
+import numpy as np
+import pandas as pd
+from scipy import sparse as sp
+
+# Add the parent directory to path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from data_preprocessing import feature_engineering, create_preprocessing_pipeline
+from feature_pipeline import SPARSE_THRESHOLD, compile_pipeline, dense_blocks, get_compiled_pipeline
+
+def make_clicks(n, seed=0):
+    """Generate raw click records covering known and unknown categories"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'timestamp': pd.date_range('2024-01-01', periods=n, freq='37min').strftime('%Y-%m-%d %H:%M:%S'),
+        'device_type': rng.choice(['Desktop', 'Mobile', 'Tablet', 'SmartTV'], n),
+        'browser': rng.choice(['Chrome', 'Edge', 'Firefox', 'Opera', 'Safari'], n),
+        'operating_system': rng.choice(['Android', 'Linux', 'Windows', 'iOS', 'macOS'], n),
+        'ad_position': rng.choice(['top', 'side'], n),
+        'device_ip_reputation': rng.choice(['Good', 'Suspicious', 'Bad', 'Unknown'], n),
+        'scroll_depth': rng.integers(0, 100, n),
+        'mouse_movement': rng.integers(0, 500, n),
+        'keystrokes_detected': rng.integers(0, 50, n),
+        'click_duration': rng.random(n) * 3,
+        'bot_likelihood_score': rng.random(n),
+        'VPN_usage': rng.integers(0, 2, n),
+        'proxy_usage': rng.integers(0, 2, n)
+    })
+
+class TestFeaturePipeline(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Fit a real preprocessor on synthetic clicks"""
+        train = make_clicks(500, seed=1)
+        train = train[train['device_type'] != 'SmartTV']
+        cls.preprocessor = create_preprocessing_pipeline()
+        cls.preprocessor.fit(feature_engineering(train.copy()))
+        cls.plan = compile_pipeline(cls.preprocessor)
+
+    def sklearn_transform(self, df):
+        X = self.preprocessor.transform(feature_engineering(df.copy()))
+        return X.toarray() if hasattr(X, 'toarray') else X
+
+    def test_dataframe_parity(self):
+        """Test the compiled plan is bit-identical to the sklearn path on a DataFrame"""
+        df = make_clicks(300, seed=2)
+        np.testing.assert_array_equal(self.plan.transform(df), self.sklearn_transform(df))
+
+    def test_records_parity(self):
+        """Test parity for single records and lists of records"""
+        df = make_clicks(40, seed=3)
+        records = df.to_dict('records')
+
+        np.testing.assert_array_equal(self.plan.transform(records), self.sklearn_transform(df))
+        np.testing.assert_array_equal(self.plan.transform(records[0]), self.sklearn_transform(df.head(1)))
+
+    def test_column_arrays_parity(self):
+        """Test parity for a dict of column arrays"""
+        df = make_clicks(100, seed=4)
+        columns = {name: df[name].to_numpy() for name in df.columns}
+        np.testing.assert_array_equal(self.plan.transform(columns), self.sklearn_transform(df))
+
+    def test_iso_timestamps_parity(self):
+        """Test ISO timestamps with offsets match pandas parsing"""
+        df = make_clicks(1, seed=5)
+        for timestamp in ['2023-06-15T14:30:00', '2023-06-17T23:59:59Z', '2023-06-18T01:00:00+05:30']:
+            df['timestamp'] = [timestamp]
+            np.testing.assert_array_equal(self.plan.transform(df.to_dict('records')), self.sklearn_transform(df))
+
+    def test_sparse_parity(self):
+        """Test the CSR output holds the dense matrix's values in float32"""
+        df = make_clicks(300, seed=6)
+        X = self.plan.transform(df, sparse=True)
+
+        self.assertTrue(sp.isspmatrix_csr(X))
+        self.assertEqual(X.dtype, np.float32)
+        np.testing.assert_array_equal(X.toarray(), self.sklearn_transform(df).astype(np.float32))
+        # SmartTV is unknown to the encoder, so those rows have one entry fewer
+        unknown = (df['device_type'] == 'SmartTV').to_numpy()
+        np.testing.assert_array_equal(np.diff(X.indptr), np.where(unknown, 9, 10))
+
+    def test_auto_sparse_follows_density(self):
+        """Test sparse='auto' only returns CSR when one-hot columns dominate"""
+        df = make_clicks(20, seed=7)
+        self.assertGreaterEqual(self.plan.density, SPARSE_THRESHOLD)
+        self.assertIsInstance(self.plan.transform(df, sparse='auto'), np.ndarray)
+
+        with patch('feature_pipeline.SPARSE_THRESHOLD', 1.0):
+            self.assertTrue(sp.issparse(self.plan.transform(df, sparse='auto')))
+
+    def test_dense_blocks(self):
+        X = sp.csr_matrix(self.plan.transform(make_clicks(25, seed=8)))
+        blocks = list(dense_blocks(X, chunk_rows=10))
+        self.assertEqual([len(b) for b in blocks], [10, 10, 5])
+        self.assertEqual(blocks[0].dtype, np.float32)
+        np.testing.assert_array_equal(np.vstack(blocks), X.toarray().astype(np.float32))
+
+    def test_missing_column_raises(self):
+        """Test a missing raw column raises like feature_engineering does"""
+        record = make_clicks(1).to_dict('records')[0]
+        del record['timestamp']
+        with self.assertRaises(KeyError):
+            self.plan.transform(record)
+
+    def test_unsupported_preprocessor_falls_back(self):
+        """Test preprocessors that cannot be compiled are reported as None"""
+        self.assertIsNone(get_compiled_pipeline(MagicMock()))
+        self.assertIs(get_compiled_pipeline(self.preprocessor), get_compiled_pipeline(self.preprocessor))
+
+if __name__ == '__main__':
+    unittest.main()
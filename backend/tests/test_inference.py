@@ -1,7 +1,7 @@
 import sys
 import os
 import unittest
-from unittest.mock import patch, MagicMock, PropertyMock
+from unittest.mock import patch, MagicMock
 import numpy as np
 import pandas as pd
 
@@ -11,29 +11,14 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 from simple_inference import load_model, preprocess_input, predict
 
 class TestInference(unittest.TestCase):
-    @patch('simple_inference.joblib.load')
-    @patch('simple_inference.pathlib.Path')
-    @patch('tensorflow.keras.models.load_model')
-    def test_load_model(self, mock_keras_load, mock_path, mock_joblib_load):
+    @patch('simple_inference.get_registry')
+    def test_load_model(self, mock_get_registry):
         """Test the model loading functionality"""
         # Setup mocks
-        mock_path_instance = MagicMock()
-        mock_path.return_value = mock_path_instance
-        mock_path_instance.__truediv__.return_value = mock_path_instance
-        
-        # Mock exists() to return True for the first model path (.keras)
-        mock_path_instance.exists.side_effect = [True, False, False]
-        
-        # Properly set up the suffix property
-        type(mock_path_instance).suffix = PropertyMock(return_value='.keras')
-        
-        # Mock preprocessor loading
         mock_preprocessor = MagicMock()
-        mock_joblib_load.return_value = {'preprocessor': mock_preprocessor}
-        
-        # Mock model loading
         mock_model = MagicMock()
-        mock_keras_load.return_value = mock_model
+        mock_artifacts = MagicMock(preprocessor=mock_preprocessor, model=mock_model, model_type="keras")
+        mock_get_registry.return_value.get.return_value = mock_artifacts
         
         # Call the function
         preprocessor, model, model_type = load_model()
@@ -42,8 +27,7 @@ class TestInference(unittest.TestCase):
         self.assertEqual(preprocessor, mock_preprocessor)
         self.assertEqual(model, mock_model)
         self.assertEqual(model_type, "keras")
-        mock_joblib_load.assert_called_once()
-        mock_keras_load.assert_called_once()
+        mock_get_registry.return_value.get.assert_called_once()
     
     @patch('simple_inference.feature_engineering')
     def test_preprocess_input(self, mock_feature_engineering):
@@ -36,22 +36,8 @@ class TestIntegration(unittest.TestCase):
             "proxy_usage": 0
         }
     
-    # Fix the path to match your actual module structure
-    @patch('simple_inference.joblib.load')
-    def test_end_to_end_prediction_flow(self, mock_load):
+    def test_end_to_end_prediction_flow(self):
         """Test the entire prediction flow from request to response"""
-        # Create a simple mock model instead of using model_training
-        mock_model = RandomForestClassifier()
-        X = np.array([[0, 0], [1, 1]])
-        y = np.array([0, 1])
-        mock_model.fit(X, y)
-        
-        # Create real preprocessor
-        mock_preprocessor = data_preprocessing.create_preprocessing_pipeline()
-        
-        # Configure mock to return our objects
-        mock_load.return_value = {'preprocessor': mock_preprocessor}
-        
         # Make the request to the correct endpoint
         response = self.app.post('/predict', 
                                 json=self.valid_input,
@@ -0,0 +1,100 @@
+import sys
+import os
+import threading
+import unittest
+from unittest.mock import patch
+
+# Add the parent directory to path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from micro_batching import MicroBatcher
+import simple_inference
+
+class TestMicroBatching(unittest.TestCase):
+    def _submit_concurrently(self, batcher, items):
+        results = [None] * len(items)
+        start = threading.Barrier(len(items))
+
+        def worker(i):
+            start.wait()
+            results[i] = batcher.submit(items[i], timeout=5)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(items))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return results
+
+    def test_concurrent_requests_share_a_batch(self):
+        """Test concurrent submissions are scored together and get their own rows"""
+        calls = []
+
+        def score_fn(items):
+            calls.append(len(items))
+            return [item * 10 for item in items]
+
+        batcher = MicroBatcher(score_fn, max_batch_size=32, max_wait_ms=200)
+        results = self._submit_concurrently(batcher, list(range(8)))
+
+        self.assertEqual([r for r, _ in results], [i * 10 for i in range(8)])
+        self.assertLess(len(calls), 8)
+        self.assertEqual(sum(calls), 8)
+        for _, metadata in results:
+            self.assertGreaterEqual(metadata['batch_size'], 1)
+            self.assertGreaterEqual(metadata['queue_delay_ms'], 0)
+
+    def test_max_batch_size_is_respected(self):
+        """Test batches never exceed max_batch_size"""
+        calls = []
+
+        def score_fn(items):
+            calls.append(len(items))
+            return items
+
+        batcher = MicroBatcher(score_fn, max_batch_size=3, max_wait_ms=200)
+        self._submit_concurrently(batcher, list(range(10)))
+
+        self.assertTrue(all(size <= 3 for size in calls))
+        self.assertEqual(sum(calls), 10)
+
+    def test_bad_item_does_not_fail_the_batch(self):
+        """Test a failing item is isolated from the rest of its batch"""
+        def score_fn(items):
+            if 'bad' in items:
+                raise ValueError('bad record')
+            return [item.upper() for item in items]
+
+        batcher = MicroBatcher(score_fn, max_batch_size=8, max_wait_ms=50)
+        outcomes = {}
+
+        def worker(item):
+            try:
+                outcomes[item] = batcher.submit(item, timeout=5)[0]
+            except ValueError as e:
+                outcomes[item] = e
+
+        threads = [threading.Thread(target=worker, args=(item,)) for item in ['a', 'bad', 'c']]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(outcomes['a'], 'A')
+        self.assertEqual(outcomes['c'], 'C')
+        self.assertIsInstance(outcomes['bad'], ValueError)
+
+    @patch('simple_inference.get_batcher')
+    def test_predict_reports_batch_metadata(self, mock_get_batcher):
+        """Test predict includes batch size and queue delay when batching is on"""
+        mock_get_batcher.return_value.submit.return_value = (
+            (0.8, True, 'keras'), {'batch_size': 4, 'queue_delay_ms': 1.5}
+        )
+
+        result = simple_inference.predict({'device_type': 'Mobile'})
+
+        self.assertTrue(result['prediction']['is_fraud'])
+        self.assertEqual(result['metadata']['batch']['batch_size'], 4)
+
+if __name__ == '__main__':
+    unittest.main()
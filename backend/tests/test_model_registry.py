@@ -0,0 +1,114 @@
+import sys
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+import joblib
+from sklearn.dummy import DummyClassifier
+from sklearn.preprocessing import StandardScaler
+
+# Add the parent directory to path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import model_registry
+from model_registry import ModelRegistry, publish_model
+
+class TestModelRegistry(unittest.TestCase):
+    def setUp(self):
+        """Create a models directory with a preprocessor and an sklearn model"""
+        self.models_dir = tempfile.mkdtemp()
+        joblib.dump({'preprocessor': StandardScaler()}, os.path.join(self.models_dir, 'preprocessor.pkl'))
+        self._write_model(DummyClassifier(strategy='most_frequent'))
+
+    def tearDown(self):
+        shutil.rmtree(self.models_dir, ignore_errors=True)
+
+    def _write_model(self, model, name='fraud_detection_model.pkl'):
+        path = os.path.join(self.models_dir, name)
+        joblib.dump(model, path)
+        # Bump mtime explicitly so the change is visible on coarse filesystems
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        return path
+
+    def test_loads_once_and_shares_artifacts(self):
+        """Test repeated gets return the same objects without reloading"""
+        registry = ModelRegistry(self.models_dir, check_interval=0)
+        with patch('model_registry.load_artifacts', wraps=model_registry.load_artifacts) as mock_load:
+            first = registry.get()
+            second = registry.get()
+
+        self.assertIs(first.model, second.model)
+        self.assertEqual(first.model_type, 'sklearn')
+        mock_load.assert_called_once()
+
+    def test_hot_swaps_on_content_change(self):
+        """Test a new model file is picked up and listeners are notified"""
+        registry = ModelRegistry(self.models_dir, check_interval=0)
+        swapped = []
+        registry.add_listener(swapped.append)
+        first = registry.get()
+
+        self._write_model(DummyClassifier(strategy='constant', constant=1))
+        second = registry.get()
+
+        self.assertIsNot(first.model, second.model)
+        self.assertNotEqual(first.version, second.version)
+        self.assertEqual(second.model.strategy, 'constant')
+        self.assertEqual(len(swapped), 2)
+
+    def test_touch_without_content_change_keeps_version(self):
+        """Test an mtime change with identical content does not reload"""
+        registry = ModelRegistry(self.models_dir, check_interval=0)
+        first = registry.get()
+
+        path = os.path.join(self.models_dir, 'fraud_detection_model.pkl')
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 5_000_000_000))
+
+        self.assertIs(registry.get().model, first.model)
+
+    def test_failed_reload_keeps_last_good_model(self):
+        """Test a corrupt artifact does not replace the serving model"""
+        registry = ModelRegistry(self.models_dir, check_interval=0)
+        first = registry.get()
+
+        path = os.path.join(self.models_dir, 'fraud_detection_model.pkl')
+        with open(path, 'wb') as f:
+            f.write(b'not a pickle')
+
+        self.assertIs(registry.get().model, first.model)
+
+    def test_concurrent_first_load(self):
+        """Test concurrent callers trigger a single load"""
+        registry = ModelRegistry(self.models_dir, check_interval=60)
+        results = []
+        with patch('model_registry.load_artifacts', wraps=model_registry.load_artifacts) as mock_load:
+            threads = [threading.Thread(target=lambda: results.append(registry.get())) for _ in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+        self.assertEqual(len(results), 8)
+        self.assertEqual(len({id(r.model) for r in results}), 1)
+        mock_load.assert_called_once()
+
+    def test_publish_model_replaces_stale_formats(self):
+        """Test publishing removes serving models of other formats"""
+        stale = os.path.join(self.models_dir, 'fraud_detection_model.keras')
+        with open(stale, 'wb') as f:
+            f.write(b'stale')
+        staged = os.path.join(self.models_dir, 'fraud_detection_model.staging.pkl')
+        joblib.dump(DummyClassifier(), staged)
+
+        target = publish_model(staged, self.models_dir)
+
+        self.assertEqual(target.name, 'fraud_detection_model.pkl')
+        self.assertFalse(os.path.exists(stale))
+        self.assertFalse(os.path.exists(staged))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import sys
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+# Add the parent directory to path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from tensorflow.keras.models import Sequential
+from tensorflow.keras.layers import Input, Dense, Dropout, BatchNormalization
+from numpy_model import NumpyModel, export_keras_model, load_exported_model
+from model_registry import file_sha256
+
+def build_model(n_features=20, seed=0):
+    """Build a model shaped like create_model('neural_network') with non-trivial BatchNorm statistics"""
+    rng = np.random.default_rng(seed)
+    model = Sequential([Input((n_features,))])
+    for units in [16, 8]:
+        model.add(Dense(units, activation='relu'))
+        model.add(BatchNormalization())
+        model.add(Dropout(0.3))
+    model.add(Dense(1, activation='sigmoid'))
+
+    for layer in model.layers:
+        if isinstance(layer, BatchNormalization):
+            size = layer.gamma.shape[0]
+            layer.set_weights([
+                rng.uniform(0.5, 1.5, size), rng.normal(0, 0.2, size),
+                rng.normal(0, 1.0, size), rng.uniform(0.5, 2.0, size)
+            ])
+        elif isinstance(layer, Dense):
+            kernel, bias = layer.get_weights()
+            layer.set_weights([rng.normal(0, 0.5, kernel.shape), rng.normal(0, 0.1, bias.shape)])
+    return model
+
+class TestNumpyModel(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.model = build_model()
+        self.X = np.random.default_rng(1).standard_normal((500, 20))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_forward_pass_matches_keras(self):
+        """Test the folded NumPy engine matches Keras within tolerance"""
+        path = os.path.join(self.tmp_dir, 'model.npz')
+        export_keras_model(self.model, path)
+        engine = NumpyModel.load(path)
+
+        expected = self.model.predict(self.X, verbose=0)
+        actual = engine.predict(self.X)
+
+        self.assertEqual(actual.shape, (500, 1))
+        self.assertEqual(actual.dtype, np.float32)
+        np.testing.assert_allclose(actual, expected, atol=1e-5)
+
+    def test_dropout_and_batchnorm_are_folded(self):
+        """Test only the Dense layers remain after folding"""
+        path = os.path.join(self.tmp_dir, 'model.npz')
+        engine = export_keras_model(self.model, path)
+
+        self.assertEqual([act for _, _, act in engine.layers], ['relu', 'relu', 'sigmoid'])
+
+    def test_stale_export_is_ignored(self):
+        """Test an export made from a different model file is not used"""
+        model_path = os.path.join(self.tmp_dir, 'fraud_detection_model.keras')
+        self.model.save(model_path)
+        export_keras_model(self.model, os.path.join(self.tmp_dir, 'fraud_detection_model.npz'),
+                           source_sha256=file_sha256(model_path))
+        self.assertIsNotNone(load_exported_model(model_path))
+
+        build_model(seed=2).save(model_path)
+        self.assertIsNone(load_exported_model(model_path))
+
+    def test_parity_failure_blocks_export(self):
+        """Test a failing parity check does not write an export"""
+        path = os.path.join(self.tmp_dir, 'model.npz')
+        with self.assertRaises(ValueError):
+            export_keras_model(self.model, path, tolerance=-1)
+        self.assertFalse(os.path.exists(path))
+
+if __name__ == '__main__':
+    unittest.main()
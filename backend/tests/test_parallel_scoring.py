@@ -0,0 +1,55 @@
+import sys
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+
+# Add the parent directory to path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from batch_scoring import ChunkScorer
+from parallel_scoring import ParallelScorer, partition_rows
+from tests.test_feature_pipeline import make_clicks
+
+class TestParallelScoring(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.mkdtemp()
+        cls.clicks = make_clicks(300, seed=5)
+        cls.clicks['scroll_depth'] = cls.clicks['scroll_depth'].astype(object)
+        cls.clicks.loc[250, 'scroll_depth'] = 'deep'
+        cls.path = os.path.join(cls.tmp_dir, 'clicks.csv')
+        cls.clicks.to_csv(cls.path, index=False)
+        cls.scorer = ParallelScorer(workers=2, partitions_per_worker=3)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.scorer.shutdown()
+        shutil.rmtree(cls.tmp_dir, ignore_errors=True)
+
+    def test_partition_rows(self):
+        """Test partitions cover every row once and end on line boundaries"""
+        data = b'a,b\n1,2\n3,4\n5,6\n\n'
+        header_end, slices = partition_rows(memoryview(data), 2)
+
+        self.assertEqual(header_end, 4)
+        self.assertEqual([n for _, n, _, _ in slices], [1, 2])
+        self.assertEqual(b''.join(data[start:end] for _, _, start, end in slices), b'1,2\n3,4\n5,6')
+
+    def test_matches_in_process_scoring(self):
+        """Test pooled results come back in row order and match scoring in one process"""
+        result, row_errors = self.scorer.score_csv(self.path)
+        expected = ChunkScorer().score(pd.read_csv(self.path, dtype=str))
+
+        self.assertEqual(list(row_errors), [250])
+        self.assertEqual(result.probabilities.shape, (300, len(result.names)))
+        np.testing.assert_allclose(result.combined, expected['ensemble_fraud_probability'].to_numpy(float),
+                                   rtol=1e-5, equal_nan=True)
+        for name in result.names:
+            np.testing.assert_allclose(result.member(name), expected[f'{name}_fraud_probability'].to_numpy(float),
+                                       rtol=1e-5, equal_nan=True)
+
+if __name__ == '__main__':
+    unittest.main()
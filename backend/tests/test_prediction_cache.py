@@ -0,0 +1,126 @@
+import sys
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest.mock import patch, MagicMock
+import numpy as np
+
+# Add the parent directory to path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import simple_inference
+from model_registry import ModelArtifacts
+from prediction_cache import (
+    MemoryCacheBackend, SqliteCacheBackend, PredictionCache, create_prediction_cache, row_keys
+)
+
+class CacheBackendTests:
+    """Behaviour shared by every cache backend"""
+
+    def make_backend(self, max_entries=3, ttl=60.0):
+        raise NotImplementedError
+
+    def test_hits_and_misses(self):
+        """Test stored values are returned and counted"""
+        backend = self.make_backend()
+        backend.put_many([('a', [0.9, True])])
+        self.assertEqual(backend.get_many(['a', 'b']), [[0.9, True], None])
+        stats = backend.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['size']), (1, 1, 1))
+
+    def test_ttl_expiry(self):
+        """Test entries past their TTL are misses"""
+        backend = self.make_backend(ttl=-1)
+        backend.put_many([('a', 1)])
+        self.assertEqual(backend.get_many(['a']), [None])
+        self.assertEqual(backend.stats()['expirations'], 1)
+
+    def test_lru_eviction(self):
+        """Test the least recently used entry is evicted first"""
+        backend = self.make_backend(max_entries=2)
+        backend.put_many([('a', 1)])
+        backend.put_many([('b', 2)])
+        backend.get_many(['a'])
+        backend.put_many([('c', 3)])
+        self.prune(backend)
+
+        self.assertEqual(backend.get_many(['a', 'b', 'c']), [1, None, 3])
+        self.assertEqual(backend.stats()['evictions'], 1)
+
+    def test_clear(self):
+        backend = self.make_backend()
+        backend.put_many([('a', 1)])
+        backend.clear()
+        self.assertEqual(backend.get_many(['a']), [None])
+
+    def prune(self, backend):
+        pass
+
+class TestMemoryCacheBackend(CacheBackendTests, unittest.TestCase):
+    def make_backend(self, max_entries=3, ttl=60.0):
+        return MemoryCacheBackend(max_entries=max_entries, ttl=ttl)
+
+class TestSqliteCacheBackend(CacheBackendTests, unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def make_backend(self, max_entries=3, ttl=60.0):
+        return SqliteCacheBackend(os.path.join(self.tmp_dir, 'cache.sqlite'), max_entries=max_entries, ttl=ttl)
+
+    def prune(self, backend):
+        # Eviction is batched; force it so the test is deterministic
+        backend._prune(backend._connection(), time.time())
+
+    def test_shared_between_instances(self):
+        """Test two backends on one file (as in two workers) see each other's entries"""
+        first, second = self.make_backend(), self.make_backend()
+        first.put_many([('a', [0.1, False])])
+        self.assertEqual(second.get_many(['a']), [[0.1, False]])
+
+class TestPredictionCache(unittest.TestCase):
+    def test_row_keys_are_content_addressed(self):
+        """Test keys depend only on row contents and model version"""
+        X = np.array([[1.0, 0.0], [1.0, -0.0], [2.0, 0.0]])
+        keys = row_keys(X, 'v1')
+        self.assertEqual(keys[0], keys[1])
+        self.assertNotEqual(keys[0], keys[2])
+        self.assertNotEqual(keys[0], row_keys(X, 'v2')[0])
+
+    def test_registry_swap_clears_cache(self):
+        """Test the cache empties when the registry swaps artifacts"""
+        registry = MagicMock()
+        cache = create_prediction_cache({'backend': 'memory'})
+        cache.attach_to_registry(registry)
+        cache.store(['a'], [0.5], [True])
+
+        listener = registry.add_listener.call_args[0][0]
+        listener(MagicMock(version='v2'))
+        self.assertEqual(cache.backend.get_many(['a']), [None])
+
+    def test_only_misses_are_scored(self):
+        """Test cached rows skip the model and results keep row order"""
+        model = MagicMock()
+        model.predict.side_effect = lambda X, verbose=0: X[:, :1] / 10.0
+        artifacts = ModelArtifacts(None, model, 'numpy', None, 'v1', 0.0)
+        cache = PredictionCache(MemoryCacheBackend())
+        X = np.array([[1.0], [2.0], [1.0], [9.0]])
+
+        with patch('simple_inference.get_prediction_cache', return_value=cache), \
+                patch('simple_inference.get_registry') as mock_registry:
+            mock_registry.return_value.get.return_value = artifacts
+            first = simple_inference.score_matrix_cached(X[:2], model, 'numpy')
+            second = simple_inference.score_matrix_cached(X, model, 'numpy')
+
+        np.testing.assert_allclose(first[0], [0.1, 0.2])
+        np.testing.assert_allclose(second[0], [0.1, 0.2, 0.1, 0.9])
+        np.testing.assert_array_equal(second[1], [False, False, False, True])
+        self.assertEqual(len(model.predict.call_args_list[-1][0][0]), 1)
+        self.assertEqual(cache.stats()['hits'], 3)
+
+if __name__ == '__main__':
+    unittest.main()
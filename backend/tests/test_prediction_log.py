@@ -0,0 +1,135 @@
+import sys
+import os
+import json
+import gzip
+import shutil
+import tempfile
+import threading
+import unittest
+import multiprocessing
+from unittest.mock import patch
+
+# Add the parent directory to path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from prediction_log import PredictionLogWriter
+
+def read_lines(path):
+    """Return the parsed entries of a plain or gzipped JSON-lines file"""
+    opener = gzip.open if str(path).endswith('.gz') else open
+    with opener(path, 'rt') as f:
+        return [json.loads(line) for line in f]
+
+def write_entries(path, worker_id, count):
+    writer = PredictionLogWriter(path, flush_interval=0, max_bytes=20000, compress=False)
+    for i in range(count):
+        writer.write({'worker': worker_id, 'i': i, 'padding': 'x' * 50})
+    writer.flush()
+
+class TestPredictionLog(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'predictions.log.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def all_entries(self):
+        entries = []
+        for name in sorted(os.listdir(self.tmp_dir)):
+            if name.startswith('predictions.log.json') and not name.endswith('.lock'):
+                entries.extend(read_lines(os.path.join(self.tmp_dir, name)))
+        return entries
+
+    def test_entries_are_written_in_order(self):
+        """Test queued entries reach the file as JSON lines after flush"""
+        writer = PredictionLogWriter(self.path, flush_interval=0)
+        for i in range(500):
+            self.assertTrue(writer.write({'i': i}))
+        self.assertTrue(writer.flush())
+
+        self.assertEqual([e['i'] for e in read_lines(self.path)], list(range(500)))
+        stats = writer.stats()
+        self.assertEqual(stats['written'], 500)
+        self.assertLessEqual(stats['batches'], 500)
+
+    def test_size_rotation_compresses_segments(self):
+        """Test the log rotates by size and closed segments are gzipped"""
+        writer = PredictionLogWriter(self.path, batch_size=10, flush_interval=0, max_bytes=2000)
+        for i in range(300):
+            writer.write({'i': i, 'padding': 'x' * 40})
+        writer.flush()
+
+        segments = [n for n in os.listdir(self.tmp_dir) if n.endswith('.gz')]
+        self.assertGreater(writer.stats()['rotations'], 0)
+        self.assertEqual(len(segments), writer.stats()['rotations'])
+        self.assertEqual(sorted(e['i'] for e in self.all_entries()), list(range(300)))
+
+    def test_backup_count_prunes_old_segments(self):
+        """Test only backup_count rotated segments are kept"""
+        writer = PredictionLogWriter(self.path, batch_size=5, flush_interval=0, max_bytes=500,
+                                     compress=False, backup_count=2)
+        for i in range(200):
+            writer.write({'i': i, 'padding': 'x' * 40})
+        writer.flush()
+
+        segments = [n for n in os.listdir(self.tmp_dir) if n.startswith('predictions.log.json.')
+                    and not n.endswith('.lock')]
+        self.assertEqual(len(segments), 2)
+
+    def test_time_rotation(self):
+        """Test a file last written in an earlier window is rotated before appending"""
+        with open(self.path, 'w') as f:
+            f.write(json.dumps({'old': True}) + '\n')
+        os.utime(self.path, (0, 0))
+
+        writer = PredictionLogWriter(self.path, flush_interval=0, rotate_interval=3600, compress=False)
+        writer.write({'new': True})
+        writer.flush()
+
+        self.assertEqual(read_lines(self.path), [{'new': True}])
+        self.assertEqual(writer.stats()['rotations'], 1)
+
+    def test_full_queue_drops_and_counts(self):
+        """Test the drop policy discards entries instead of blocking the caller"""
+        release = threading.Event()
+        writer = PredictionLogWriter(self.path, max_queue_size=2, batch_size=1, flush_interval=0)
+        with patch.object(writer, '_append', side_effect=lambda data: release.wait(5)):
+            results = [writer.write({'i': i}) for i in range(10)]
+            release.set()
+            writer.flush()
+
+        self.assertIn(False, results)
+        self.assertEqual(writer.stats()['dropped'], results.count(False))
+
+    def test_block_policy_waits_for_space(self):
+        """Test the block policy keeps entries when the writer catches up in time"""
+        writer = PredictionLogWriter(self.path, max_queue_size=2, batch_size=1, flush_interval=0,
+                                     queue_full_policy='block', block_timeout=5)
+        self.assertTrue(all(writer.write({'i': i}) for i in range(50)))
+        writer.flush()
+        self.assertEqual(len(read_lines(self.path)), 50)
+
+    def test_invalid_policy_raises(self):
+        """Test unknown queue-full policies are rejected"""
+        with self.assertRaises(ValueError):
+            PredictionLogWriter(self.path, queue_full_policy='ignore')
+
+    @unittest.skipUnless(hasattr(os, 'fork'), "requires fork")
+    def test_processes_share_log_without_torn_lines(self):
+        """Test concurrent processes rotating one log never interleave partial lines"""
+        ctx = multiprocessing.get_context('fork')
+        workers = [ctx.Process(target=write_entries, args=(self.path, w, 400)) for w in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(30)
+            self.assertEqual(worker.exitcode, 0)
+
+        entries = self.all_entries()
+        self.assertEqual(len(entries), 1600)
+        for w in range(4):
+            self.assertEqual(sorted(e['i'] for e in entries if e['worker'] == w), list(range(400)))
+
+if __name__ == '__main__':
+    unittest.main()
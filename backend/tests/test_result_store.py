@@ -0,0 +1,117 @@
+import sys
+import os
+import io
+import time
+import hashlib
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Add the parent directory to path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app
+from batch_jobs import BatchJobQueue, COMPLETED, QUEUED, RUNNING
+from batch_scoring import ChunkScorer
+from result_store import ResultStore, spool_upload
+from tests.test_feature_pipeline import make_clicks
+
+class TestResultStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def make_file(self, content):
+        path = os.path.join(self.tmp_dir, f'file{time.perf_counter_ns()}')
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+    def test_spool_upload(self):
+        """Test identical uploads get distinct files and the same hash"""
+        first, first_hash = spool_upload(io.BytesIO(b'a,b\n1,2\n'), self.tmp_dir, '.csv')
+        second, second_hash = spool_upload(io.BytesIO(b'a,b\n1,2\n'), self.tmp_dir, '.csv')
+
+        self.assertNotEqual(first, second)
+        self.assertEqual(first_hash, second_hash)
+        self.assertEqual(first_hash, hashlib.sha256(b'a,b\n1,2\n').hexdigest())
+
+    def test_lru_eviction_by_entries_and_bytes(self):
+        """Test the least recently used results go first once a limit is passed"""
+        store = ResultStore(os.path.join(self.tmp_dir, 'results'), max_entries=2, max_bytes=10)
+        store.put('a', self.make_file(b'1234'))
+        store.put('b', self.make_file(b'1234'))
+        store.get('a')
+        store.put('c', self.make_file(b'1234'))
+        self.assertEqual([store.get(k) is not None for k in 'abc'], [True, False, True])
+
+        store.put('d', self.make_file(b'123456789'))
+        self.assertEqual([store.get(k) is not None for k in 'acd'], [False, False, True])
+        self.assertEqual(store.stats()['bytes'], 9)
+
+    def test_ttl_expiry(self):
+        store = ResultStore(os.path.join(self.tmp_dir, 'results'), ttl=-1)
+        path = store.put('a', self.make_file(b'x'), suffix='.csv')
+        self.assertIsNone(store.get('a'))
+        self.assertFalse(path.exists())
+
+class TestResultCaching(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.scorer = ChunkScorer()
+        cls.csv = make_clicks(80, seed=13).to_csv(index=False).encode()
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.store = ResultStore(os.path.join(self.tmp_dir, 'results'))
+        self.app = app.test_client()
+        self.app.testing = True
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def post(self, url, filename='clicks.csv'):
+        return self.app.post(url, data={'file': (io.BytesIO(self.csv), filename)},
+                             content_type='multipart/form-data')
+
+    def test_reupload_is_served_from_store(self):
+        """Test a re-upload under another name gets the stored result for stream and JSON output"""
+        with patch('api_routes.get_result_store', return_value=self.store):
+            for url in ('/batch-predict?stream=csv', '/batch-predict'):
+                first = self.post(url)
+                first_body = first.get_data()
+                second = self.post(url, 'renamed.csv')
+
+                self.assertEqual(first.headers['X-Result-Cache'], 'miss')
+                self.assertEqual(second.headers['X-Result-Cache'], 'hit')
+                self.assertEqual(second.get_data(), first_body)
+                second.close()
+        self.assertEqual(self.store.stats()['entries'], 2)
+
+    def test_job_reupload_completes_at_once(self):
+        """Test a job for an already scored upload completes without scoring"""
+        queue = BatchJobQueue(os.path.join(self.tmp_dir, 'jobs'), chunk_rows=50,
+                              scorer_factory=lambda: self.scorer, result_store=self.store)
+        upload = os.path.join(self.tmp_dir, 'clicks.csv')
+        with open(upload, 'wb') as f:
+            f.write(self.csv)
+
+        first = queue.submit(upload, 'clicks.csv')
+        while queue.status(first)['status'] in (QUEUED, RUNNING):
+            time.sleep(0.05)
+        with patch.object(BatchJobQueue, '_run') as run:
+            second = queue.submit(upload, 'clicks.csv')
+            run.assert_not_called()
+
+        status = queue.status(second)
+        self.assertEqual(status['status'], COMPLETED)
+        self.assertEqual(status['rows_done'], 80)
+        self.assertEqual(status['fraud_count'], queue.status(first)['fraud_count'])
+        with open(queue.result_path(first), 'rb') as a, open(queue.result_path(second), 'rb') as b:
+            self.assertEqual(a.read(), b.read())
+
+if __name__ == '__main__':
+    unittest.main()
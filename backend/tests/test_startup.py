@@ -0,0 +1,23 @@
+import sys
+import os
+import unittest
+
+# Add the parent directory to path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.startup_benchmark import HEAVY_MODULES, run_once
+
+class TestStartup(unittest.TestCase):
+    def test_app_import_is_light(self):
+        """Test importing app.py does not load TensorFlow, xgboost, imblearn or matplotlib"""
+        result = run_once()
+        self.assertEqual(result['heavy_modules'], [], f"Heavy modules imported at startup: {result['heavy_modules']}")
+        self.assertGreater(result['peak_rss_mb'], 0)
+
+    def test_benchmark_tracks_expected_modules(self):
+        """Test the benchmark watches the libraries that must stay lazy"""
+        for module in ['tensorflow', 'xgboost', 'imblearn', 'matplotlib']:
+            self.assertIn(module, HEAVY_MODULES)
+
+if __name__ == '__main__':
+    unittest.main()
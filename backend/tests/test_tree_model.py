@@ -0,0 +1,96 @@
+import sys
+import os
+import shutil
+import tempfile
+import unittest
+import joblib
+import numpy as np
+from scipy import sparse as sp
+
+# Add the parent directory to path to import modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sklearn.ensemble import RandomForestClassifier
+from xgboost import XGBClassifier
+from tree_model import TreeEnsemble, export_tree_model, export_model_file, load_exported_trees
+
+def make_data(n=600, n_features=20, seed=0):
+    """Generate a binary classification problem with a learnable signal"""
+    rng = np.random.default_rng(seed)
+    X = rng.standard_normal((n, n_features))
+    y = (X[:, 0] + 0.5 * X[:, 3] - X[:, 7] + rng.normal(0, 0.5, n) > 0).astype(int)
+    return X, y
+
+class TestTreeModel(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        X, y = make_data()
+        cls.X_test, _ = make_data(n=400, seed=1)
+        cls.forest = RandomForestClassifier(n_estimators=20, max_depth=8, random_state=42).fit(X, y)
+        cls.xgb = XGBClassifier(n_estimators=30, max_depth=4, eval_metric='logloss', random_state=42).fit(X, y)
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_random_forest_parity(self):
+        """Test the exported forest matches sklearn predict_proba and predict"""
+        ensemble = export_tree_model(self.forest)
+        np.testing.assert_allclose(ensemble.predict_proba(self.X_test), self.forest.predict_proba(self.X_test), atol=1e-12)
+        np.testing.assert_array_equal(ensemble.predict(self.X_test), self.forest.predict(self.X_test))
+
+    def test_xgboost_parity(self):
+        """Test the exported booster matches XGBoost predict_proba and predict"""
+        ensemble = export_tree_model(self.xgb)
+        np.testing.assert_allclose(ensemble.predict_proba(self.X_test), self.xgb.predict_proba(self.X_test), atol=1e-5)
+        np.testing.assert_array_equal(ensemble.predict(self.X_test), self.xgb.predict(self.X_test))
+
+    def test_xgboost_missing_values_follow_default(self):
+        """Test NaN features take each split's default direction like XGBoost"""
+        X = self.X_test.copy()
+        X[::3, 0] = np.nan
+        X[1::4, 7] = np.nan
+        ensemble = export_tree_model(self.xgb)
+        np.testing.assert_allclose(ensemble.predict_proba(X)[:, 1], self.xgb.predict_proba(X)[:, 1], atol=1e-5)
+
+    def test_sparse_input(self):
+        """Test CSR input scores like the dense matrix, absent entries counting as zeros"""
+        X = np.where(np.abs(self.X_test) < 0.8, 0.0, self.X_test)
+        for model in (self.forest, self.xgb):
+            ensemble = export_tree_model(model)
+            np.testing.assert_array_equal(ensemble.predict_proba(sp.csr_matrix(X)), ensemble.predict_proba(X))
+
+    def test_single_row(self):
+        """Test a 1-D feature vector is scored as one row"""
+        ensemble = export_tree_model(self.xgb)
+        self.assertEqual(ensemble.predict_proba(self.X_test[0]).shape, (1, 2))
+
+    def test_save_load_round_trip(self):
+        """Test an export reloads with identical predictions"""
+        path = os.path.join(self.tmp_dir, 'model.trees.npz')
+        ensemble = export_tree_model(self.forest, source_sha256='abc')
+        ensemble.save(path)
+        loaded = TreeEnsemble.load(path)
+
+        self.assertEqual(loaded.source_sha256, 'abc')
+        np.testing.assert_array_equal(loaded.predict_proba(self.X_test), ensemble.predict_proba(self.X_test))
+
+    def test_stale_export_is_ignored(self):
+        """Test an export made from a different model file is not used"""
+        model_path = os.path.join(self.tmp_dir, 'model.pkl')
+        joblib.dump(self.xgb, model_path)
+        export_model_file(model_path)
+        self.assertIsInstance(load_exported_trees(model_path), TreeEnsemble)
+
+        joblib.dump(self.forest, model_path)
+        self.assertIsNone(load_exported_trees(model_path))
+
+    def test_unsupported_model_raises(self):
+        """Test non-tree classifiers are rejected"""
+        with self.assertRaises(ValueError):
+            export_tree_model(object())
+
+if __name__ == '__main__':
+    unittest.main()
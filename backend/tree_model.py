@@ -0,0 +1,331 @@
+import os
+import sys
+import json
+import logging
+import pathlib
+from typing import Optional
+
+import numpy as np
+
+from model_registry import MODELS_DIR, export_path_for, file_sha256, final_estimator
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+# Rows scored per pass; keeps the (rows x trees) node-index matrices cache-resident
+CHUNK_ROWS = 256
+
+
+class TreeEnsemble:
+    """
+    Dependency-light evaluator for exported RandomForest and XGBoost classifiers
+
+    All trees share contiguous node arrays (feature, threshold, left, right,
+    value, default_left) and roots holds each tree's first node. Rows are
+    scored level by level: every (row, tree) pair advances one node per step,
+    so a batch needs max_depth vectorized gathers instead of a Python loop
+    per tree and row.
+
+    predict_proba() also takes scipy sparse matrices and densifies only
+    CHUNK_ROWS rows at a time, so one-hot heavy batches stay in CSR.
+    """
+    accepts_sparse = True
+
+    def __init__(self, kind: str, feature, threshold, left, right, value, default_left, roots,
+                 max_depth: int, n_features: int, base_margin: float = 0.0,
+                 source_sha256: Optional[str] = None):
+        if kind not in ('random_forest', 'xgboost'):
+            raise ValueError(f"Unsupported tree ensemble kind: {kind}")
+        self.kind = kind
+        self.feature = np.ascontiguousarray(feature, dtype=np.int32)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float64)
+        self.left = np.ascontiguousarray(left, dtype=np.int32)
+        self.right = np.ascontiguousarray(right, dtype=np.int32)
+        self.value = np.ascontiguousarray(value, dtype=np.float64)
+        self.default_left = np.ascontiguousarray(default_left, dtype=bool)
+        self.roots = np.ascontiguousarray(roots, dtype=np.int32)
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+        self.base_margin = float(base_margin)
+        self.source_sha256 = source_sha256
+        self.classes_ = np.array([0, 1])
+        self._prepare()
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    def _prepare(self):
+        """Derive evaluation arrays where leaves loop back to themselves"""
+        is_leaf = self.feature < 0
+        nodes = np.arange(self.n_nodes, dtype=np.intp)
+        self._split_feature = np.where(is_leaf, 0, self.feature).astype(np.intp)
+        # children[2 * node] is the left child, children[2 * node + 1] the right one
+        self._children = np.empty(2 * self.n_nodes, dtype=np.intp)
+        self._children[0::2] = np.where(is_leaf, nodes, self.left)
+        self._children[1::2] = np.where(is_leaf, nodes, self.right)
+
+    def _leaf_values(self, X: np.ndarray) -> np.ndarray:
+        """Return the leaf value reached in every tree, shape (n_rows, n_trees)"""
+        # sklearn and XGBoost both compare features in float32
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows = X.shape[0]
+        flat_X = X.ravel()
+        row_offsets = (np.arange(n_rows, dtype=np.intp) * X.shape[1])[:, None]
+        has_missing = self.kind == 'xgboost' and np.isnan(flat_X).any()
+
+        node = np.repeat(self.roots.astype(np.intp)[None, :], n_rows, axis=0)
+        for _ in range(self.max_depth):
+            x = flat_X.take(row_offsets + self._split_feature.take(node))
+            threshold = self.threshold.take(node)
+            if self.kind == 'xgboost':
+                go_right = ~(x < threshold)
+                if has_missing:
+                    go_right = np.where(np.isnan(x), ~self.default_left.take(node), go_right)
+            else:
+                go_right = x > threshold
+            node = self._children.take(2 * node + go_right)
+
+        return self.value.take(node)
+
+    def predict_proba(self, X) -> np.ndarray:
+        """Return class probabilities with shape (n_rows, 2), like sklearn's predict_proba"""
+        sparse = hasattr(X, 'tocsr')
+        if sparse:
+            X = X.tocsr()
+        else:
+            X = np.asarray(X)
+            if X.ndim == 1:
+                X = X.reshape(1, -1)
+        fraud = np.empty(X.shape[0], dtype=np.float64)
+        for start in range(0, X.shape[0], CHUNK_ROWS):
+            block = X[start:start + CHUNK_ROWS]
+            # Absent entries are zeros here, as in the dense matrix the trees were trained on
+            leaves = self._leaf_values(block.astype(np.float32).toarray() if sparse else block)
+            if self.kind == 'xgboost':
+                margin = self.base_margin + leaves.sum(axis=1)
+                fraud[start:start + CHUNK_ROWS] = 1.0 / (1.0 + np.exp(-margin))
+            else:
+                fraud[start:start + CHUNK_ROWS] = leaves.mean(axis=1)
+        return np.column_stack([1.0 - fraud, fraud])
+
+    def predict(self, X) -> np.ndarray:
+        """Return 0/1 labels"""
+        proba = self.predict_proba(X)[:, 1]
+        if self.kind == 'xgboost':
+            return (proba > 0.5).astype(int)
+        # RandomForest takes the argmax of the averaged probabilities; ties go to class 0
+        return (proba > 1.0 - proba).astype(int)
+
+    def save(self, path) -> pathlib.Path:
+        """Write the node arrays to a compressed .npz, atomically replacing any previous export"""
+        path = pathlib.Path(path)
+        staged = path.with_name(path.name.replace('.npz', '') + '.staging.npz')
+        np.savez_compressed(
+            staged,
+            format_version=np.asarray(FORMAT_VERSION),
+            kind=np.asarray(self.kind),
+            feature=self.feature, threshold=self.threshold,
+            left=self.left, right=self.right, value=self.value,
+            default_left=self.default_left, roots=self.roots,
+            max_depth=np.asarray(self.max_depth), n_features=np.asarray(self.n_features),
+            base_margin=np.asarray(self.base_margin),
+            source_sha256=np.asarray(self.source_sha256 or '')
+        )
+        os.replace(staged, path)
+        return path
+
+    @classmethod
+    def load(cls, path) -> 'TreeEnsemble':
+        """Load an export written by save()"""
+        with np.load(path, allow_pickle=False) as data:
+            if int(data['format_version']) != FORMAT_VERSION:
+                raise ValueError(f"Unsupported export format version {int(data['format_version'])}")
+            return cls(
+                str(data['kind']), data['feature'], data['threshold'], data['left'], data['right'],
+                data['value'], data['default_left'], data['roots'], int(data['max_depth']),
+                int(data['n_features']), float(data['base_margin']),
+                source_sha256=str(data['source_sha256']) or None
+            )
+
+
+def _depth(left: np.ndarray, right: np.ndarray, root: int = 0) -> int:
+    depth, level = 0, [root]
+    while level:
+        level = [c for n in level for c in (left[n], right[n]) if c >= 0]
+        depth += bool(level)
+    return depth
+
+
+def export_random_forest(forest, source_sha256: Optional[str] = None) -> TreeEnsemble:
+    """Flatten a fitted RandomForestClassifier into a TreeEnsemble"""
+    fraud_column = list(forest.classes_).index(1)
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset, max_depth = 0, 0
+
+    for estimator in forest.estimators_:
+        tree = estimator.tree_
+        is_leaf = tree.children_left < 0
+        counts = tree.value[:, 0, :]
+        features.append(np.where(is_leaf, -1, tree.feature))
+        thresholds.append(tree.threshold)
+        lefts.append(np.where(is_leaf, -1, tree.children_left + offset))
+        rights.append(np.where(is_leaf, -1, tree.children_right + offset))
+        values.append(counts[:, fraud_column] / counts.sum(axis=1))
+        roots.append(offset)
+        max_depth = max(max_depth, tree.max_depth)
+        offset += tree.node_count
+
+    feature = np.concatenate(features)
+    return TreeEnsemble(
+        'random_forest', feature, np.concatenate(thresholds), np.concatenate(lefts),
+        np.concatenate(rights), np.concatenate(values), np.zeros(len(feature), dtype=bool),
+        roots, max_depth, forest.n_features_in_, source_sha256=source_sha256
+    )
+
+
+def export_xgboost(classifier, source_sha256: Optional[str] = None) -> TreeEnsemble:
+    """Flatten a fitted binary:logistic XGBClassifier into a TreeEnsemble"""
+    learner = json.loads(classifier.get_booster().save_raw('json'))['learner']
+    if learner['objective']['name'] != 'binary:logistic':
+        raise ValueError(f"Unsupported XGBoost objective: {learner['objective']['name']}")
+    if learner['gradient_booster']['name'] != 'gbtree':
+        raise ValueError(f"Unsupported XGBoost booster: {learner['gradient_booster']['name']}")
+
+    trees = learner['gradient_booster']['model']['trees']
+    try:
+        trees = trees[:classifier.best_iteration + 1]
+    except AttributeError:
+        pass  # No early stopping: predict_proba uses every tree
+
+    base_score = float(str(learner['learner_model_param']['base_score']).strip('[]'))
+    features, thresholds, lefts, rights, values, default_lefts, roots = [], [], [], [], [], [], []
+    offset, max_depth = 0, 0
+
+    for tree in trees:
+        if any(tree.get('split_type', [])):
+            raise ValueError("Categorical XGBoost splits are not supported")
+        left = np.asarray(tree['left_children'])
+        right = np.asarray(tree['right_children'])
+        is_leaf = left < 0
+        conditions = np.asarray(tree['split_conditions'], dtype=np.float32)
+        features.append(np.where(is_leaf, -1, tree['split_indices']))
+        thresholds.append(np.where(is_leaf, 0.0, conditions))
+        values.append(np.where(is_leaf, conditions, 0.0))  # Leaf weights live in split_conditions
+        lefts.append(np.where(is_leaf, -1, left + offset))
+        rights.append(np.where(is_leaf, -1, right + offset))
+        default_lefts.append(np.asarray(tree['default_left'], dtype=bool))
+        roots.append(offset)
+        max_depth = max(max_depth, _depth(left, right))
+        offset += len(left)
+
+    feature = np.concatenate(features)
+    return TreeEnsemble(
+        'xgboost', feature, np.concatenate(thresholds), np.concatenate(lefts), np.concatenate(rights),
+        np.concatenate(values), np.concatenate(default_lefts), roots, max_depth,
+        int(learner['learner_model_param']['num_feature']),
+        base_margin=float(np.log(base_score / (1.0 - base_score))), source_sha256=source_sha256
+    )
+
+
+def export_tree_model(model, source_sha256: Optional[str] = None) -> TreeEnsemble:
+    """
+    Flatten a fitted tree classifier (or a Pipeline ending in one) into a TreeEnsemble
+
+    Only the classifier is exported: preprocessing is applied upstream and
+    SMOTE is a training-time step.
+
+    Args:
+        model: RandomForestClassifier, XGBClassifier or a Pipeline ending in one
+        source_sha256 (str, optional): Hash of the .pkl the export was made from
+
+    Returns:
+        TreeEnsemble: Equivalent array-based evaluator
+
+    Raises:
+        ValueError: If the classifier type is not supported
+    """
+    classifier = final_estimator(model)
+    kind = classifier.__class__.__name__
+    if kind == 'RandomForestClassifier':
+        return export_random_forest(classifier, source_sha256)
+    if kind == 'XGBClassifier':
+        return export_xgboost(classifier, source_sha256)
+    raise ValueError(f"Unsupported tree model: {kind}")
+
+
+def export_model_file(model_path, model=None) -> TreeEnsemble:
+    """Export the tree model stored in model_path next to it, checking parity on random inputs"""
+    import joblib
+
+    model_path = pathlib.Path(model_path)
+    if model is None:
+        model = joblib.load(model_path)
+    ensemble = export_tree_model(model, source_sha256=file_sha256(model_path))
+
+    probe = np.random.default_rng(0).standard_normal((512, ensemble.n_features))
+    expected = final_estimator(model).predict_proba(probe)[:, 1]
+    max_diff = float(np.max(np.abs(ensemble.predict_proba(probe)[:, 1] - expected)))
+    if max_diff > 1e-5:
+        raise ValueError(f"Tree export differs from {model_path} by {max_diff:.2e}")
+
+    export_path = ensemble.save(export_path_for(model_path))
+    logger.info(f"Exported {ensemble.n_trees} trees ({ensemble.n_nodes} nodes) to {export_path}")
+    return ensemble
+
+
+def load_exported_trees(model_path, model_sha256: Optional[str] = None) -> Optional[TreeEnsemble]:
+    """
+    Load the tree export of a .pkl model file if one exists and is up to date
+
+    Args:
+        model_path: Path to the joblib-pickled model
+        model_sha256 (str, optional): Precomputed hash of model_path
+
+    Returns:
+        TreeEnsemble or None: The export, or None if missing, stale or unreadable
+    """
+    export_path = export_path_for(model_path)
+    if not export_path.exists():
+        return None
+    try:
+        ensemble = TreeEnsemble.load(export_path)
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable tree export {export_path}: {e}")
+        return None
+
+    if model_sha256 is None:
+        model_sha256 = file_sha256(model_path)
+    if ensemble.source_sha256 != model_sha256:
+        logger.warning(f"Ignoring stale tree export {export_path}; it was made from a different model file")
+        return None
+    return ensemble
+
+
+def main():
+    """Export the random forest and XGBoost models (or the given .pkl files) to tree arrays"""
+    paths = [pathlib.Path(p) for p in sys.argv[1:]] or [
+        MODELS_DIR / 'random_forest_model' / 'model.pkl',
+        MODELS_DIR / 'xgboost_model' / 'model.pkl'
+    ]
+    status = 0
+    for model_path in paths:
+        if not model_path.exists():
+            logger.warning(f"Model not found at {model_path}")
+            continue
+        try:
+            export_model_file(model_path)
+        except Exception as e:
+            logger.error(f"Export of {model_path} failed: {e}")
+            status = 1
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
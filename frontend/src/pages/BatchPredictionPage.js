@@ -1,9 +1,13 @@
-import React, { useState } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
 import { toast } from 'react-toastify';
 import HeroSection from '../components/HeroSection';
 import '../styles/BatchPredictionPage.css';
 
+const API_URL = 'http://localhost:5000';
+const POLL_INTERVAL_MS = 1000;
+const UPLOAD_EXTENSIONS = ['.csv', '.csv.gz', '.csv.zst', '.zip'];
+
 const BatchPredictionPage = () => {
   const [file, setFile] = useState(null);
   const [isProcessing, setIsProcessing] = useState(false);
@@ -11,14 +15,23 @@ const BatchPredictionPage = () => {
   const [dragActive, setDragActive] = useState(false);
   // Remove model selection state
   const [downloading, setDownloading] = useState(false);
+  const [job, setJob] = useState(null);
+  const pollRef = useRef(null);
+
+  // Stop polling when leaving the page
+  useEffect(() => () => clearTimeout(pollRef.current), []);
+
+  // Compressed CSVs and zip archives are decompressed by the backend while it scores
+  const isSupportedUpload = (candidate) =>
+    candidate.type === 'text/csv' || UPLOAD_EXTENSIONS.some((ext) => candidate.name.toLowerCase().endsWith(ext));
 
   const handleFileChange = (e) => {
     const selectedFile = e.target.files[0];
     if (selectedFile) {
-      if (selectedFile.type === 'text/csv' || selectedFile.name.endsWith('.csv')) {
+      if (isSupportedUpload(selectedFile)) {
         setFile(selectedFile);
       } else {
-        toast.error('Please upload a CSV file');
+        toast.error('Please upload a CSV file (optionally .gz, .zst or .zip compressed)');
       }
     }
   };
@@ -41,10 +54,10 @@ const BatchPredictionPage = () => {
     
     if (e.dataTransfer.files && e.dataTransfer.files[0]) {
       const droppedFile = e.dataTransfer.files[0];
-      if (droppedFile.type === 'text/csv' || droppedFile.name.endsWith('.csv')) {
+      if (isSupportedUpload(droppedFile)) {
         setFile(droppedFile);
       } else {
-        toast.error('Please upload a CSV file');
+        toast.error('Please upload a CSV file (optionally .gz, .zst or .zip compressed)');
       }
     }
   };
@@ -66,30 +79,103 @@ const BatchPredictionPage = () => {
     }
 
     setIsProcessing(true);
+    setResults(null);
+    setJob(null);
     const formData = new FormData();
     formData.append('file', file);
-    
-    // Use ensemble model by default without giving user a choice
-    formData.append('model', 'ensemble');
-    formData.append('threshold', 0.5);
 
     try {
-      const response = await axios.post('http://localhost:5000/batch-predict', formData, {
+      // The upload is queued as a background job; poll it instead of waiting on one long request
+      const response = await axios.post(`${API_URL}/batch-jobs`, formData, {
         headers: {
           'Content-Type': 'multipart/form-data'
         }
       });
-      
-      setResults(response.data);
-      toast.success('Batch prediction completed successfully');
+      setJob(response.data);
+      pollJob(response.data.job_id);
     } catch (error) {
-      console.error('Error processing batch prediction:', error);
-      toast.error(error.response?.data?.message || 'Error processing batch prediction');
-    } finally {
+      console.error('Error submitting batch job:', error);
+      toast.error(error.response?.data?.error || 'Error submitting batch prediction');
+      setIsProcessing(false);
+    }
+  };
+
+  const pollJob = async (jobId) => {
+    try {
+      const response = await axios.get(`${API_URL}/batch-jobs/${jobId}`);
+      const status = response.data;
+      setJob(status);
+
+      if (status.status === 'queued' || status.status === 'running') {
+        pollRef.current = setTimeout(() => pollJob(jobId), POLL_INTERVAL_MS);
+        return;
+      }
+
       setIsProcessing(false);
+      if (status.status === 'completed') {
+        const scored = status.rows_done - status.error_rows;
+        setResults({
+          job_id: status.job_id,
+          total_records: status.rows_done,
+          fraud_count: status.fraud_count,
+          fraud_percentage: scored > 0 ? (status.fraud_count / scored) * 100 : 0,
+          processing_time: status.processing_time,
+          error_rows: status.error_rows
+        });
+        toast.success('Batch prediction completed successfully');
+      } else if (status.status === 'cancelled') {
+        toast.info('Batch prediction cancelled');
+      } else {
+        toast.error(status.error || 'Batch prediction failed');
+      }
+    } catch (error) {
+      console.error('Error polling batch job:', error);
+      toast.error(error.response?.data?.error || 'Lost track of the batch prediction');
+      setIsProcessing(false);
+    }
+  };
+
+  const cancelJob = async () => {
+    if (!job) return;
+    try {
+      await axios.post(`${API_URL}/batch-jobs/${job.job_id}/cancel`);
+    } catch (error) {
+      console.error('Error cancelling batch job:', error);
+      toast.error('Failed to cancel batch prediction');
     }
   };
 
+  const downloadJobResult = async () => {
+    if (!results?.job_id) return;
+    setDownloading(true);
+    try {
+      const response = await axios.get(`${API_URL}/batch-jobs/${results.job_id}/result`, {
+        responseType: 'blob'
+      });
+      const url = URL.createObjectURL(response.data);
+      const a = document.createElement('a');
+      a.style.display = 'none';
+      a.href = url;
+      a.download = `fraud_predictions_${new Date().toISOString().slice(0, 10)}.csv`;
+      document.body.appendChild(a);
+      a.click();
+      window.URL.revokeObjectURL(url);
+      document.body.removeChild(a);
+      toast.success('Results downloaded successfully');
+    } catch (error) {
+      console.error('Error downloading results:', error);
+      toast.error('Failed to download results');
+    } finally {
+      setDownloading(false);
+    }
+  };
+
+  const formatEta = (seconds) => {
+    if (seconds === null || seconds === undefined) return 'estimating...';
+    if (seconds < 60) return `${Math.ceil(seconds)}s left`;
+    return `${Math.floor(seconds / 60)}m ${Math.ceil(seconds % 60)}s left`;
+  };
+
   const getRiskLevel = (probability) => {
     if (probability >= 0.7) return 'high-risk';
     if (probability >= 0.4) return 'medium-risk';
@@ -407,7 +493,7 @@ d7a9b578-ac46-4505-aca9-736f007d0960,2024-03-11 16:46:39,Tablet,Opera,macOS,0.41
               type="file" 
               id="file-input" 
               className="file-input" 
-              accept=".csv" 
+              accept=".csv,.gz,.zst,.zip" 
               onChange={handleFileChange} 
             />
           </div>
@@ -436,7 +522,25 @@ d7a9b578-ac46-4505-aca9-736f007d0960,2024-03-11 16:46:39,Tablet,Opera,macOS,0.41
           <div className="results-section">
             <div className="processing-indicator">
               <div className="processing-spinner"></div>
-              <p className="processing-message">Processing your data, this may take a moment...</p>
+              {job && job.status === 'running' ? (
+                <>
+                  <div className="job-progress">
+                    <div className="job-progress-bar" style={{ width: `${Math.round((job.progress || 0) * 100)}%` }}></div>
+                  </div>
+                  <p className="processing-message">
+                    {job.rows_done.toLocaleString()} of {(job.rows_total || 0).toLocaleString()} rows scored, {formatEta(job.eta_seconds)}
+                  </p>
+                </>
+              ) : (
+                <p className="processing-message">
+                  {job ? 'Waiting for a worker to pick up your file...' : 'Uploading your data...'}
+                </p>
+              )}
+              {job && (
+                <button className="cancel-job-button" onClick={cancelJob}>
+                  Cancel
+                </button>
+              )}
             </div>
           </div>
         )}
@@ -466,8 +570,21 @@ d7a9b578-ac46-4505-aca9-736f007d0960,2024-03-11 16:46:39,Tablet,Opera,macOS,0.41
               </div>
             </div>
             
+            {results.job_id && (
+              <>
+                {results.error_rows > 0 && (
+                  <p className="results-note">
+                    {results.error_rows} rows could not be scored; see the error column in the results file.
+                  </p>
+                )}
+                <button className="download-button" onClick={downloadJobResult} disabled={downloading}>
+                  <span className="download-icon">📥</span> {downloading ? 'Downloading...' : 'Download Full Results CSV'}
+                </button>
+              </>
+            )}
+
             {/* Conditionally render summary or detailed results based on result structure */}
-            {results.predictions && typeof results.predictions === 'object' && !Array.isArray(results.predictions) ? (
+            {results.job_id ? null : results.predictions && typeof results.predictions === 'object' && !Array.isArray(results.predictions) ? (
               renderSummary()
             ) : (
               <>
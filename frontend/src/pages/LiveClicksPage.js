@@ -1,35 +1,116 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
 import '../styles/LiveClicksPage.css';
 
+// Clicks requested per page; the server returns a cursor to continue from
+const PAGE_SIZE = 1000;
+// Delay before reopening a stream the server refused, doubled up to the maximum
+const STREAM_RETRY_MS = 5000;
+const MAX_STREAM_RETRY_MS = 60000;
+
 const LiveClicksPage = () => {
   const [liveClicks, setLiveClicks] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [lastUpdated, setLastUpdated] = useState(null);
+  const cursorRef = useRef(0);
+  const fetchingRef = useRef(false);
 
+  // Fetch only the clicks appended since the last poll and add them to the table
   const fetchLiveClicks = async () => {
+    if (fetchingRef.current) return;
+    fetchingRef.current = true;
     try {
-      const response = await axios.get('http://localhost:5000/api/live-clicks');
-      setLiveClicks(response.data);
+      let hasMore = true;
+      while (hasMore) {
+        const since = cursorRef.current;
+        const response = await axios.get('http://localhost:5000/api/live-clicks', {
+          params: { since, limit: PAGE_SIZE }
+        });
+        // The stream delivered clicks meanwhile; it already has (or will push) this page
+        if (cursorRef.current !== since) break;
+        const { clicks, cursor, has_more: more } = response.data;
+        cursorRef.current = cursor;
+        hasMore = more;
+        if (clicks.length > 0) {
+          setLiveClicks(previous => previous.concat(clicks));
+        }
+      }
+      setError(null);
       setLastUpdated(new Date());
       setLoading(false);
     } catch (err) {
       setError('Failed to fetch live clicks data');
       setLoading(false);
       console.error('Error fetching live clicks:', err);
+    } finally {
+      fetchingRef.current = false;
     }
   };
 
   useEffect(() => {
-    fetchLiveClicks();
-    
-    // Set up polling for real-time updates
-    const interval = setInterval(() => {
-      fetchLiveClicks();
-    }, 5000); // Poll every 5 seconds
-    
-    return () => clearInterval(interval);
+    let source = null;
+    let interval = null;
+    let retry = null;
+    let retryDelay = STREAM_RETRY_MS;
+    let closed = false;
+
+    const startPolling = () => {
+      if (!interval) interval = setInterval(fetchLiveClicks, 5000);
+    };
+
+    // Clicks are pushed as they arrive; event ids are cursors, so the browser
+    // resumes from the last one received when it reconnects
+    const openStream = () => {
+      if (closed) return;
+      source = new EventSource(
+        `http://localhost:5000/api/live-clicks/stream?last_event_id=${cursorRef.current}`
+      );
+      source.addEventListener('click', event => {
+        const cursor = Number(event.lastEventId);
+        if (cursor <= cursorRef.current) return; // Already fetched by a refresh
+        cursorRef.current = cursor;
+        setLiveClicks(previous => previous.concat([JSON.parse(event.data)]));
+        setLastUpdated(new Date());
+      });
+      // Too far behind to replay: catch up through the paginated endpoint, then reconnect
+      source.addEventListener('reset', () => {
+        source.close();
+        fetchLiveClicks().then(openStream);
+      });
+      source.onopen = () => {
+        retryDelay = STREAM_RETRY_MS;
+        if (interval) {
+          clearInterval(interval);
+          interval = null;
+        }
+      };
+      // The browser retries dropped connections itself, but gives up for good on an
+      // error response such as 503 when the server has too many streams open: poll
+      // meanwhile and try the stream again after a growing delay
+      source.onerror = () => {
+        if (source.readyState !== EventSource.CLOSED || closed) return;
+        startPolling();
+        retry = setTimeout(openStream, retryDelay);
+        retryDelay = Math.min(retryDelay * 2, MAX_STREAM_RETRY_MS);
+      };
+    };
+
+    fetchLiveClicks().then(() => {
+      if (window.EventSource) {
+        openStream();
+      } else if (!closed) {
+        // No Server-Sent Events: fall back to polling for new clicks
+        startPolling();
+      }
+    });
+
+    return () => {
+      closed = true;
+      if (source) source.close();
+      if (interval) clearInterval(interval);
+      if (retry) clearTimeout(retry);
+    };
   }, []);
 
   return (